@@ -1,16 +1,24 @@
 """FastAPI application for the agent system."""
+import asyncio
 import sys
+import uuid
 from pathlib import Path
-from typing import Optional
+from typing import Any, Optional
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent))
 
+from context.compression_worker import get_compression_worker, shutdown_compression_worker
+from context.pg_pool import close_connection_pool, get_connection_pool
+from context.token_counter import TOKENIZER_FILE, warmup_tokenizer
 from src.agent.agent import create_agent
+from src.jobs import JobWorker, create_job_store
+from src.prompts import get_prompt_budgeter
 from src.utils.logger import setup_logger
 from config import get_settings
 
@@ -48,6 +56,10 @@ app.add_middleware(
 # Global agent instance
 agent = None
 
+# Async job store (and optional in-process worker pool)
+job_store = None
+embedded_worker = None
+
 
 # Request/Response models
 class QueryRequest(BaseModel):
@@ -71,6 +83,10 @@ class QueryRequest(BaseModel):
         False,
         description="Enable deep thinking mode: multi-step recall with QA pairs (slower but more comprehensive)"
     )
+    parallel_execution: Optional[bool] = Field(
+        None,
+        description="Optional override for parallel execution: run recall steps (and deep thinking sub-answers) concurrently"
+    )
     session_id: Optional[str] = Field(
         None,
         description="Optional session ID for multi-turn conversation (auto-loads history if exists)"
@@ -115,18 +131,71 @@ class QueryResponse(BaseModel):
     tokens_until_compression: Optional[int] = Field(None, description="Remaining tokens before compression is triggered")
 
 
+
+class StreamEvent(BaseModel):
+    """Server-sent event emitted by the streaming query endpoint."""
+    
+    type: str = Field(..., description="Event type: session, intent, plan, step, analysis, token, done, error")
+    content: Optional[str] = Field(None, description="Text payload (answer token, intent, error message)")
+    session_id: Optional[str] = Field(None, description="Session ID (session event only)")
+    data: Optional[Any] = Field(None, description="Structured payload (plan, step result, analysis, final response)")
+
+
+class AsyncJobResponse(BaseModel):
+    """Status and result of an async query job."""
+    
+    job_id: str = Field(..., description="Job ID")
+    status: str = Field(..., description="Job status: queued, running, succeeded, failed, cancelled")
+    session_id: Optional[str] = Field(None, description="Session ID of the query")
+    created_at: Optional[float] = Field(None, description="Creation timestamp")
+    started_at: Optional[float] = Field(None, description="Start timestamp")
+    finished_at: Optional[float] = Field(None, description="Finish timestamp")
+    queue_position: Optional[int] = Field(None, description="Position in the queue (queued jobs only, 0 = next)")
+    cancel_requested: bool = Field(False, description="Cancellation requested while running")
+    result: Optional[QueryResponse] = Field(None, description="Query result (succeeded / failed jobs)")
+    error: Optional[str] = Field(None, description="Error message if any")
+
+
+class RecallCacheInvalidateRequest(BaseModel):
+    """Request model for recall cache invalidation."""
+    
+    index_names: list = Field(
+        ...,
+        description="Indexes whose documents were uploaded or deleted",
+        min_length=1
+    )
+
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize the agent on startup."""
-    global agent
+    global agent, job_store, embedded_worker
     logger.info("Initializing agent...")
     
     try:
+        # Load the tokenizer now so the first request does not pay for it
+        if not await asyncio.to_thread(warmup_tokenizer) and settings.tokenizer_required:
+            raise RuntimeError(f"TOKENIZER_REQUIRED is set but the tokenizer could not be loaded from {TOKENIZER_FILE}")
+        # Measure prompt template overheads once, with the loaded tokenizer
+        await asyncio.to_thread(get_prompt_budgeter)
+        
         # Agent is configured via environment variables
         agent = create_agent()
         logger.info("Agent initialized successfully")
         logger.info(f"Recall API: {settings.recall_api_url}")
         logger.info(f"Web search enabled: {settings.enable_web_search}")
+        
+        # Async jobs are executed by worker processes (python worker.py)
+        job_store = create_job_store()
+        if settings.job_embedded_worker:
+            embedded_worker = JobWorker(
+                agent,
+                job_store,
+                concurrency=settings.job_worker_concurrency,
+                heartbeat_interval=settings.job_heartbeat_interval,
+                stale_timeout=settings.job_stale_timeout
+            )
+            await embedded_worker.start()
     except Exception as e:
         logger.error(f"Failed to initialize agent: {str(e)}", exc_info=True)
         raise
@@ -136,6 +205,13 @@ async def startup_event():
 async def shutdown_event():
     """Cleanup on shutdown."""
     logger.info("Shutting down agent API...")
+    
+    if embedded_worker is not None:
+        await embedded_worker.stop()
+    if agent is not None:
+        await agent.aclose()
+    shutdown_compression_worker()
+    close_connection_pool()
 
 
 @app.get("/")
@@ -156,7 +232,9 @@ async def health_check():
     
     return {
         "status": "healthy",
-        "agent_ready": True
+        "agent_ready": True,
+        "postgres_pool": get_connection_pool().stats(),
+        "compression_worker": get_compression_worker().stats()
     }
 
 
@@ -180,7 +258,8 @@ async def process_query(request: QueryRequest):
     logger.info(f"Received query [session: {request.session_id or 'new'}]: {request.user_query[:100]}...")
     
     try:
-        result = agent.process_query(
+        # 使用异步执行路径，LLM调用期间不阻塞事件循环
+        result = await agent.aprocess_query(
             user_query=request.user_query,
             mode_type=request.mode_type,
             enable_web_search=request.enable_web_search,
@@ -189,16 +268,70 @@ async def process_query(request: QueryRequest):
             content=request.content,
             force_recall=request.force_recall,
             recall_index_names=request.recall_index_names,
-            recall_doc_ids=request.recall_doc_ids
+            recall_doc_ids=request.recall_doc_ids,
+            parallel_execution=request.parallel_execution
         )
         
         return QueryResponse(**result)
-        
+    
     except Exception as e:
         logger.error(f"Error processing query: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+
+@app.post("/query/stream")
+async def process_query_stream(request: QueryRequest):
+    """
+    Process a user query and stream progress via Server-Sent Events.
+    
+    Emits one event per workflow transition (intent, plan, each execution step,
+    analysis), then the final answer token by token, then a ``done`` event with
+    the full response and ``data: [DONE]``.
+    
+    Args:
+        request: Query request containing user query and optional parameters
+        
+    Returns:
+        StreamingResponse (text/event-stream)
+    """
+    if agent is None:
+        raise HTTPException(status_code=503, detail="Agent not initialized")
+    
+    logger.info(f"Received stream query [session: {request.session_id or 'new'}]: {request.user_query[:100]}...")
+    
+    async def generate():
+        try:
+            async for event in agent.astream_query(
+                user_query=request.user_query,
+                mode_type=request.mode_type,
+                enable_web_search=request.enable_web_search,
+                deep_thinking=request.deep_thinking,
+                session_id=request.session_id,
+                content=request.content,
+                force_recall=request.force_recall,
+                recall_index_names=request.recall_index_names,
+                recall_doc_ids=request.recall_doc_ids,
+                parallel_execution=request.parallel_execution
+            ):
+                yield f"data: {StreamEvent(**event).model_dump_json(exclude_none=True)}\n\n"
+        except Exception as e:
+            logger.error(f"Error streaming query: {str(e)}", exc_info=True)
+            yield f"data: {StreamEvent(type='error', content=str(e)).model_dump_json(exclude_none=True)}\n\n"
+        
+        yield "data: [DONE]\n\n"
+    
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
 @app.get("/conversation/{session_id}")
 async def get_conversation_history(session_id: str):
     """
@@ -225,41 +358,126 @@ async def get_conversation_history(session_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/query/async")
-async def process_query_async(request: QueryRequest, background_tasks: BackgroundTasks):
+
+@app.post("/recall/cache/invalidate")
+async def invalidate_recall_cache(request: RecallCacheInvalidateRequest):
     """
-    Process a query asynchronously in the background.
+    Invalidate cached recall results for the given indexes.
+    
+    Call this after documents are uploaded to or deleted from an index so
+    subsequent queries don't reuse stale recall results.
     
     Args:
-        request: Query request
-        background_tasks: FastAPI background tasks
+        request: Indexes to invalidate
         
     Returns:
-        Immediate response with session ID
+        Cache statistics after invalidation
     """
     if agent is None:
         raise HTTPException(status_code=503, detail="Agent not initialized")
     
-    import uuid
+    try:
+        stats = agent.invalidate_recall_cache(request.index_names)
+        return {
+            "success": True,
+            "index_names": request.index_names,
+            "cache": stats
+        }
+    except Exception as e:
+        logger.error(f"Error invalidating recall cache: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/query/async")
+async def process_query_async(request: QueryRequest):
+    """
+    Queue a query for asynchronous processing by the worker pool.
+    
+    Poll ``GET /query/async/{job_id}`` for status and result.
+    
+    Args:
+        request: Query request
+        
+    Returns:
+        Immediate response with job ID and session ID
+    """
+    if job_store is None:
+        raise HTTPException(status_code=503, detail="Job store not initialized")
+    
     session_id = request.session_id or str(uuid.uuid4())
     
-    # Add task to background
-    background_tasks.add_task(
-        agent.process_query,
-        request.user_query,
-        request.mode_type,
-        request.enable_web_search,
-        request.deep_thinking,
-        session_id
-    )
+    try:
+        job_id = await asyncio.to_thread(
+            job_store.enqueue,
+            {
+                "user_query": request.user_query,
+                "mode_type": request.mode_type,
+                "enable_web_search": request.enable_web_search,
+                "deep_thinking": request.deep_thinking,
+                "session_id": session_id,
+                "content": request.content,
+                "force_recall": request.force_recall,
+                "recall_index_names": request.recall_index_names,
+                "recall_doc_ids": request.recall_doc_ids,
+                "parallel_execution": request.parallel_execution
+            },
+            session_id
+        )
+    except Exception as e:
+        logger.error(f"Error queueing async query: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
     
     return {
+        "job_id": job_id,
         "session_id": session_id,
-        "status": "processing",
-        "message": "Query is being processed in the background"
+        "status": "queued",
+        "message": "Query is queued for background processing"
     }
 
 
+@app.get("/query/async/{job_id}", response_model=AsyncJobResponse, response_model_exclude_none=True)
+async def get_async_query(job_id: str):
+    """
+    Get the status and result of an async query job.
+    
+    Args:
+        job_id: Job ID returned by POST /query/async
+        
+    Returns:
+        Job status, and the query result once finished
+    """
+    if job_store is None:
+        raise HTTPException(status_code=503, detail="Job store not initialized")
+    
+    job = await asyncio.to_thread(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found or expired: {job_id}")
+    return AsyncJobResponse(**job)
+
+
+@app.post("/query/async/{job_id}/cancel", response_model=AsyncJobResponse, response_model_exclude_none=True)
+async def cancel_async_query(job_id: str):
+    """
+    Cancel an async query job.
+    
+    Queued jobs are cancelled immediately; running jobs are interrupted by
+    their worker within one heartbeat interval. Finished jobs are unchanged.
+    
+    Args:
+        job_id: Job ID returned by POST /query/async
+        
+    Returns:
+        Job status after the cancellation request
+    """
+    if job_store is None:
+        raise HTTPException(status_code=503, detail="Job store not initialized")
+    
+    status = await asyncio.to_thread(job_store.cancel, job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Job not found or expired: {job_id}")
+    return AsyncJobResponse(**await asyncio.to_thread(job_store.get, job_id))
+
+
 if __name__ == "__main__":
     import uvicorn
     
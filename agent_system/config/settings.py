@@ -25,14 +25,22 @@ class Settings(BaseSettings):
     # ========== 上下文和 Token 管理 ==========
     max_context_tokens: int = 128000  # 模型最大上下文窗口
     direct_content_threshold: float = 0.7  # 直接内容模式阈值：文档大小 < 70% 可用tokens时直接使用
+    collected_information_token_budget: int = 16000  # 分析/回答提示词中已收集信息的 token 上限（召回片段按相似度与步骤覆盖度择优填充）
+    reserved_answer_tokens: int = 4000  # 为模型回答预留的token数（提示词预算从上下文窗口中扣除）
     
     # ========== Agent 配置 ==========
     enable_web_search: bool = False
     max_replan_attempts: int = 2
     execution_timeout: int = 300
+    parallel_execution: bool = False  # 并发执行各 recall 步骤（深度思考模式下子问题回答也并发生成）
+    parallel_recall_concurrency: int = 4  # 并发执行时同时进行的 recall / LLM 请求上限
+    parallel_deep_thinking_refine: bool = True  # 深度思考并发模式下，子问题回答完成后结合全部QA对再修订一轮
+    intent_fast_path: bool = True  # 意图识别先经本地规则 / 分类器判定，置信度不足时才调用 LLM
+    intent_classifier_threshold: float = 0.9  # 本地分类器判定所需的最低后验概率（scripts/eval_intent_classifier.py 评估）
     
     # Recall API Configuration
     recall_api_url: str = "http://localhost:9003/api/recall"
+    recall_batch_api_url: str = ""  # 批量召回接口（多个问题一次请求）；留空或接口不可用时并发逐个调用 recall_api_url
     recall_index_names: str = "deeprag_vectors"  # Comma-separated
     recall_doc_ids: str = ""  # Comma-separated, optional
     recall_es_host: str = "http://localhost:9200"
@@ -40,6 +48,20 @@ class Settings(BaseSettings):
     recall_similarity_threshold: float = 0.2
     recall_vector_similarity_weight: float = 0.3
     
+    # Recall HTTP Client Configuration (shared keep-alive pool)
+    recall_timeout: float = 60.0  # 单次请求超时（秒）
+    recall_connect_timeout: float = 10.0  # 建立连接超时（秒）
+    recall_max_connections: int = 20  # 到 recall 服务的最大并发连接数
+    recall_max_keepalive_connections: int = 10  # 连接池中保留的空闲长连接数
+    recall_keepalive_expiry: float = 30.0  # 空闲长连接保留时间（秒）
+    recall_http2: bool = False  # 启用 HTTP/2（需安装 h2，未安装时回退 HTTP/1.1）
+    
+    # Recall Cache Configuration
+    recall_cache_enabled: bool = True  # 缓存召回结果（相同问题/索引/文档/参数直接复用）
+    recall_cache_ttl: int = 600  # 缓存有效期（秒）
+    recall_cache_max_entries: int = 1024  # 进程内 LRU 最大条目数
+    recall_cache_redis_enabled: bool = True  # 启用 Redis 共享缓存层（多进程共享，失效代数也存于 Redis）
+    
     # Recall Model Configuration
     recall_model_factory: str = "VLLM"
     recall_model_name: str = "bge-m3"
@@ -68,6 +90,11 @@ class Settings(BaseSettings):
     # ========== 上下文压缩配置 ==========
     compression_threshold_ratio: float = 0.8  # 达到80%上下文时触发压缩
     compression_preserve_ratio: float = 0.3  # 保留最近30%的消息不压缩
+    compression_mode: str = "incremental"  # incremental（只总结上一轮摘要之后的新区间并合并为滚动摘要）| full（重新总结分割点之前的全部内容）
+    compression_summary_max_tokens: int = 2000  # 增量模式下滚动摘要的目标上限
+    compression_background: bool = True  # 在后台线程中压缩，不阻塞触发压缩的请求（False 时在保存本轮后同步压缩）
+    compression_worker_threads: int = 2  # 每个进程同时执行压缩的线程数
+    compression_lock_ttl: int = 600  # 会话压缩锁过期时间（秒），应大于一次摘要调用的最长耗时
     
     # ========== 时间窗口注入配置 ==========
     intent_recognition_turns: int = 2
@@ -93,12 +120,28 @@ class Settings(BaseSettings):
     postgres_user: str = "reader"  # Reader 项目的用户名
     postgres_password: str = "reader_dev_password"  # Reader 项目的密码
     postgres_pool_size: int = 10
-    postgres_max_overflow: int = 20
+    postgres_max_overflow: int = 20  # 连接池满时额外允许的溢出连接数（归还时关闭）
+    postgres_pool_timeout: float = 30.0  # 等待可用连接的最长时间（秒），超时抛出 PoolTimeoutError
+    
+    # ========== 异步任务配置（/query/async，Redis 任务队列 + 独立 worker 进程）==========
+    job_worker_concurrency: int = 4  # 每个 worker 进程同时执行的任务数（python worker.py --concurrency 可覆盖）
+    job_embedded_worker: bool = False  # 在 API 进程内启动 worker（仅开发环境；生产环境请单独运行 worker.py）
+    job_result_ttl: int = 3600  # 任务结束后结果保留时间（秒）
+    job_queued_ttl: int = 86400  # 未结束任务记录保留时间（秒）
+    job_heartbeat_interval: float = 5.0  # 执行中任务的心跳与取消检查间隔（秒）
+    job_stale_timeout: int = 60  # 心跳超时后任务重新入队（秒），应大于心跳间隔
+    
+    # ========== 图检查点配置（会话历史由 SessionManager 持久化，检查点仅用于单次运行）==========
+    checkpointer_backend: str = "memory"  # memory（有界内存，LRU+TTL）| postgres | redis | none（不保存检查点）
+    checkpointer_max_threads: int = 1000  # memory 模式下最多保留的运行线程数（每次运行结束即删除），超出按 LRU 淘汰
+    checkpointer_ttl: int = 3600  # 检查点保留时间（秒）；memory 模式按最近访问计时，redis 模式设置 key 过期
     
     # ========== 性能配置 ==========
     batch_size: int = 100
     enable_cache: bool = True
     cache_read_timeout: int = 2
+    token_count_cache_size: int = 10000  # token 计数缓存条目数（按内容哈希，LRU），0 表示不缓存
+    tokenizer_required: bool = False  # tokenizer（context/tokenizer/tokenizer.json）加载失败时中止启动；否则按字符数估算 token
     
     def validate_required_fields(self) -> None:
         """Validate that all required fields are set."""
@@ -10,9 +10,11 @@ from langchain.schema import HumanMessage
 
 from context.models import Message, CompressionRecord, MessageType
 from context.session_storage import SessionStorage
+from context.token_budget import TokenBudget
 from context.token_counter import calculate_tokens
 from context.prompts.compression_prompt import (
     build_compression_prompt,
+    build_incremental_compression_prompt,
     validate_compression_output,
     extract_summary_content
 )
@@ -21,6 +23,8 @@ from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+COMPRESSION_MODES = ("incremental", "full")
+
 
 class CompressionManager:
     """压缩管理器 - 实现上下文压缩算法"""
@@ -57,6 +61,12 @@ class CompressionManager:
         self.settings = settings
         self.preserve_ratio = settings.compression_preserve_ratio
         self.compression_threshold = settings.compression_threshold_tokens
+        self.compression_mode = settings.compression_mode.lower()
+        self.summary_max_tokens = settings.compression_summary_max_tokens
+        if self.compression_mode not in COMPRESSION_MODES:
+            raise ValueError(
+                f"Unknown COMPRESSION_MODE: {self.compression_mode} (expected one of {COMPRESSION_MODES})"
+            )
     
     # ========================================================================
     # 主要压缩方法
@@ -64,7 +74,7 @@ class CompressionManager:
     
     def should_compress(self, session_id: str) -> bool:
         """
-        判断会话是否需要压缩
+        判断会话是否需要压缩（读取会话token计数器，不加载消息）
         
         Args:
             session_id: 会话ID
@@ -72,21 +82,8 @@ class CompressionManager:
         Returns:
             是否需要压缩
         """
-        messages = self.storage.get_messages(session_id, include_compressed=False)
-        
-        if not messages:
-            return False
-        
-        total_tokens = sum(msg.token_count for msg in messages)
-        should_compress = total_tokens > self.compression_threshold
-        
-        if should_compress:
-            logger.info(
-                f"Compression needed: session={session_id}, "
-                f"tokens={total_tokens}, threshold={self.compression_threshold}"
-            )
-        
-        return should_compress
+        budget = TokenBudget(storage=self.storage, compression_threshold=self.compression_threshold)
+        return budget.needs_compression(session_id)
     
     def compress_session(self, session_id: str) -> CompressionRecord:
         """
@@ -114,7 +111,6 @@ class CompressionManager:
         # 保存结果
         self._save_compression_result(
             session_id=session_id,
-            compressed_messages=compressed_messages,
             summary_message=summary_message,
             compression_record=compression_record
         )
@@ -139,20 +135,18 @@ class CompressionManager:
         2. 从后往前检查，找到即将使累积达到30%的消息
         3. 该消息就是分割点位置，需要确保在对话边界（assistant回答之后）
         4. 分离消息
-        5. 调用LLM生成XML摘要
+        5. 调用LLM生成XML摘要（增量模式下只总结上一轮摘要之后的新消息，并合并进该摘要）
         6. 创建压缩记录
         
         Args:
             messages: 需要压缩的消息列表
             
         Returns:
-            (被压缩的消息列表, 摘要消息, 压缩记录)
+            (被压缩的消息列表, 摘要消息, 压缩记录)；压缩记录的 round 在保存后才确定
         """
-        # 过滤出活跃消息（排除已压缩的，但保留压缩摘要）
-        active_messages = [
-            msg for msg in messages
-            if not msg.is_compressed or msg.message_type == MessageType.COMPRESSION
-        ]
+        # 过滤出未被压缩的消息（包括当前的压缩摘要）
+        # 已被合并进新摘要的旧摘要仍会出现在活跃消息中，但其token已经扣除，不能再次压缩
+        active_messages = [msg for msg in messages if not msg.is_compressed]
         
         if not active_messages:
             raise ValueError("No active messages to compress")
@@ -225,9 +219,26 @@ class CompressionManager:
         # ========================================================================
         # 步骤5: 调用LLM生成XML摘要
         # ========================================================================
-        summary_content = self._generate_summary(messages_to_compress)
+        # 增量模式：上一轮摘要不再作为普通消息重新总结，Prompt 大小只取决于
+        # 有上限的滚动摘要和新区间，不随会话变长而增长
+        previous_summary = None
+        if self.compression_mode == "incremental":
+            previous_summary = self._find_latest_summary(messages_to_compress)
+        
+        if previous_summary is not None:
+            new_messages = [msg for msg in messages_to_compress if msg.message_type != MessageType.COMPRESSION]
+            summary_content = self._generate_incremental_summary(previous_summary.content, new_messages)
+        else:
+            new_messages = messages_to_compress
+            summary_content = self._generate_summary(messages_to_compress)
         summary_tokens = calculate_tokens(summary_content, self.settings.model_name)
         
+        if previous_summary is not None and summary_tokens > self.summary_max_tokens:
+            # 超出滚动摘要上限：单独再压缩一次摘要本身（输入大小同样有上限）
+            logger.info(f"Rolling summary over limit ({summary_tokens} > {self.summary_max_tokens}), condensing")
+            summary_content = self._generate_incremental_summary(summary_content, [])
+            summary_tokens = calculate_tokens(summary_content, self.settings.model_name)
+        
         logger.info(f"Summary generated: {summary_tokens} tokens")
         
         # ========================================================================
@@ -236,21 +247,24 @@ class CompressionManager:
         compressed_tokens = sum(msg.token_count for msg in messages_to_compress)
         compressed_message_ids = [msg.message_id for msg in messages_to_compress]
         
-        # 计算当前是第几轮压缩
         session_id = messages_to_compress[0].session_id
-        compression_history = self.storage.get_compression_history(session_id)
-        current_round = len(compression_history) + 1
         
-        # 创建压缩记录
+        # 创建压缩记录（轮次在保存时由存储层分配）
         compression_record = CompressionRecord.create_new(
             session_id=session_id,
-            round=current_round,
+            round=0,
             original_message_count=len(messages_to_compress),
             compressed_token_count=compressed_tokens,
             summary_token_count=summary_tokens,
             summary_content=summary_content,
-            compressed_message_ids=compressed_message_ids
+            compressed_message_ids=compressed_message_ids,
+            parent_compression_id=previous_summary.compression_id if previous_summary else None
         )
+        compression_record.metadata = {
+            "mode": "incremental" if previous_summary else "full",
+            "new_message_count": len(new_messages),
+            "new_token_count": sum(msg.token_count for msg in new_messages)
+        }
         
         # 创建摘要消息
         # 使用被压缩区间的第一条消息的sequence_number
@@ -270,10 +284,7 @@ class CompressionManager:
             f"(replacing compressed messages seq={messages_to_compress[0].sequence_number}-{messages_to_compress[-1].sequence_number})"
         )
         
-        logger.info(
-            f"Compression record created: round={current_round}, "
-            f"ratio={compression_record.compression_ratio:.2%}"
-        )
+        logger.info(f"Compression record created: ratio={compression_record.compression_ratio:.2%}")
         
         return messages_to_compress, summary_message, compression_record
     
@@ -315,51 +326,62 @@ class CompressionManager:
         logger.info("Summary generated successfully")
         return summary
     
+    def _find_latest_summary(self, messages: List[Message]) -> Optional[Message]:
+        """
+        找到待压缩区间中最新的压缩摘要（上一轮的滚动摘要）
+        
+        Args:
+            messages: 待压缩的消息（按序号升序）
+            
+        Returns:
+            压缩摘要消息，没有时返回None
+        """
+        for msg in reversed(messages):
+            if msg.message_type == MessageType.COMPRESSION:
+                return msg
+        return None
+    
+    def _generate_incremental_summary(self, previous_summary: str, messages: List[Message]) -> str:
+        """
+        调用LLM将新消息合并进已有摘要
+        
+        Args:
+            previous_summary: 上一轮的XML摘要
+            messages: 上一轮摘要之后的新消息（为空时仅压缩摘要本身）
+            
+        Returns:
+            更新后的XML摘要
+            
+        Raises:
+            Exception: LLM调用失败或输出格式不正确
+        """
+        logger.debug(f"Merging {len(messages)} new messages into rolling summary")
+        
+        prompt = build_incremental_compression_prompt(previous_summary, messages, self.summary_max_tokens)
+        response = self.llm.invoke([HumanMessage(content=prompt)])
+        summary = extract_summary_content(response.content)
+        
+        if not validate_compression_output(summary):
+            error_msg = f"LLM output does not match expected XML format: {summary[:100]}..."
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        
+        logger.info("Rolling summary updated successfully")
+        return summary
+    
     def _save_compression_result(
         self,
         session_id: str,
-        compressed_messages: List[Message],
         summary_message: Message,
         compression_record: CompressionRecord
     ) -> None:
         """
-        保存压缩结果
+        保存压缩结果（单个事务：标记消息、写入摘要、更新会话统计、写入压缩记录）
         
         Args:
             session_id: 会话ID
-            compressed_messages: 被压缩的消息
             summary_message: 摘要消息
-            compression_record: 压缩记录
+            compression_record: 压缩记录（round 在保存时写回）
         """
-        # 1. 标记被压缩的消息
-        compressed_message_ids = [msg.message_id for msg in compressed_messages]
-        self.storage.mark_messages_compressed(
-            message_ids=compressed_message_ids,
-            compression_id=compression_record.compression_id
-        )
-        
-        # 2. 添加摘要消息
-        self.storage.add_message(summary_message)
-        
-        # 3. 保存压缩记录
-        self.storage.save_compression_record(compression_record)
-        
-        # 4. 更新会话的压缩计数
-        self.storage.increment_compression_count(session_id)
-        
-        # 5. 更新会话token统计（减去被压缩的，加上摘要）
-        session = self.storage.get_session(session_id)
-        if session:
-            new_total = (
-                session.total_token_count 
-                - compression_record.compressed_token_count 
-                + compression_record.summary_token_count
-            )
-            self.storage.update_session_stats(
-                session_id=session_id,
-                total_tokens=new_total,
-                message_count=session.message_count
-            )
-        
-        logger.info(f"Compression result saved for session: {session_id}")
-
+        self.storage.save_compression_result(compression_record, summary_message)
+        logger.info(f"Compression result saved for session: {session_id}, round={compression_record.round}")
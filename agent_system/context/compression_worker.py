@@ -0,0 +1,234 @@
+"""
+后台压缩 worker
+
+将上下文压缩（一次完整的 LLM 摘要调用）移出请求路径：
+- 保存本轮消息后超过阈值时调用 ``submit``，立即返回，压缩在后台线程中执行
+- 会话级锁：进程内同一会话只排队一个任务；跨进程（API / worker.py）
+  使用 Redis ``SET NX EX`` 锁，同一会话同一时间只有一个压缩在执行
+- 拿到锁后重新检查阈值，已被其他进程压缩的会话直接跳过
+- 压缩结果写入存储后，下一轮请求加载快照时自然读到新的摘要
+
+同一进程内共享一个 worker（get_compression_worker）。
+"""
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, wait as wait_futures
+from typing import Any, Dict, Optional
+
+from redis.exceptions import WatchError
+
+from config import get_settings
+from context.session_storage import SessionStorage
+from context.token_budget import TokenBudget
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class CompressionWorker:
+    """后台压缩 worker（线程池 + 会话级锁）"""
+    
+    def __init__(
+        self,
+        storage: Optional[SessionStorage] = None,
+        max_workers: int = 2,
+        lock_ttl: int = 600,
+        compression_manager: Optional[Any] = None
+    ):
+        """
+        初始化后台压缩 worker
+        
+        Args:
+            storage: 会话存储实例，如果为None则创建新实例
+            max_workers: 同时执行压缩的线程数
+            lock_ttl: 会话压缩锁过期时间（秒），应大于一次摘要调用的最长耗时
+            compression_manager: 压缩管理器，None 时首次压缩前创建
+        """
+        self.storage = storage or SessionStorage()
+        self.lock_ttl = lock_ttl
+        self.token_budget = TokenBudget(storage=self.storage)
+        self._compression_manager = compression_manager
+        
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="compression")
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        
+        # 指标
+        self._submitted = 0
+        self._skipped = 0
+        self._completed = 0
+        self._failed = 0
+    
+    @staticmethod
+    def _lock_key(session_id: str) -> str:
+        return f"agent_compression_lock:{session_id}"
+    
+    def submit(self, session_id: str) -> bool:
+        """
+        提交会话压缩任务（不阻塞）
+        
+        Args:
+            session_id: 会话ID
+            
+        Returns:
+            是否已提交；该会话已有排队或执行中的任务、或 worker 已关闭时返回 False
+        """
+        with self._lock:
+            if session_id in self._pending:
+                self._skipped += 1
+                logger.debug(f"Compression already pending for session: {session_id}")
+                return False
+            try:
+                self._pending[session_id] = self._executor.submit(self._run, session_id)
+            except RuntimeError:
+                logger.warning(f"Compression worker is shut down, skipping session: {session_id}")
+                return False
+            self._submitted += 1
+        
+        logger.info(f"Compression scheduled for session: {session_id}")
+        return True
+    
+    def _run(self, session_id: str) -> None:
+        """后台线程：持锁执行压缩"""
+        try:
+            token = self._acquire_lock(session_id)
+            if token is None:
+                logger.info(f"Compression skipped, session locked by another worker: {session_id}")
+                with self._lock:
+                    self._skipped += 1
+                return
+            
+            try:
+                # 重新检查：排队期间会话可能已被其他进程压缩
+                if not self.token_budget.needs_compression(session_id):
+                    logger.info(f"Compression no longer needed for session: {session_id}")
+                    with self._lock:
+                        self._skipped += 1
+                    return
+                
+                record = self._get_compression_manager().compress_session(session_id)
+                logger.info(
+                    f"Background compression completed: session={session_id}, "
+                    f"saved {record.saved_tokens} tokens, round {record.round}"
+                )
+                with self._lock:
+                    self._completed += 1
+            finally:
+                self._release_lock(session_id, token)
+        
+        except Exception as e:
+            logger.error(f"Background compression failed for session {session_id}: {e}", exc_info=True)
+            with self._lock:
+                self._failed += 1
+        finally:
+            with self._lock:
+                self._pending.pop(session_id, None)
+    
+    def _get_compression_manager(self) -> Any:
+        if self._compression_manager is None:
+            from context.compression_manager import CompressionManager
+            self._compression_manager = CompressionManager(storage=self.storage)
+        return self._compression_manager
+    
+    def _acquire_lock(self, session_id: str) -> Optional[str]:
+        """
+        获取跨进程会话压缩锁
+        
+        Returns:
+            锁令牌，锁被占用时返回None；Redis 不可用时仅依赖进程内去重
+        """
+        token = uuid.uuid4().hex
+        try:
+            if self.storage.redis_client.set(self._lock_key(session_id), token, nx=True, ex=self.lock_ttl):
+                return token
+            return None
+        except Exception as e:
+            logger.warning(f"Failed to acquire compression lock in Redis, using process lock only: {e}")
+            return token
+    
+    def _release_lock(self, session_id: str, token: str) -> None:
+        """释放会话压缩锁（仅当锁仍属于自己时删除）"""
+        lock_key = self._lock_key(session_id)
+        try:
+            with self.storage.redis_client.pipeline() as pipe:
+                pipe.watch(lock_key)
+                if pipe.get(lock_key) == token:
+                    pipe.multi()
+                    pipe.delete(lock_key)
+                    pipe.execute()
+        except WatchError:
+            pass
+        except Exception as e:
+            logger.warning(f"Failed to release compression lock for session {session_id}: {e}")
+    
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待当前排队和执行中的压缩任务结束
+        
+        Args:
+            timeout: 最长等待时间（秒），None 表示一直等待
+            
+        Returns:
+            是否全部结束
+        """
+        with self._lock:
+            futures = list(self._pending.values())
+        _, not_done = wait_futures(futures, timeout=timeout)
+        return not not_done
+    
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        关闭 worker，不再接受新任务
+        
+        Args:
+            wait: 是否等待执行中的压缩完成（未开始的任务被取消）
+        """
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+        logger.info("Compression worker stopped")
+    
+    def stats(self) -> Dict[str, Any]:
+        """后台压缩指标"""
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "submitted": self._submitted,
+                "skipped": self._skipped,
+                "completed": self._completed,
+                "failed": self._failed
+            }
+
+
+_worker: Optional[CompressionWorker] = None
+_worker_lock = threading.Lock()
+
+
+def get_compression_worker() -> CompressionWorker:
+    """
+    获取进程内共享的后台压缩 worker（首次调用时根据配置创建）
+    
+    Returns:
+        CompressionWorker 实例
+    """
+    global _worker
+    if _worker is None:
+        with _worker_lock:
+            if _worker is None:
+                settings = get_settings()
+                _worker = CompressionWorker(
+                    max_workers=settings.compression_worker_threads,
+                    lock_ttl=settings.compression_lock_ttl
+                )
+                logger.info(
+                    f"Compression worker created (threads={settings.compression_worker_threads}, "
+                    f"lock_ttl={settings.compression_lock_ttl}s)"
+                )
+    return _worker
+
+
+def shutdown_compression_worker(wait: bool = True) -> None:
+    """关闭进程内共享的后台压缩 worker（应用关闭时调用）"""
+    global _worker
+    with _worker_lock:
+        if _worker is not None:
+            _worker.shutdown(wait=wait)
+            _worker = None
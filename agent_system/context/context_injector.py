@@ -2,6 +2,10 @@
 上下文注入器
 
 实现时间窗口注入策略，根据不同的处理阶段注入相应的历史对话
+
+最近N轮注入可传入本次请求的会话快照（load_snapshot：请求开始时加载一次的
+最新压缩摘要 + 最近若干条消息），在快照上按阶段切片，不再重复读取存储；
+未传入时按需读取最近上下文（尾部查询，不加载整个历史）。
 """
 
 from typing import List, Optional
@@ -25,8 +29,28 @@ class ContextInjector:
         """
         self.storage = storage or SessionStorage()
         self.injection_strategy = get_settings().injection_strategy
+        # 快照需覆盖的最近消息数（各阶段最大轮数 × 2）
+        self.snapshot_message_count = max(
+            strategy["turn_count"] for strategy in self.injection_strategy.values()
+        ) * 2
     
-    def inject_for_intent_recognition(self, session_id: str) -> List[Message]:
+    def load_snapshot(self, session_id: str) -> List[Message]:
+        """
+        加载本次请求的会话快照：最新压缩摘要 + 各阶段所需的最近消息
+        
+        Args:
+            session_id: 会话ID
+            
+        Returns:
+            消息列表（压缩摘要在前）
+        """
+        return self.storage.get_recent_context(session_id, self.snapshot_message_count)
+    
+    def inject_for_intent_recognition(
+        self,
+        session_id: str,
+        snapshot: Optional[List[Message]] = None
+    ) -> List[Message]:
         """
         为意图识别阶段注入上下文
         
@@ -34,6 +58,7 @@ class ContextInjector:
         
         Args:
             session_id: 会话ID
+            snapshot: 会话快照（load_snapshot 的结果），None 时读取最近上下文
             
         Returns:
             注入的消息列表
@@ -41,7 +66,7 @@ class ContextInjector:
         turn_count = self.injection_strategy["intent_recognition"]["turn_count"]
         include_compression = self.injection_strategy["intent_recognition"]["include_compression"]
         
-        messages = self._get_recent_turns(session_id, turn_count, include_compression)
+        messages = self._get_recent_turns(session_id, turn_count, include_compression, snapshot)
         
         logger.debug(
             f"Injected for intent_recognition: session={session_id}, "
@@ -50,7 +75,11 @@ class ContextInjector:
         
         return messages
     
-    def inject_for_planning(self, session_id: str) -> List[Message]:
+    def inject_for_planning(
+        self,
+        session_id: str,
+        snapshot: Optional[List[Message]] = None
+    ) -> List[Message]:
         """
         为执行规划阶段注入上下文
         
@@ -58,6 +87,7 @@ class ContextInjector:
         
         Args:
             session_id: 会话ID
+            snapshot: 会话快照（load_snapshot 的结果），None 时读取最近上下文
             
         Returns:
             注入的消息列表
@@ -65,7 +95,7 @@ class ContextInjector:
         turn_count = self.injection_strategy["planning"]["turn_count"]
         include_compression = self.injection_strategy["planning"]["include_compression"]
         
-        messages = self._get_recent_turns(session_id, turn_count, include_compression)
+        messages = self._get_recent_turns(session_id, turn_count, include_compression, snapshot)
         
         logger.debug(
             f"Injected for planning: session={session_id}, "
@@ -74,7 +104,11 @@ class ContextInjector:
         
         return messages
     
-    def inject_for_answer_generation(self, session_id: str) -> List[Message]:
+    def inject_for_answer_generation(
+        self,
+        session_id: str,
+        snapshot: Optional[List[Message]] = None
+    ) -> List[Message]:
         """
         为答案生成阶段注入上下文
         
@@ -82,6 +116,7 @@ class ContextInjector:
         
         Args:
             session_id: 会话ID
+            snapshot: 会话快照（load_snapshot 的结果），None 时读取最近上下文
             
         Returns:
             注入的消息列表
@@ -89,7 +124,7 @@ class ContextInjector:
         turn_count = self.injection_strategy["answer_generation"]["turn_count"]
         include_compression = self.injection_strategy["answer_generation"]["include_compression"]
         
-        messages = self._get_recent_turns(session_id, turn_count, include_compression)
+        messages = self._get_recent_turns(session_id, turn_count, include_compression, snapshot)
         
         logger.debug(
             f"Injected for answer_generation: session={session_id}, "
@@ -174,7 +209,8 @@ class ContextInjector:
         self,
         session_id: str,
         turn_count: int,
-        include_compression: bool = True
+        include_compression: bool = True,
+        snapshot: Optional[List[Message]] = None
     ) -> List[Message]:
         """
         获取最近N轮对话
@@ -189,6 +225,7 @@ class ContextInjector:
             session_id: 会话ID
             turn_count: 轮数
             include_compression: 是否包含压缩摘要
+            snapshot: 会话快照，提供时在其上切片，不读取存储
             
         Returns:
             消息列表（压缩摘要 + 最近N轮）
@@ -196,11 +233,11 @@ class ContextInjector:
         if turn_count == 0:
             return []
         
-        # 获取所有活跃消息（包括压缩摘要）
-        all_messages = self.storage.get_messages(
-            session_id,
-            include_compressed=False  # 不包含已被压缩的原始消息
-        )
+        # 最新压缩摘要 + 最近的普通消息（快照，或尾部查询）
+        if snapshot is not None:
+            all_messages = snapshot
+        else:
+            all_messages = self.storage.get_recent_context(session_id, turn_count * 2)
         
         if not all_messages:
             return []
@@ -38,7 +38,7 @@ class Message:
     message_type: MessageType = MessageType.USER
     is_compressed: bool = False
     compression_id: Optional[str] = None
-    sequence_number: int = 0
+    sequence_number: Optional[int] = 0  # None 表示由 storage 层分配
     metadata: Dict[str, Any] = field(default_factory=dict)
 
     @classmethod
@@ -66,7 +66,7 @@ class Message:
             token_count=token_count,
             created_at=datetime.now(),
             message_type=MessageType.USER,
-            sequence_number=sequence_number if sequence_number is not None else 0
+            sequence_number=sequence_number
         )
 
     @classmethod
@@ -94,7 +94,7 @@ class Message:
             token_count=token_count,
             created_at=datetime.now(),
             message_type=MessageType.ASSISTANT,
-            sequence_number=sequence_number if sequence_number is not None else 0
+            sequence_number=sequence_number
         )
 
     @classmethod
@@ -242,6 +242,7 @@ class CompressionRecord:
     summary_content: str
     compressed_message_ids: List[str]
     created_at: datetime
+    parent_compression_id: Optional[str] = None  # 增量压缩时合并的上一轮压缩
     metadata: Dict[str, Any] = field(default_factory=dict)
 
     @classmethod
@@ -253,7 +254,8 @@ class CompressionRecord:
         compressed_token_count: int,
         summary_token_count: int,
         summary_content: str,
-        compressed_message_ids: List[str]
+        compressed_message_ids: List[str],
+        parent_compression_id: Optional[str] = None
     ) -> "CompressionRecord":
         """创建新的压缩记录"""
         return cls(
@@ -265,7 +267,8 @@ class CompressionRecord:
             summary_token_count=summary_token_count,
             summary_content=summary_content,
             compressed_message_ids=compressed_message_ids,
-            created_at=datetime.now()
+            created_at=datetime.now(),
+            parent_compression_id=parent_compression_id
         )
 
     def to_dict(self) -> Dict[str, Any]:
@@ -280,6 +283,7 @@ class CompressionRecord:
             "summary_content": self.summary_content,
             "compressed_message_ids": self.compressed_message_ids,
             "created_at": self.created_at.isoformat(),
+            "parent_compression_id": self.parent_compression_id,
             "metadata": self.metadata
         }
 
@@ -296,6 +300,7 @@ class CompressionRecord:
             summary_content=data["summary_content"],
             compressed_message_ids=data["compressed_message_ids"],
             created_at=datetime.fromisoformat(data["created_at"]),
+            parent_compression_id=data.get("parent_compression_id"),
             metadata=data.get("metadata", {})
         )
 
@@ -0,0 +1,248 @@
+"""
+PostgreSQL 连接池
+
+线程安全的 psycopg2 连接池，替代非线程安全的 SimpleConnectionPool：
+- 常驻 ``pool_size`` 个连接，繁忙时最多额外创建 ``max_overflow`` 个溢出连接，
+  溢出连接归还时关闭（与 SQLAlchemy QueuePool 语义一致）
+- 连接耗尽时阻塞等待，超过 ``timeout`` 抛出 PoolTimeoutError
+- 归还时回滚未结束的事务，丢弃已断开的连接
+- 记录连接池指标（借出数、等待次数、等待时间、超时次数）
+
+同一进程内的所有 SessionStorage 共享一个连接池（get_connection_pool）。
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+
+from config import get_settings
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class PoolTimeoutError(PoolError):
+    """等待可用连接超时"""
+
+
+class PostgresConnectionPool:
+    """线程安全、带指标的 PostgreSQL 连接池"""
+    
+    def __init__(
+        self,
+        pool_size: int = 10,
+        max_overflow: int = 20,
+        timeout: float = 30.0,
+        **connect_kwargs: Any
+    ):
+        """
+        初始化连接池（连接按需创建）
+        
+        Args:
+            pool_size: 常驻连接数
+            max_overflow: 额外允许的溢出连接数
+            timeout: 等待可用连接的最长时间（秒）
+            **connect_kwargs: psycopg2.connect 参数
+        """
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self._connect_kwargs = connect_kwargs
+        
+        self._idle: List[Any] = []
+        self._checked_out = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        
+        # 指标
+        self._total_checkouts = 0
+        self._wait_count = 0
+        self._total_wait_time = 0.0
+        self._max_wait_time = 0.0
+        self._timeouts = 0
+    
+    @property
+    def max_connections(self) -> int:
+        """最大连接数（常驻 + 溢出）"""
+        return self.pool_size + self.max_overflow
+    
+    def _total_connections(self) -> int:
+        return len(self._idle) + self._checked_out
+    
+    def getconn(self, timeout: Optional[float] = None) -> Any:
+        """
+        借出一个连接（无可用连接且已达上限时阻塞等待）
+        
+        Args:
+            timeout: 等待超时（秒），默认使用连接池配置
+            
+        Returns:
+            psycopg2 连接
+            
+        Raises:
+            PoolTimeoutError: 等待超时
+            PoolError: 连接池已关闭
+        """
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        waited = False
+        
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise PoolError("connection pool is closed")
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._total_connections() < self.max_connections:
+                    conn = None  # 在锁外创建新连接
+                    break
+                
+                remaining = timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeoutError(
+                        f"Timed out after {timeout}s waiting for a PostgreSQL connection "
+                        f"({self._checked_out} checked out, max {self.max_connections})"
+                    )
+                waited = True
+                self._condition.wait(remaining)
+            
+            self._checked_out += 1
+            self._total_checkouts += 1
+            if waited:
+                wait_time = time.monotonic() - start
+                self._wait_count += 1
+                self._total_wait_time += wait_time
+                self._max_wait_time = max(self._max_wait_time, wait_time)
+        
+        if conn is None or conn.closed:
+            try:
+                conn = psycopg2.connect(**self._connect_kwargs)
+            except Exception:
+                with self._condition:
+                    self._checked_out -= 1
+                    self._condition.notify()
+                raise
+        return conn
+    
+    def putconn(self, conn: Any, close: bool = False) -> None:
+        """
+        归还连接
+        
+        未结束的事务会被回滚；已断开、出错或超出常驻数量的连接直接关闭。
+        
+        Args:
+            conn: getconn 借出的连接
+            close: 强制关闭该连接
+        """
+        if not conn.closed and not close:
+            try:
+                if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception as e:
+                logger.warning(f"Discarding PostgreSQL connection after failed rollback: {e}")
+                close = True
+        
+        with self._condition:
+            self._checked_out -= 1
+            keep = not (close or conn.closed or self._closed) and len(self._idle) < self.pool_size
+            if keep:
+                self._idle.append(conn)
+            self._condition.notify()
+        
+        if not keep and not conn.closed:
+            conn.close()
+    
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """
+        借出连接并在一个事务中使用：正常退出时提交，异常时回滚，最后归还
+        
+        Yields:
+            psycopg2 连接
+        """
+        conn = self.getconn()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            self.putconn(conn)
+    
+    def closeall(self) -> None:
+        """关闭所有空闲连接，借出的连接归还时关闭"""
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._condition.notify_all()
+        for conn in idle:
+            conn.close()
+        logger.info("PostgreSQL connection pool closed")
+    
+    def stats(self) -> Dict[str, Any]:
+        """连接池指标"""
+        with self._condition:
+            return {
+                "pool_size": self.pool_size,
+                "max_overflow": self.max_overflow,
+                "connections": self._total_connections(),
+                "checked_out": self._checked_out,
+                "idle": len(self._idle),
+                "overflow": max(0, self._total_connections() - self.pool_size),
+                "total_checkouts": self._total_checkouts,
+                "wait_count": self._wait_count,
+                "total_wait_time": round(self._total_wait_time, 4),
+                "max_wait_time": round(self._max_wait_time, 4),
+                "avg_wait_time": round(self._total_wait_time / self._wait_count, 4) if self._wait_count else 0.0,
+                "timeouts": self._timeouts
+            }
+
+
+_pool: Optional[PostgresConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_connection_pool() -> PostgresConnectionPool:
+    """
+    获取进程内共享的连接池（首次调用时根据配置创建）
+    
+    Returns:
+        PostgresConnectionPool 实例
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                settings = get_settings()
+                _pool = PostgresConnectionPool(
+                    pool_size=settings.postgres_pool_size,
+                    max_overflow=settings.postgres_max_overflow,
+                    timeout=settings.postgres_pool_timeout,
+                    host=settings.postgres_host,
+                    port=settings.postgres_port,
+                    database=settings.postgres_db,
+                    user=settings.postgres_user,
+                    password=settings.postgres_password
+                )
+                logger.info(
+                    f"PostgreSQL connection pool created (pool_size={settings.postgres_pool_size}, "
+                    f"max_overflow={settings.postgres_max_overflow})"
+                )
+    return _pool
+
+
+def close_connection_pool() -> None:
+    """关闭进程内共享的连接池（应用关闭时调用）"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
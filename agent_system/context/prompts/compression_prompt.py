@@ -81,6 +81,72 @@ def build_compression_prompt(messages: List[Message]) -> str:
     return prompt
 
 
+INCREMENTAL_COMPRESSION_PROMPT = """你是一个专业的对话历史摘要助手。下面给出此前对话的已有摘要，以及在它之后发生的新对话。
+你的任务是把新对话中的信息合并进已有摘要，输出一份更新后的完整摘要（滚动摘要）。
+
+要求：
+1. **只提炼新对话**：已有摘要中的内容直接沿用，不需要重新展开
+2. **合并而非追加**：与已有要点重复或被新对话更新的内容要合并、改写，保持时间顺序
+3. **控制长度**：更新后的摘要不超过约{max_summary_tokens}个token；超出时优先压缩较早、较次要的要点，保留用户的决策、偏好和约束
+4. **结构化输出**：使用与已有摘要相同的XML模板
+
+输出格式（必须严格遵守）：
+```xml
+<conversation_summary>
+  <topic>主要讨论话题的简要描述</topic>
+  <key_points>
+    <point>关键点：具体内容</point>
+  </key_points>
+  <decisions>
+    用户做出的决策、表达的偏好或达成的结论
+  </decisions>
+  <context>
+    其他需要保留的上下文信息
+  </context>
+</conversation_summary>
+```
+
+注意：
+- 如果某个部分没有内容，保留标签但内容为"无"
+- 所有内容用中文表达
+- 不要添加额外的解释或评论
+"""
+
+
+def build_incremental_compression_prompt(
+    previous_summary: str,
+    messages: List[Message],
+    max_summary_tokens: int
+) -> str:
+    """
+    构建增量压缩Prompt：已有摘要 + 新增对话 → 更新后的滚动摘要
+    
+    Args:
+        previous_summary: 上一轮的XML摘要
+        messages: 上一轮摘要之后、本次需要压缩的新消息
+        max_summary_tokens: 更新后摘要的目标上限
+        
+    Returns:
+        完整的增量压缩Prompt
+    """
+    conversation_text = "## 新增的对话\n\n"
+    for msg in messages:
+        speaker = "用户" if msg.role == "user" else "助手"
+        conversation_text += f"**{speaker}**: {msg.content}\n\n"
+    
+    prompt = f"""{INCREMENTAL_COMPRESSION_PROMPT.format(max_summary_tokens=max_summary_tokens)}
+
+## 已有摘要
+
+{previous_summary}
+
+{conversation_text}
+
+请将新增对话合并进已有摘要，生成更新后的XML格式摘要。"""
+    
+    return prompt
+
+
 def validate_compression_output(output: str) -> bool:
     """
     验证压缩输出是否符合格式要求
@@ -8,7 +8,8 @@ from typing import Optional, List
 
 from context.models import Session, Message
 from context.session_storage import SessionStorage
-from context.token_counter import calculate_tokens
+from context.token_budget import TokenBudget
+from context.token_counter import calculate_tokens, count_tokens_batch
 from config import get_settings
 from src.utils.logger import get_logger
 
@@ -28,6 +29,11 @@ class SessionManager:
         self.storage = storage or SessionStorage()
         self.max_context_tokens = get_settings().max_context_tokens
         self.compression_threshold = get_settings().compression_threshold_tokens
+        self.token_budget = TokenBudget(
+            storage=self.storage,
+            max_context_tokens=self.max_context_tokens,
+            compression_threshold=self.compression_threshold
+        )
     
     # ========================================================================
     # 会话生命周期管理
@@ -139,11 +145,8 @@ class SessionManager:
             sequence_number=None  # 自动分配
         )
         
-        # 保存消息（在事务中自动分配sequence_number）
-        self.storage.add_message(message)
-        
-        # 更新会话统计
-        self._update_session_after_message(session_id, token_count)
+        # 保存消息并原子更新会话统计（同一事务中分配sequence_number）
+        self.storage.add_turn_messages(session_id, [message])
         
         logger.info(
             f"User message added: session={session_id}, "
@@ -174,11 +177,8 @@ class SessionManager:
             sequence_number=None  # 自动分配
         )
         
-        # 保存消息（在事务中自动分配sequence_number）
-        self.storage.add_message(message)
-        
-        # 更新会话统计
-        self._update_session_after_message(session_id, token_count)
+        # 保存消息并原子更新会话统计（同一事务中分配sequence_number）
+        self.storage.add_turn_messages(session_id, [message])
         
         logger.info(
             f"Assistant message added: session={session_id}, "
@@ -187,6 +187,48 @@ class SessionManager:
         
         return message
     
+    def commit_turn(
+        self,
+        session_id: str,
+        user_content: Optional[str],
+        assistant_content: str
+    ) -> Session:
+        """
+        保存一轮对话：用户消息与助手回复在一个事务中写入，并原子更新会话统计
+        
+        Args:
+            session_id: 会话ID
+            user_content: 用户消息内容，None 表示用户消息已单独保存
+            assistant_content: 助手回复内容
+            
+        Returns:
+            更新后的会话（可直接用于压缩判断，无需再次读取）
+        """
+        contents = [assistant_content] if user_content is None else [user_content, assistant_content]
+        token_counts = count_tokens_batch(contents, get_settings().model_name)
+        
+        messages = []
+        if user_content is not None:
+            messages.append(Message.create_user_message(
+                session_id=session_id,
+                content=user_content,
+                token_count=token_counts[0]
+            ))
+        messages.append(Message.create_assistant_message(
+            session_id=session_id,
+            content=assistant_content,
+            token_count=token_counts[-1]
+        ))
+        
+        session = self.storage.add_turn_messages(session_id, messages)
+        
+        logger.info(
+            f"Turn committed: session={session_id}, messages={len(messages)}, "
+            f"tokens={sum(m.token_count for m in messages)}, total_tokens={session.total_token_count}"
+        )
+        
+        return session
+    
     def get_conversation_history(
         self,
         session_id: str,
@@ -221,7 +263,7 @@ class SessionManager:
     
     def calculate_session_tokens(self, session_id: str) -> int:
         """
-        计算会话的总token数
+        获取会话的总token数（读取会话计数器，不加载消息）
         
         Args:
             session_id: 会话ID
@@ -229,16 +271,7 @@ class SessionManager:
         Returns:
             总token数
         """
-        messages = self.storage.get_messages(
-            session_id=session_id,
-            include_compressed=False
-        )
-        
-        total_tokens = sum(msg.token_count for msg in messages)
-        
-        logger.debug(f"Session total tokens: {total_tokens} for session={session_id}")
-        
-        return total_tokens
+        return self.token_budget.used_tokens(session_id)
     
     def get_available_tokens(self, session_id: str) -> int:
         """
@@ -250,21 +283,13 @@ class SessionManager:
         Returns:
             可用token数
         """
-        used_tokens = self.calculate_session_tokens(session_id)
-        available = self.max_context_tokens - used_tokens
-        
-        logger.debug(
-            f"Available tokens: {available} "
-            f"(used={used_tokens}, max={self.max_context_tokens})"
-        )
-        
-        return available
+        return self.token_budget.available_tokens(session_id)
     
     # ========================================================================
     # 压缩管理
     # ========================================================================
     
-    def check_compression_needed(self, session_id: str) -> bool:
+    def check_compression_needed(self, session_id: str, session: Optional[Session] = None) -> bool:
         """
         检查是否需要压缩
         
@@ -272,39 +297,26 @@ class SessionManager:
         
         Args:
             session_id: 会话ID
+            session: 已获取的最新会话（如 commit_turn 的返回值），None 时从存储读取
             
         Returns:
             是否需要压缩
         """
         # 直接从session统计获取token数，避免重复计算
-        session = self.storage.get_session(session_id)
-        
-        if not session:
-            logger.warning(f"Session not found: {session_id}")
-            return False
-        
-        total_tokens = session.total_token_count
-        should_compress = total_tokens > self.compression_threshold
-        
-        if should_compress:
-            logger.warning(
-                f"Compression threshold exceeded: session={session_id}, "
-                f"tokens={total_tokens}, threshold={self.compression_threshold}"
-            )
-        
-        return should_compress
+        return self.token_budget.needs_compression(session_id, session)
     
-    def should_compress(self, session_id: str) -> bool:
+    def should_compress(self, session_id: str, session: Optional[Session] = None) -> bool:
         """
         检查是否需要压缩（别名方法）
         
         Args:
             session_id: 会话ID
+            session: 已获取的最新会话，None 时从存储读取
             
         Returns:
             是否需要压缩
         """
-        return self.check_compression_needed(session_id)
+        return self.check_compression_needed(session_id, session)
     
     def trigger_compression(self, session_id: str):
         """
@@ -332,11 +344,31 @@ class SessionManager:
         
         return compression_record
     
+    def schedule_compression(self, session_id: str) -> bool:
+        """
+        安排压缩：默认交给后台 worker 执行，不阻塞当前请求
+        
+        compression_background=False 时同步执行 trigger_compression。
+        
+        Args:
+            session_id: 会话ID
+            
+        Returns:
+            是否已提交后台压缩（同步执行时为 False）
+        """
+        if not get_settings().compression_background:
+            self.trigger_compression(session_id)
+            return False
+        
+        from context.compression_worker import get_compression_worker
+        return get_compression_worker().submit(session_id)
+    
     def recalculate_session_stats(self, session_id: str) -> bool:
         """
         重新计算并修复session统计
         
-        从数据库实际消息重新计算token数和消息数，用于数据修复和验证。
+        由数据库根据已保存的每条消息的 token_count 重新汇总（不加载消息内容），
+        用于数据修复和验证。
         
         Args:
             session_id: 会话ID
@@ -345,68 +377,18 @@ class SessionManager:
             是否成功修复
         """
         try:
-            # 获取所有活跃消息（包括压缩摘要）
-            messages = self.storage.get_messages(
-                session_id=session_id,
-                include_compressed=False
-            )
-            
-            # 重新计算token总数
-            actual_token_count = sum(msg.token_count for msg in messages)
-            
-            # 重新计算用户交互消息数（不包括压缩摘要）
-            from context.models import MessageType
-            actual_message_count = sum(
-                1 for msg in messages 
-                if msg.message_type in [MessageType.USER, MessageType.ASSISTANT]
-            )
-            
-            # 更新统计
-            self.storage.update_session_stats(
-                session_id=session_id,
-                total_tokens=actual_token_count,
-                message_count=actual_message_count
-            )
+            session = self.storage.recalculate_session_stats(session_id)
+            if session is None:
+                logger.warning(f"Session not found: {session_id}")
+                return False
             
             logger.info(
                 f"Session stats recalculated: session={session_id}, "
-                f"tokens={actual_token_count}, messages={actual_message_count}"
+                f"tokens={session.total_token_count}, messages={session.message_count}"
             )
             
             return True
-            
+        
         except Exception as e:
             logger.error(f"Failed to recalculate session stats: {e}", exc_info=True)
             return False
-    
-    # ========================================================================
-    # 私有方法
-    # ========================================================================
-    
-    def _update_session_after_message(self, session_id: str, token_count: int) -> None:
-        """
-        添加消息后更新会话统计
-        
-        Args:
-            session_id: 会话ID
-            token_count: 新增的token数
-        """
-        # 获取当前会话信息
-        session = self.storage.get_session(session_id)
-        
-        if session:
-            # 更新统计
-            new_total_tokens = session.total_token_count + token_count
-            new_message_count = session.message_count + 1
-            
-            self.storage.update_session_stats(
-                session_id=session_id,
-                total_tokens=new_total_tokens,
-                message_count=new_message_count
-            )
-            
-            logger.debug(
-                f"Session stats updated: session={session_id}, "
-                f"total_tokens={new_total_tokens}, message_count={new_message_count}"
-            )
-
@@ -7,16 +7,24 @@
 
 import json
 import redis
-from psycopg2 import pool
-from typing import List, Optional
+from psycopg2.extras import execute_values
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime
 
+from context.pg_pool import get_connection_pool
 from context.models import Session, Message, CompressionRecord, MessageType, SessionStatus
 from config import get_settings
 from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# 消息缓存版本号比缓存多保留的时间（秒）
+_VERSION_TTL_MARGIN = 300
+# 消息缓存的加载标记成员（score 为 -1，排在所有消息之前）
+_LOADED_MARKER = "__loaded__"
+# 尾部窗口缓存保留的最近普通消息条数（覆盖各阶段最近N轮注入）
+_TAIL_WINDOW = 20
+
 
 class SessionStorage:
     """会话存储层 - 数据访问封装"""
@@ -44,27 +52,17 @@ class SessionStorage:
         
         self.redis_client = redis.Redis(**redis_kwargs)
         
-        # PostgreSQL连接池
-        self.pg_pool = pool.SimpleConnectionPool(
-            1,  # minconn
-            settings.postgres_pool_size,  # maxconn
-            host=settings.postgres_host,
-            port=settings.postgres_port,
-            database=settings.postgres_db,
-            user=settings.postgres_user,
-            password=settings.postgres_password
-        )
+        # PostgreSQL连接池（线程安全，进程内所有 SessionStorage 共享）
+        self.pg_pool = get_connection_pool()
         
         # 保存settings引用（用于其他方法）
         self.settings = settings
         
         logger.info("SessionStorage initialized successfully")
     
-    def __del__(self):
-        """清理资源"""
-        if hasattr(self, 'pg_pool') and self.pg_pool:
-            self.pg_pool.closeall()
-            logger.info("PostgreSQL connection pool closed")
+    def pool_stats(self) -> Dict[str, Any]:
+        """PostgreSQL 连接池指标（借出数、等待次数与时间等）"""
+        return self.pg_pool.stats()
     
     # ========================================================================
     # Session 操作
@@ -73,8 +71,7 @@ class SessionStorage:
     def create_session(self, session: Session) -> None:
         """创建会话"""
         # 写入PostgreSQL
-        conn = self.pg_pool.getconn()
-        try:
+        with self.pg_pool.connection() as conn:
             with conn.cursor() as cursor:
                 cursor.execute(
                     """
@@ -95,10 +92,7 @@ class SessionStorage:
                         json.dumps(session.metadata)
                     )
                 )
-            conn.commit()
             logger.info(f"Session created in PostgreSQL: {session.session_id}")
-        finally:
-            self.pg_pool.putconn(conn)
         
         # 写入Redis缓存
         if self.settings.enable_cache:
@@ -114,8 +108,7 @@ class SessionStorage:
                 return cached
         
         # Redis未命中，从PostgreSQL读取
-        conn = self.pg_pool.getconn()
-        try:
+        with self.pg_pool.connection() as conn:
             with conn.cursor() as cursor:
                 cursor.execute(
                     """
@@ -149,8 +142,6 @@ class SessionStorage:
                     return session
                 
                 return None
-        finally:
-            self.pg_pool.putconn(conn)
     
     def update_session_stats(
         self,
@@ -159,8 +150,7 @@ class SessionStorage:
         message_count: int
     ) -> None:
         """更新会话统计信息"""
-        conn = self.pg_pool.getconn()
-        try:
+        with self.pg_pool.connection() as conn:
             with conn.cursor() as cursor:
                 cursor.execute(
                     """
@@ -172,19 +162,68 @@ class SessionStorage:
                     """,
                     (total_tokens, message_count, datetime.now(), session_id)
                 )
-            conn.commit()
             logger.debug(f"Session stats updated: {session_id}, tokens={total_tokens}, messages={message_count}")
-        finally:
-            self.pg_pool.putconn(conn)
         
         # 使缓存失效
         if self.settings.enable_cache:
             self._invalidate_cache(session_id)
     
+    def recalculate_session_stats(self, session_id: str) -> Optional[Session]:
+        """
+        由已保存的每条消息的 token_count 重新汇总会话统计（在数据库中聚合，不读取消息内容）
+        
+        与增量维护的口径一致：
+        - total_token_count：未被压缩的消息（含当前压缩摘要）的token总数
+        - message_count：全部 user / assistant 消息数（压缩不减少该计数）
+        
+        Args:
+            session_id: 会话ID
+            
+        Returns:
+            更新后的会话，不存在时返回None
+        """
+        with self.pg_pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    UPDATE agent_sessions s
+                    SET total_token_count = agg.tokens,
+                        message_count = agg.messages,
+                        updated_at = %s
+                    FROM (
+                        SELECT COALESCE(SUM(token_count) FILTER (WHERE NOT is_compressed), 0) AS tokens,
+                               COUNT(*) FILTER (WHERE message_type IN ('user', 'assistant')) AS messages
+                        FROM agent_messages
+                        WHERE session_id = %s
+                    ) agg
+                    WHERE s.session_id = %s
+                    RETURNING s.user_id, s.created_at, s.updated_at, s.total_token_count,
+                              s.message_count, s.compression_count, s.status, s.metadata
+                    """,
+                    (datetime.now(), session_id, session_id)
+                )
+                row = cursor.fetchone()
+        
+        if self.settings.enable_cache:
+            self._invalidate_cache(session_id)
+        
+        if row is None:
+            return None
+        return Session(
+            session_id=session_id,
+            user_id=row[0],
+            created_at=row[1],
+            updated_at=row[2],
+            total_token_count=row[3],
+            message_count=row[4],
+            compression_count=row[5],
+            status=SessionStatus(row[6]),
+            metadata=row[7] if row[7] else {}
+        )
+    
     def increment_compression_count(self, session_id: str) -> None:
         """增加压缩次数"""
-        conn = self.pg_pool.getconn()
-        try:
+        with self.pg_pool.connection() as conn:
             with conn.cursor() as cursor:
                 cursor.execute(
                     """
@@ -195,10 +234,7 @@ class SessionStorage:
                     """,
                     (datetime.now(), session_id)
                 )
-            conn.commit()
             logger.debug(f"Compression count incremented for session: {session_id}")
-        finally:
-            self.pg_pool.putconn(conn)
         
         # 使缓存失效
         if self.settings.enable_cache:
@@ -210,7 +246,9 @@ class SessionStorage:
     
     def get_next_sequence_number(self, session_id: str) -> int:
         """
-        获取会话的下一个消息序号
+        获取会话的下一个消息序号（只读取计数器，不占用序号）
+        
+        需要占用序号时不要先调用本方法再写入，而是让 add_message 自动分配。
         
         Args:
             session_id: 会话ID
@@ -218,38 +256,73 @@ class SessionStorage:
         Returns:
             下一个序号
         """
-        conn = self.pg_pool.getconn()
-        try:
+        with self.pg_pool.connection() as conn:
             with conn.cursor() as cursor:
                 cursor.execute(
-                    "SELECT COALESCE(MAX(sequence_number), -1) + 1 FROM agent_messages WHERE session_id = %s",
+                    "SELECT next_sequence_number FROM agent_sessions WHERE session_id = %s",
                     (session_id,)
                 )
                 result = cursor.fetchone()
                 return result[0] if result else 0
-        finally:
-            self.pg_pool.putconn(conn)
+    
+    @staticmethod
+    def _allocate_sequence_number(cursor: Any, session_id: str, sequence_number: Optional[int]) -> int:
+        """
+        在当前事务中分配消息序号
+        
+        递增 agent_sessions.next_sequence_number 并返回（O(1)，不扫描消息表）。
+        UPDATE 持有会话行锁直到事务提交，同一会话的并发写入依次取得不同序号。
+        指定了序号的消息（如沿用被压缩区间序号的摘要）只推进计数器，不会回退。
+        
+        Args:
+            cursor: 事务中的游标
+            session_id: 会话ID
+            sequence_number: 指定的序号，None 或负数表示自动分配
+            
+        Returns:
+            消息序号
+            
+        Raises:
+            ValueError: 会话不存在
+        """
+        if sequence_number is None or sequence_number < 0:
+            cursor.execute(
+                """
+                UPDATE agent_sessions
+                SET next_sequence_number = next_sequence_number + 1
+                WHERE session_id = %s
+                RETURNING next_sequence_number - 1
+                """,
+                (session_id,)
+            )
+        else:
+            cursor.execute(
+                """
+                UPDATE agent_sessions
+                SET next_sequence_number = GREATEST(next_sequence_number, %s + 1)
+                WHERE session_id = %s
+                RETURNING %s
+                """,
+                (sequence_number, session_id, sequence_number)
+            )
+        result = cursor.fetchone()
+        if result is None:
+            raise ValueError(f"Session not found: {session_id}")
+        return result[0]
     
     def add_message(self, message: Message) -> None:
         """
         添加消息
         
-        注意：如果message.sequence_number为None或负数，会在事务中自动分配下一个序号。
-        这样可以保证并发安全（在同一事务中获取和插入）。
+        注意：如果message.sequence_number为None或负数，会在同一事务中从会话的
+        序号计数器分配下一个序号（并发安全），并写回 message.sequence_number。
         """
-        conn = self.pg_pool.getconn()
-        try:
+        with self.pg_pool.connection() as conn:
             with conn.cursor() as cursor:
-                # 如果sequence_number未设置，在事务中自动分配
-                seq_num = message.sequence_number
-                if seq_num is None or seq_num < 0:
-                    cursor.execute(
-                        "SELECT COALESCE(MAX(sequence_number), -1) + 1 FROM agent_messages WHERE session_id = %s FOR UPDATE",
-                        (message.session_id,)
-                    )
-                    result = cursor.fetchone()
-                    seq_num = result[0] if result else 0
+                seq_num = self._allocate_sequence_number(cursor, message.session_id, message.sequence_number)
+                if seq_num != message.sequence_number:
                     logger.debug(f"Auto-assigned sequence_number={seq_num} for message {message.message_id}")
+                message.sequence_number = seq_num
                 
                 cursor.execute(
                     """
@@ -272,14 +345,105 @@ class SessionStorage:
                         json.dumps(message.metadata)
                     )
                 )
-            conn.commit()
             logger.debug(f"Message added: {message.message_id}, type={message.message_type.value}, seq={seq_num}")
-        finally:
-            self.pg_pool.putconn(conn)
         
-        # 使消息缓存失效
+        # 追加到消息缓存（不重新加载整个历史）
         if self.settings.enable_cache:
-            self._invalidate_message_cache(message.session_id)
+            self._append_cached_message(message)
+    
+    def add_turn_messages(self, session_id: str, messages: List[Message]) -> Session:
+        """
+        在一个事务中写入一轮对话的消息，并原子递增会话统计
+        
+        一条 UPDATE ... RETURNING 同时分配连续的序号、累加 total_token_count /
+        message_count 并返回更新后的会话（不读后改写，不丢失并发更新），再一次性
+        插入所有消息；提交后用一个 pipeline 更新缓存。
+        
+        Args:
+            session_id: 会话ID
+            messages: 本轮消息（按顺序，序号由计数器分配并写回）
+            
+        Returns:
+            更新后的会话
+            
+        Raises:
+            ValueError: 会话不存在
+        """
+        total_tokens = sum(message.token_count for message in messages)
+        # message_count 只统计用户交互消息（不包括压缩摘要）
+        interaction_count = sum(
+            1 for message in messages
+            if message.message_type in (MessageType.USER, MessageType.ASSISTANT)
+        )
+        
+        with self.pg_pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    UPDATE agent_sessions
+                    SET next_sequence_number = next_sequence_number + %s,
+                        total_token_count = total_token_count + %s,
+                        message_count = message_count + %s,
+                        updated_at = %s
+                    WHERE session_id = %s
+                    RETURNING next_sequence_number - %s, user_id, created_at, updated_at,
+                              total_token_count, message_count, compression_count, status, metadata
+                    """,
+                    (len(messages), total_tokens, interaction_count, datetime.now(), session_id, len(messages))
+                )
+                row = cursor.fetchone()
+                if row is None:
+                    raise ValueError(f"Session not found: {session_id}")
+                
+                for offset, message in enumerate(messages):
+                    message.sequence_number = row[0] + offset
+                
+                execute_values(
+                    cursor,
+                    """
+                    INSERT INTO agent_messages
+                    (message_id, session_id, role, content, message_type, token_count,
+                     created_at, is_compressed, compression_id, sequence_number, metadata)
+                    VALUES %s
+                    """,
+                    [
+                        (
+                            message.message_id,
+                            session_id,
+                            message.role,
+                            message.content,
+                            message.message_type.value,
+                            message.token_count,
+                            message.created_at,
+                            message.is_compressed,
+                            message.compression_id,
+                            message.sequence_number,
+                            json.dumps(message.metadata)
+                        )
+                        for message in messages
+                    ]
+                )
+        
+        session = Session(
+            session_id=session_id,
+            user_id=row[1],
+            created_at=row[2],
+            updated_at=row[3],
+            total_token_count=row[4],
+            message_count=row[5],
+            compression_count=row[6],
+            status=SessionStatus(row[7]),
+            metadata=row[8] if row[8] else {}
+        )
+        logger.debug(
+            f"Turn committed: {session_id}, messages={len(messages)}, "
+            f"total_tokens={session.total_token_count}, message_count={session.message_count}"
+        )
+        
+        if self.settings.enable_cache:
+            self._cache_turn(session, messages)
+        
+        return session
     
     def get_messages(
         self,
@@ -289,17 +453,17 @@ class SessionStorage:
     ) -> List[Message]:
         """获取消息列表"""
         # 尝试从Redis读取
-        cache_key = f"agent_messages:{session_id}:all" if include_compressed else f"agent_messages:{session_id}:active"
+        scope = "all" if include_compressed else "active"
+        version = None
         
         if self.settings.enable_cache:
-            cached = self._get_cached_messages(cache_key)
-            if cached:
+            cached, version = self._get_cached_messages(session_id, scope, limit)
+            if cached is not None:
                 logger.debug(f"Messages cache hit: {session_id}")
-                return cached[:limit] if limit else cached
+                return cached
         
         # 从PostgreSQL读取
-        conn = self.pg_pool.getconn()
-        try:
+        with self.pg_pool.connection() as conn:
             with conn.cursor() as cursor:
                 if include_compressed:
                     query = """
@@ -342,18 +506,15 @@ class SessionStorage:
                     messages.append(message)
                 
                 # 写入缓存
-                if self.settings.enable_cache and not limit:
-                    self._cache_messages(cache_key, messages)
+                if version is not None and not limit:
+                    self._cache_messages(session_id, scope, messages, version)
                 
                 logger.debug(f"Loaded {len(messages)} messages from PostgreSQL: {session_id}")
                 return messages
-        finally:
-            self.pg_pool.putconn(conn)
     
     def get_recent_messages(self, session_id: str, count: int) -> List[Message]:
         """获取最近的N条消息"""
-        conn = self.pg_pool.getconn()
-        try:
+        with self.pg_pool.connection() as conn:
             with conn.cursor() as cursor:
                 cursor.execute(
                     """
@@ -387,8 +548,89 @@ class SessionStorage:
                 
                 logger.debug(f"Loaded {len(messages)} recent messages: {session_id}")
                 return messages
-        finally:
-            self.pg_pool.putconn(conn)
+    
+    def get_recent_context(self, session_id: str, message_count: int) -> List[Message]:
+        """
+        获取最近上下文：最新的压缩摘要 + 最近N条未被压缩的普通消息
+        
+        使用 ORDER BY sequence_number DESC LIMIT 查询（部分索引
+        idx_agent_messages_active_tail / idx_agent_messages_summary），
+        不加载整个历史。N 不超过缓存窗口时优先读取缓存尾部窗口。
+        
+        Args:
+            session_id: 会话ID
+            message_count: 普通消息条数
+            
+        Returns:
+            消息列表（压缩摘要在前，普通消息按序号升序）
+        """
+        if message_count <= 0:
+            return []
+        
+        use_cache = self.settings.enable_cache and message_count <= _TAIL_WINDOW
+        version = None
+        if use_cache:
+            cached, version = self._get_cached_tail(session_id, message_count)
+            if cached is not None:
+                logger.debug(f"Recent context cache hit: {session_id}")
+                return cached
+        
+        # 缓存未命中时按窗口大小查询，用于回填缓存
+        limit = _TAIL_WINDOW if use_cache else message_count
+        with self.pg_pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    (SELECT message_id, session_id, role, content, message_type, token_count,
+                            created_at, is_compressed, compression_id, sequence_number, metadata
+                     FROM agent_messages
+                     WHERE session_id = %s AND message_type = 'compression'
+                     ORDER BY sequence_number DESC, created_at DESC
+                     LIMIT 1)
+                    UNION ALL
+                    (SELECT message_id, session_id, role, content, message_type, token_count,
+                            created_at, is_compressed, compression_id, sequence_number, metadata
+                     FROM agent_messages
+                     WHERE session_id = %s AND is_compressed = FALSE AND message_type <> 'compression'
+                     ORDER BY sequence_number DESC
+                     LIMIT %s)
+                    """,
+                    (session_id, session_id, limit)
+                )
+                rows = cursor.fetchall()
+        
+        summary = None
+        recent = []
+        for row in rows:
+            message = self._row_to_message(row)
+            if message.message_type == MessageType.COMPRESSION:
+                summary = message
+            else:
+                recent.append(message)
+        recent.reverse()  # 反转以保持时间顺序
+        
+        if version is not None:
+            self._cache_tail(session_id, summary, recent, version)
+        
+        logger.debug(f"Loaded recent context from PostgreSQL: {session_id}, messages={len(recent)}")
+        return ([summary] if summary else []) + recent[-message_count:]
+    
+    @staticmethod
+    def _row_to_message(row: tuple) -> Message:
+        """将 agent_messages 查询行转换为 Message"""
+        return Message(
+            message_id=row[0],
+            session_id=row[1],
+            role=row[2],
+            content=row[3],
+            message_type=MessageType(row[4]),
+            token_count=row[5],
+            created_at=row[6],
+            is_compressed=row[7],
+            compression_id=row[8],
+            sequence_number=row[9],
+            metadata=row[10] if row[10] else {}
+        )
     
     def mark_messages_compressed(
         self,
@@ -396,36 +638,28 @@ class SessionStorage:
         compression_id: str
     ) -> None:
         """标记消息为已压缩"""
-        conn = self.pg_pool.getconn()
-        try:
+        compressed: Dict[str, List[str]] = {}
+        with self.pg_pool.connection() as conn:
             with conn.cursor() as cursor:
-                # 获取session_id用于缓存失效
-                cursor.execute(
-                    "SELECT DISTINCT session_id FROM agent_messages WHERE message_id = ANY(%s)",
-                    (message_ids,)
-                )
-                session_ids = [row[0] for row in cursor.fetchall()]
-                
-                # 标记为已压缩
+                # 标记为已压缩，返回 session_id 用于更新缓存
                 cursor.execute(
                     """
                     UPDATE agent_messages
                     SET is_compressed = TRUE,
                         compression_id = %s
                     WHERE message_id = ANY(%s)
+                    RETURNING session_id, message_id
                     """,
                     (compression_id, message_ids)
                 )
-            conn.commit()
-            logger.info(f"Marked {len(message_ids)} messages as compressed")
-            
-            # 使消息缓存失效
-            if self.settings.enable_cache:
-                for session_id in session_ids:
-                    self._invalidate_message_cache(session_id)
-                    logger.debug(f"Message cache invalidated for session: {session_id}")
-        finally:
-            self.pg_pool.putconn(conn)
+                for session_id, message_id in cursor.fetchall():
+                    compressed.setdefault(session_id, []).append(message_id)
+        logger.info(f"Marked {len(message_ids)} messages as compressed")
+        
+        # 原地更新消息缓存（事务提交之后）
+        if self.settings.enable_cache:
+            for session_id, ids in compressed.items():
+                self._mark_cached_messages_compressed(session_id, ids, compression_id)
     
     # ========================================================================
     # Compression 操作
@@ -433,16 +667,15 @@ class SessionStorage:
     
     def save_compression_record(self, record: CompressionRecord) -> None:
         """保存压缩记录"""
-        conn = self.pg_pool.getconn()
-        try:
+        with self.pg_pool.connection() as conn:
             with conn.cursor() as cursor:
                 cursor.execute(
                     """
                     INSERT INTO agent_compression_history
                     (compression_id, session_id, round, original_message_count,
                      compressed_token_count, summary_token_count, summary_content,
-                     compressed_message_ids, created_at, metadata)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                     compressed_message_ids, created_at, parent_compression_id, metadata)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
                     """,
                     (
                         record.compression_id,
@@ -454,24 +687,147 @@ class SessionStorage:
                         record.summary_content,
                         record.compressed_message_ids,
                         record.created_at,
+                        record.parent_compression_id,
                         json.dumps(record.metadata)
                     )
                 )
-            conn.commit()
             logger.info(f"Compression record saved: {record.compression_id}, round={record.round}")
-        finally:
-            self.pg_pool.putconn(conn)
+    
+    def save_compression_result(
+        self,
+        record: CompressionRecord,
+        summary_message: Message
+    ) -> int:
+        """
+        在一个事务中保存完整的压缩结果，返回本次压缩轮次
+        
+        锁定会话行后依次：标记被压缩的消息、写入摘要消息、递增 compression_count
+        （即本次轮次）并按实际被标记消息的token数更新 total_token_count、写入压缩记录。
+        任一步失败整体回滚，不会出现计数已扣减但摘要缺失的中间状态。
+        
+        Args:
+            record: 压缩记录（round 由本方法分配并写回）
+            summary_message: 摘要消息（沿用被压缩区间第一条消息的序号）
+            
+        Returns:
+            本次压缩的轮次
+            
+        Raises:
+            ValueError: 会话不存在，或部分消息已被其他压缩处理（整体回滚）
+        """
+        session_id = record.session_id
+        
+        with self.pg_pool.connection() as conn:
+            with conn.cursor() as cursor:
+                # 锁定会话行：同一会话的压缩串行执行
+                cursor.execute(
+                    "SELECT 1 FROM agent_sessions WHERE session_id = %s FOR UPDATE",
+                    (session_id,)
+                )
+                if cursor.fetchone() is None:
+                    raise ValueError(f"Session not found: {session_id}")
+                
+                cursor.execute(
+                    """
+                    UPDATE agent_messages
+                    SET is_compressed = TRUE,
+                        compression_id = %s
+                    WHERE session_id = %s AND message_id = ANY(%s) AND is_compressed = FALSE
+                    RETURNING message_id, token_count
+                    """,
+                    (record.compression_id, session_id, record.compressed_message_ids)
+                )
+                marked = cursor.fetchall()
+                if len(marked) != len(record.compressed_message_ids):
+                    raise ValueError(
+                        f"Compression conflict: {len(record.compressed_message_ids) - len(marked)} messages "
+                        f"already compressed or missing in session {session_id}"
+                    )
+                compressed_tokens = sum(row[1] for row in marked)
+                
+                cursor.execute(
+                    """
+                    INSERT INTO agent_messages
+                    (message_id, session_id, role, content, message_type, token_count,
+                     created_at, is_compressed, compression_id, sequence_number, metadata)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    """,
+                    (
+                        summary_message.message_id,
+                        session_id,
+                        summary_message.role,
+                        summary_message.content,
+                        summary_message.message_type.value,
+                        summary_message.token_count,
+                        summary_message.created_at,
+                        summary_message.is_compressed,
+                        summary_message.compression_id,
+                        summary_message.sequence_number,
+                        json.dumps(summary_message.metadata)
+                    )
+                )
+                
+                cursor.execute(
+                    """
+                    UPDATE agent_sessions
+                    SET compression_count = compression_count + 1,
+                        total_token_count = total_token_count - %s + %s,
+                        next_sequence_number = GREATEST(next_sequence_number, %s + 1),
+                        updated_at = %s
+                    WHERE session_id = %s
+                    RETURNING compression_count
+                    """,
+                    (
+                        compressed_tokens,
+                        summary_message.token_count,
+                        summary_message.sequence_number,
+                        datetime.now(),
+                        session_id
+                    )
+                )
+                record.round = cursor.fetchone()[0]
+                
+                cursor.execute(
+                    """
+                    INSERT INTO agent_compression_history
+                    (compression_id, session_id, round, original_message_count,
+                     compressed_token_count, summary_token_count, summary_content,
+                     compressed_message_ids, created_at, parent_compression_id, metadata)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    """,
+                    (
+                        record.compression_id,
+                        session_id,
+                        record.round,
+                        record.original_message_count,
+                        record.compressed_token_count,
+                        record.summary_token_count,
+                        record.summary_content,
+                        record.compressed_message_ids,
+                        record.created_at,
+                        record.parent_compression_id,
+                        json.dumps(record.metadata)
+                    )
+                )
+        logger.info(f"Compression result saved: {record.compression_id}, session={session_id}, round={record.round}")
+        
+        # 事务提交后更新缓存
+        if self.settings.enable_cache:
+            self._mark_cached_messages_compressed(session_id, record.compressed_message_ids, record.compression_id)
+            self._append_cached_message(summary_message)
+            self._invalidate_cache(session_id)
+        
+        return record.round
     
     def get_compression_history(self, session_id: str) -> List[CompressionRecord]:
         """获取压缩历史"""
-        conn = self.pg_pool.getconn()
-        try:
+        with self.pg_pool.connection() as conn:
             with conn.cursor() as cursor:
                 cursor.execute(
                     """
                     SELECT compression_id, session_id, round, original_message_count,
                            compressed_token_count, summary_token_count, summary_content,
-                           compressed_message_ids, created_at, metadata
+                           compressed_message_ids, created_at, parent_compression_id, metadata
                     FROM agent_compression_history
                     WHERE session_id = %s
                     ORDER BY round ASC
@@ -492,14 +848,13 @@ class SessionStorage:
                         summary_content=row[6],
                         compressed_message_ids=row[7],
                         created_at=row[8],
-                        metadata=row[9] if row[9] else {}
+                        parent_compression_id=row[9],
+                        metadata=row[10] if row[10] else {}
                     )
                     records.append(record)
                 
                 logger.debug(f"Loaded {len(records)} compression records: {session_id}")
                 return records
-        finally:
-            self.pg_pool.putconn(conn)
     
     # ========================================================================
     # 缓存操作
@@ -536,36 +891,291 @@ class SessionStorage:
             return Session.from_dict(json.loads(data))
         return None
     
-    def _cache_messages(self, cache_key: str, messages: List[Message]) -> None:
+    @staticmethod
+    def _message_version_key(session_id: str) -> str:
+        """会话消息缓存版本号的 key"""
+        return f"agent_messages_version:{session_id}"
+    
+    @staticmethod
+    def _message_cache_key(session_id: str, scope: str) -> str:
+        """
+        消息缓存 key
+        
+        - all / active：Sorted Set，member 为 message_id，score 为 sequence_number
+          （压缩摘要沿用被压缩区间的序号，同一 score 可能有多条消息）
+        - data：Hash，message_id → 消息 JSON
+        - tail：Sorted Set，最近 _TAIL_WINDOW 条未被压缩的普通消息（尾部窗口）
+        - summary：String，最新压缩摘要的 message_id（空字符串表示没有摘要）
+        
+        Args:
+            session_id: 会话ID
+            scope: all（全部消息）/ active（未被压缩的消息与压缩摘要）/ data / tail / summary
+        """
+        return f"agent_messages:{session_id}:{scope}"
+    
+    def _get_cached_messages(
+        self,
+        session_id: str,
+        scope: str,
+        limit: Optional[int] = None
+    ) -> Tuple[Optional[List[Message]], int]:
         """
-        缓存消息列表
+        从缓存获取消息列表
+        
+        只有带加载标记（score 为 -1 的哨兵成员）的缓存才包含完整历史，
+        否则视为未命中（追加写入可能先于加载创建了不完整的集合）。
         
+        Returns:
+            (消息列表, 缓存版本号)，未命中时消息列表为None；版本号用于回填缓存
+            
         Raises:
-            Exception: Redis缓存失败
+            Exception: Redis读取失败
         """
-        data = json.dumps([msg.to_dict() for msg in messages])
-        self.redis_client.setex(
-            cache_key,
-            self.settings.message_cache_ttl,
-            data
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.get(self._message_version_key(session_id))
+        # 第一个成员是加载标记
+        pipe.zrange(self._message_cache_key(session_id, scope), 0, limit if limit else -1)
+        version, message_ids = pipe.execute()
+        version = int(version or 0)
+        
+        if not message_ids or message_ids[0] != _LOADED_MARKER:
+            return None, version
+        
+        message_ids = message_ids[1:]
+        if not message_ids:
+            return [], version
+        data = self.redis_client.hmget(self._message_cache_key(session_id, "data"), message_ids)
+        if any(item is None for item in data):
+            # 消息数据已过期或被逐出，按未命中处理
+            return None, version
+        return [Message.from_dict(json.loads(item)) for item in data], version
+    
+    def _write_cached_messages(self, pipe: Any, session_id: str, scope: str, messages: List[Message]) -> None:
+        """写入消息数据并加入 scope 集合（在调用方的 pipeline 中）"""
+        if not messages:
+            return
+        pipe.hset(
+            self._message_cache_key(session_id, "data"),
+            mapping={message.message_id: json.dumps(message.to_dict()) for message in messages}
+        )
+        pipe.zadd(
+            self._message_cache_key(session_id, scope),
+            {message.message_id: message.sequence_number for message in messages}
         )
-        logger.debug(f"Messages cached: {cache_key}")
     
-    def _get_cached_messages(self, cache_key: str) -> Optional[List[Message]]:
+    def _expire_message_cache(self, pipe: Any, session_id: str) -> None:
+        """刷新会话消息缓存的过期时间（各 key 同时过期）"""
+        ttl = self.settings.message_cache_ttl
+        for scope in ("all", "active", "data", "tail", "summary"):
+            pipe.expire(self._message_cache_key(session_id, scope), ttl)
+        # 版本号比缓存活得更久（版本号过期后从 0 重新开始）
+        pipe.expire(self._message_version_key(session_id), ttl + _VERSION_TTL_MARGIN)
+    
+    def _cache_messages(
+        self,
+        session_id: str,
+        scope: str,
+        messages: List[Message],
+        version: int
+    ) -> None:
         """
-        从缓存获取消息列表
+        用从 PostgreSQL 加载的完整历史填充缓存，并写入加载标记
+        
+        version 是查询 PostgreSQL 之前读取的版本号。若期间消息被原地更新
+        （压缩）或缓存被清除，版本号已变化，本次加载的数据可能过期，放弃写入。
+        合并写入（而非覆盖），加载期间追加的新消息不会丢失。
+        
+        Raises:
+            Exception: Redis缓存失败
+        """
+        key = self._message_cache_key(session_id, scope)
+        version_key = self._message_version_key(session_id)
+        
+        with self.redis_client.pipeline() as pipe:
+            try:
+                pipe.watch(version_key)
+                if int(pipe.get(version_key) or 0) != version:
+                    logger.debug(f"Messages cache fill skipped (version changed): {key}")
+                    return
+                
+                pipe.multi()
+                self._write_cached_messages(pipe, session_id, scope, messages)
+                pipe.zadd(key, {_LOADED_MARKER: -1})
+                self._expire_message_cache(pipe, session_id)
+                pipe.execute()
+            except redis.WatchError:
+                logger.debug(f"Messages cache fill skipped (concurrent update): {key}")
+                return
+        logger.debug(f"Messages cached: {key} ({len(messages)} messages)")
+    
+    def _append_cached_message(self, message: Message) -> None:
+        """
+        将新消息追加到缓存（只序列化这一条消息）
+        
+        无论缓存是否已加载都直接写入：未加载的集合没有加载标记，不会被当作
+        完整历史读取；之后的加载会与之合并。
+        
+        Raises:
+            Exception: Redis写入失败
+        """
+        pipe = self.redis_client.pipeline()
+        self._write_cached_messages(pipe, message.session_id, "all", [message])
+        if not message.is_compressed or message.message_type == MessageType.COMPRESSION:
+            self._write_cached_messages(pipe, message.session_id, "active", [message])
+        self._append_to_tail(pipe, message.session_id, [message])
+        self._expire_message_cache(pipe, message.session_id)
+        pipe.execute()
+        logger.debug(f"Message appended to cache: {message.message_id}, seq={message.sequence_number}")
+    
+    def _append_to_tail(self, pipe: Any, session_id: str, messages: List[Message]) -> None:
+        """
+        将新消息加入尾部窗口（在调用方的 pipeline 中，消息数据由调用方写入）
+        
+        普通消息加入 tail 并裁剪到窗口大小（保留排在最前的加载标记）；压缩摘要
+        更新 summary，并递增版本号，使摘要写入前开始的尾部加载放弃写入。
+        """
+        tail_key = self._message_cache_key(session_id, "tail")
+        regular = {}
+        for message in messages:
+            if message.message_type == MessageType.COMPRESSION:
+                pipe.set(self._message_cache_key(session_id, "summary"), message.message_id)
+                pipe.incr(self._message_version_key(session_id))
+            elif not message.is_compressed:
+                regular[message.message_id] = message.sequence_number
+        if regular:
+            pipe.zadd(tail_key, regular)
+            pipe.zremrangebyrank(tail_key, 1, -(_TAIL_WINDOW + 1))
+    
+    def _get_cached_tail(self, session_id: str, message_count: int) -> Tuple[Optional[List[Message]], int]:
+        """
+        从尾部窗口缓存获取最近上下文
         
         Returns:
-            消息列表，如果缓存未命中返回None
+            (消息列表, 缓存版本号)，未命中时消息列表为None
             
         Raises:
             Exception: Redis读取失败
         """
-        data = self.redis_client.get(cache_key)
-        if data:
-            messages_data = json.loads(data)
-            return [Message.from_dict(msg_dict) for msg_dict in messages_data]
-        return None
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.get(self._message_version_key(session_id))
+        pipe.zrange(self._message_cache_key(session_id, "tail"), 0, -1)
+        pipe.get(self._message_cache_key(session_id, "summary"))
+        version, tail_ids, summary_id = pipe.execute()
+        version = int(version or 0)
+        
+        if not tail_ids or tail_ids[0] != _LOADED_MARKER or summary_id is None:
+            return None, version
+        
+        message_ids = ([summary_id] if summary_id else []) + tail_ids[1:][-message_count:]
+        if not message_ids:
+            return [], version
+        data = self.redis_client.hmget(self._message_cache_key(session_id, "data"), message_ids)
+        if any(item is None for item in data):
+            return None, version
+        return [Message.from_dict(json.loads(item)) for item in data], version
+    
+    def _cache_tail(
+        self,
+        session_id: str,
+        summary: Optional[Message],
+        recent: List[Message],
+        version: int
+    ) -> None:
+        """
+        用 PostgreSQL 查询结果填充尾部窗口缓存（版本号校验同 _cache_messages）
+        
+        Raises:
+            Exception: Redis缓存失败
+        """
+        tail_key = self._message_cache_key(session_id, "tail")
+        version_key = self._message_version_key(session_id)
+        
+        with self.redis_client.pipeline() as pipe:
+            try:
+                pipe.watch(version_key)
+                if int(pipe.get(version_key) or 0) != version:
+                    logger.debug(f"Recent context cache fill skipped (version changed): {session_id}")
+                    return
+                
+                pipe.multi()
+                messages = ([summary] if summary else []) + recent
+                if messages:
+                    pipe.hset(
+                        self._message_cache_key(session_id, "data"),
+                        mapping={message.message_id: json.dumps(message.to_dict()) for message in messages}
+                    )
+                if recent:
+                    pipe.zadd(tail_key, {message.message_id: message.sequence_number for message in recent})
+                pipe.zadd(tail_key, {_LOADED_MARKER: -1})
+                pipe.zremrangebyrank(tail_key, 1, -(_TAIL_WINDOW + 1))
+                pipe.set(self._message_cache_key(session_id, "summary"), summary.message_id if summary else "")
+                self._expire_message_cache(pipe, session_id)
+                pipe.execute()
+            except redis.WatchError:
+                logger.debug(f"Recent context cache fill skipped (concurrent update): {session_id}")
+                return
+        logger.debug(f"Recent context cached: {session_id} ({len(recent)} messages)")
+    
+    def _cache_turn(self, session: Session, messages: List[Message]) -> None:
+        """
+        一轮对话提交后更新缓存：追加消息并使会话缓存失效（一次 pipeline）
+        
+        会话统计不直接写入缓存：并发提交的写回顺序与事务提交顺序无关，
+        可能用旧值覆盖新值。调用方使用 add_turn_messages 返回的会话即可。
+        
+        Raises:
+            Exception: Redis写入失败
+        """
+        pipe = self.redis_client.pipeline()
+        self._write_cached_messages(pipe, session.session_id, "all", messages)
+        self._write_cached_messages(pipe, session.session_id, "active", messages)
+        self._append_to_tail(pipe, session.session_id, messages)
+        self._expire_message_cache(pipe, session.session_id)
+        pipe.delete(f"agent_session:{session.session_id}")
+        pipe.execute()
+        logger.debug(f"Turn cached: {session.session_id} ({len(messages)} messages)")
+    
+    def _mark_cached_messages_compressed(
+        self,
+        session_id: str,
+        message_ids: List[str],
+        compression_id: str
+    ) -> None:
+        """
+        在缓存中原地标记消息为已压缩：更新消息数据，并从 active / tail 中移除
+        （压缩摘要与 PostgreSQL 查询一致，仍保留在 active 中）
+        
+        同时递增版本号，使压缩之前开始、尚未写入的加载放弃写入。
+        
+        Raises:
+            Exception: Redis写入失败
+        """
+        data_key = self._message_cache_key(session_id, "data")
+        active_key = self._message_cache_key(session_id, "active")
+        tail_key = self._message_cache_key(session_id, "tail")
+        
+        pipe = self.redis_client.pipeline()
+        pipe.incr(self._message_version_key(session_id))
+        
+        updated = {}
+        for message_id, item in zip(message_ids, self.redis_client.hmget(data_key, message_ids)):
+            if item is None:
+                # 不在缓存中（未加载的集合里也不会有它）
+                pipe.zrem(active_key, message_id)
+                pipe.zrem(tail_key, message_id)
+                continue
+            message = Message.from_dict(json.loads(item))
+            message.is_compressed = True
+            message.compression_id = compression_id
+            updated[message_id] = json.dumps(message.to_dict())
+            if message.message_type != MessageType.COMPRESSION:
+                pipe.zrem(active_key, message_id)
+                pipe.zrem(tail_key, message_id)
+        if updated:
+            pipe.hset(data_key, mapping=updated)
+        self._expire_message_cache(pipe, session_id)
+        pipe.execute()
+        logger.debug(f"Marked {len(message_ids)} cached messages as compressed: {session_id}")
     
     def _invalidate_cache(self, session_id: str) -> None:
         """
@@ -582,13 +1192,19 @@ class SessionStorage:
         """
         使消息缓存失效
         
+        删除会话的缓存 key（key 已知，不扫描 keyspace），并递增版本号，
+        使进行中的加载放弃写入。
+        
         Raises:
-            Exception: Redis删除失败
+            Exception: Redis写入失败
         """
-        # 删除所有相关的消息缓存
-        pattern = f"agent_messages:{session_id}:*"
-        keys = self.redis_client.keys(pattern)
-        if keys:
-            self.redis_client.delete(*keys)
-            logger.debug(f"Message cache invalidated: {session_id}")
-
+        version_key = self._message_version_key(session_id)
+        pipe = self.redis_client.pipeline()
+        pipe.incr(version_key)
+        pipe.expire(version_key, self.settings.message_cache_ttl + _VERSION_TTL_MARGIN)
+        pipe.delete(*(
+            self._message_cache_key(session_id, scope)
+            for scope in ("all", "active", "data", "tail", "summary")
+        ))
+        version, _, _ = pipe.execute()
+        logger.debug(f"Message cache invalidated: {session_id} (version {version})")
@@ -0,0 +1,99 @@
+"""
+Token 预算
+
+只使用持久化的计数器回答预算问题：
+- agent_sessions.total_token_count：活跃消息（含当前压缩摘要）的token总数，
+  由 add_turn_messages / save_compression_result 在写入的同一事务中增量维护
+- agent_messages.token_count：每条消息写入时计算一次，之后不再重新编码
+
+"还剩多少token"、"是否需要压缩" 都是 O(1)：只读取会话行（优先 Redis 缓存），
+不加载消息内容。
+"""
+from typing import Optional
+
+from config import get_settings
+from context.models import Session
+from context.session_storage import SessionStorage
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class TokenBudget:
+    """基于会话计数器的 token 预算"""
+    
+    def __init__(
+        self,
+        storage: Optional[SessionStorage] = None,
+        max_context_tokens: Optional[int] = None,
+        compression_threshold: Optional[int] = None
+    ):
+        """
+        初始化 token 预算
+        
+        Args:
+            storage: 会话存储实例，如果为None则创建新实例
+            max_context_tokens: 最大上下文token数，默认使用配置
+            compression_threshold: 压缩阈值token数，默认使用配置
+        """
+        settings = get_settings()
+        self.storage = storage or SessionStorage()
+        self.max_context_tokens = max_context_tokens or settings.max_context_tokens
+        self.compression_threshold = compression_threshold or settings.compression_threshold_tokens
+    
+    def _session(self, session_id: str, session: Optional[Session]) -> Optional[Session]:
+        return session if session is not None else self.storage.get_session(session_id)
+    
+    def used_tokens(self, session_id: str, session: Optional[Session] = None) -> int:
+        """
+        会话当前占用的token数
+        
+        Args:
+            session_id: 会话ID
+            session: 已获取的最新会话（如 commit_turn 的返回值），None 时从存储读取
+            
+        Returns:
+            token数，会话不存在时为0
+        """
+        session = self._session(session_id, session)
+        return session.total_token_count if session else 0
+    
+    def available_tokens(self, session_id: str, session: Optional[Session] = None) -> int:
+        """
+        会话剩余的可用token数
+        
+        Args:
+            session_id: 会话ID
+            session: 已获取的最新会话，None 时从存储读取
+            
+        Returns:
+            最大上下文减去已占用的token数
+        """
+        used = self.used_tokens(session_id, session)
+        available = self.max_context_tokens - used
+        logger.debug(f"Available tokens: {available} (used={used}, max={self.max_context_tokens})")
+        return available
+    
+    def needs_compression(self, session_id: str, session: Optional[Session] = None) -> bool:
+        """
+        会话是否超过压缩阈值
+        
+        Args:
+            session_id: 会话ID
+            session: 已获取的最新会话，None 时从存储读取
+            
+        Returns:
+            是否需要压缩，会话不存在时为False
+        """
+        session = self._session(session_id, session)
+        if not session:
+            logger.warning(f"Session not found: {session_id}")
+            return False
+        
+        needed = session.total_token_count > self.compression_threshold
+        if needed:
+            logger.warning(
+                f"Compression threshold exceeded: session={session_id}, "
+                f"tokens={session.total_token_count}, threshold={self.compression_threshold}"
+            )
+        return needed
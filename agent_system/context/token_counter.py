@@ -1,60 +1,246 @@
-"""Token counting utilities for content management."""
+"""
+Token counting utilities for content management.
+
+- count_tokens_batch: 批量计数，未命中缓存的文本一次交给 Rust tokenizer 的 encode_batch
+- 按内容哈希的有界 LRU 缓存：相同文本（消息、摘要、重复召回的片段）不重复编码
+- is_within_token_limit: 分段编码，超出上限即停止（大文档不必完整编码）
+
+Tokenizer 通过独立的 ``tokenizers`` 库从 context/tokenizer/tokenizer.json 加载，
+不导入 transformers（仅目录中没有 tokenizer.json 时才延迟导入 transformers 兜底）。
+服务启动时调用 warmup_tokenizer 预加载，首个请求不再承担加载耗时。
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import Tuple, Optional
+from typing import Any, List, Tuple, Optional
 
-import transformers
+from config import get_settings
 from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
-_QWEN_TOKENIZER: Optional[transformers.PreTrainedTokenizer] = None
-_TOKENIZER_LOADED = False
+# tokenizer 在 context/tokenizer 目录
+TOKENIZER_DIR = Path(__file__).parent / "tokenizer"
+TOKENIZER_FILE = TOKENIZER_DIR / "tokenizer.json"
+
+_QWEN_TOKENIZER: Optional[Any] = None
+_TOKENIZER_ERROR: Optional[Exception] = None
+_TOKENIZER_LOCK = threading.Lock()
 
+# 内容哈希 -> token数（LRU，容量见 settings.token_count_cache_size）
+_TOKEN_CACHE: "OrderedDict[bytes, int]" = OrderedDict()
+_TOKEN_CACHE_LOCK = threading.Lock()
 
-def _get_qwen_tokenizer() -> transformers.PreTrainedTokenizer:
+# is_within_token_limit 每段编码的字符数
+_EARLY_EXIT_CHUNK_CHARS = 8192
+
+
+def _load_tokenizer(tokenizer_dir: Path) -> Any:
+    """
+    加载 tokenizer：优先 tokenizers.Tokenizer（tokenizer.json），否则延迟导入 transformers
+    
+    Returns:
+        提供 encode_batch 的 tokenizer（transformers 兜底时为其 Rust backend）
+        
+    Raises:
+        FileNotFoundError: 目录不存在或缺少 tokenizer 文件
     """
-    获取或创建Qwen tokenizer（单例模式）
+    if not tokenizer_dir.exists():
+        raise FileNotFoundError(
+            f"未找到 Qwen tokenizer 目录: {tokenizer_dir}\n"
+            f"请确保 tokenizer 文件存在于 {tokenizer_dir}"
+        )
     
-    使用全局缓存避免每次调用都重新加载tokenizer（提升性能约1000倍）
+    tokenizer_file = tokenizer_dir / TOKENIZER_FILE.name
+    if tokenizer_file.exists():
+        from tokenizers import Tokenizer
+        return Tokenizer.from_file(str(tokenizer_file))
+    
+    if not (tokenizer_dir / "vocab.json").exists():
+        raise FileNotFoundError(f"未找到 tokenizer.json（或 vocab.json + merges.txt）: {tokenizer_dir}")
+    
+    # 兜底：只有 vocab.json + merges.txt 时由 transformers 构建（导入较慢）
+    logger.warning(f"{tokenizer_file} 不存在，回退到 transformers 加载")
+    import transformers
+    tokenizer = transformers.AutoTokenizer.from_pretrained(
+        str(tokenizer_dir),
+        trust_remote_code=True,
+        local_files_only=True  # 只使用本地文件
+    )
+    return tokenizer.backend_tokenizer
+
+
+def _get_qwen_tokenizer() -> Any:
+    """
+    获取或创建Qwen tokenizer（单例模式，线程安全）
+    
+    使用全局缓存避免每次调用都重新加载tokenizer；加载失败也会被记住，
+    之后的调用直接使用粗略估算，不重复尝试加载。
     
     Returns:
-        transformers.PreTrainedTokenizer: 缓存的tokenizer实例
+        缓存的 tokenizers.Tokenizer 实例
+        
+    Raises:
+        FileNotFoundError: tokenizer 文件不存在
+        Exception: tokenizer 加载失败
     """
-    global _QWEN_TOKENIZER, _TOKENIZER_LOADED
+    global _QWEN_TOKENIZER, _TOKENIZER_ERROR
     
     if _QWEN_TOKENIZER is None:
-        if not _TOKENIZER_LOADED:
-            logger.info("首次加载 Qwen tokenizer，这可能需要几秒钟...")
-            _TOKENIZER_LOADED = True
-        
-        # tokenizer 在 context/tokenizer 目录
-        tokenizer_dir = Path(__file__).parent / "tokenizer"
-        
-        if not tokenizer_dir.exists():
-            error_msg = (
-                f"未找到 Qwen tokenizer 目录: {tokenizer_dir}\n"
-                f"请确保 tokenizer 文件存在于 {tokenizer_dir}"
-            )
-            logger.error(error_msg)
-            raise FileNotFoundError(error_msg)
-        
-        try:
-            _QWEN_TOKENIZER = transformers.AutoTokenizer.from_pretrained(
-                str(tokenizer_dir),
-                trust_remote_code=True,
-                local_files_only=True  # 只使用本地文件
-            )
-            logger.info(f"✅ Qwen tokenizer 加载完成（路径: {tokenizer_dir}），已缓存")
-        except Exception as e:
-            logger.error(f"加载 Qwen tokenizer 失败: {e}")
-            raise
+        with _TOKENIZER_LOCK:
+            if _QWEN_TOKENIZER is None and _TOKENIZER_ERROR is None:
+                start = time.perf_counter()
+                try:
+                    _QWEN_TOKENIZER = _load_tokenizer(TOKENIZER_DIR)
+                    logger.info(
+                        f"✅ Qwen tokenizer 加载完成（路径: {TOKENIZER_DIR}，"
+                        f"{(time.perf_counter() - start) * 1000:.0f}ms），已缓存"
+                    )
+                except Exception as e:
+                    _TOKENIZER_ERROR = e
+                    logger.error(f"加载 Qwen tokenizer 失败: {e}")
+            if _TOKENIZER_ERROR is not None:
+                raise _TOKENIZER_ERROR
     
     return _QWEN_TOKENIZER
 
 
+def warmup_tokenizer() -> bool:
+    """
+    预加载 tokenizer 并完成一次编码（服务启动时调用）
+    
+    tokenizer 不可用时记录 error 日志（含期望的 tokenizer.json 路径），之后所有
+    token 计数都退化为字符数估算；调用方可据返回值决定是否中止启动。
+    
+    Returns:
+        tokenizer 是否可用（不可用时 token 计数使用粗略估算）
+    """
+    start = time.perf_counter()
+    try:
+        _get_qwen_tokenizer().encode_batch(["warmup"])
+    except Exception as e:
+        logger.error(
+            f"Tokenizer 不可用（期望文件: {TOKENIZER_FILE}），所有 token 计数将按字符数粗略估算，"
+            f"上下文预算不再精确。获取方式见 README「Tokenizer」一节。原因: {e}"
+        )
+        return False
+    logger.info(f"Tokenizer warmed up in {(time.perf_counter() - start) * 1000:.0f}ms")
+    return True
+
+
+def tokenizer_available() -> bool:
+    """
+    tokenizer 是否可用（加载失败会被记住，不重复尝试）
+    
+    Returns:
+        False 表示 token 计数均为按字符数的粗略估算
+    """
+    try:
+        _get_qwen_tokenizer()
+    except Exception:
+        return False
+    return True
+
+
+def _cache_key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def _cache_get(key: bytes) -> Optional[int]:
+    with _TOKEN_CACHE_LOCK:
+        count = _TOKEN_CACHE.get(key)
+        if count is not None:
+            _TOKEN_CACHE.move_to_end(key)
+        return count
+
+
+def _cache_put(key: bytes, count: int) -> None:
+    max_entries = get_settings().token_count_cache_size
+    if max_entries <= 0:
+        return
+    with _TOKEN_CACHE_LOCK:
+        _TOKEN_CACHE[key] = count
+        _TOKEN_CACHE.move_to_end(key)
+        while len(_TOKEN_CACHE) > max_entries:
+            _TOKEN_CACHE.popitem(last=False)
+
+
+def clear_token_cache() -> None:
+    """清空 token 计数缓存"""
+    with _TOKEN_CACHE_LOCK:
+        _TOKEN_CACHE.clear()
+
+
+def _encode_lengths(texts: List[str]) -> Tuple[List[int], bool]:
+    """
+    编码文本并返回各自的token数
+    
+    Returns:
+        (token数列表, 是否为精确值)；tokenizer 不可用时为粗略估算，不写入缓存
+    """
+    try:
+        # Rust tokenizer 批量编码（并行，释放 GIL）
+        encodings = _get_qwen_tokenizer().encode_batch(texts)
+        return [len(encoding.ids) for encoding in encodings], True
+    
+    except FileNotFoundError:
+        # tokenizer 未找到（加载失败时已记录 error 日志），使用粗略估算
+        logger.debug("Tokenizer 未找到，使用粗略估算")
+        return [len(text) for text in texts], False
+    
+    except Exception as e:
+        logger.error(f"Token 计算失败: {e}")
+        # Last resort: rough estimation
+        logger.warning(f"使用粗略估算: {len(texts)} texts")
+        return [len(text) for text in texts], False
+
+
+def count_tokens_batch(texts: List[str], model: str = "Qwen/Qwen3-30B-A3B-Instruct-2507") -> List[int]:
+    """
+    批量计算 token 数
+    
+    先查内容哈希缓存，未命中的文本去重后一次批量编码。
+    
+    Args:
+        texts: 文本列表
+        model: 模型名称（当前使用本地tokenizer，忽略model参数）
+        
+    Returns:
+        与 texts 一一对应的token数
+    """
+    counts = [0] * len(texts)
+    missing: "OrderedDict[bytes, List[int]]" = OrderedDict()
+    missing_texts: List[str] = []
+    
+    for index, text in enumerate(texts):
+        if not text:
+            continue
+        key = _cache_key(text)
+        cached = _cache_get(key)
+        if cached is not None:
+            counts[index] = cached
+        elif key in missing:
+            missing[key].append(index)
+        else:
+            missing[key] = [index]
+            missing_texts.append(text)
+    
+    if missing_texts:
+        lengths, exact = _encode_lengths(missing_texts)
+        for (key, indices), length in zip(missing.items(), lengths):
+            if exact:
+                _cache_put(key, length)
+            for index in indices:
+                counts[index] = length
+    
+    return counts
+
+
 def calculate_tokens(text: str, model: str = "Qwen/Qwen3-30B-A3B-Instruct-2507") -> int:
     """
-    使用 transformers 进行 token 计算（Qwen 模型）
+    计算单个文本的 token 数（Qwen 模型，带内容哈希缓存）
     
     优化：使用全局缓存的 tokenizer，避免每次调用都重新加载（提升性能约1000倍）
     
@@ -68,26 +254,68 @@ def calculate_tokens(text: str, model: str = "Qwen/Qwen3-30B-A3B-Instruct-2507")
     # 空文本检查
     if text is None or not text:
         return 0
+    return count_tokens_batch([text], model)[0]
+
+
+def _split_for_counting(text: str, chunk_chars: int) -> List[str]:
+    """按大约 chunk_chars 分段，尽量在换行处切分以减少段边界对计数的影响"""
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_chars, len(text))
+        if end < len(text):
+            newline = text.rfind("\n", start + chunk_chars // 2, end)
+            if newline != -1:
+                end = newline + 1
+        chunks.append(text[start:end])
+        start = end
+    return chunks
+
+
+def is_within_token_limit(
+    text: str,
+    limit: int,
+    model: str = "Qwen/Qwen3-30B-A3B-Instruct-2507"
+) -> Tuple[bool, int]:
+    """
+    判断文本是否不超过 limit 个 token，超出后立即停止编码
     
-    try:
-        tokenizer = _get_qwen_tokenizer()
-        
-        # 编码文本
-        result = tokenizer.encode(text)
-        return len(result)
-        
-    except FileNotFoundError:
-        # tokenizer 未找到，使用粗略估算
-        logger.warning("Tokenizer 未找到，使用粗略估算")
-        estimated = len(text)
-        return estimated
+    长文本分段编码并累加（段边界处的计数与整体编码可能相差个位数token），
+    累计超过 limit 即返回，不再编码剩余部分。
+    
+    Args:
+        text: 输入文本
+        limit: token上限
+        model: 模型名称（当前使用本地tokenizer，忽略model参数）
         
-    except Exception as e:
-        logger.error(f"Token 计算失败: {e}")
-        # Last resort: rough estimation (1 token ≈ 4 chars)
-        estimated = len(text)
-        logger.warning(f"使用粗略估算: {estimated} tokens")
-        return estimated
+    Returns:
+        (是否不超过上限, token数)；超出时token数为停止时已编码部分的计数（下界）
+    """
+    if not text:
+        return 0 <= limit, 0
+    
+    key = _cache_key(text)
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached <= limit, cached
+    
+    if len(text) <= _EARLY_EXIT_CHUNK_CHARS:
+        count = calculate_tokens(text, model)
+        return count <= limit, count
+    
+    total = 0
+    exact = True
+    for chunk in _split_for_counting(text, _EARLY_EXIT_CHUNK_CHARS):
+        lengths, chunk_exact = _encode_lengths([chunk])
+        total += lengths[0]
+        exact = exact and chunk_exact
+        if total > limit:
+            logger.debug(f"Token limit {limit} exceeded after {total} tokens, stopped encoding")
+            return False, total
+    
+    if exact:
+        _cache_put(key, total)
+    return True, total
 
 
 def should_use_direct_content(
@@ -108,20 +336,18 @@ def should_use_direct_content(
     Returns:
         Tuple of (should_use_direct, token_count)
         - should_use_direct: True if content can be used directly
-        - token_count: Number of tokens in the content
+        - token_count: Number of tokens in the content (a lower bound when the
+          content exceeds the threshold, since counting stops early)
     """
-    # Calculate tokens in the content
-    token_count = calculate_tokens(content, model)
-    
     # Calculate maximum allowed tokens
     max_allowed_tokens = int(available_tokens * threshold)
     
-    # Determine if content is small enough to use directly
-    should_use = token_count <= max_allowed_tokens
+    # Count tokens, stopping as soon as the content exceeds the allowed budget
+    should_use, token_count = is_within_token_limit(content, max_allowed_tokens, model)
     
     # Log the decision
-    percentage = (token_count / available_tokens) * 100
-    logger.info(f"Token analysis: {token_count:,} tokens / {available_tokens:,} available "
+    percentage = (token_count / available_tokens) * 100 if available_tokens else float("inf")
+    logger.info(f"Token analysis: {'' if should_use else '>= '}{token_count:,} tokens / {available_tokens:,} available "
                f"({percentage:.1f}%, threshold: {threshold*100:.0f}%)")
     
     if should_use:
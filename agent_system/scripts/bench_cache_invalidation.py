@@ -0,0 +1,93 @@
+"""
+消息缓存失效基准测试
+
+对比旧的 KEYS 扫描失效与版本号失效（SessionStorage._invalidate_message_cache）
+在 keyspace 增长时的耗时。KEYS 的耗时随 key 总数线性增长，版本号失效保持不变。
+
+用法：
+    python scripts/bench_cache_invalidation.py                    # 使用配置中的 Redis
+    python scripts/bench_cache_invalidation.py --fake             # 使用 fakeredis
+    python scripts/bench_cache_invalidation.py --sizes 1000 10000 100000 --repeat 50
+
+会写入 ``bench:filler:*`` 占位 key，结束后按名称删除（不使用 KEYS）。
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from context.session_storage import SessionStorage
+
+SESSION_ID = "bench-session"
+FILLER_PREFIX = "bench:filler:"
+
+
+def legacy_invalidate(redis_client, session_id: str) -> None:
+    """旧实现：KEYS 扫描后删除"""
+    keys = redis_client.keys(f"agent_messages:{session_id}:*")
+    if keys:
+        redis_client.delete(*keys)
+
+
+def fill(redis_client, start: int, end: int, batch: int = 5000) -> None:
+    """写入占位 key，模拟共享 Redis 中其他会话/租户的数据"""
+    for offset in range(start, end, batch):
+        pipe = redis_client.pipeline(transaction=False)
+        for i in range(offset, min(offset + batch, end)):
+            pipe.set(f"{FILLER_PREFIX}{i}", "x")
+        pipe.execute()
+
+
+def cleanup(redis_client, count: int, batch: int = 5000) -> None:
+    for offset in range(0, count, batch):
+        redis_client.delete(*(f"{FILLER_PREFIX}{i}" for i in range(offset, min(offset + batch, count))))
+
+
+def measure(func, repeat: int) -> float:
+    """中位耗时（毫秒）"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark message cache invalidation")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="keyspace sizes")
+    parser.add_argument("--repeat", type=int, default=20, help="invalidations measured per size")
+    parser.add_argument("--fake", action="store_true", help="use fakeredis instead of the configured Redis")
+    args = parser.parse_args()
+    
+    storage = SessionStorage()
+    if args.fake:
+        import fakeredis
+        storage.redis_client = fakeredis.FakeRedis(decode_responses=True)
+    redis_client = storage.redis_client
+    
+    def legacy():
+        # 每次失效前都有一份缓存需要删除
+        redis_client.set(f"agent_messages:{SESSION_ID}:active", "[]")
+        legacy_invalidate(redis_client, SESSION_ID)
+    
+    def versioned():
+        storage._invalidate_message_cache(SESSION_ID)
+    
+    print(f"{'keys':>10}  {'KEYS+DEL (ms)':>14}  {'versioned (ms)':>15}")
+    filled = 0
+    try:
+        for size in sorted(args.sizes):
+            fill(redis_client, filled, size)
+            filled = size
+            print(f"{size:>10}  {measure(legacy, args.repeat):>14.3f}  {measure(versioned, args.repeat):>15.3f}")
+    finally:
+        cleanup(redis_client, filled)
+        redis_client.delete(storage._message_version_key(SESSION_ID))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+启动耗时基准测试
+
+在独立的子进程中分别测量（每项都是冷启动）：
+- import tokenizers / import transformers 的耗时
+- import context.token_counter 的耗时（包含 context 包的依赖）
+- 首次 calculate_tokens（未预热：加载 tokenizer + 编码）与 warmup_tokenizer 之后的首次调用
+
+用法：
+    python scripts/bench_startup.py
+    python scripts/bench_startup.py --repeat 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+PROBES = {
+    "import tokenizers": "import tokenizers",
+    "import transformers": "import transformers",
+    "import context.token_counter": "import context.token_counter",
+    "first count (cold)": (
+        "from context.token_counter import calculate_tokens",
+        "calculate_tokens('你好，请总结这篇文档')"
+    ),
+    "first count (warmed)": (
+        "from context.token_counter import calculate_tokens, warmup_tokenizer; warmup_tokenizer()",
+        "calculate_tokens('你好，请总结这篇文档')"
+    ),
+}
+
+TEMPLATE = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+{setup}
+start = time.perf_counter()
+{statement}
+print(json.dumps((time.perf_counter() - start) * 1000))
+"""
+
+
+def run_probe(setup: str, statement: str) -> float:
+    """在新解释器中执行 statement，返回耗时（毫秒）"""
+    code = TEMPLATE.format(root=str(ROOT), setup=setup, statement=statement)
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "bench-key")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, cwd=ROOT)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark tokenizer import and warm-up time")
+    parser.add_argument("--repeat", type=int, default=3, help="cold runs per probe")
+    args = parser.parse_args()
+    
+    print(f"{'probe':<30}  {'median (ms)':>12}")
+    for name, probe in PROBES.items():
+        setup, statement = ("", probe) if isinstance(probe, str) else probe
+        try:
+            timings = [run_probe(setup, statement) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print(f"{name:<30}  {'n/a':>12}  ({e})")
+            continue
+        print(f"{name:<30}  {statistics.median(timings):>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
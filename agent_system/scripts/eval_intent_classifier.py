@@ -0,0 +1,100 @@
+"""
+意图识别快速通道离线评估
+
+在标注集（src/agent/intent_examples.jsonl）上：
+- 规则层：直接在全部样本上统计命中率与准确率（规则不依赖训练数据）
+- 模型层：分层 k 折交叉验证（每折用其余样本训练），按不同阈值统计
+  本地判定覆盖率（不调用 LLM 的比例）与本地判定准确率
+
+用法：
+    python scripts/eval_intent_classifier.py
+    python scripts/eval_intent_classifier.py --folds 10 --thresholds 0.8 0.9 0.95 0.99
+    python scripts/eval_intent_classifier.py --data other_examples.jsonl --errors
+"""
+import argparse
+import os
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault("OPENAI_API_KEY", "eval-key")
+
+from src.agent.intent_classifier import (  # noqa: E402
+    EXAMPLES_PATH,
+    IntentClassifier,
+    load_examples
+)
+
+
+def stratified_folds(examples, folds):
+    """按意图轮流分配到各折，保证每折中各意图比例一致"""
+    buckets = defaultdict(list)
+    for example in examples:
+        buckets[example[1]].append(example)
+    assignment = [[] for _ in range(folds)]
+    for items in buckets.values():
+        for i, example in enumerate(items):
+            assignment[i % folds].append(example)
+    return assignment
+
+
+def evaluate_rules(examples, show_errors):
+    hits = correct = 0
+    for query, intent in examples:
+        predicted = IntentClassifier.match_rules(query)
+        if predicted is None:
+            continue
+        hits += 1
+        if predicted == intent:
+            correct += 1
+        elif show_errors:
+            print(f"  rule error: {query!r} -> {predicted.value} (expected {intent.value})")
+    print(f"rules: coverage {hits}/{len(examples)} ({hits / len(examples):.1%}), "
+          f"accuracy {correct}/{hits} ({correct / max(hits, 1):.1%})")
+
+
+def evaluate_tiers(examples, folds, thresholds, show_errors):
+    # 每个样本在不包含它的折上训练后的预测
+    predictions = []
+    fold_list = stratified_folds(examples, folds)
+    for i, test in enumerate(fold_list):
+        train = [example for j, fold in enumerate(fold_list) if j != i for example in fold]
+        classifier = IntentClassifier(examples=train, threshold=0.0)
+        for query, intent in test:
+            predictions.append((query, intent, classifier.classify(query)))
+    
+    print(f"\n{folds}-fold cross-validation, rules + model ({len(examples)} examples)")
+    print(f"{'threshold':>10}  {'local':>14}  {'local acc':>10}  {'model acc':>10}")
+    for threshold in thresholds:
+        local = correct = model_local = model_correct = 0
+        for query, intent, prediction in predictions:
+            if prediction.tier == "model" and prediction.confidence < threshold:
+                continue
+            local += 1
+            correct += prediction.intent == intent
+            if prediction.tier == "model":
+                model_local += 1
+                model_correct += prediction.intent == intent
+                if show_errors and prediction.intent != intent:
+                    print(f"  t={threshold}: {query!r} -> {prediction.intent.value} "
+                          f"({prediction.confidence:.3f}, expected {intent.value})")
+        print(f"{threshold:>10.3f}  {local:>5}/{len(predictions)} ({local / len(predictions):>5.1%})  "
+              f"{correct / max(local, 1):>10.1%}  {model_correct / max(model_local, 1):>10.1%}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Evaluate the local intent classification tiers")
+    parser.add_argument("--data", type=Path, default=EXAMPLES_PATH, help="labelled JSON Lines file")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.5, 0.7, 0.8, 0.9, 0.95, 0.99])
+    parser.add_argument("--errors", action="store_true", help="print misclassified queries")
+    args = parser.parse_args()
+    
+    examples = load_examples(args.data)
+    evaluate_rules(examples, args.errors)
+    evaluate_tiers(examples, args.folds, args.thresholds, args.errors)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,19 @@
 """Main agent class for orchestrating the workflow."""
+import asyncio
 import time
 import uuid
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, AsyncIterator
+
+from langchain_core.messages import AIMessageChunk
 
 from langchain_openai import ChatOpenAI
 
 from .state import AgentState, IntentType
 from .nodes import AgentNodes
 from .graph import create_agent_graph
-from ..tools import create_recall_tool, create_web_search_tool
+from .checkpointer import create_checkpointer
+from ..tools import create_recall_cache, create_recall_tool, create_web_search_tool
+from ..prompts import get_prompt_budgeter
 from ..utils.logger import get_logger
 from config import get_settings
 
@@ -41,7 +46,8 @@ class IntelligentAgent:
         )
         logger.info(f"LLM initialized: {self.settings.model_name}")
         
-        # Initialize Recall tool with HTTP API
+        # Initialize Recall tool with HTTP API (and optional result cache)
+        self.recall_cache = create_recall_cache()
         self.recall_tool = create_recall_tool(
             api_url=self.settings.recall_api_url,
             index_names=self.settings.get_recall_index_names(),
@@ -58,7 +64,15 @@ class IntelligentAgent:
             rerank_factory=self.settings.recall_rerank_factory if self.settings.recall_use_rerank else None,
             rerank_model_name=self.settings.recall_rerank_model_name if self.settings.recall_use_rerank else None,
             rerank_base_url=self.settings.recall_rerank_base_url if self.settings.recall_use_rerank else None,
-            rerank_api_key=self.settings.recall_rerank_api_key if self.settings.recall_use_rerank else None
+            rerank_api_key=self.settings.recall_rerank_api_key if self.settings.recall_use_rerank else None,
+            timeout=self.settings.recall_timeout,
+            connect_timeout=self.settings.recall_connect_timeout,
+            max_connections=self.settings.recall_max_connections,
+            max_keepalive_connections=self.settings.recall_max_keepalive_connections,
+            keepalive_expiry=self.settings.recall_keepalive_expiry,
+            http2=self.settings.recall_http2,
+            cache=self.recall_cache,
+            batch_api_url=self.settings.recall_batch_api_url or None
         )
         logger.info("Recall tool initialized with HTTP API")
         
@@ -80,19 +94,24 @@ class IntelligentAgent:
             web_search_tool=self.web_search_tool
         )
         
+        # Prompt template overheads (measured once per process)
+        self.prompt_budgeter = get_prompt_budgeter()
+        
         # Initialize session manager (强制依赖)
         storage = SessionStorage()
         self.session_manager = SessionManager(storage)
         logger.info("Session manager initialized at agent level")
         
-        # Create graph
-        self.graph = create_agent_graph(self.agent_nodes)
+        # Create graph (bounded / external checkpointer, or none)
+        self.checkpointer = create_checkpointer()
+        self.graph = create_agent_graph(self.agent_nodes, self.checkpointer)
         logger.info("Agent graph created")
         
         logger.info("IntelligentAgent initialization complete")
     
-    def process_query(
+    def _prepare_initial_state(
         self,
+        start_time: float,
         user_query: str,
         mode_type: Optional[str] = None,
         enable_web_search: Optional[bool] = None,
@@ -101,12 +120,17 @@ class IntelligentAgent:
         content: Optional[str] = None,
         force_recall: bool = False,
         recall_index_names: Optional[List[str]] = None,
-        recall_doc_ids: Optional[List[str]] = None
-    ) -> Dict[str, Any]:
+        recall_doc_ids: Optional[List[str]] = None,
+        parallel_execution: Optional[bool] = None
+    ) -> AgentState:
         """
-        Process a user query through the agent workflow.
+        Load the session and build the initial workflow state for a query.
+        
+        Shared by process_query and aprocess_query; all blocking work done before
+        the graph runs (session storage, token counting) happens here.
         
         Args:
+            start_time: Request start timestamp
             user_query: The user's question or request
             mode_type: Optional task type override
             enable_web_search: Optional override for web search enablement
@@ -116,12 +140,11 @@ class IntelligentAgent:
             force_recall: If True, always use recall even when content is small
             recall_index_names: Optional list of index names for recall (overrides environment)
             recall_doc_ids: Optional list of document IDs for recall (overrides environment)
+            parallel_execution: Optional override for parallel execution of recall steps
             
         Returns:
-            Result dictionary containing the final answer and metadata
+            Initial agent state
         """
-        start_time = time.time()
-        
         # 🔑 如果用户未提供session_id，自动生成一个
         if session_id is None:
             session_id = str(uuid.uuid4())
@@ -140,43 +163,50 @@ class IntelligentAgent:
         # 包含：压缩摘要tokens + 保留消息tokens（不包括已压缩的原始消息）
         session_tokens = session.total_token_count
         
-        # 加载session历史（用于context injection）
-        session_messages = self.session_manager.get_conversation_history(session_id)
-        session_history = session_messages if session_messages else None
+        # 加载session快照（最新压缩摘要 + 最近消息），各节点的context injection在其上切片，不再重复读取
+        session_messages = self.agent_nodes.context_injector.load_snapshot(session_id)
+        session_history = session_messages
         
         if session_messages:
-            logger.info(f"Loaded session history: {len(session_messages)} messages, {session_tokens} tokens")
+            logger.info(f"Loaded session snapshot: {len(session_messages)} recent messages, {session_tokens} session tokens")
         
         # ========================================================================
-        # 🔑 自动计算当前可用上下文长度
+        # 🔑 计算当前可用上下文长度（提示词模板开销启动时已测量）
         # ========================================================================
         from context.token_counter import calculate_tokens
         
         # 1. 计算当前查询的tokens
         query_tokens = calculate_tokens(user_query, self.settings.model_name)
         
-        # 2. 预估系统提示词tokens（根据任务类型粗略估计）
-        estimated_system_tokens = 2000  # 提示词+规划等系统消息
-        
-        # 3. 预留给回答的tokens
-        reserved_answer_tokens = 4000  # 预留给助手回答
+        # 2. 回答提示词实际注入的对话历史（快照切片后格式化）
+        history_text = self.agent_nodes.context_injector.format_messages_for_prompt(
+            self.agent_nodes.context_injector.inject_for_answer_generation(session_id, session_messages)
+        )
+        history_tokens = calculate_tokens(history_text, self.settings.model_name) if history_text else 0
         
-        # 4. 计算当前可用上下文
-        # 公式：可用 = 最大上下文 - (历史tokens + 当前问题 + 系统提示 + 预留回答)
-        max_context_tokens = self.settings.max_context_tokens
-        used_tokens = session_tokens + query_tokens + estimated_system_tokens + reserved_answer_tokens
-        available_tokens = max(0, max_context_tokens - used_tokens)
+        # 3. 可用 = 最大上下文 - (预留回答 + 当前问题 + 最大提示词模板开销 + 注入历史)
+        #    意图尚未识别时按该模式下开销最大的意图计算
+        budget = self.prompt_budgeter.budget(
+            query_tokens=query_tokens,
+            history_tokens=history_tokens,
+            intent=IntentType(mode_type) if mode_type else None,
+            deep_thinking=deep_thinking
+        )
+        max_context_tokens = budget.max_context_tokens
+        available_tokens = budget.available_tokens
         
         logger.info("=" * 60)
         logger.info("📊 当前上下文使用情况")
         logger.info("=" * 60)
         logger.info(f"最大上下文: {max_context_tokens:,} tokens")
-        logger.info(f"会话历史: {session_tokens:,} tokens (压缩摘要 + 保留消息)")
+        logger.info(f"会话历史: {session_tokens:,} tokens (压缩摘要 + 保留消息)，注入回答提示词: {history_tokens:,} tokens")
         logger.info(f"当前问题: {query_tokens:,} tokens")
-        logger.info(f"系统提示: {estimated_system_tokens:,} tokens (估计)")
-        logger.info(f"预留回答: {reserved_answer_tokens:,} tokens")
-        logger.info(f"已使用: {used_tokens:,} tokens ({(used_tokens/max_context_tokens)*100:.1f}%)")
+        logger.info(f"提示词模板: {budget.template_tokens:,} tokens ({budget.stage})")
+        logger.info(f"预留回答: {budget.reserved_answer_tokens:,} tokens")
+        logger.info(f"已使用: {budget.used_tokens:,} tokens ({(budget.used_tokens/max_context_tokens)*100:.1f}%)")
         logger.info(f"剩余可用: {available_tokens:,} tokens ({(available_tokens/max_context_tokens)*100:.1f}%)")
+        if not budget.exact:
+            logger.warning("Tokenizer 不可用：以上 token 数均为按字符数的粗略估算")
         logger.info("=" * 60)
         
         # ========================================================================
@@ -210,7 +240,7 @@ class IntelligentAgent:
             else:
                 logger.info("=" * 60)
                 logger.info("⚠️ 文档过大，使用 recall 模式")
-                logger.info(f"   文档 Token 数: {token_count:,}")
+                logger.info(f"   文档 Token 数: >= {token_count:,}（超出阈值后停止计数）")
                 logger.info(f"   可用 Token 数: {available_tokens:,}")
                 logger.info(f"   使用比例: {(token_count/available_tokens)*100:.1f}%")
                 logger.info(f"   阈值: {self.settings.direct_content_threshold*100:.0f}%")
@@ -230,12 +260,16 @@ class IntelligentAgent:
             "mode_type": IntentType(mode_type) if mode_type else None,
             "enable_web_search": enable_web_search if enable_web_search is not None else self.settings.enable_web_search,
             "deep_thinking": deep_thinking,
+            "use_parallel_execution": (
+                parallel_execution if parallel_execution is not None else self.settings.parallel_execution
+            ),
             "detected_intent": None,
             "plan": None,
             "current_step_index": 0,
             "replan_count": 0,
             "execution_results": [],
             "collected_information": "",
+            "retrieved_chunks": [],
             "qa_pairs": [],
             "is_information_sufficient": False,
             "analysis_result": None,
@@ -245,6 +279,8 @@ class IntelligentAgent:
             "session_id": session_id,
             "session_history": session_history,  # Injected session history (from SessionManager)
             "session_tokens": session_tokens,
+            "query_tokens": query_tokens,
+            "history_tokens": history_tokens,
             "_user_message_saved": user_message_saved,  # Internal flag to avoid duplicate saving
             # Metadata
             "start_time": start_time,
@@ -258,57 +294,341 @@ class IntelligentAgent:
             "recall_doc_ids": recall_doc_ids
         }
         
+        return initial_state
+    
+    def _discard_checkpoints(self, config: Dict[str, Any]) -> None:
+        """
+        Drop the checkpoints of a finished run.
+        
+        History lives in SessionManager and every run starts from a fresh
+        initial state, so a run's checkpoints are not needed once it ends.
+        """
+        if self.checkpointer is None:
+            return
+        thread_id = config["configurable"]["thread_id"]
         try:
-            # Execute the graph with recursion limit
-            config = {
-                "configurable": {"thread_id": session_id},
-                "recursion_limit": 50  # Increase from default 25
-            }
-            result = self.graph.invoke(initial_state, config=config)
+            self.checkpointer.delete_thread(thread_id)
+        except NotImplementedError:
+            pass
+        except Exception as e:
+            logger.warning(f"Failed to discard checkpoints for run {thread_id}: {e}")
+    
+    async def _adiscard_checkpoints(self, config: Dict[str, Any]) -> None:
+        """Async version of _discard_checkpoints."""
+        if self.checkpointer is None:
+            return
+        thread_id = config["configurable"]["thread_id"]
+        try:
+            await self.checkpointer.adelete_thread(thread_id)
+        except NotImplementedError:
+            pass
+        except Exception as e:
+            logger.warning(f"Failed to discard checkpoints for run {thread_id}: {e}")
+    
+    def _graph_config(self, session_id: str) -> Dict[str, Any]:
+        """
+        Build the graph run config for one run of a session.
+        
+        Each run gets its own checkpoint thread, so concurrent requests for the
+        same session do not share (or delete) each other's checkpoints.
+        """
+        return {
+            "configurable": {"thread_id": f"{session_id}:{uuid.uuid4().hex}"},
+            "recursion_limit": 50  # Increase from default 25
+        }
+    
+    def _build_response(self, result: Dict[str, Any], session_id: str, start_time: float) -> Dict[str, Any]:
+        """
+        Build the success response from the final workflow state.
+        
+        Args:
+            result: Final agent state
+            session_id: Session ID
+            start_time: Request start timestamp
             
-            execution_time = time.time() - start_time
-            logger.info(f"Query processed successfully in {execution_time:.2f}s")
+        Returns:
+            Result dictionary containing the final answer and metadata
+        """
+        execution_time = time.time() - start_time
+        logger.info(f"Query processed successfully in {execution_time:.2f}s")
+        
+        # Get session statistics
+        session = self.session_manager.load_session(session_id)
+        compression_threshold = self.settings.compression_threshold_tokens
+        tokens_remaining = max(0, compression_threshold - session.total_token_count)
+        
+        session_stats = {
+            "session_total_tokens": session.total_token_count,
+            "session_message_count": session.message_count,
+            "compression_threshold": compression_threshold,
+            "tokens_until_compression": tokens_remaining
+        }
+        logger.debug(f"Session stats: {session.total_token_count}/{compression_threshold} tokens, {tokens_remaining} remaining")
+        
+        # Extract key information
+        return {
+            "success": True,
+            "session_id": session_id,
+            "detected_intent": result["detected_intent"].value if result.get("detected_intent") else None,
+            "plan": result.get("plan"),
+            "execution_results": result.get("execution_results", []),
+            "analysis": result.get("analysis_result"),
+            "final_answer": result.get("final_answer", ""),
+            "execution_time": execution_time,
+            "error": result.get("error"),
+            **session_stats  # Add session statistics
+        }
+    
+    def _build_error_response(self, error: Exception, session_id: str, start_time: float) -> Dict[str, Any]:
+        """Build the failure response for an error raised by the workflow."""
+        execution_time = time.time() - start_time
+        logger.error(f"Error processing query: {str(error)}", exc_info=error)
+        
+        return {
+            "success": False,
+            "session_id": session_id,
+            "error": str(error),
+            "execution_time": execution_time,
+            "final_answer": f"处理请求时发生错误: {str(error)}"
+        }
+    
+    def process_query(
+        self,
+        user_query: str,
+        mode_type: Optional[str] = None,
+        enable_web_search: Optional[bool] = None,
+        deep_thinking: bool = False,
+        session_id: Optional[str] = None,
+        content: Optional[str] = None,
+        force_recall: bool = False,
+        recall_index_names: Optional[List[str]] = None,
+        recall_doc_ids: Optional[List[str]] = None,
+        parallel_execution: Optional[bool] = None
+    ) -> Dict[str, Any]:
+        """
+        Process a user query through the agent workflow.
+        
+        Args:
+            user_query: The user's question or request
+            mode_type: Optional task type override
+            enable_web_search: Optional override for web search enablement
+            deep_thinking: Enable deep thinking mode with QA pairs
+            session_id: Optional session ID for multi-turn conversation (auto-loads history if exists)
+            content: Optional full document content (for small documents)
+            force_recall: If True, always use recall even when content is small
+            recall_index_names: Optional list of index names for recall (overrides environment)
+            recall_doc_ids: Optional list of document IDs for recall (overrides environment)
+            parallel_execution: Optional override for parallel execution of recall steps
             
-            # Get session statistics
-            session = self.session_manager.load_session(session_id)
-            compression_threshold = self.settings.compression_threshold_tokens
-            tokens_remaining = max(0, compression_threshold - session.total_token_count)
+        Returns:
+            Result dictionary containing the final answer and metadata
+        """
+        start_time = time.time()
+        initial_state = self._prepare_initial_state(
+            start_time, user_query, mode_type, enable_web_search, deep_thinking,
+            session_id, content, force_recall, recall_index_names, recall_doc_ids,
+            parallel_execution
+        )
+        session_id = initial_state["session_id"]
+        
+        config = self._graph_config(session_id)
+        try:
+            result = self.graph.invoke(initial_state, config=config)
+            return self._build_response(result, session_id, start_time)
+        except Exception as e:
+            return self._build_error_response(e, session_id, start_time)
+        finally:
+            self._discard_checkpoints(config)
+    
+    async def aprocess_query(
+        self,
+        user_query: str,
+        mode_type: Optional[str] = None,
+        enable_web_search: Optional[bool] = None,
+        deep_thinking: bool = False,
+        session_id: Optional[str] = None,
+        content: Optional[str] = None,
+        force_recall: bool = False,
+        recall_index_names: Optional[List[str]] = None,
+        recall_doc_ids: Optional[List[str]] = None,
+        parallel_execution: Optional[bool] = None
+    ) -> Dict[str, Any]:
+        """
+        Async version of process_query.
+        
+        Runs the graph with ``graph.ainvoke`` so LLM calls are awaited instead of
+        blocking the event loop; session storage access runs in worker threads.
+        Many queries can therefore be in flight on a single worker process.
+        
+        Args:
+            user_query: The user's question or request
+            mode_type: Optional task type override
+            enable_web_search: Optional override for web search enablement
+            deep_thinking: Enable deep thinking mode with QA pairs
+            session_id: Optional session ID for multi-turn conversation
+            content: Optional full document content (for small documents)
+            force_recall: If True, always use recall even when content is small
+            recall_index_names: Optional list of index names for recall (overrides environment)
+            recall_doc_ids: Optional list of document IDs for recall (overrides environment)
+            parallel_execution: Optional override for parallel execution of recall steps
             
-            session_stats = {
-                "session_total_tokens": session.total_token_count,
-                "session_message_count": session.message_count,
-                "compression_threshold": compression_threshold,
-                "tokens_until_compression": tokens_remaining
-            }
-            logger.debug(f"Session stats: {session.total_token_count}/{compression_threshold} tokens, {tokens_remaining} remaining")
+        Returns:
+            Result dictionary containing the final answer and metadata
+        """
+        start_time = time.time()
+        initial_state = await asyncio.to_thread(
+            self._prepare_initial_state,
+            start_time, user_query, mode_type, enable_web_search, deep_thinking,
+            session_id, content, force_recall, recall_index_names, recall_doc_ids,
+            parallel_execution
+        )
+        session_id = initial_state["session_id"]
+        
+        config = self._graph_config(session_id)
+        try:
+            result = await self.graph.ainvoke(initial_state, config=config)
+            return await asyncio.to_thread(self._build_response, result, session_id, start_time)
+        except Exception as e:
+            return self._build_error_response(e, session_id, start_time)
+        finally:
+            await self._adiscard_checkpoints(config)
+    
+    # Nodes whose LLM output is the user-facing answer (streamed token by token)
+    _ANSWER_NODES = ("answer_generation", "simple_interaction")
+    
+    def _node_update_events(
+        self,
+        node: str,
+        update: Dict[str, Any],
+        previous_result_count: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Convert a node state update into stream events.
+        
+        Args:
+            node: Name of the node that produced the update
+            update: State update returned by the node
+            previous_result_count: Number of execution results before this update
             
-            # Extract key information
-            response = {
-                "success": True,
-                "session_id": session_id,
-                "detected_intent": result["detected_intent"].value if result.get("detected_intent") else None,
-                "plan": result.get("plan"),
-                "execution_results": result.get("execution_results", []),
-                "analysis": result.get("analysis_result"),
-                "final_answer": result.get("final_answer", ""),
-                "execution_time": execution_time,
-                "error": result.get("error"),
-                **session_stats  # Add session statistics
-            }
+        Returns:
+            Event dictionaries (empty if the node has no progress event)
+        """
+        if node == "intent_recognition":
+            intent = update.get("detected_intent")
+            return [{"type": "intent", "content": intent.value if intent else None}]
+        if node == "plan_generation":
+            return [{"type": "plan", "data": update.get("plan")}]
+        if node in ("execution", "parallel_execution"):
+            # 只推送本次新完成的步骤（并行执行一次完成多个步骤）
+            results = update.get("execution_results") or []
+            return [{"type": "step", "data": r} for r in results[previous_result_count:]]
+        if node == "analysis":
+            return [{"type": "analysis", "data": update.get("analysis_result")}]
+        return []
+    
+    async def astream_query(
+        self,
+        user_query: str,
+        mode_type: Optional[str] = None,
+        enable_web_search: Optional[bool] = None,
+        deep_thinking: bool = False,
+        session_id: Optional[str] = None,
+        content: Optional[str] = None,
+        force_recall: bool = False,
+        recall_index_names: Optional[List[str]] = None,
+        recall_doc_ids: Optional[List[str]] = None,
+        parallel_execution: Optional[bool] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming version of aprocess_query.
+        
+        Yields progress events as the workflow advances and the final answer
+        token by token:
+        
+        - ``session``: session ID assigned to this query
+        - ``intent`` / ``plan`` / ``step`` / ``analysis``: node transitions
+        - ``token``: a piece of the final answer
+        - ``done``: final response (same fields as aprocess_query)
+        - ``error``: the workflow failed; no further events follow
+        
+        Args:
+            user_query: The user's question or request
+            mode_type: Optional task type override
+            enable_web_search: Optional override for web search enablement
+            deep_thinking: Enable deep thinking mode with QA pairs
+            session_id: Optional session ID for multi-turn conversation
+            content: Optional full document content (for small documents)
+            force_recall: If True, always use recall even when content is small
+            recall_index_names: Optional list of index names for recall (overrides environment)
+            recall_doc_ids: Optional list of document IDs for recall (overrides environment)
+            parallel_execution: Optional override for parallel execution of recall steps
             
-            return response
+        Yields:
+            Event dictionaries with a ``type`` key
+        """
+        start_time = time.time()
+        initial_state = await asyncio.to_thread(
+            self._prepare_initial_state,
+            start_time, user_query, mode_type, enable_web_search, deep_thinking,
+            session_id, content, force_recall, recall_index_names, recall_doc_ids,
+            parallel_execution
+        )
+        session_id = initial_state["session_id"]
+        yield {"type": "session", "session_id": session_id}
+        
+        final_state: Dict[str, Any] = dict(initial_state)
+        config = self._graph_config(session_id)
+        try:
+            async for mode, payload in self.graph.astream(
+                initial_state,
+                config=config,
+                stream_mode=["updates", "messages"]
+            ):
+                if mode == "messages":
+                    chunk, metadata = payload
+                    # 只转发最终回答节点的增量 token（跳过其他节点的 JSON 输出）
+                    if (
+                        isinstance(chunk, AIMessageChunk)
+                        and chunk.content
+                        and metadata.get("langgraph_node") in self._ANSWER_NODES
+                    ):
+                        yield {"type": "token", "content": chunk.content}
+                    continue
+                
+                for node, update in payload.items():
+                    if not update:
+                        continue
+                    previous_result_count = len(final_state.get("execution_results") or [])
+                    final_state.update(update)
+                    for event in self._node_update_events(node, update, previous_result_count):
+                        yield event
             
+            response = await asyncio.to_thread(self._build_response, final_state, session_id, start_time)
+            yield {"type": "done", "data": response}
         except Exception as e:
-            execution_time = time.time() - start_time
-            logger.error(f"Error processing query: {str(e)}", exc_info=True)
+            response = self._build_error_response(e, session_id, start_time)
+            yield {"type": "error", "content": response["error"], "data": response}
+        finally:
+            await self._adiscard_checkpoints(config)
+    
+    async def aclose(self) -> None:
+        """Release pooled HTTP connections held by the agent's tools."""
+        await self.recall_tool.aclose()
+    
+    def invalidate_recall_cache(self, index_names: List[str]) -> Dict[str, Any]:
+        """
+        Invalidate cached recall results for indexes whose documents changed.
+        
+        Args:
+            index_names: Indexes that had documents uploaded or deleted
             
-            return {
-                "success": False,
-                "session_id": session_id,
-                "error": str(e),
-                "execution_time": execution_time,
-                "final_answer": f"处理请求时发生错误: {str(e)}"
-            }
+        Returns:
+            Cache statistics after invalidation
+        """
+        if self.recall_cache is None:
+            return {"enabled": False}
+        self.recall_cache.invalidate_indexes(index_names)
+        return {"enabled": True, **self.recall_cache.stats()}
     
     def get_conversation_history(self, session_id: str) -> List[Dict[str, Any]]:
         """
@@ -356,31 +676,6 @@ class IntelligentAgent:
         except Exception as e:
             logger.error(f"Failed to clear conversation: {str(e)}")
             return False
-    
-    async def aprocess_query(
-        self,
-        user_query: str,
-        mode_type: Optional[str] = None,
-        enable_web_search: Optional[bool] = None,
-        deep_thinking: bool = False,
-        session_id: Optional[str] = None
-    ) -> Dict[str, Any]:
-        """
-        Async version of process_query.
-        
-        Args:
-            user_query: The user's question or request
-            mode_type: Optional task type override
-            enable_web_search: Optional override for web search enablement
-            deep_thinking: Enable deep thinking mode with QA pairs
-            session_id: Optional session ID for multi-turn conversation
-            
-        Returns:
-            Result dictionary containing the final answer and metadata
-        """
-        # For now, call the sync version
-        # In production, implement true async execution
-        return self.process_query(user_query, mode_type, enable_web_search, deep_thinking, session_id)
 
 
 def create_agent() -> IntelligentAgent:
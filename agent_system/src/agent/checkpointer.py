@@ -0,0 +1,320 @@
+"""
+Checkpointer construction for the agent graph.
+
+Conversation history is persisted by SessionManager, so graph checkpoints only
+need to live for the duration of a run. The default in-memory checkpointer is
+therefore bounded: whole threads are evicted by LRU order, TTL and a thread cap.
+Postgres and Redis backends are available through optional packages.
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Sequence, Set, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple
+)
+from langgraph.checkpoint.memory import MemorySaver
+
+from config import get_settings
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+CHECKPOINTER_BACKENDS = ("memory", "postgres", "redis", "none")
+
+
+class BoundedMemorySaver(MemorySaver):
+    """
+    In-memory checkpointer with LRU/TTL eviction and a cap on the number of threads.
+    
+    Threads (one per session) are evicted as a whole: when a thread hasn't been
+    written or read for ``ttl`` seconds, or when more than ``max_threads`` threads
+    are stored, the least recently used threads are dropped. Keys written per
+    thread are tracked so eviction doesn't scan the whole store.
+    """
+    
+    def __init__(self, max_threads: int = 1000, ttl: int = 3600, **kwargs: Any):
+        """
+        Initialize the checkpointer.
+        
+        Args:
+            max_threads: Maximum number of threads kept in memory
+            ttl: Seconds a thread is kept after its last access
+            **kwargs: Passed to MemorySaver (e.g. serde)
+        """
+        super().__init__(**kwargs)
+        self.max_threads = max_threads
+        self.ttl = ttl
+        
+        self._threads: "OrderedDict[str, float]" = OrderedDict()
+        self._write_keys: Dict[str, Set[Tuple[str, str, str]]] = {}
+        self._blob_keys: Dict[str, Set[Tuple[str, str, str, Any]]] = {}
+        self._lock = threading.RLock()
+        self.evictions = 0
+    
+    def _touch(self, thread_id: str) -> None:
+        """Mark a thread as used and evict expired / least recently used threads."""
+        self._threads[thread_id] = time.monotonic()
+        self._threads.move_to_end(thread_id)
+        self._evict(keep=thread_id)
+    
+    def _evict(self, keep: Optional[str] = None) -> None:
+        """Drop expired threads, then the oldest ones beyond max_threads."""
+        expire_before = time.monotonic() - self.ttl
+        while self._threads:
+            thread_id, last_access = next(iter(self._threads.items()))
+            if thread_id == keep:
+                break
+            if last_access >= expire_before and len(self._threads) <= self.max_threads:
+                break
+            self._drop_thread(thread_id)
+            self.evictions += 1
+    
+    def _drop_thread(self, thread_id: str) -> None:
+        """Remove all checkpoints, writes and blobs of a thread (lock held)."""
+        self._threads.pop(thread_id, None)
+        self.storage.pop(thread_id, None)
+        for key in self._write_keys.pop(thread_id, ()):
+            self.writes.pop(key, None)
+        for key in self._blob_keys.pop(thread_id, ()):
+            self.blobs.pop(key, None)
+    
+    def _track_writes(self, checkpoint_tuples: Sequence[CheckpointTuple]) -> None:
+        """
+        Track the writes keys of returned checkpoints (lock held).
+        
+        MemorySaver reads pending writes through a defaultdict, which creates an
+        empty entry for every checkpoint read, including ones without writes.
+        """
+        for checkpoint_tuple in checkpoint_tuples:
+            configurable = checkpoint_tuple.config["configurable"]
+            self._write_keys.setdefault(configurable["thread_id"], set()).add((
+                configurable["thread_id"],
+                configurable.get("checkpoint_ns", ""),
+                configurable["checkpoint_id"]
+            ))
+    
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            # Unknown threads must not be created by the defaultdict lookup in MemorySaver
+            if thread_id not in self.storage:
+                return None
+            self._touch(thread_id)
+            result = super().get_tuple(config)
+            if result is not None:
+                self._track_writes([result])
+            return result
+    
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None
+    ) -> Iterator[CheckpointTuple]:
+        with self._lock:
+            if config and config["configurable"]["thread_id"] not in self.storage:
+                return iter(())
+            # Materialize under the lock so eviction can't change the store mid-iteration
+            results = list(super().list(config, filter=filter, before=before, limit=limit))
+            self._track_writes(results)
+            return iter(results)
+    
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        with self._lock:
+            result = super().put(config, checkpoint, metadata, new_versions)
+            self._blob_keys.setdefault(thread_id, set()).update(
+                (thread_id, checkpoint_ns, channel, version) for channel, version in new_versions.items()
+            )
+            self._touch(thread_id)
+            return result
+    
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = ""
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            super().put_writes(config, writes, task_id, task_path)
+            self._write_keys.setdefault(thread_id, set()).add((
+                thread_id,
+                config["configurable"].get("checkpoint_ns", ""),
+                config["configurable"]["checkpoint_id"]
+            ))
+            self._touch(thread_id)
+    
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._drop_thread(thread_id)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Checkpointer statistics."""
+        with self._lock:
+            return {
+                "threads": len(self._threads),
+                "checkpoints": sum(len(ns) for thread in self.storage.values() for ns in thread.values()),
+                "blobs": len(self.blobs),
+                "evictions": self.evictions
+            }
+
+
+class ThreadedAsyncSaver(BaseCheckpointSaver):
+    """
+    Gives a sync-only checkpointer an async interface by running it in worker threads.
+    
+    The agent serves ``graph.invoke`` and ``graph.ainvoke`` from one compiled
+    graph, so the checkpointer must implement both interfaces.
+    """
+    
+    def __init__(self, saver: BaseCheckpointSaver):
+        super().__init__(serde=saver.serde)
+        self.saver = saver
+    
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return self.saver.get_tuple(config)
+    
+    def list(self, config: Optional[RunnableConfig], **kwargs: Any) -> Iterator[CheckpointTuple]:
+        return self.saver.list(config, **kwargs)
+    
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions
+    ) -> RunnableConfig:
+        return self.saver.put(config, checkpoint, metadata, new_versions)
+    
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = ""
+    ) -> None:
+        self.saver.put_writes(config, writes, task_id, task_path)
+    
+    def delete_thread(self, thread_id: str) -> None:
+        self.saver.delete_thread(thread_id)
+    
+    def get_next_version(self, current: Optional[Any], channel: Any) -> Any:
+        return self.saver.get_next_version(current, channel)
+    
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.saver.get_tuple, config)
+    
+    async def alist(self, config: Optional[RunnableConfig], **kwargs: Any) -> AsyncIterator[CheckpointTuple]:
+        for item in await asyncio.to_thread(lambda: list(self.saver.list(config, **kwargs))):
+            yield item
+    
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.saver.put, config, checkpoint, metadata, new_versions)
+    
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = ""
+    ) -> None:
+        await asyncio.to_thread(self.saver.put_writes, config, writes, task_id, task_path)
+    
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.saver.delete_thread, thread_id)
+
+
+def _create_postgres_checkpointer(settings) -> BaseCheckpointSaver:
+    """Postgres checkpointer on the session database (langgraph-checkpoint-postgres, psycopg 3)."""
+    try:
+        from langgraph.checkpoint.postgres import PostgresSaver
+        from psycopg.rows import dict_row
+        from psycopg_pool import ConnectionPool
+    except ImportError as e:
+        raise RuntimeError(
+            "CHECKPOINTER_BACKEND=postgres requires 'langgraph-checkpoint-postgres' and 'psycopg[pool]'"
+        ) from e
+    
+    pool = ConnectionPool(
+        conninfo=settings.postgres_url,
+        max_size=settings.postgres_pool_size,
+        kwargs={"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row},
+        open=True
+    )
+    saver = PostgresSaver(pool)
+    saver.setup()
+    return ThreadedAsyncSaver(saver)
+
+
+def _create_redis_checkpointer(settings) -> BaseCheckpointSaver:
+    """Redis checkpointer with key TTL (langgraph-checkpoint-redis, needs RedisJSON + RediSearch)."""
+    try:
+        from langgraph.checkpoint.redis import RedisSaver
+    except ImportError as e:
+        raise RuntimeError("CHECKPOINTER_BACKEND=redis requires 'langgraph-checkpoint-redis'") from e
+    
+    # langgraph-checkpoint-redis expects the TTL in minutes
+    saver = RedisSaver(
+        redis_url=settings.redis_url,
+        ttl={"default_ttl": max(1, settings.checkpointer_ttl // 60), "refresh_on_read": True}
+    )
+    saver.setup()
+    return ThreadedAsyncSaver(saver)
+
+
+def create_checkpointer() -> Optional[BaseCheckpointSaver]:
+    """
+    Create the graph checkpointer configured by CHECKPOINTER_BACKEND.
+    
+    Returns:
+        Checkpointer instance, or None when checkpointing is disabled
+        
+    Raises:
+        ValueError: Unknown backend
+        RuntimeError: Optional packages for the backend are not installed
+    """
+    settings = get_settings()
+    backend = settings.checkpointer_backend.lower()
+    
+    if backend == "none":
+        logger.info("Graph checkpointing disabled")
+        return None
+    if backend == "memory":
+        logger.info(
+            f"Graph checkpointer: bounded memory (max_threads={settings.checkpointer_max_threads}, "
+            f"ttl={settings.checkpointer_ttl}s)"
+        )
+        return BoundedMemorySaver(max_threads=settings.checkpointer_max_threads, ttl=settings.checkpointer_ttl)
+    if backend == "postgres":
+        logger.info("Graph checkpointer: postgres")
+        return _create_postgres_checkpointer(settings)
+    if backend == "redis":
+        logger.info("Graph checkpointer: redis")
+        return _create_redis_checkpointer(settings)
+    
+    raise ValueError(f"Unknown CHECKPOINTER_BACKEND: {backend} (expected one of {CHECKPOINTER_BACKENDS})")
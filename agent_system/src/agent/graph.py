@@ -1,7 +1,8 @@
 """Graph construction and routing logic for the agent."""
-from typing import Literal
+from typing import Literal, Optional
 
-from langgraph.checkpoint.memory import MemorySaver
+from langchain_core.runnables import RunnableLambda
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph import END, START, StateGraph
 
 from .state import AgentState, IntentType
@@ -11,13 +12,33 @@ from ..utils.logger import get_logger
 logger = get_logger(__name__)
 
 
-def create_agent_graph(agent_nodes: AgentNodes):
+def _node(name: str, func, afunc) -> RunnableLambda:
+    """
+    Wrap a node's sync and async implementations into one runnable.
+    
+    ``graph.invoke`` runs ``func`` and ``graph.ainvoke`` / ``graph.astream`` run
+    ``afunc``, so the same compiled graph serves both execution paths.
+    
+    Args:
+        name: Node name
+        func: Synchronous node implementation
+        afunc: Async node implementation
+        
+    Returns:
+        Runnable usable as a graph node
+    """
+    return RunnableLambda(func, afunc=afunc, name=name)
+
+
+def create_agent_graph(agent_nodes: AgentNodes, checkpointer: Optional[BaseCheckpointSaver] = None):
     """
     Create the LangGraph workflow for the agent.
     
     Args:
         agent_nodes: Configured agent nodes instance
-        
+        checkpointer: Optional checkpointer for state persistence (see create_checkpointer);
+            None compiles the graph without checkpointing
+            
     Returns:
         Compiled graph ready for execution
     """
@@ -27,12 +48,27 @@ def create_agent_graph(agent_nodes: AgentNodes):
     workflow = StateGraph(AgentState)
     
     # Add nodes
-    workflow.add_node("intent_recognition", agent_nodes.intent_recognition_node)
-    workflow.add_node("simple_interaction", agent_nodes.simple_interaction_node)
-    workflow.add_node("plan_generation", agent_nodes.plan_generation_node)
-    workflow.add_node("execution", agent_nodes.execution_node)
-    workflow.add_node("analysis", agent_nodes.analysis_node)
-    workflow.add_node("answer_generation", agent_nodes.answer_generation_node)
+    workflow.add_node("intent_recognition", _node(
+        "intent_recognition", agent_nodes.intent_recognition_node, agent_nodes.aintent_recognition_node
+    ))
+    workflow.add_node("simple_interaction", _node(
+        "simple_interaction", agent_nodes.simple_interaction_node, agent_nodes.asimple_interaction_node
+    ))
+    workflow.add_node("plan_generation", _node(
+        "plan_generation", agent_nodes.plan_generation_node, agent_nodes.aplan_generation_node
+    ))
+    workflow.add_node("execution", _node(
+        "execution", agent_nodes.execution_node, agent_nodes.aexecution_node
+    ))
+    workflow.add_node("parallel_execution", _node(
+        "parallel_execution", agent_nodes.parallel_execution_node, agent_nodes.aparallel_execution_node
+    ))
+    workflow.add_node("analysis", _node(
+        "analysis", agent_nodes.analysis_node, agent_nodes.aanalysis_node
+    ))
+    workflow.add_node("answer_generation", _node(
+        "answer_generation", agent_nodes.answer_generation_node, agent_nodes.aanswer_generation_node
+    ))
     
     logger.info("Added all nodes to graph")
     
@@ -57,6 +93,26 @@ def create_agent_graph(agent_nodes: AgentNodes):
         else:
             return "plan_generation"
     
+    def route_after_plan(
+        state: AgentState
+    ) -> Literal["execution", "parallel_execution"]:
+        """
+        Route after plan generation.
+        
+        With parallel execution enabled the recall steps (and, in deep thinking
+        mode, their sub-answers) run concurrently; otherwise step by step.
+        
+        Args:
+            state: Current agent state
+            
+        Returns:
+            Next node name
+        """
+        if state.get("use_parallel_execution"):
+            logger.info("Routing after plan: parallel execution")
+            return "parallel_execution"
+        return "execution"
+    
     def route_after_execution(
         state: AgentState
     ) -> Literal["execution", "analysis"]:
@@ -118,8 +174,15 @@ def create_agent_graph(agent_nodes: AgentNodes):
     # Simple interaction goes directly to END
     workflow.add_edge("simple_interaction", END)
     
-    # Plan generation goes to execution
-    workflow.add_edge("plan_generation", "execution")
+    # Plan generation goes to execution (step by step or parallel)
+    workflow.add_conditional_edges(
+        "plan_generation",
+        route_after_plan,
+        {
+            "execution": "execution",
+            "parallel_execution": "parallel_execution"
+        }
+    )
     
     # Execution can loop or go to analysis
     workflow.add_conditional_edges(
@@ -131,6 +194,9 @@ def create_agent_graph(agent_nodes: AgentNodes):
         }
     )
     
+    # Parallel execution runs the whole plan, then goes to analysis
+    workflow.add_edge("parallel_execution", "analysis")
+    
     # Analysis can go to answer or back to planning
     workflow.add_conditional_edges(
         "analysis",
@@ -146,9 +212,6 @@ def create_agent_graph(agent_nodes: AgentNodes):
     
     logger.info("Added all edges and routing logic")
     
-    # Add checkpointer for state persistence
-    checkpointer = MemorySaver()
-    
     # Compile the graph with recursion limit
     app = workflow.compile(
         checkpointer=checkpointer,
@@ -0,0 +1,256 @@
+"""
+Local intent classifier (fast path before the LLM).
+
+Two cheap tiers decide a query without an LLM round trip:
+
+1. Rules: greetings / thanks / acknowledgements and questions about the
+   conversation itself are simple_interaction; a few unambiguous keyword
+   patterns identify document tasks (a query matching more than one task
+   is left to the next tier).
+2. Model: multinomial naive Bayes over character 1-3 grams, trained at
+   startup on the labelled examples in ``intent_examples.jsonl``.
+   Log scores are divided by the square root of the number of n-grams so
+   that long queries do not get near-certain posteriors by length alone;
+   the model decides only when that posterior reaches the configured
+   threshold.
+
+Anything else (or a follow-up that refers back to the conversation) goes to
+the LLM. Accuracy and coverage of each tier are measured offline with
+``scripts/eval_intent_classifier.py``.
+"""
+import json
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .state import IntentType
+from ..utils.logger import get_logger
+from config import get_settings
+
+logger = get_logger(__name__)
+
+EXAMPLES_PATH = Path(__file__).parent / "intent_examples.jsonl"
+
+# 归一化：小写，去掉空白和标点
+_STRIP = re.compile(r"[\s\W_]+", re.UNICODE)
+
+# 问候 / 感谢 / 确认 / 告别（整句匹配）
+_SMALL_TALK = re.compile(
+    r"(你好|您好|hi|hello|hey|嗨|哈喽|早上好|早安|上午好|中午好|下午好|晚上好|晚安|在吗|在不在|"
+    r"谢谢|多谢|感谢|非常感谢|thanks|thankyou|thx|辛苦了|"
+    r"好的|好|嗯|嗯嗯|收到|明白了|知道了|了解|ok|okay|"
+    r"再见|拜拜|bye|goodbye)+(呀|啊|哦|啦|你|您)*"
+)
+
+# 关于对话本身的问题
+_CONVERSATION = re.compile(
+    r"(总结|回顾|重复|复述).{0,6}(我们|刚才|之前|上一?个?).{0,6}(对话|聊天|回答|内容|讨论)"
+    r"|我(之前|刚才|上一个|第一个)问(了|的是)?什么"
+    r"|我们(刚才|之前)聊(到|了)"
+)
+
+# 明确的文档任务关键词（只有一类命中时才采用）
+_TASK_RULES: Dict[IntentType, re.Pattern] = {
+    IntentType.COMPARISON_EVALUATION: re.compile(
+        r"对比|比较|相比|优劣|孰优|利弊|哪个更|哪份.{0,12}更|谁更|哪家.{0,6}(更|最)|compare|versus|vs"
+    ),
+    IntentType.COMPLIANCE_MATCHING: re.compile(
+        r"(是否|有没有|能否)(符合|满足|包含|违反|合规|合法|具备|按照)|符不符合|合不合(规|法)|(合规|合法)吗"
+        r"|comply|compliant|compliance"
+    ),
+    IntentType.TEMPLATE_GENERATION: re.compile(
+        r"(参考|参照|模仿|仿照|照着|照这|按照|套用|以这).{0,20}(写|起草|拟|编写|仿写|改写)"
+        r"|(照着|套用|基于|用这).{0,10}(模板|范文|格式|框架)|仿写|astemplate"
+    ),
+    IntentType.SUMMARY_EXTRACTION: re.compile(
+        r"^(请|帮我|麻烦)?(总结|概括|归纳|提炼|提取|摘录|汇总|梳理|概述|抽取)|^summari[sz]e"
+    ),
+}
+
+# 指代对话历史的追问：有历史时不在本地判断文档任务
+_REFERENCE = re.compile(r"这|那|它|上面|上述|刚才|之前|前面|第.(个|点|条)")
+
+
+def normalize(query: str) -> str:
+    """Lowercase the query and drop whitespace and punctuation."""
+    return _STRIP.sub("", query.lower())
+
+
+def char_ngrams(text: str, max_n: int = 3) -> List[str]:
+    """Character 1..max_n grams of normalized text."""
+    return [text[i:i + n] for n in range(1, max_n + 1) for i in range(len(text) - n + 1)]
+
+
+def load_examples(path: Path = EXAMPLES_PATH) -> List[Tuple[str, IntentType]]:
+    """
+    Load labelled examples.
+    
+    Args:
+        path: JSON Lines file with ``query`` and ``intent`` fields
+        
+    Returns:
+        (query, intent) pairs
+    """
+    examples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                examples.append((record["query"], IntentType(record["intent"])))
+    return examples
+
+
+@dataclass(frozen=True)
+class IntentPrediction:
+    """Result of the local tiers; ``intent`` is None when the LLM must decide."""
+    
+    intent: Optional[IntentType]
+    confidence: float
+    tier: str  # rule / model / llm
+
+
+class NaiveBayesIntentModel:
+    """Multinomial naive Bayes over character n-grams."""
+    
+    def __init__(self, alpha: float = 0.1):
+        self.alpha = alpha
+        self._log_prior: Dict[IntentType, float] = {}
+        self._log_likelihood: Dict[IntentType, Dict[str, float]] = {}
+        self._log_unseen: Dict[IntentType, float] = {}
+    
+    def fit(self, examples: Iterable[Tuple[str, IntentType]]) -> "NaiveBayesIntentModel":
+        counts: Dict[IntentType, Counter] = defaultdict(Counter)
+        docs: Counter = Counter()
+        for query, intent in examples:
+            counts[intent].update(char_ngrams(normalize(query)))
+            docs[intent] += 1
+        
+        vocabulary = set().union(*counts.values()) if counts else set()
+        total_docs = sum(docs.values())
+        for intent, features in counts.items():
+            denominator = sum(features.values()) + self.alpha * (len(vocabulary) + 1)
+            self._log_prior[intent] = math.log(docs[intent] / total_docs)
+            self._log_likelihood[intent] = {
+                feature: math.log((count + self.alpha) / denominator) for feature, count in features.items()
+            }
+            self._log_unseen[intent] = math.log(self.alpha / denominator)
+        return self
+    
+    def predict_proba(self, query: str) -> Dict[IntentType, float]:
+        """
+        Posterior probability of each intent.
+        
+        Args:
+            query: User query
+            
+        Returns:
+            Probabilities by intent (empty if the model is not trained)
+        """
+        features = char_ngrams(normalize(query))
+        temperature = math.sqrt(max(len(features), 1))
+        scores = {}
+        for intent, prior in self._log_prior.items():
+            likelihood = self._log_likelihood[intent]
+            unseen = self._log_unseen[intent]
+            scores[intent] = prior + sum(likelihood.get(feature, unseen) for feature in features)
+        
+        if not scores:
+            return {}
+        top = max(scores.values())
+        exp_scores = {intent: math.exp((score - top) / temperature) for intent, score in scores.items()}
+        total = sum(exp_scores.values())
+        return {intent: value / total for intent, value in exp_scores.items()}
+
+
+class IntentClassifier:
+    """Rule and naive Bayes tiers in front of LLM intent recognition."""
+    
+    def __init__(
+        self,
+        examples: Optional[List[Tuple[str, IntentType]]] = None,
+        threshold: Optional[float] = None
+    ):
+        """
+        Train the model tier.
+        
+        Args:
+            examples: Labelled (query, intent) pairs; defaults to the bundled set
+            threshold: Minimum model posterior for a local decision (defaults to settings)
+        """
+        self.threshold = threshold if threshold is not None else get_settings().intent_classifier_threshold
+        examples = examples if examples is not None else load_examples()
+        self.model = NaiveBayesIntentModel().fit(examples)
+        logger.info(f"Intent classifier trained on {len(examples)} examples (threshold={self.threshold})")
+    
+    @staticmethod
+    def match_rules(query: str, has_history: bool = False) -> Optional[IntentType]:
+        """
+        Rule tier.
+        
+        Args:
+            query: User query
+            has_history: Whether the session has earlier turns
+            
+        Returns:
+            Intent if exactly one rule family matches, otherwise None
+        """
+        text = normalize(query)
+        if not text:
+            return None
+        if _SMALL_TALK.fullmatch(text) or _CONVERSATION.search(text):
+            return IntentType.SIMPLE_INTERACTION
+        if has_history and _REFERENCE.search(text):
+            return None
+        
+        matched = [intent for intent, pattern in _TASK_RULES.items() if pattern.search(text)]
+        return matched[0] if len(matched) == 1 else None
+    
+    def classify(self, query: str, has_history: bool = False) -> IntentPrediction:
+        """
+        Decide the intent locally when confident.
+        
+        Args:
+            query: User query
+            has_history: Whether the session has earlier turns (follow-ups that
+                refer back to the conversation are left to the LLM)
+                
+        Returns:
+            Prediction; ``intent`` is None when the LLM should decide
+        """
+        intent = self.match_rules(query, has_history)
+        if intent is not None:
+            return IntentPrediction(intent, 1.0, "rule")
+        
+        if has_history and _REFERENCE.search(normalize(query)):
+            return IntentPrediction(None, 0.0, "llm")
+        
+        probabilities = self.model.predict_proba(query)
+        if not probabilities:
+            return IntentPrediction(None, 0.0, "llm")
+        intent, confidence = max(probabilities.items(), key=lambda item: item[1])
+        if confidence >= self.threshold:
+            return IntentPrediction(intent, confidence, "model")
+        return IntentPrediction(None, confidence, "llm")
+
+
+_classifier: Optional[IntentClassifier] = None
+_classifier_lock = threading.Lock()
+
+
+def get_intent_classifier() -> IntentClassifier:
+    """
+    Get the process-wide intent classifier (trained on first call).
+    
+    Returns:
+        IntentClassifier instance
+    """
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                _classifier = IntentClassifier()
+    return _classifier
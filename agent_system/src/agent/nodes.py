@@ -1,36 +1,57 @@
 """Node implementations for the agent graph."""
-from typing import Dict, Any
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple, Union
 
 from langchain_core.messages import HumanMessage, AIMessage
 from langchain_openai import ChatOpenAI
 
 from .state import AgentState, IntentType, StepType, ExecutionResult, QAPair
+from .intent_classifier import get_intent_classifier
 from ..prompts import (
     INTENT_RECOGNITION_PROMPT,
     get_planning_prompt,
     TOOL_EXECUTION_PROMPT,
+    DIRECT_CONTENT_NOTICE,
     INFORMATION_ANALYSIS_PROMPT,
     SIMPLE_INTERACTION_PROMPT,
+    ANSWER_QUERY_WITH_HISTORY,
     get_answer_prompt,
     SUB_QUESTION_ANSWER_PROMPT,
-    get_sub_question_context
+    SUB_QUESTION_REFINE_PROMPT,
+    get_sub_question_context,
+    get_all_qa_context,
+    get_prompt_budgeter
 )
 from ..utils.logger import get_logger
 from ..utils.json_parser import parse_json_response
+from ..utils.chunk_context import assemble_chunk_context, merge_chunks
 from ..tools import RecallTool, WebSearchTool
+from ..tools.recall_tool import SearchOutcome
 from config import get_settings
 
 # 上下文管理模块 - 强制依赖
 from context.session_manager import SessionManager
 from context.session_storage import SessionStorage
 from context.context_injector import ContextInjector
+from context.token_counter import calculate_tokens
 
 logger = get_logger(__name__)
 settings = get_settings()
 
+# Prefetched recall step: (tool decision, execution result, recalled chunks), or the error raised while deciding
+PrefetchedStep = Union[Tuple[Dict[str, Any], ExecutionResult, List[Dict[str, Any]]], Exception]
+
 
 class AgentNodes:
-    """Container for all agent node functions."""
+    """
+    Container for all agent node functions.
+    
+    Every node has a synchronous variant (used by ``graph.invoke``) and an
+    ``a``-prefixed async variant (used by ``graph.ainvoke``). Both variants share
+    the prompt building and response parsing helpers below; only the LLM, tool
+    and storage calls differ.
+    """
     
     def __init__(
         self,
@@ -55,13 +76,16 @@ class AgentNodes:
         self.session_manager = SessionManager(storage)
         self.context_injector = ContextInjector()
         
+        # 意图识别快速通道（规则 + 本地分类器）
+        self.intent_classifier = get_intent_classifier() if settings.intent_fast_path else None
+        
         logger.info("AgentNodes initialized with session management")
     
     def _execute_recall(
         self,
         query: str,
         state: AgentState
-    ) -> str:
+    ) -> Tuple[str, List[Dict[str, Any]]]:
         """
         Execute recall with dynamic parameters from state.
         
@@ -70,19 +94,40 @@ class AgentNodes:
             state: Agent state containing optional recall parameters
             
         Returns:
-            Recall results
+            Tuple of (formatted recall results, structured chunk records)
         """
         # Get dynamic parameters from state if provided
         index_names = state.get('recall_index_names')
         doc_ids = state.get('recall_doc_ids')
         
-        # Call recall tool's _run method directly with optional parameters
-        return self.recall_tool._run(
+        # Call recall tool directly with optional parameters
+        return self.recall_tool.search(
             query=query,
             index_names=index_names,
             doc_ids=doc_ids
         )
     
+    async def _aexecute_recall(
+        self,
+        query: str,
+        state: AgentState
+    ) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Async version of _execute_recall.
+        
+        Args:
+            query: Search query
+            state: Agent state containing optional recall parameters
+            
+        Returns:
+            Tuple of (formatted recall results, structured chunk records)
+        """
+        return await self.recall_tool.asearch(
+            query=query,
+            index_names=state.get('recall_index_names'),
+            doc_ids=state.get('recall_doc_ids')
+        )
+    
     def _get_conversation_context(
         self,
         state: AgentState,
@@ -105,13 +150,19 @@ class AgentNodes:
             logger.warning("No session_id provided, cannot retrieve context")
             return ""
         
+        # 会话快照：process_query 已为本次请求加载最近上下文，各阶段在其上切片，不再重复读取存储
+        # （simple_interaction 需要完整历史，单独读取）
+        snapshot = None
+        if 'session_history' in state:
+            snapshot = state['session_history'] or []
+        
         # 根据阶段选择合适的注入方法
         if stage == "intent_recognition":
-            messages = self.context_injector.inject_for_intent_recognition(session_id)
+            messages = self.context_injector.inject_for_intent_recognition(session_id, snapshot)
         elif stage == "planning":
-            messages = self.context_injector.inject_for_planning(session_id)
+            messages = self.context_injector.inject_for_planning(session_id, snapshot)
         elif stage == "answer_generation":
-            messages = self.context_injector.inject_for_answer_generation(session_id)
+            messages = self.context_injector.inject_for_answer_generation(session_id, snapshot)
         elif stage == "simple_interaction":
             messages = self.context_injector.inject_for_simple_interaction(session_id)
         else:
@@ -124,6 +175,89 @@ class AgentNodes:
         # 使用ContextInjector的格式化方法
         return self.context_injector.format_messages_for_prompt(messages)
     
+    async def _aget_conversation_context(
+        self,
+        state: AgentState,
+        num_turns: int = 2,
+        stage: str = "intent_recognition"
+    ) -> str:
+        """
+        获取对话上下文（异步版本，存储访问在线程池中执行，不阻塞事件循环）
+        
+        Args:
+            state: Agent state
+            num_turns: 需要的对话轮次数（未使用，保留用于兼容）
+            stage: 处理阶段
+            
+        Returns:
+            格式化的对话历史字符串
+        """
+        return await asyncio.to_thread(self._get_conversation_context, state, num_turns, stage)
+    
+    async def _astream_text(self, prompt: str) -> str:
+        """
+        Generate a user-facing reply with ``llm.astream``.
+        
+        Tokens are emitted through the callback system as they arrive, so a
+        caller consuming ``graph.astream(..., stream_mode="messages")`` sees the
+        answer token by token; the concatenated text is returned for the state.
+        
+        Args:
+            prompt: Prompt to send to the LLM
+            
+        Returns:
+            Full generated text
+        """
+        parts = []
+        async for chunk in self.llm.astream([HumanMessage(content=prompt)]):
+            if chunk.content:
+                parts.append(chunk.content)
+        return "".join(parts)
+    
+    def _collected_information_budget(self, state: AgentState) -> int:
+        """
+        Token budget for the collected information of this request.
+        
+        The configured cap, lowered to what the context window has left after
+        the prompt templates, query, injected history and reserved answer.
+        """
+        if state.get("query_tokens") is None:
+            return settings.collected_information_token_budget
+        
+        budget = get_prompt_budgeter().budget(
+            query_tokens=state["query_tokens"],
+            history_tokens=state.get("history_tokens") or 0,
+            intent=state.get("detected_intent"),
+            deep_thinking=state.get("deep_thinking", False)
+        )
+        return min(settings.collected_information_token_budget, budget.available_tokens)
+    
+    def _collected_context(self, state: AgentState) -> str:
+        """
+        Assemble the collected information for a prompt under the token budget.
+        
+        Text results (direct content, web search, steps without tools) are kept
+        as accumulated; deduplicated recall chunks fill the remaining budget in
+        order of similarity and step coverage.
+        
+        Args:
+            state: Current agent state
+            
+        Returns:
+            Collected information text
+        """
+        text_info = state.get("collected_information", "")
+        chunks = state.get("retrieved_chunks") or []
+        if not chunks:
+            return text_info
+        
+        budget = self._collected_information_budget(state) - calculate_tokens(text_info)
+        chunk_context = assemble_chunk_context(chunks, budget)
+        if not chunk_context:
+            return text_info
+        
+        return f"{text_info}\n\n【召回的文档片段】\n{chunk_context}" if text_info else f"【召回的文档片段】\n{chunk_context}"
+    
     def _format_execution_history(self, execution_results: list) -> str:
         """
         Format execution history for replanning context.
@@ -172,7 +306,7 @@ class AgentNodes:
         plan = state.get('plan', {})
         analysis = state.get('analysis_result', {})
         execution_results = state.get('execution_results', [])
-        collected_info = state.get('collected_information', '')
+        collected_info = self._collected_context(state)
         
         context_parts = [
             "=" * 80,
@@ -235,6 +369,136 @@ class AgentNodes:
         
         return "\n".join(context_parts)
     
+    # ========================================================================
+    # Intent recognition
+    # ========================================================================
+    
+    def _intent_from_mode_type(self, state: AgentState) -> Optional[Dict[str, Any]]:
+        """
+        Use the caller-provided mode_type as intent if it is valid.
+        
+        Args:
+            state: Current agent state
+            
+        Returns:
+            State update with detected intent, or None to fall back to the LLM
+        """
+        if not state.get("mode_type"):
+            return None
+        
+        mode_type = state["mode_type"]
+        logger.info(f"Using provided mode_type: {mode_type}")
+        
+        # Validate it's a valid IntentType
+        try:
+            detected_intent = IntentType(mode_type)
+            logger.info(f"Validated intent: {detected_intent}")
+            return {
+                "detected_intent": detected_intent,
+                "messages": state.get("messages", []) + [
+                    HumanMessage(content=state["user_query"])
+                ]
+            }
+        except ValueError:
+            logger.warning(f"Invalid mode_type: {mode_type}, falling back to LLM")
+            return None
+    
+    def _intent_from_classifier(self, state: AgentState) -> Optional[Dict[str, Any]]:
+        """
+        Decide the intent locally (rules / classifier) when it is confident.
+        
+        Args:
+            state: Current agent state
+            
+        Returns:
+            State update with detected intent, or None to fall back to the LLM
+        """
+        if self.intent_classifier is None:
+            return None
+        
+        prediction = self.intent_classifier.classify(
+            state["user_query"],
+            has_history=bool(state.get("session_history"))
+        )
+        if prediction.intent is None:
+            logger.info(f"Local intent classifier not confident ({prediction.confidence:.2f}), using LLM")
+            return None
+        
+        logger.info(
+            f"🎯 本地意图判定: {prediction.intent.value} "
+            f"(tier={prediction.tier}, confidence={prediction.confidence:.2f})"
+        )
+        return {
+            "detected_intent": prediction.intent,
+            "messages": state.get("messages", []) + [
+                HumanMessage(content=state["user_query"])
+            ]
+        }
+    
+    def _build_intent_prompt(self, state: AgentState, context_str: str) -> str:
+        """
+        Build the intent recognition prompt.
+        
+        Args:
+            state: Current agent state
+            context_str: Formatted conversation history (may be empty)
+            
+        Returns:
+            Rendered prompt
+        """
+        # Build context-aware prompt for intent recognition
+        query_with_context = state["user_query"]
+        
+        if context_str:
+            query_with_context = f"对话历史：\n{context_str}\n\n当前问题：{state['user_query']}"
+            logger.info("Using conversation history for intent recognition (2 turns)")
+        
+        return INTENT_RECOGNITION_PROMPT.format(user_query=query_with_context)
+    
+    def _parse_intent_response(self, state: AgentState, content: str) -> Dict[str, Any]:
+        """
+        Parse the intent recognition LLM response into a state update.
+        
+        Args:
+            state: Current agent state
+            content: Raw LLM response content
+            
+        Returns:
+            State update with detected intent
+        """
+        # Parse JSON response
+        intent_data = parse_json_response(content, expected_fields=["intent"])
+        
+        if intent_data:
+            intent_str = intent_data.get("intent")
+            confidence = intent_data.get("confidence", "unknown")
+            reasoning = intent_data.get("reasoning", "")
+            
+            # 显示大模型判断的任务类型
+            logger.info("="*60)
+            logger.info("🎯 大模型判断结果:")
+            logger.info(f"   任务类型: {intent_str}")
+            logger.info(f"   置信度: {confidence}")
+            logger.info(f"   判断依据: {reasoning}")
+            logger.info("="*60)
+        else:
+            # Fallback: try to extract intent from plain text
+            intent_str = content.strip()
+            logger.warning(f"Failed to parse JSON, trying plain text: {intent_str}")
+        
+        try:
+            detected_intent = IntentType(intent_str)
+        except ValueError:
+            logger.warning(f"Invalid intent from LLM: {intent_str}, defaulting to knowledge_reasoning")
+            detected_intent = IntentType.KNOWLEDGE_REASONING
+        
+        return {
+            "detected_intent": detected_intent,
+            "messages": state.get("messages", []) + [
+                HumanMessage(content=state["user_query"])
+            ]
+        }
+    
     def intent_recognition_node(self, state: AgentState) -> Dict[str, Any]:
         """
         Recognize user intent from query.
@@ -250,75 +514,105 @@ class AgentNodes:
         logger.info(f"Previous messages: {len(state.get('messages', []))}")
         
         try:
-            # Check if mode_type is provided
-            if state.get("mode_type"):
-                mode_type = state["mode_type"]
-                logger.info(f"Using provided mode_type: {mode_type}")
-                
-                # Validate it's a valid IntentType
-                try:
-                    detected_intent = IntentType(mode_type)
-                    logger.info(f"Validated intent: {detected_intent}")
-                    return {
-                        "detected_intent": detected_intent,
-                        "messages": state.get("messages", []) + [
-                            HumanMessage(content=state["user_query"])
-                        ]
-                    }
-                except ValueError:
-                    logger.warning(f"Invalid mode_type: {mode_type}, falling back to LLM")
-            
-            # Build context-aware prompt for intent recognition
-            query_with_context = state["user_query"]
+            # Check if mode_type is provided, then the local fast path
+            update = self._intent_from_mode_type(state) or self._intent_from_classifier(state)
+            if update:
+                return update
             
             # 获取对话历史上下文（2轮）
             context_str = self._get_conversation_context(state, num_turns=2, stage="intent_recognition")
-            
-            if context_str:
-                query_with_context = f"对话历史：\n{context_str}\n\n当前问题：{state['user_query']}"
-                logger.info("Using conversation history for intent recognition (2 turns)")
+            prompt = self._build_intent_prompt(state, context_str)
             
             # Use LLM to detect intent
-            prompt = INTENT_RECOGNITION_PROMPT.format(user_query=query_with_context)
             response = self.llm.invoke([HumanMessage(content=prompt)])
+            return self._parse_intent_response(state, response.content)
+        
+        except Exception as e:
+            logger.error(f"Error in intent recognition: {str(e)}", exc_info=True)
+            raise RuntimeError(f"Intent recognition failed: {str(e)}")
+    
+    async def aintent_recognition_node(self, state: AgentState) -> Dict[str, Any]:
+        """
+        Async version of intent_recognition_node.
+        
+        Args:
+            state: Current agent state
             
-            # Parse JSON response
-            intent_data = parse_json_response(response.content, expected_fields=["intent"])
-            
-            if intent_data:
-                intent_str = intent_data.get("intent")
-                confidence = intent_data.get("confidence", "unknown")
-                reasoning = intent_data.get("reasoning", "")
-                
-                # 显示大模型判断的任务类型
-                logger.info("="*60)
-                logger.info("🎯 大模型判断结果:")
-                logger.info(f"   任务类型: {intent_str}")
-                logger.info(f"   置信度: {confidence}")
-                logger.info(f"   判断依据: {reasoning}")
-                logger.info("="*60)
-            else:
-                # Fallback: try to extract intent from plain text
-                intent_str = response.content.strip()
-                logger.warning(f"Failed to parse JSON, trying plain text: {intent_str}")
-            
-            try:
-                detected_intent = IntentType(intent_str)
-            except ValueError:
-                logger.warning(f"Invalid intent from LLM: {intent_str}, defaulting to knowledge_reasoning")
-                detected_intent = IntentType.KNOWLEDGE_REASONING
+        Returns:
+            Updated state with detected intent
+        """
+        logger.info("============ Intent Recognition Node ============")
+        logger.info(f"User query: {state['user_query'][:100]}...")
+        logger.info(f"Previous messages: {len(state.get('messages', []))}")
+        
+        try:
+            update = self._intent_from_mode_type(state) or self._intent_from_classifier(state)
+            if update:
+                return update
             
-            return {
-                "detected_intent": detected_intent,
-                "messages": state.get("messages", []) + [
-                    HumanMessage(content=state["user_query"])
-                ]
-            }
+            context_str = await self._aget_conversation_context(state, num_turns=2, stage="intent_recognition")
+            prompt = self._build_intent_prompt(state, context_str)
             
+            response = await self.llm.ainvoke([HumanMessage(content=prompt)])
+            return self._parse_intent_response(state, response.content)
+        
         except Exception as e:
             logger.error(f"Error in intent recognition: {str(e)}", exc_info=True)
             raise RuntimeError(f"Intent recognition failed: {str(e)}")
     
+    # ========================================================================
+    # Simple interaction
+    # ========================================================================
+    
+    def _build_simple_interaction_prompt(self, state: AgentState, context_str: str) -> str:
+        """
+        Build the simple interaction prompt.
+        
+        Args:
+            state: Current agent state
+            context_str: Formatted conversation history (may be empty)
+            
+        Returns:
+            Rendered prompt
+        """
+        # 🔑 关键修复：注入对话历史，让Agent能记住之前的对话
+        query_with_context = state["user_query"]
+        
+        if context_str:
+            query_with_context = f"【对话历史】\n{context_str}\n\n【当前问题】\n{state['user_query']}"
+            logger.info("✅ Simple interaction using ALL active conversation history (with token limit protection)")
+        else:
+            logger.info("⚠️  No conversation history available")
+        
+        return SIMPLE_INTERACTION_PROMPT.format(user_query=query_with_context)
+    
+    def _save_turn(self, state: AgentState, final_answer: str) -> None:
+        """
+        会话管理：保存本轮的用户消息和助手回复，并检查是否需要压缩
+        
+        Args:
+            state: Current agent state
+            final_answer: Generated assistant answer
+        """
+        session_id = state.get('session_id')
+        if not session_id:
+            return
+        
+        # 🔑 关键：用户消息在workflow结束时与助手回复一起保存（同一事务），而不是开始时
+        # 这样确保context injection时不会包含当前的user消息，避免重复
+        user_content = None if state.get('_user_message_saved') else state["user_query"]
+        session = self.session_manager.commit_turn(
+            session_id=session_id,
+            user_content=user_content,
+            assistant_content=final_answer
+        )
+        logger.info(f"✅ Turn saved to session {session_id}")
+        
+        # 检查是否需要压缩：在后台执行，下一轮请求读取新的摘要
+        if self.session_manager.should_compress(session_id, session=session):
+            logger.info(f"Scheduling compression for session {session_id}")
+            self.session_manager.schedule_compression(session_id)
+    
     def simple_interaction_node(self, state: AgentState) -> Dict[str, Any]:
         """
         Handle simple interactions directly.
@@ -332,50 +626,17 @@ class AgentNodes:
         logger.info("============ Simple Interaction Node ============")
         
         try:
-            # 🔑 关键修复：注入对话历史，让Agent能记住之前的对话
-            query_with_context = state["user_query"]
-            
-            # 获取对话历史上下文（最近2轮对话）
+            # 获取对话历史上下文（所有活跃消息）
             context_str = self._get_conversation_context(state, num_turns=0, stage="simple_interaction")
+            prompt = self._build_simple_interaction_prompt(state, context_str)
             
-            if context_str:
-                query_with_context = f"【对话历史】\n{context_str}\n\n【当前问题】\n{state['user_query']}"
-                logger.info("✅ Simple interaction using ALL active conversation history (with token limit protection)")
-            else:
-                logger.info("⚠️  No conversation history available")
-            
-            prompt = SIMPLE_INTERACTION_PROMPT.format(user_query=query_with_context)
             response = self.llm.invoke([HumanMessage(content=prompt)])
             
             final_answer = response.content
             logger.info(f"Generated simple response: {final_answer[:100]}...")
             
             # 会话管理：保存消息（simple_interaction跳过了planning/execution）
-            session_id = state.get('session_id')
-            if session_id:
-                # 🔑 关键：保存用户消息（在workflow结束时保存，而不是开始时）
-                if not state.get('_user_message_saved'):
-                    self.session_manager.add_user_message(
-                        session_id=session_id,
-                        content=state["user_query"]
-                    )
-                    logger.info(f"User message saved to session {session_id}")
-                
-                # 保存助手回复
-                self.session_manager.add_assistant_message(
-                    session_id=session_id,
-                    content=final_answer
-                )
-                logger.info(f"✅ Assistant message saved to session {session_id}")
-                
-                # 检查是否需要压缩
-                if self.session_manager.should_compress(session_id):
-                    logger.info(f"Triggering compression for session {session_id}")
-                    compression_record = self.session_manager.trigger_compression(session_id)
-                    logger.info(
-                        f"Compression completed: saved {compression_record.saved_tokens} tokens, "
-                        f"round {compression_record.round}"
-                    )
+            self._save_turn(state, final_answer)
             
             return {
                 "final_answer": final_answer,
@@ -383,346 +644,1206 @@ class AgentNodes:
                     AIMessage(content=final_answer)
                 ]
             }
-            
+        
         except Exception as e:
             logger.error(f"Error in simple interaction: {str(e)}", exc_info=True)
             raise RuntimeError(f"Simple interaction failed: {str(e)}")
     
-    def plan_generation_node(self, state: AgentState) -> Dict[str, Any]:
+    async def asimple_interaction_node(self, state: AgentState) -> Dict[str, Any]:
         """
-        Generate execution plan based on intent.
+        Async version of simple_interaction_node.
         
         Args:
             state: Current agent state
             
         Returns:
-            Updated state with execution plan
+            Updated state with final answer
         """
-        replan_count = state.get("replan_count", 0)
-        
-        logger.info("================ Plan Generation Node ================")
-        logger.info(f"Intent: {state['detected_intent']}")
-        logger.info(f"Replan count: {replan_count}")
-        
-        deep_thinking = state.get("deep_thinking", False)
-        logger.info(f"Planning mode: {'Deep Thinking' if deep_thinking else 'Fast'}")
+        logger.info("============ Simple Interaction Node ============")
         
         try:
-            # Build context-aware query
-            query_with_context = state["user_query"]
-            
-            # 获取对话历史上下文（2轮）
-            context_str = self._get_conversation_context(state, num_turns=2, stage="planning")
-            
-            if context_str:
-                query_with_context = f"对话历史（用于理解代词和上下文）：\n{context_str}\n\n当前问题：{state['user_query']}"
-                logger.info("Using conversation history for planning (2 turns)")
-            
-            # 🔑 关键优化：如果是重新规划，添加执行历史和分析结果
-            if replan_count > 0:
-                replanning_context = self._build_replanning_context(state, replan_count)
-                query_with_context = f"{replanning_context}\n\n{query_with_context}"
-                logger.info(f"Added replanning context (attempt {replan_count})")
-                logger.info("=" * 60)
-                logger.info("🔄 Replanning Context Preview:")
-                logger.info(replanning_context[:500] + "...")
-                logger.info("=" * 60)
-            
-            # Get the appropriate planning prompt based on intent and mode
-            prompt_template = get_planning_prompt(
-                intent_type=state["detected_intent"],
-                deep_thinking=deep_thinking
-            )
-            
-            # Format prompt with user query
-            prompt = prompt_template.format(user_query=query_with_context)
-            
-            # Generate plan
-            response = self.llm.invoke([HumanMessage(content=prompt)])
+            context_str = await self._aget_conversation_context(state, num_turns=0, stage="simple_interaction")
+            prompt = self._build_simple_interaction_prompt(state, context_str)
             
-            # Parse JSON response
-            plan = parse_json_response(
-                response.content,
-                expected_fields=["locale", "thought", "title", "steps"]
-            )
+            final_answer = await self._astream_text(prompt)
+            logger.info(f"Generated simple response: {final_answer[:100]}...")
             
-            if not plan:
-                raise ValueError("Failed to parse plan JSON from LLM response")
+            await asyncio.to_thread(self._save_turn, state, final_answer)
             
-            # logger.info(f"Generated plan: {plan}")
-            # logger.info(f"Generated plan: {plan['title']}")
-            # logger.info(f"Number of steps: {len(plan['steps'])}")
+            return {
+                "final_answer": final_answer,
+                "messages": state.get("messages", []) + [
+                    AIMessage(content=final_answer)
+                ]
+            }
+        
+        except Exception as e:
+            logger.error(f"Error in simple interaction: {str(e)}", exc_info=True)
+            raise RuntimeError(f"Simple interaction failed: {str(e)}")
+    
+    # ========================================================================
+    # Plan generation
+    # ========================================================================
+    
+    def _build_planning_prompt(self, state: AgentState, context_str: str) -> str:
+        """
+        Build the planning prompt, including replanning context when needed.
+        
+        Args:
+            state: Current agent state
+            context_str: Formatted conversation history (may be empty)
             
-            # Print complete plan details
-            logger.info("=" * 60)
-            logger.info("📋 完整任务规划")
+        Returns:
+            Rendered prompt
+        """
+        replan_count = state.get("replan_count", 0)
+        
+        # Build context-aware query
+        query_with_context = state["user_query"]
+        
+        if context_str:
+            query_with_context = f"对话历史（用于理解代词和上下文）：\n{context_str}\n\n当前问题：{state['user_query']}"
+            logger.info("Using conversation history for planning (2 turns)")
+        
+        # 🔑 关键优化：如果是重新规划，添加执行历史和分析结果
+        if replan_count > 0:
+            replanning_context = self._build_replanning_context(state, replan_count)
+            query_with_context = f"{replanning_context}\n\n{query_with_context}"
+            logger.info(f"Added replanning context (attempt {replan_count})")
             logger.info("=" * 60)
-            logger.info(f"标题: {plan['title']}")
-            logger.info(f"\n思考过程:\n{plan['thought']}")
-            logger.info(f"\n执行步骤 (共{len(plan['steps'])}步):")
-            for i, step in enumerate(plan['steps'], 1):
-                logger.info(f"步骤 {i}. [{step['step_type']}] {step['title']}")
+            logger.info("🔄 Replanning Context Preview:")
+            logger.info(replanning_context[:500] + "...")
             logger.info("=" * 60)
-            
-            # 🔑 关键修复：重新规划时保留之前收集的信息
-            # 只重置当前规划的执行状态，不清空已收集的信息
-            if replan_count > 0:
-                # 重新规划：保留已收集的信息和执行历史
-                logger.info("🔄 保存之前的执行结果和收集的信息")
-                return {
-                    "plan": plan,
-                    "current_step_index": 0,
-                    # 保留之前的执行结果（用于历史记录）
-                    "execution_results": state.get("execution_results", []),
-                    # 保留之前收集的信息（累积）
-                    "collected_information": state.get("collected_information", "")
-                }
-            else:
-                # 首次规划：初始化为空
-                return {
-                    "plan": plan,
-                    "current_step_index": 0,
-                    "execution_results": [],
-                    "collected_information": ""
-                }
-            
-        except Exception as e:
-            logger.error(f"Error in plan generation: {str(e)}", exc_info=True)
-            raise RuntimeError(f"Plan generation failed: {str(e)}")
+        
+        # Get the appropriate planning prompt based on intent and mode
+        prompt_template = get_planning_prompt(
+            intent_type=state["detected_intent"],
+            deep_thinking=state.get("deep_thinking", False)
+        )
+        
+        # Format prompt with user query
+        return prompt_template.format(user_query=query_with_context)
     
-    def execution_node(self, state: AgentState) -> Dict[str, Any]:
+    def _parse_plan_response(self, state: AgentState, content: str) -> Dict[str, Any]:
         """
-        Execute current step in the plan.
+        Parse the planning LLM response into a state update.
         
         Args:
             state: Current agent state
+            content: Raw LLM response content
             
         Returns:
-            Updated state with execution results
+            State update with the new plan
         """
-        plan = state["plan"]
-        current_step_index = state["current_step_index"]
-        current_step = plan["steps"][current_step_index]
+        replan_count = state.get("replan_count", 0)
         
-        logger.info(f"============ Execution Node - Step {current_step_index + 1}/{len(plan['steps'])} ============")
-        logger.info(f"Step title: {current_step['title']}")
-        logger.info(f"Step type: {current_step['step_type']}")
+        # Parse JSON response
+        plan = parse_json_response(
+            content,
+            expected_fields=["locale", "thought", "title", "steps"]
+        )
         
-        try:
-            # Build context-aware user query
-            # 注意：execution阶段配置为不注入历史（execution_turns=0）
-            # 因为工具执行主要基于当前步骤的明确指令，不需要完整对话历史
-            user_query_with_context = state["user_query"]
-            
-            # Prepare tool execution prompt
-            use_direct_content = state.get("use_direct_content", False)
-            
-            # 🔑 优化：在直接内容模式下，明确告知 LLM
-            collected_info = state.get("collected_information", "暂无")
-            if use_direct_content and collected_info != "暂无":
-                collected_info = f"📄 **已提供完整文档内容**（直接内容模式，无需再次 recall）\n\n{collected_info}"
-            
-            prompt = TOOL_EXECUTION_PROMPT.format(
-                user_query=user_query_with_context,
-                step_title=current_step["title"],
-                step_type=current_step["step_type"],
-                step_index=current_step_index + 1,
-                total_steps=len(plan["steps"]),
-                collected_information=collected_info,
-                web_search_available="可用" if state.get("enable_web_search") and self.web_search_tool else "不可用"
-            )
-            
-            # Get tool decision
-            response = self.llm.invoke([HumanMessage(content=prompt)])
-            decision = parse_json_response(
-                response.content,
-                expected_fields=["need_tool"]  # Only require need_tool field
-            )
-            
-            if not decision:
-                logger.error(f"Failed to parse tool decision. Response: {response.content[:500]}")
-                # Fallback: default behavior based on step type
-                if current_step["step_type"] == "recall":
-                    # For recall steps, default to calling recall tool
-                    decision = {
-                        "need_tool": True,
-                        "tool_name": "recall",
-                        "query": f"{state['user_query']} - {current_step['title']}",
-                        "reasoning": "Fallback: Auto-generated query for recall step"
-                    }
-                    logger.warning("Using fallback decision for recall step")
-                else:
-                    # For other steps, skip tool if we can't parse decision
-                    decision = {
-                        "need_tool": False,
-                        "tool_name": None,
-                        "query": None,
-                        "reasoning": "Fallback: Skipping tool due to parse error"
-                    }
-                    logger.warning("Using fallback decision: skipping tool")
-            
-            logger.info(f"Tool decision: {decision['reasoning']}")
-            
-            # 🔑 Check if direct content mode is enabled for recall steps
-            use_direct_content = state.get("use_direct_content", False)
-            direct_content = state.get("direct_content")
-            
-            if use_direct_content and current_step["step_type"] == "recall":
-                logger.info("=" * 60)
-                logger.info("📄 直接内容模式：跳过 recall 工具，使用提供的文档内容")
-                logger.info(f"   内容长度: {len(direct_content):,} 字符")
-                logger.info(f"   Token 数: {state.get('content_token_count', 'N/A')}")
-                logger.info("=" * 60)
-                
-                # Create execution result with direct content
-                execution_result: ExecutionResult = {
-                    "step_index": current_step_index,
-                    "step_title": current_step["title"],
-                    "step_type": StepType.RECALL,
-                    "tool_used": "direct_content",
-                    "query": "使用用户提供的完整文档内容",
-                    "result": direct_content,
-                    "error": None
-                }
-                
-                # Skip normal tool execution, go directly to result handling
-                # (continue with the existing code below)
-            else:
-                # Prepare execution result for normal tool execution
-                execution_result: ExecutionResult = {
-                    "step_index": current_step_index,
-                    "step_title": current_step["title"],
-                    "step_type": StepType(current_step["step_type"]),
-                    "tool_used": decision.get("tool_name"),
-                    "query": decision.get("query"),
-                    "result": "",
-                    "error": None
-                }
+        if not plan:
+            raise ValueError("Failed to parse plan JSON from LLM response")
+        
+        # Print complete plan details
+        logger.info("=" * 60)
+        logger.info("📋 完整任务规划")
+        logger.info("=" * 60)
+        logger.info(f"标题: {plan['title']}")
+        logger.info(f"\n思考过程:\n{plan['thought']}")
+        logger.info(f"\n执行步骤 (共{len(plan['steps'])}步):")
+        for i, step in enumerate(plan['steps'], 1):
+            logger.info(f"步骤 {i}. [{step['step_type']}] {step['title']}")
+        logger.info("=" * 60)
+        
+        # 🔑 关键修复：重新规划时保留之前收集的信息
+        # 只重置当前规划的执行状态，不清空已收集的信息
+        if replan_count > 0:
+            # 重新规划：保留已收集的信息和执行历史
+            logger.info("🔄 保存之前的执行结果和收集的信息")
+            return {
+                "plan": plan,
+                "current_step_index": 0,
+                # 保留之前的执行结果（用于历史记录）
+                "execution_results": state.get("execution_results", []),
+                # 保留之前收集的信息（累积）
+                "collected_information": state.get("collected_information", "")
+            }
+        else:
+            # 首次规划：初始化为空
+            return {
+                "plan": plan,
+                "current_step_index": 0,
+                "execution_results": [],
+                "collected_information": "",
+                "retrieved_chunks": []
+            }
+    
+    def _log_planning_start(self, state: AgentState) -> None:
+        """Log the plan generation banner."""
+        logger.info("================ Plan Generation Node ================")
+        logger.info(f"Intent: {state['detected_intent']}")
+        logger.info(f"Replan count: {state.get('replan_count', 0)}")
+        logger.info(f"Planning mode: {'Deep Thinking' if state.get('deep_thinking', False) else 'Fast'}")
+    
+    def plan_generation_node(self, state: AgentState) -> Dict[str, Any]:
+        """
+        Generate execution plan based on intent.
+        
+        Args:
+            state: Current agent state
+            
+        Returns:
+            Updated state with execution plan
+        """
+        self._log_planning_start(state)
+        
+        try:
+            # 获取对话历史上下文（2轮）
+            context_str = self._get_conversation_context(state, num_turns=2, stage="planning")
+            prompt = self._build_planning_prompt(state, context_str)
+            
+            # Generate plan
+            response = self.llm.invoke([HumanMessage(content=prompt)])
+            return self._parse_plan_response(state, response.content)
+        
+        except Exception as e:
+            logger.error(f"Error in plan generation: {str(e)}", exc_info=True)
+            raise RuntimeError(f"Plan generation failed: {str(e)}")
+    
+    async def aplan_generation_node(self, state: AgentState) -> Dict[str, Any]:
+        """
+        Async version of plan_generation_node.
+        
+        Args:
+            state: Current agent state
+            
+        Returns:
+            Updated state with execution plan
+        """
+        self._log_planning_start(state)
+        
+        try:
+            context_str = await self._aget_conversation_context(state, num_turns=2, stage="planning")
+            prompt = self._build_planning_prompt(state, context_str)
+            
+            response = await self.llm.ainvoke([HumanMessage(content=prompt)])
+            return self._parse_plan_response(state, response.content)
+        
+        except Exception as e:
+            logger.error(f"Error in plan generation: {str(e)}", exc_info=True)
+            raise RuntimeError(f"Plan generation failed: {str(e)}")
+    
+    # ========================================================================
+    # Execution
+    # ========================================================================
+    
+    def _build_tool_decision_prompt(self, state: AgentState, step_index: int) -> str:
+        """
+        Build the tool decision prompt for a plan step.
+        
+        Args:
+            state: Current agent state
+            step_index: Index of the step in the current plan
+            
+        Returns:
+            Rendered prompt
+        """
+        plan = state["plan"]
+        step = plan["steps"][step_index]
+        
+        # 注意：execution阶段配置为不注入历史（execution_turns=0）
+        # 因为工具执行主要基于当前步骤的明确指令，不需要完整对话历史
+        use_direct_content = state.get("use_direct_content", False)
+        
+        # 🔑 优化：在直接内容模式下，明确告知 LLM
+        collected_info = self._collected_context(state) or "暂无"
+        if use_direct_content and collected_info != "暂无":
+            collected_info = f"{DIRECT_CONTENT_NOTICE}{collected_info}"
+        
+        return TOOL_EXECUTION_PROMPT.format(
+            user_query=state["user_query"],
+            step_title=step["title"],
+            step_type=step["step_type"],
+            step_index=step_index + 1,
+            total_steps=len(plan["steps"]),
+            collected_information=collected_info,
+            web_search_available="可用" if state.get("enable_web_search") and self.web_search_tool else "不可用"
+        )
+    
+    def _parse_tool_decision(self, state: AgentState, step_index: int, content: str) -> Dict[str, Any]:
+        """
+        Parse the tool decision, falling back to a default based on step type.
+        
+        Args:
+            state: Current agent state
+            step_index: Index of the step in the current plan
+            content: Raw LLM response content
+            
+        Returns:
+            Tool decision dictionary
+        """
+        step = state["plan"]["steps"][step_index]
+        decision = parse_json_response(
+            content,
+            expected_fields=["need_tool"]  # Only require need_tool field
+        )
+        
+        if not decision:
+            logger.error(f"Failed to parse tool decision. Response: {content[:500]}")
+            # Fallback: default behavior based on step type
+            if step["step_type"] == "recall":
+                # For recall steps, default to calling recall tool
+                decision = {
+                    "need_tool": True,
+                    "tool_name": "recall",
+                    "query": f"{state['user_query']} - {step['title']}",
+                    "reasoning": "Fallback: Auto-generated query for recall step"
+                }
+                logger.warning("Using fallback decision for recall step")
+            else:
+                # For other steps, skip tool if we can't parse decision
+                decision = {
+                    "need_tool": False,
+                    "tool_name": None,
+                    "query": None,
+                    "reasoning": "Fallback: Skipping tool due to parse error"
+                }
+                logger.warning("Using fallback decision: skipping tool")
+        
+        logger.info(f"Tool decision: {decision.get('reasoning', '')}")
+        return decision
+    
+    def _uses_direct_content(self, state: AgentState, step_index: int) -> bool:
+        """Whether a step is served from the user-provided document instead of recall."""
+        step = state["plan"]["steps"][step_index]
+        return bool(state.get("use_direct_content", False)) and step["step_type"] == "recall"
+    
+    def _new_execution_result(
+        self,
+        state: AgentState,
+        step_index: int,
+        decision: Dict[str, Any]
+    ) -> ExecutionResult:
+        """
+        Create the execution result for a step before any tool is called.
+        
+        Args:
+            state: Current agent state
+            step_index: Index of the step in the current plan
+            decision: Parsed tool decision
+            
+        Returns:
+            Execution result (already filled in for direct content mode)
+        """
+        step = state["plan"]["steps"][step_index]
+        
+        # 🔑 Check if direct content mode is enabled for recall steps
+        if self._uses_direct_content(state, step_index):
+            direct_content = state.get("direct_content")
+            logger.info("=" * 60)
+            logger.info("📄 直接内容模式：跳过 recall 工具，使用提供的文档内容")
+            logger.info(f"   内容长度: {len(direct_content):,} 字符")
+            logger.info(f"   Token 数: {state.get('content_token_count', 'N/A')}")
+            logger.info("=" * 60)
+            
+            # Create execution result with direct content
+            return {
+                "step_index": step_index,
+                "step_title": step["title"],
+                "step_type": StepType.RECALL,
+                "tool_used": "direct_content",
+                "query": "使用用户提供的完整文档内容",
+                "result": direct_content,
+                "error": None
+            }
+        
+        # Prepare execution result for normal tool execution
+        return {
+            "step_index": step_index,
+            "step_title": step["title"],
+            "step_type": StepType(step["step_type"]),
+            "tool_used": decision.get("tool_name"),
+            "query": decision.get("query"),
+            "result": "",
+            "error": None
+        }
+    
+    def _needs_tool_call(self, state: AgentState, step_index: int, decision: Dict[str, Any]) -> bool:
+        """Whether the decision requires calling a tool (never in direct content mode)."""
+        if self._uses_direct_content(state, step_index):
+            return False
+        return bool(decision.get("need_tool") and decision.get("tool_name"))
+    
+    def _execute_recall_many(self, queries: List[str], state: AgentState) -> List[SearchOutcome]:
+        """
+        Execute several recalls with the state's recall parameters in one batch.
+        
+        Args:
+            queries: Search queries
+            state: Agent state containing optional recall parameters
+            
+        Returns:
+            Per query: (formatted recall results, chunk records), or the error
+        """
+        logger.info(f"Calling tool: recall (batch of {len(queries)} queries)")
+        return self.recall_tool.search_many(
+            queries,
+            index_names=state.get('recall_index_names'),
+            doc_ids=state.get('recall_doc_ids'),
+            max_concurrency=max(1, settings.parallel_recall_concurrency)
+        )
+    
+    async def _aexecute_recall_many(self, queries: List[str], state: AgentState) -> List[SearchOutcome]:
+        """Async version of _execute_recall_many."""
+        logger.info(f"Calling tool: recall (batch of {len(queries)} queries)")
+        return await self.recall_tool.asearch_many(
+            queries,
+            index_names=state.get('recall_index_names'),
+            doc_ids=state.get('recall_doc_ids'),
+            max_concurrency=max(1, settings.parallel_recall_concurrency)
+        )
+    
+    def _run_tool(self, decision: Dict[str, Any], state: AgentState) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Run the tool selected by the decision.
+        
+        Returns:
+            Tuple of (tool result text, recalled chunk records; empty for web search)
+            
+        Raises:
+            RuntimeError: Web search requested but not available
+            ValueError: Unknown tool
+        """
+        tool_name = decision["tool_name"]
+        query = decision["query"]
+        
+        logger.info(f"Calling tool: {tool_name} with query: {query[:200]}...")
+        
+        if tool_name == "recall":
+            return self._execute_recall(query, state)
+        elif tool_name == "web_search":
+            if not self.web_search_tool:
+                raise RuntimeError("Web search tool is not available")
+            return self.web_search_tool.run(query), []
+        else:
+            raise ValueError(f"Unknown tool: {tool_name}")
+    
+    async def _arun_tool(self, decision: Dict[str, Any], state: AgentState) -> Tuple[str, List[Dict[str, Any]]]:
+        """Async version of _run_tool."""
+        tool_name = decision["tool_name"]
+        query = decision["query"]
+        
+        logger.info(f"Calling tool: {tool_name} with query: {query[:200]}...")
+        
+        if tool_name == "recall":
+            return await self._aexecute_recall(query, state)
+        elif tool_name == "web_search":
+            if not self.web_search_tool:
+                raise RuntimeError("Web search tool is not available")
+            return await asyncio.to_thread(self.web_search_tool.run, query), []
+        else:
+            raise ValueError(f"Unknown tool: {tool_name}")
+    
+    def _record_tool_result(
+        self,
+        execution_result: ExecutionResult,
+        tool_result: Optional[str] = None,
+        tool_error: Optional[Exception] = None
+    ) -> None:
+        """Store a tool result (or the tool error) on the execution result."""
+        if tool_error is not None:
+            error_msg = f"Tool execution error: {str(tool_error)}"
+            logger.error(error_msg, exc_info=tool_error)
+            execution_result["error"] = error_msg
+            execution_result["result"] = f"工具调用失败: {str(tool_error)}"
+        else:
+            execution_result["result"] = tool_result
+            logger.info(f"Tool execution successful, result length: {len(tool_result)}")
+    
+    def _record_no_tool(
+        self,
+        state: AgentState,
+        step_index: int,
+        decision: Dict[str, Any],
+        execution_result: ExecutionResult
+    ) -> None:
+        """Fill in the result of a step that did not call any tool."""
+        # 🔑 修复：如果是直接内容模式，result 已经被设置为完整文档，不要覆盖
+        if not self._uses_direct_content(state, step_index):
+            execution_result["result"] = f"无需工具调用: {decision.get('reasoning', '')}"
+        logger.info("No tool execution needed")
+    
+    def _generates_qa_pair(self, state: AgentState, step_index: int) -> bool:
+        """Deep thinking mode generates a QA pair for every recall step."""
+        step = state["plan"]["steps"][step_index]
+        return bool(state.get("deep_thinking", False)) and step["step_type"] == "recall"
+    
+    def _build_sub_question_prompt(
+        self,
+        state: AgentState,
+        step_index: int,
+        execution_result: ExecutionResult
+    ) -> str:
+        """
+        Build the sub-question answer prompt for deep thinking mode.
+        
+        Args:
+            state: Current agent state
+            step_index: Index of the step in the current plan
+            execution_result: Execution result of the step
+            
+        Returns:
+            Rendered prompt
+        """
+        plan = state["plan"]
+        
+        # Get previous QA pairs for context
+        previous_context = get_sub_question_context(state.get("qa_pairs", []))
+        
+        # Prepare sub-question answer prompt
+        recalled_content = execution_result["result"] if execution_result["result"] else "（未召回到相关内容）"
+        
+        return SUB_QUESTION_ANSWER_PROMPT.format(
+            user_query=state["user_query"],
+            step_index=step_index + 1,
+            total_steps=len(plan["steps"]),
+            sub_question=plan["steps"][step_index]["title"],
+            previous_qa_context=previous_context,
+            recalled_content=recalled_content
+        )
+    
+    def _qa_pair_update(
+        self,
+        state: AgentState,
+        step_index: int,
+        decision: Dict[str, Any],
+        execution_result: ExecutionResult,
+        sub_answer: str
+    ) -> Dict[str, Any]:
+        """Build the state update for a deep thinking step with its QA pair."""
+        logger.info(f"Generated sub-answer, length: {len(sub_answer)} characters")
+        
+        # Create QA pair
+        qa_pair: QAPair = {
+            "step_index": step_index,
+            "question": state["plan"]["steps"][step_index]["title"],
+            "answer": sub_answer,
+            "recall_query": decision.get("query")
+        }
+        
+        return {
+            "execution_results": state.get("execution_results", []) + [execution_result],
+            "qa_pairs": state.get("qa_pairs", []) + [qa_pair],
+            "current_step_index": step_index + 1
+        }
+    
+    def _step_update(
+        self,
+        state: AgentState,
+        step_index: int,
+        execution_result: ExecutionResult,
+        accumulate_information: bool,
+        chunks: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Build the state update after a step.
+        
+        Args:
+            state: Current agent state
+            step_index: Index of the step in the current plan
+            execution_result: Execution result of the step
+            accumulate_information: Accumulate the result for later prompts (fast mode)
+            chunks: Structured chunk records recalled by this step
+            
+        Returns:
+            State update
+        """
+        update = {
+            "execution_results": state.get("execution_results", []) + [execution_result],
+            "current_step_index": step_index + 1
+        }
+        
+        # Recalled chunks are deduplicated by chunk_id and assembled under a token
+        # budget at prompt time (see _collected_context), not pasted as text
+        if accumulate_information and chunks and not execution_result.get("error"):
+            update["retrieved_chunks"] = merge_chunks(state.get("retrieved_chunks", []), chunks, step_index)
+        
+        # Fast mode or non-recall steps: accumulate information
+        elif accumulate_information:
+            step = state["plan"]["steps"][step_index]
+            updated_info = state.get("collected_information", "")
+            if execution_result["result"] and not execution_result.get("error"):
+                updated_info += f"\n\n【步骤 {step_index + 1}: {step['title']}】\n{execution_result['result']}"
+            update["collected_information"] = updated_info
+        
+        return update
+    
+    def _execution_error_update(self, state: AgentState, step_index: int, error: Exception) -> Dict[str, Any]:
+        """Record a failed step but keep the workflow going."""
+        logger.error(f"Error in execution node: {str(error)}", exc_info=error)
+        step = state["plan"]["steps"][step_index]
+        error_result: ExecutionResult = {
+            "step_index": step_index,
+            "step_title": step["title"],
+            "step_type": StepType(step["step_type"]),
+            "tool_used": None,
+            "query": None,
+            "result": "",
+            "error": str(error)
+        }
+        return {
+            "execution_results": state.get("execution_results", []) + [error_result],
+            "current_step_index": step_index + 1,
+            "error": str(error)
+        }
+    
+    def _log_execution_start(self, state: AgentState) -> None:
+        """Log the execution banner for the current step."""
+        plan = state["plan"]
+        current_step_index = state["current_step_index"]
+        current_step = plan["steps"][current_step_index]
+        
+        logger.info(f"============ Execution Node - Step {current_step_index + 1}/{len(plan['steps'])} ============")
+        logger.info(f"Step title: {current_step['title']}")
+        logger.info(f"Step type: {current_step['step_type']}")
+    
+    def execution_node(self, state: AgentState) -> Dict[str, Any]:
+        """
+        Execute current step in the plan.
+        
+        Args:
+            state: Current agent state
+            
+        Returns:
+            Updated state with execution results
+        """
+        current_step_index = state["current_step_index"]
+        self._log_execution_start(state)
+        
+        try:
+            # Get tool decision
+            prompt = self._build_tool_decision_prompt(state, current_step_index)
+            response = self.llm.invoke([HumanMessage(content=prompt)])
+            decision = self._parse_tool_decision(state, current_step_index, response.content)
+            
+            execution_result = self._new_execution_result(state, current_step_index, decision)
             
             # Execute tool if needed (only when not using direct content)
-            if not (use_direct_content and current_step["step_type"] == "recall") and decision["need_tool"] and decision.get("tool_name"):
-                tool_name = decision["tool_name"]
-                query = decision["query"]
-                
-                logger.info(f"Calling tool: {tool_name} with query: {query[:200]}...")
-                
+            chunks: List[Dict[str, Any]] = []
+            if self._needs_tool_call(state, current_step_index, decision):
                 try:
-                    if tool_name == "recall":
-                        tool_result = self._execute_recall(query, state)
-                    elif tool_name == "web_search":
-                        if not self.web_search_tool:
-                            raise RuntimeError("Web search tool is not available")
-                        tool_result = self.web_search_tool.run(query)
-                    else:
-                        raise ValueError(f"Unknown tool: {tool_name}")
-                    
-                    execution_result["result"] = tool_result
-                    logger.info(f"Tool execution successful, result length: {len(tool_result)}")
-                    
+                    tool_result, chunks = self._run_tool(decision, state)
+                    self._record_tool_result(execution_result, tool_result=tool_result)
                 except Exception as tool_error:
-                    error_msg = f"Tool execution error: {str(tool_error)}"
-                    logger.error(error_msg, exc_info=True)
-                    execution_result["error"] = error_msg
-                    execution_result["result"] = f"工具调用失败: {str(tool_error)}"
-                    
+                    self._record_tool_result(execution_result, tool_error=tool_error)
             else:
-                # 🔑 修复：如果是直接内容模式，result 已经被设置为完整文档，不要覆盖
-                if not (use_direct_content and current_step["step_type"] == "recall"):
-                    execution_result["result"] = f"无需工具调用: {decision['reasoning']}"
-                logger.info("No tool execution needed")
+                self._record_no_tool(state, current_step_index, decision, execution_result)
             
             # Update state - different logic for deep thinking mode
-            updated_results = state.get("execution_results", []) + [execution_result]
-            
-            # Check if deep thinking mode is enabled
             deep_thinking = state.get("deep_thinking", False)
             
-            if deep_thinking and current_step["step_type"] == "recall":
+            if self._generates_qa_pair(state, current_step_index):
                 # Deep thinking mode: generate QA pair for recall steps
                 logger.info("Deep thinking mode: Generating QA pair for this step")
                 
                 try:
-                    # Get previous QA pairs for context
-                    previous_qa_pairs = state.get("qa_pairs", [])
-                    previous_context = get_sub_question_context(previous_qa_pairs)
-                    
-                    # Prepare sub-question answer prompt
-                    sub_question = current_step["title"]
-                    recalled_content = execution_result["result"] if execution_result["result"] else "（未召回到相关内容）"
-                    
-                    prompt = SUB_QUESTION_ANSWER_PROMPT.format(
-                        user_query=user_query_with_context,
-                        step_index=current_step_index + 1,
-                        total_steps=len(plan["steps"]),
-                        sub_question=sub_question,
-                        previous_qa_context=previous_context,
-                        recalled_content=recalled_content
-                    )
-                    
-                    # Generate answer for this sub-question
+                    prompt = self._build_sub_question_prompt(state, current_step_index, execution_result)
                     response = self.llm.invoke([HumanMessage(content=prompt)])
-                    sub_answer = response.content
-                    
-                    logger.info(f"Generated sub-answer, length: {len(sub_answer)} characters")
-                    
-                    # Create QA pair
-                    qa_pair: QAPair = {
-                        "step_index": current_step_index,
-                        "question": sub_question,
-                        "answer": sub_answer,
-                        "recall_query": decision.get("query")
-                    }
-                    
-                    updated_qa_pairs = previous_qa_pairs + [qa_pair]
-                    
-                    return {
-                        "execution_results": updated_results,
-                        "qa_pairs": updated_qa_pairs,
-                        "current_step_index": current_step_index + 1
-                    }
-                    
+                    return self._qa_pair_update(
+                        state, current_step_index, decision, execution_result, response.content
+                    )
                 except Exception as e:
                     logger.error(f"Error generating QA pair: {str(e)}", exc_info=True)
                     # Fallback: treat as fast mode
                     logger.warning("Falling back to fast mode due to QA generation error")
                     deep_thinking = False
             
-            # Fast mode or non-recall steps: accumulate information
-            if not deep_thinking:
-                updated_info = state.get("collected_information", "")
-                if execution_result["result"] and not execution_result.get("error"):
-                    updated_info += f"\n\n【步骤 {current_step_index + 1}: {current_step['title']}】\n{execution_result['result']}"
-                
-                return {
-                    "execution_results": updated_results,
-                    "collected_information": updated_info,
-                    "current_step_index": current_step_index + 1
-                }
+            # Deep thinking mode with non-recall step (analysis/synthesis) just moves on
+            return self._step_update(
+                state, current_step_index, execution_result, accumulate_information=not deep_thinking, chunks=chunks
+            )
+        
+        except Exception as e:
+            # Record error but continue
+            return self._execution_error_update(state, current_step_index, e)
+    
+    async def aexecution_node(self, state: AgentState) -> Dict[str, Any]:
+        """
+        Async version of execution_node.
+        
+        Args:
+            state: Current agent state
+            
+        Returns:
+            Updated state with execution results
+        """
+        current_step_index = state["current_step_index"]
+        self._log_execution_start(state)
+        
+        try:
+            prompt = self._build_tool_decision_prompt(state, current_step_index)
+            response = await self.llm.ainvoke([HumanMessage(content=prompt)])
+            decision = self._parse_tool_decision(state, current_step_index, response.content)
+            
+            execution_result = self._new_execution_result(state, current_step_index, decision)
+            
+            chunks: List[Dict[str, Any]] = []
+            if self._needs_tool_call(state, current_step_index, decision):
+                try:
+                    tool_result, chunks = await self._arun_tool(decision, state)
+                    self._record_tool_result(execution_result, tool_result=tool_result)
+                except Exception as tool_error:
+                    self._record_tool_result(execution_result, tool_error=tool_error)
             else:
-                # Deep thinking mode but non-recall step (analysis/synthesis)
-                # Just move to next step without generating QA
-                return {
-                    "execution_results": updated_results,
-                    "current_step_index": current_step_index + 1
-                }
+                self._record_no_tool(state, current_step_index, decision, execution_result)
+            
+            deep_thinking = state.get("deep_thinking", False)
             
+            if self._generates_qa_pair(state, current_step_index):
+                logger.info("Deep thinking mode: Generating QA pair for this step")
+                
+                try:
+                    prompt = self._build_sub_question_prompt(state, current_step_index, execution_result)
+                    response = await self.llm.ainvoke([HumanMessage(content=prompt)])
+                    return self._qa_pair_update(
+                        state, current_step_index, decision, execution_result, response.content
+                    )
+                except Exception as e:
+                    logger.error(f"Error generating QA pair: {str(e)}", exc_info=True)
+                    logger.warning("Falling back to fast mode due to QA generation error")
+                    deep_thinking = False
+            
+            return self._step_update(
+                state, current_step_index, execution_result, accumulate_information=not deep_thinking, chunks=chunks
+            )
+        
         except Exception as e:
-            logger.error(f"Error in execution node: {str(e)}", exc_info=True)
-            # Record error but continue
-            error_result: ExecutionResult = {
-                "step_index": current_step_index,
-                "step_title": current_step["title"],
-                "step_type": StepType(current_step["step_type"]),
-                "tool_used": None,
-                "query": None,
-                "result": "",
-                "error": str(e)
-            }
-            return {
-                "execution_results": state.get("execution_results", []) + [error_result],
-                "current_step_index": current_step_index + 1,
-                "error": str(e)
+            return self._execution_error_update(state, current_step_index, e)
+    
+    # ========================================================================
+    # Parallel execution
+    # ========================================================================
+    
+    def _pending_recall_steps(self, state: AgentState) -> List[int]:
+        """Indices of the not yet executed recall steps of the current plan."""
+        steps = state["plan"]["steps"]
+        return [
+            i for i in range(state["current_step_index"], len(steps))
+            if steps[i]["step_type"] == "recall"
+        ]
+    
+    def _tool_decision_batch(self, state: AgentState, step_indices: List[int]) -> List[List[HumanMessage]]:
+        """Build one tool decision prompt per step, for llm.batch / llm.abatch."""
+        return [
+            [HumanMessage(content=self._build_tool_decision_prompt(state, i))]
+            for i in step_indices
+        ]
+    
+    def _prepare_prefetch(
+        self,
+        state: AgentState,
+        step_indices: List[int],
+        responses: List[Any]
+    ) -> Tuple[Dict[int, PrefetchedStep], List[Tuple[int, Dict[str, Any], ExecutionResult, List[Dict[str, Any]]]]]:
+        """
+        Turn batched tool decisions into execution results and pending tool calls.
+        
+        Args:
+            state: Current agent state
+            step_indices: Recall step indices, in plan order
+            responses: LLM responses (or exceptions) aligned with step_indices
+            
+        Returns:
+            Tuple of (results by step index, list of (step_index, decision, execution_result,
+            chunks) whose tool call still has to run)
+        """
+        results: Dict[int, PrefetchedStep] = {}
+        pending = []
+        
+        for step_index, response in zip(step_indices, responses):
+            if isinstance(response, Exception):
+                results[step_index] = response
+                continue
+            
+            decision = self._parse_tool_decision(state, step_index, response.content)
+            execution_result = self._new_execution_result(state, step_index, decision)
+            chunks: List[Dict[str, Any]] = []
+            results[step_index] = (decision, execution_result, chunks)
+            
+            if self._needs_tool_call(state, step_index, decision):
+                pending.append((step_index, decision, execution_result, chunks))
+            else:
+                self._record_no_tool(state, step_index, decision, execution_result)
+        
+        return results, pending
+    
+    def _record_tool_outcome(
+        self,
+        execution_result: ExecutionResult,
+        chunks: List[Dict[str, Any]],
+        outcome: SearchOutcome
+    ) -> None:
+        """Record a prefetched tool call: (text, recalled chunks) or the error it raised."""
+        if isinstance(outcome, Exception):
+            self._record_tool_result(execution_result, tool_error=outcome)
+            return
+        tool_result, recalled = outcome
+        chunks.extend(recalled)
+        self._record_tool_result(execution_result, tool_result=tool_result)
+    
+    @staticmethod
+    def _split_recall_calls(pending: List[Tuple]) -> Tuple[List[Tuple], List[Tuple]]:
+        """Split pending tool calls into recall calls (batched together) and other tools."""
+        recall_calls = [item for item in pending if item[1]["tool_name"] == "recall"]
+        other_calls = [item for item in pending if item[1]["tool_name"] != "recall"]
+        return recall_calls, other_calls
+    
+    def _prefetch_recall_steps(
+        self,
+        state: AgentState,
+        step_indices: List[int]
+    ) -> Dict[int, PrefetchedStep]:
+        """
+        Decide and run all given recall steps concurrently.
+        
+        Tool decisions go out as one ``llm.batch`` call. The recall queries are then
+        sent together through ``RecallTool.search_many`` (one batch request, or
+        concurrent single requests), while other tool calls run on a thread pool
+        bounded by ``parallel_recall_concurrency``.
+        
+        Args:
+            state: Current agent state
+            step_indices: Recall step indices, in plan order
+            
+        Returns:
+            (decision, execution result, chunks), or the error raised while deciding, per step index
+        """
+        concurrency = max(1, settings.parallel_recall_concurrency)
+        responses = self.llm.batch(
+            self._tool_decision_batch(state, step_indices),
+            config={"max_concurrency": concurrency},
+            return_exceptions=True
+        )
+        results, pending = self._prepare_prefetch(state, step_indices, responses)
+        
+        recall_calls, other_calls = self._split_recall_calls(pending)
+        
+        if other_calls:
+            with ThreadPoolExecutor(max_workers=min(concurrency, len(other_calls) + 1)) as pool:
+                futures = [
+                    (execution_result, chunks, pool.submit(self._run_tool, decision, state))
+                    for _, decision, execution_result, chunks in other_calls
+                ]
+                if recall_calls:
+                    self._record_recall_batch(recall_calls, self._execute_recall_many(
+                        [decision["query"] for _, decision, _, _ in recall_calls], state
+                    ))
+                for execution_result, chunks, future in futures:
+                    try:
+                        outcome = future.result()
+                    except Exception as tool_error:
+                        outcome = tool_error
+                    self._record_tool_outcome(execution_result, chunks, outcome)
+        elif recall_calls:
+            self._record_recall_batch(recall_calls, self._execute_recall_many(
+                [decision["query"] for _, decision, _, _ in recall_calls], state
+            ))
+        
+        return results
+    
+    def _record_recall_batch(self, recall_calls: List[Tuple], outcomes: List[SearchOutcome]) -> None:
+        """Record the outcome of each recall call of a batch."""
+        for (_, _, execution_result, chunks), outcome in zip(recall_calls, outcomes):
+            self._record_tool_outcome(execution_result, chunks, outcome)
+    
+    async def _aprefetch_recall_steps(
+        self,
+        state: AgentState,
+        step_indices: List[int]
+    ) -> Dict[int, PrefetchedStep]:
+        """Async version of _prefetch_recall_steps (llm.abatch, batched recall + semaphore-bounded gather)."""
+        concurrency = max(1, settings.parallel_recall_concurrency)
+        responses = await self.llm.abatch(
+            self._tool_decision_batch(state, step_indices),
+            config={"max_concurrency": concurrency},
+            return_exceptions=True
+        )
+        results, pending = self._prepare_prefetch(state, step_indices, responses)
+        
+        recall_calls, other_calls = self._split_recall_calls(pending)
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def run(
+            decision: Dict[str, Any],
+            execution_result: ExecutionResult,
+            chunks: List[Dict[str, Any]]
+        ) -> None:
+            async with semaphore:
+                try:
+                    outcome = await self._arun_tool(decision, state)
+                except Exception as tool_error:
+                    outcome = tool_error
+                self._record_tool_outcome(execution_result, chunks, outcome)
+        
+        async def run_recall_batch() -> None:
+            if not recall_calls:
+                return
+            self._record_recall_batch(recall_calls, await self._aexecute_recall_many(
+                [decision["query"] for _, decision, _, _ in recall_calls], state
+            ))
+        
+        await asyncio.gather(
+            run_recall_batch(),
+            *(run(decision, execution_result, chunks) for _, decision, execution_result, chunks in other_calls)
+        )
+        return results
+    
+    def _sub_question_targets(self, state: AgentState, prefetched: Dict[int, PrefetchedStep]) -> List[int]:
+        """Prefetched steps that get a QA pair (deep thinking recall steps), in plan order."""
+        return [
+            i for i in sorted(prefetched)
+            if not isinstance(prefetched[i], Exception) and self._generates_qa_pair(state, i)
+        ]
+    
+    def _collect_sub_answers(
+        self,
+        step_indices: List[int],
+        responses: List[Any],
+        purpose: str
+    ) -> Dict[int, str]:
+        """Keep the successful sub-answers of a batch, logging the failed ones."""
+        answers = {}
+        for step_index, response in zip(step_indices, responses):
+            if isinstance(response, Exception):
+                logger.error(f"Error in {purpose} for step {step_index + 1}: {str(response)}", exc_info=response)
+            else:
+                answers[step_index] = response.content
+        return answers
+    
+    def _build_refine_prompts(
+        self,
+        state: AgentState,
+        answers: Dict[int, str]
+    ) -> Tuple[List[int], List[List[HumanMessage]]]:
+        """
+        Build the refinement prompts for concurrently generated sub-answers.
+        
+        Every prompt carries all QA pairs (earlier rounds plus this round's drafts,
+        with full answers) so each answer can be aligned with the others.
+        
+        Args:
+            state: Current agent state
+            answers: Draft sub-answers by step index
+            
+        Returns:
+            Tuple of (step indices, prompts aligned with them)
+        """
+        plan = state["plan"]
+        step_indices = sorted(answers)
+        all_qa_pairs = state.get("qa_pairs", []) + [
+            {"question": plan["steps"][i]["title"], "answer": answers[i]} for i in step_indices
+        ]
+        all_qa_context = get_all_qa_context(all_qa_pairs)
+        
+        prompts = [
+            [HumanMessage(content=SUB_QUESTION_REFINE_PROMPT.format(
+                user_query=state["user_query"],
+                step_index=i + 1,
+                total_steps=len(plan["steps"]),
+                sub_question=plan["steps"][i]["title"],
+                draft_answer=answers[i],
+                all_qa_context=all_qa_context
+            ))]
+            for i in step_indices
+        ]
+        return step_indices, prompts
+    
+    def _needs_refinement(self, answers: Dict[int, str]) -> bool:
+        """The refinement pass only helps when several answers were drafted independently."""
+        return settings.parallel_deep_thinking_refine and len(answers) > 1
+    
+    def _answer_sub_questions(
+        self,
+        state: AgentState,
+        prefetched: Dict[int, PrefetchedStep]
+    ) -> Dict[int, str]:
+        """
+        Answer all deep thinking sub-questions concurrently, then optionally refine them.
+        
+        Sub-answers are drafted in one ``llm.batch`` call (each sees only the QA
+        pairs of earlier rounds); if ``parallel_deep_thinking_refine`` is enabled,
+        a second batch revises every draft with all drafts as context.
+        
+        Args:
+            state: Current agent state
+            prefetched: Prefetched recall steps by step index
+            
+        Returns:
+            Sub-answer per step index (steps whose answer failed are missing)
+        """
+        step_indices = self._sub_question_targets(state, prefetched)
+        if not step_indices:
+            return {}
+        
+        concurrency = max(1, settings.parallel_recall_concurrency)
+        logger.info(f"Deep thinking mode: Generating {len(step_indices)} QA pair(s) concurrently")
+        
+        responses = self.llm.batch(
+            [
+                [HumanMessage(content=self._build_sub_question_prompt(state, i, prefetched[i][1]))]
+                for i in step_indices
+            ],
+            config={"max_concurrency": concurrency},
+            return_exceptions=True
+        )
+        answers = self._collect_sub_answers(step_indices, responses, "sub-question answering")
+        
+        if self._needs_refinement(answers):
+            logger.info(f"Refining {len(answers)} sub-answer(s) with all QA pairs as context")
+            refine_indices, prompts = self._build_refine_prompts(state, answers)
+            responses = self.llm.batch(prompts, config={"max_concurrency": concurrency}, return_exceptions=True)
+            # 修订失败的子问题保留初稿
+            answers.update(self._collect_sub_answers(refine_indices, responses, "sub-answer refinement"))
+        
+        return answers
+    
+    async def _aanswer_sub_questions(
+        self,
+        state: AgentState,
+        prefetched: Dict[int, PrefetchedStep]
+    ) -> Dict[int, str]:
+        """Async version of _answer_sub_questions."""
+        step_indices = self._sub_question_targets(state, prefetched)
+        if not step_indices:
+            return {}
+        
+        concurrency = max(1, settings.parallel_recall_concurrency)
+        logger.info(f"Deep thinking mode: Generating {len(step_indices)} QA pair(s) concurrently")
+        
+        responses = await self.llm.abatch(
+            [
+                [HumanMessage(content=self._build_sub_question_prompt(state, i, prefetched[i][1]))]
+                for i in step_indices
+            ],
+            config={"max_concurrency": concurrency},
+            return_exceptions=True
+        )
+        answers = self._collect_sub_answers(step_indices, responses, "sub-question answering")
+        
+        if self._needs_refinement(answers):
+            logger.info(f"Refining {len(answers)} sub-answer(s) with all QA pairs as context")
+            refine_indices, prompts = self._build_refine_prompts(state, answers)
+            responses = await self.llm.abatch(prompts, config={"max_concurrency": concurrency}, return_exceptions=True)
+            answers.update(self._collect_sub_answers(refine_indices, responses, "sub-answer refinement"))
+        
+        return answers
+    
+    def _merge_prefetched_step(
+        self,
+        state: AgentState,
+        step_index: int,
+        prefetched: PrefetchedStep,
+        sub_answer: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        State update for a prefetched recall step (same shape as a sequential step).
+        
+        Args:
+            state: Current agent state
+            step_index: Index of the step in the current plan
+            prefetched: Prefetched (decision, execution result, chunks), or the decision error
+            sub_answer: Sub-answer for deep thinking mode, if one was generated
+            
+        Returns:
+            State update
+        """
+        logger.info(f"Merging prefetched result for step {step_index + 1}/{len(state['plan']['steps'])}")
+        if isinstance(prefetched, Exception):
+            return self._execution_error_update(state, step_index, prefetched)
+        
+        decision, execution_result, chunks = prefetched
+        if self._generates_qa_pair(state, step_index):
+            if sub_answer is not None:
+                return self._qa_pair_update(state, step_index, decision, execution_result, sub_answer)
+            # Same fallback as execution_node: treat as fast mode
+            logger.warning("Falling back to fast mode due to QA generation error")
+        
+        return self._step_update(state, step_index, execution_result, accumulate_information=True, chunks=chunks)
+    
+    def _log_parallel_start(self, state: AgentState, recall_indices: List[int]) -> None:
+        """Log the parallel execution banner."""
+        logger.info("============ Parallel Execution Node ============")
+        logger.info(
+            f"Prefetching {len(recall_indices)} recall step(s) of {len(state['plan']['steps'])} "
+            f"(concurrency: {settings.parallel_recall_concurrency})"
+        )
+    
+    @staticmethod
+    def _parallel_update(working: Dict[str, Any]) -> Dict[str, Any]:
+        """Extract the execution fields of the working state as the node update."""
+        update = {
+            "execution_results": working.get("execution_results", []),
+            "current_step_index": working["current_step_index"],
+            "collected_information": working.get("collected_information", ""),
+            "retrieved_chunks": working.get("retrieved_chunks", []),
+            "qa_pairs": working.get("qa_pairs", [])
+        }
+        if working.get("error"):
+            update["error"] = working["error"]
+        return update
+    
+    def parallel_execution_node(self, state: AgentState) -> Dict[str, Any]:
+        """
+        Execute all remaining plan steps, running the recall steps concurrently.
+        
+        Recall steps don't depend on one another, so their tool decisions and
+        recalls are issued together; in deep thinking mode all sub-answers are
+        then generated concurrently as well (plus an optional refinement pass).
+        The other steps run in plan order exactly like execution_node. Results
+        are merged into ``execution_results``, ``collected_information`` and
+        ``qa_pairs`` in plan order.
+        
+        Args:
+            state: Current agent state
+            
+        Returns:
+            Updated state with execution results for the whole plan
+        """
+        recall_indices = self._pending_recall_steps(state)
+        self._log_parallel_start(state, recall_indices)
+        
+        prefetched = self._prefetch_recall_steps(state, recall_indices) if recall_indices else {}
+        sub_answers = self._answer_sub_questions(state, prefetched)
+        
+        working: Dict[str, Any] = dict(state)
+        for step_index in range(state["current_step_index"], len(state["plan"]["steps"])):
+            working["current_step_index"] = step_index
+            if step_index in prefetched:
+                working.update(self._merge_prefetched_step(
+                    working, step_index, prefetched[step_index], sub_answers.get(step_index)
+                ))
+            else:
+                working.update(self.execution_node(working))
+        
+        return self._parallel_update(working)
+    
+    async def aparallel_execution_node(self, state: AgentState) -> Dict[str, Any]:
+        """
+        Async version of parallel_execution_node.
+        
+        Args:
+            state: Current agent state
+            
+        Returns:
+            Updated state with execution results for the whole plan
+        """
+        recall_indices = self._pending_recall_steps(state)
+        self._log_parallel_start(state, recall_indices)
+        
+        prefetched = await self._aprefetch_recall_steps(state, recall_indices) if recall_indices else {}
+        sub_answers = await self._aanswer_sub_questions(state, prefetched)
+        
+        working: Dict[str, Any] = dict(state)
+        for step_index in range(state["current_step_index"], len(state["plan"]["steps"])):
+            working["current_step_index"] = step_index
+            if step_index in prefetched:
+                working.update(self._merge_prefetched_step(
+                    working, step_index, prefetched[step_index], sub_answers.get(step_index)
+                ))
+            else:
+                working.update(await self.aexecution_node(working))
+        
+        return self._parallel_update(working)
+    
+    # ========================================================================
+    # Analysis
+    # ========================================================================
+    
+    def _build_analysis_prompt(self, state: AgentState) -> str:
+        """
+        Build the information sufficiency analysis prompt.
+        
+        Args:
+            state: Current agent state
+            
+        Returns:
+            Rendered prompt
+        """
+        # Build execution summary
+        execution_summary = "\n".join([
+            f"步骤{r['step_index']+1}: {r['step_title']} - 工具: {r.get('tool_used', '无')}"
+            for r in state.get("execution_results", [])
+        ])
+        
+        return INFORMATION_ANALYSIS_PROMPT.format(
+            user_query=state["user_query"],
+            task_type=state["detected_intent"].value,
+            collected_information=self._collected_context(state),
+            execution_summary=execution_summary
+        )
+    
+    def _parse_analysis_response(self, state: AgentState, content: str) -> Dict[str, Any]:
+        """
+        Parse the analysis LLM response and apply the replan limit.
+        
+        Args:
+            state: Current agent state
+            content: Raw LLM response content
+            
+        Returns:
+            State update with analysis results
+        """
+        analysis = parse_json_response(
+            content,
+            expected_fields=["is_sufficient", "analysis"]
+        )
+        
+        if not analysis:
+            logger.warning("Failed to parse analysis JSON, defaulting to sufficient")
+            analysis = {
+                "is_sufficient": True,
+                "analysis": "无法解析分析结果，继续生成答案",
+                "missing_aspects": [],
+                "suggested_actions": []
             }
+        
+        is_sufficient = analysis["is_sufficient"]
+        logger.info(f"Information sufficient: {is_sufficient}")
+        logger.info(f"Analysis: {analysis['analysis'][:200]}...")
+        
+        # Check replan count
+        replan_count = state.get("replan_count", 0)
+        if not is_sufficient:
+            if replan_count >= settings.max_replan_attempts:
+                logger.warning(f"Max replan attempts ({settings.max_replan_attempts}) reached, proceeding with available information")
+                is_sufficient = True
+                analysis["analysis"] += "\n（已达最大重新规划次数，将基于现有信息生成答案）"
+            else:
+                # Increment replan counter
+                replan_count += 1
+                logger.info(f"Information insufficient, replanning (attempt {replan_count}/{settings.max_replan_attempts})")
+        
+        return {
+            "is_information_sufficient": is_sufficient,
+            "analysis_result": analysis,
+            "replan_count": replan_count
+        }
+    
+    def _analysis_error_update(self, error: Exception) -> Dict[str, Any]:
+        """Default to sufficient on analysis errors to avoid infinite loops."""
+        logger.error(f"Error in analysis node: {str(error)}", exc_info=error)
+        return {
+            "is_information_sufficient": True,
+            "analysis_result": {
+                "is_sufficient": True,
+                "analysis": f"分析过程出错: {str(error)}，将基于现有信息生成答案",
+                "missing_aspects": [],
+                "suggested_actions": []
+            },
+            "error": str(error)
+        }
     
     def analysis_node(self, state: AgentState) -> Dict[str, Any]:
         """
@@ -737,173 +1858,132 @@ class AgentNodes:
         logger.info("============ Analysis Node ============")
         
         try:
-            # Build execution summary
-            execution_summary = "\n".join([
-                f"步骤{r['step_index']+1}: {r['step_title']} - 工具: {r.get('tool_used', '无')}"
-                for r in state.get("execution_results", [])
-            ])
-            
-            # Prepare analysis prompt
-            prompt = INFORMATION_ANALYSIS_PROMPT.format(
-                user_query=state["user_query"],
-                task_type=state["detected_intent"].value,
-                collected_information=state.get("collected_information", ""),
-                execution_summary=execution_summary
-            )
+            prompt = self._build_analysis_prompt(state)
             
             # Get analysis
             response = self.llm.invoke([HumanMessage(content=prompt)])
-            analysis = parse_json_response(
-                response.content,
-                expected_fields=["is_sufficient", "analysis"]
-            )
-            
-            if not analysis:
-                logger.warning("Failed to parse analysis JSON, defaulting to sufficient")
-                analysis = {
-                    "is_sufficient": True,
-                    "analysis": "无法解析分析结果，继续生成答案",
-                    "missing_aspects": [],
-                    "suggested_actions": []
-                }
-            
-            is_sufficient = analysis["is_sufficient"]
-            logger.info(f"Information sufficient: {is_sufficient}")
-            logger.info(f"Analysis: {analysis['analysis'][:200]}...")
-            
-            # Check replan count
-            replan_count = state.get("replan_count", 0)
-            if not is_sufficient:
-                if replan_count >= settings.max_replan_attempts:
-                    logger.warning(f"Max replan attempts ({settings.max_replan_attempts}) reached, proceeding with available information")
-                    is_sufficient = True
-                    analysis["analysis"] += "\n（已达最大重新规划次数，将基于现有信息生成答案）"
-                else:
-                    # Increment replan counter
-                    replan_count += 1
-                    logger.info(f"Information insufficient, replanning (attempt {replan_count}/{settings.max_replan_attempts})")
-            
-            return {
-                "is_information_sufficient": is_sufficient,
-                "analysis_result": analysis,
-                "replan_count": replan_count
-            }
+            return self._parse_analysis_response(state, response.content)
+        
+        except Exception as e:
+            return self._analysis_error_update(e)
+    
+    async def aanalysis_node(self, state: AgentState) -> Dict[str, Any]:
+        """
+        Async version of analysis_node.
+        
+        Args:
+            state: Current agent state
             
+        Returns:
+            Updated state with analysis results
+        """
+        logger.info("============ Analysis Node ============")
+        
+        try:
+            prompt = self._build_analysis_prompt(state)
+            response = await self.llm.ainvoke([HumanMessage(content=prompt)])
+            return self._parse_analysis_response(state, response.content)
+        
         except Exception as e:
-            logger.error(f"Error in analysis node: {str(e)}", exc_info=True)
-            # Default to sufficient to avoid infinite loops
-            return {
-                "is_information_sufficient": True,
-                "analysis_result": {
-                    "is_sufficient": True,
-                    "analysis": f"分析过程出错: {str(e)}，将基于现有信息生成答案",
-                    "missing_aspects": [],
-                    "suggested_actions": []
-                },
-                "error": str(e)
-            }
+            return self._analysis_error_update(e)
     
-    def answer_generation_node(self, state: AgentState) -> Dict[str, Any]:
+    # ========================================================================
+    # Answer generation
+    # ========================================================================
+    
+    def _build_answer_prompt(self, state: AgentState, context_str: str) -> str:
         """
-        Generate final answer based on collected information or QA pairs.
+        Build the final answer prompt from collected information or QA pairs.
         
         Args:
             state: Current agent state
+            context_str: Formatted conversation history (may be empty)
             
         Returns:
-            Updated state with final answer
+            Rendered prompt
         """
+        # Build context-aware query for answer generation
+        user_query_with_context = state["user_query"]
+        
+        if context_str:
+            user_query_with_context = ANSWER_QUERY_WITH_HISTORY.format(context=context_str, user_query=state['user_query'])
+            logger.info("Using conversation history for answer generation (3 turns)")
+        
+        # Prepare context based on mode
+        if state.get("deep_thinking", False):
+            # Deep thinking mode: use QA pairs
+            qa_pairs = state.get("qa_pairs", [])
+            logger.info(f"Using {len(qa_pairs)} QA pairs for answer generation")
+            
+            # Format QA pairs as context
+            if qa_pairs:
+                qa_context_lines = []
+                for i, qa in enumerate(qa_pairs, 1):
+                    qa_context_lines.append(f"## 子问题 {i}: {qa['question']}\n")
+                    qa_context_lines.append(f"{qa['answer']}\n")
+                context_for_llm = "\n".join(qa_context_lines)
+            else:
+                context_for_llm = "（没有生成QA对，可能所有步骤都是analysis/synthesis类型）"
+                logger.warning("No QA pairs found in deep thinking mode")
+        else:
+            # Fast mode: use collected information
+            context_for_llm = self._collected_context(state)
+            logger.info(f"Using collected information, length: {len(context_for_llm)} chars")
+        
+        # Get the appropriate answer prompt
+        prompt_template = get_answer_prompt(state["detected_intent"])
+        return prompt_template.format(
+            user_query=user_query_with_context,
+            collected_information=context_for_llm
+        )
+    
+    def _log_qa_pairs(self, state: AgentState) -> None:
+        """Log QA pairs summary if in deep thinking mode."""
+        qa_pairs = state.get("qa_pairs", [])
+        if not (state.get("deep_thinking", False) and qa_pairs):
+            return
+        
+        logger.info("=" * 60)
+        logger.info("📊 深度思考模式 - QA对总结")
+        logger.info("=" * 60)
+        for i, qa in enumerate(qa_pairs, 1):
+            logger.info(f"Q{i}: {qa['question']}")
+            answer_preview = qa['answer'][:150] + "..." if len(qa['answer']) > 150 else qa['answer']
+            logger.info(f"A{i}: {answer_preview}")
+            logger.info("-" * 60)
+    
+    def _log_answer_start(self, state: AgentState) -> None:
+        """Log the answer generation banner."""
         logger.info("============ Answer Generation Node ============")
         logger.info(f"Intent: {state['detected_intent']}")
+        logger.info(f"Mode: {'Deep Thinking' if state.get('deep_thinking', False) else 'Fast'}")
+    
+    def answer_generation_node(self, state: AgentState) -> Dict[str, Any]:
+        """
+        Generate final answer based on collected information or QA pairs.
         
-        deep_thinking = state.get("deep_thinking", False)
-        logger.info(f"Mode: {'Deep Thinking' if deep_thinking else 'Fast'}")
+        Args:
+            state: Current agent state
+            
+        Returns:
+            Updated state with final answer
+        """
+        self._log_answer_start(state)
         
         try:
-            # Build context-aware query for answer generation
-            user_query_with_context = state["user_query"]
-            
             # 获取对话历史上下文（3轮 - answer generation需要更多上下文）
             context_str = self._get_conversation_context(state, num_turns=3, stage="answer_generation")
-            
-            if context_str:
-                user_query_with_context = f"【对话历史（用于理解上下文和代词）】\n{context_str}\n\n【当前问题】\n{state['user_query']}"
-                logger.info("Using conversation history for answer generation (3 turns)")
-            
-            # Prepare context based on mode
-            if deep_thinking:
-                # Deep thinking mode: use QA pairs
-                qa_pairs = state.get("qa_pairs", [])
-                logger.info(f"Using {len(qa_pairs)} QA pairs for answer generation")
-                
-                # Format QA pairs as context
-                if qa_pairs:
-                    qa_context_lines = []
-                    for i, qa in enumerate(qa_pairs, 1):
-                        qa_context_lines.append(f"## 子问题 {i}: {qa['question']}\n")
-                        qa_context_lines.append(f"{qa['answer']}\n")
-                    context_for_llm = "\n".join(qa_context_lines)
-                else:
-                    context_for_llm = "（没有生成QA对，可能所有步骤都是analysis/synthesis类型）"
-                    logger.warning("No QA pairs found in deep thinking mode")
-            else:
-                # Fast mode: use collected information
-                context_for_llm = state.get("collected_information", "")
-                logger.info(f"Using collected information, length: {len(context_for_llm)} chars")
-            
-            # Get the appropriate answer prompt
-            prompt_template = get_answer_prompt(state["detected_intent"])
-            prompt = prompt_template.format(
-                user_query=user_query_with_context,
-                collected_information=context_for_llm
-            )
+            prompt = self._build_answer_prompt(state, context_str)
             
             # Generate answer
             response = self.llm.invoke([HumanMessage(content=prompt)])
             final_answer = response.content
             
             logger.info(f"Generated answer length: {len(final_answer)} characters")
+            self._log_qa_pairs(state)
             
-            # Log QA pairs summary if in deep thinking mode
-            if deep_thinking and qa_pairs:
-                logger.info("=" * 60)
-                logger.info("📊 深度思考模式 - QA对总结")
-                logger.info("=" * 60)
-                for i, qa in enumerate(qa_pairs, 1):
-                    logger.info(f"Q{i}: {qa['question']}")
-                    answer_preview = qa['answer'][:150] + "..." if len(qa['answer']) > 150 else qa['answer']
-                    logger.info(f"A{i}: {answer_preview}")
-                    logger.info("-" * 60)
-            
-            # ========================================================================
             # 会话管理：保存消息和检查压缩
-            # ========================================================================
-            session_id = state.get('session_id')
-            if session_id:
-                # 🔑 关键：保存用户消息（在workflow结束时保存，而不是开始时）
-                # 这样确保context injection时不会包含当前的user消息，避免重复
-                if not state.get('_user_message_saved'):
-                    self.session_manager.add_user_message(
-                        session_id=session_id,
-                        content=state["user_query"]
-                    )
-                    logger.info(f"User message saved to session {session_id}")
-                
-                # 保存助手回复
-                self.session_manager.add_assistant_message(
-                    session_id=session_id,
-                    content=final_answer
-                )
-                logger.debug(f"Assistant message saved to session {session_id}")
-                
-                # 检查是否需要压缩
-                if self.session_manager.should_compress(session_id):
-                    logger.info(f"Triggering compression for session {session_id}")
-                    compression_record = self.session_manager.trigger_compression(session_id)
-                    logger.info(
-                        f"Compression completed: saved {compression_record.saved_tokens} tokens, "
-                        f"round {compression_record.round}"
-                    )
+            self._save_turn(state, final_answer)
             
             return {
                 "final_answer": final_answer,
@@ -911,8 +1991,41 @@ class AgentNodes:
                     AIMessage(content=final_answer)
                 ]
             }
+        
+        except Exception as e:
+            logger.error(f"Error in answer generation: {str(e)}", exc_info=True)
+            raise RuntimeError(f"Answer generation failed: {str(e)}")
+    
+    async def aanswer_generation_node(self, state: AgentState) -> Dict[str, Any]:
+        """
+        Async version of answer_generation_node.
+        
+        Args:
+            state: Current agent state
+            
+        Returns:
+            Updated state with final answer
+        """
+        self._log_answer_start(state)
+        
+        try:
+            context_str = await self._aget_conversation_context(state, num_turns=3, stage="answer_generation")
+            prompt = self._build_answer_prompt(state, context_str)
+            
+            final_answer = await self._astream_text(prompt)
             
+            logger.info(f"Generated answer length: {len(final_answer)} characters")
+            self._log_qa_pairs(state)
+            
+            await asyncio.to_thread(self._save_turn, state, final_answer)
+            
+            return {
+                "final_answer": final_answer,
+                "messages": state.get("messages", []) + [
+                    AIMessage(content=final_answer)
+                ]
+            }
+        
         except Exception as e:
             logger.error(f"Error in answer generation: {str(e)}", exc_info=True)
             raise RuntimeError(f"Answer generation failed: {str(e)}")
-
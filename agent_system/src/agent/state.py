@@ -61,6 +61,18 @@ class ExecutionResult(TypedDict):
     error: Optional[str]
 
 
+class RetrievedChunk(TypedDict):
+    """A recalled document chunk, deduplicated across steps by chunk_id."""
+    
+    chunk_id: str
+    doc_name: str
+    page_num: Optional[int]
+    content: str
+    similarity: float  # Highest similarity over all recalls of this chunk
+    step_indices: List[int]  # Steps that recalled this chunk
+    token_count: int
+
+
 class ToolDecision(TypedDict):
     """Decision about tool usage."""
     
@@ -91,6 +103,7 @@ class AgentState(TypedDict):
     mode_type: Optional[IntentType]
     enable_web_search: bool
     deep_thinking: bool  # Enable deep thinking mode with QA pairs
+    use_parallel_execution: bool  # Run recall steps (and deep thinking sub-answers) concurrently
     
     # Direct content mode (for small documents)
     direct_content: Optional[str]  # Full document content provided by user
@@ -107,7 +120,8 @@ class AgentState(TypedDict):
     
     # Execution
     execution_results: List[ExecutionResult]
-    collected_information: str  # Used in fast mode
+    collected_information: str  # Used in fast mode (text results; recall chunks live in retrieved_chunks)
+    retrieved_chunks: List[RetrievedChunk]  # Deduplicated recall chunks, assembled under a token budget
     qa_pairs: List[QAPair]  # Used in deep thinking mode
     
     # Analysis
@@ -122,8 +136,10 @@ class AgentState(TypedDict):
     
     # Session and context management
     session_id: Optional[str]
-    session_history: Optional[List]  # Injected session history (List[Message])
-    session_tokens: Optional[int]  # Token count of injected history
+    session_history: Optional[List]  # Session snapshot loaded once per request (latest summary + recent List[Message]), sliced per stage
+    session_tokens: Optional[int]  # Token count of the session's active messages
+    query_tokens: Optional[int]  # Token count of the user query
+    history_tokens: Optional[int]  # Token count of the formatted history injected into answer prompts
     
     # Recall configuration (dynamic overrides)
     recall_index_names: Optional[List[str]]  # Override for recall index names
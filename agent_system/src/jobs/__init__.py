@@ -0,0 +1,5 @@
+"""Async query jobs: Redis-backed job store and worker pool."""
+from .job_store import JobStatus, JobStore, create_job_store
+from .worker import JobWorker
+
+__all__ = ["JobStatus", "JobStore", "create_job_store", "JobWorker"]
@@ -0,0 +1,369 @@
+"""
+异步查询任务存储
+
+基于 Redis 的持久化任务队列：
+- 任务记录：Hash ``agent_job:{job_id}``（状态、请求、结果、时间戳），带过期时间
+- 待处理队列：List ``agent_job:queue``（LPUSH 入队，worker 从右端取出）
+- 处理中列表：List ``agent_job:processing``，worker 取任务时原子移入（BLMOVE），
+  worker 崩溃后由心跳超时检测重新入队，任务不会丢失
+
+状态流转：queued → running → succeeded / failed / cancelled
+"""
+import json
+import time
+import uuid
+from enum import Enum
+from typing import Any, Dict, List, Optional
+
+import redis
+
+from config import get_settings
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Redis key
+_JOB_PREFIX = "agent_job:"
+_QUEUE_KEY = "agent_job:queue"
+_PROCESSING_KEY = "agent_job:processing"
+
+
+class JobStatus(str, Enum):
+    """任务状态"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class JobStore:
+    """
+    Redis 任务存储（线程安全，可被 API 进程和多个 worker 进程共享）
+    
+    状态变更使用 WATCH/MULTI 乐观锁，避免取消与开始执行之间的竞争。
+    """
+    
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        result_ttl: int = 3600,
+        queued_ttl: int = 86400
+    ):
+        """
+        初始化任务存储
+        
+        Args:
+            redis_client: Redis 客户端（需 decode_responses=True）
+            result_ttl: 任务结束后记录保留时间（秒）
+            queued_ttl: 任务未结束时记录保留时间（秒）
+        """
+        self.redis_client = redis_client
+        self.result_ttl = result_ttl
+        self.queued_ttl = queued_ttl
+        
+        # 上一次 requeue_stale 时在处理中列表里仍为 queued 状态的任务
+        self._unclaimed: set = set()
+    
+    @staticmethod
+    def _job_key(job_id: str) -> str:
+        return f"{_JOB_PREFIX}{job_id}"
+    
+    # ========================================================================
+    # API 侧
+    # ========================================================================
+    
+    def enqueue(self, request: Dict[str, Any], session_id: str) -> str:
+        """
+        创建任务并加入队列
+        
+        Args:
+            request: aprocess_query 的参数
+            session_id: 会话ID
+            
+        Returns:
+            任务ID
+        """
+        job_id = str(uuid.uuid4())
+        key = self._job_key(job_id)
+        
+        pipe = self.redis_client.pipeline()
+        pipe.hset(key, mapping={
+            "job_id": job_id,
+            "status": JobStatus.QUEUED.value,
+            "session_id": session_id,
+            "request": json.dumps(request, ensure_ascii=False),
+            "created_at": time.time()
+        })
+        pipe.expire(key, self.queued_ttl)
+        pipe.lpush(_QUEUE_KEY, job_id)
+        pipe.execute()
+        
+        logger.info(f"📥 Job {job_id} queued (session {session_id})")
+        return job_id
+    
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        获取任务状态与结果
+        
+        Args:
+            job_id: 任务ID
+            
+        Returns:
+            任务信息，不存在或已过期返回 None
+        """
+        data = self.redis_client.hgetall(self._job_key(job_id))
+        if not data:
+            return None
+        
+        job = {
+            "job_id": job_id,
+            "status": data["status"],
+            "session_id": data.get("session_id"),
+            "created_at": float(data["created_at"]),
+            "started_at": float(data["started_at"]) if data.get("started_at") else None,
+            "finished_at": float(data["finished_at"]) if data.get("finished_at") else None,
+            "cancel_requested": data.get("cancel_requested") == "1",
+            "result": json.loads(data["result"]) if data.get("result") else None,
+            "error": data.get("error") or None
+        }
+        if job["status"] == JobStatus.QUEUED.value:
+            job["queue_position"] = self._queue_position(job_id)
+        return job
+    
+    def _queue_position(self, job_id: str) -> Optional[int]:
+        """队列中的位置（0 表示下一个被执行）"""
+        # worker 从右端取任务：LPOS 从右端开始查找，只扫描排在它前面的任务
+        with self.redis_client.pipeline() as pipe:
+            pipe.llen(_QUEUE_KEY)
+            pipe.lpos(_QUEUE_KEY, job_id, rank=-1)
+            length, index = pipe.execute()
+        if index is None:
+            return None
+        return length - 1 - index
+    
+    def cancel(self, job_id: str) -> Optional[str]:
+        """
+        取消任务
+        
+        排队中的任务直接取消；执行中的任务标记取消请求，由 worker 中断执行；
+        已结束的任务不受影响。
+        
+        Args:
+            job_id: 任务ID
+            
+        Returns:
+            取消后的任务状态，任务不存在返回 None
+        """
+        key = self._job_key(job_id)
+        with self.redis_client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    status = pipe.hget(key, "status")
+                    if status is None:
+                        return None
+                    
+                    pipe.multi()
+                    if status == JobStatus.QUEUED.value:
+                        pipe.hset(key, mapping={
+                            "status": JobStatus.CANCELLED.value,
+                            "finished_at": time.time()
+                        })
+                        pipe.expire(key, self.result_ttl)
+                        pipe.lrem(_QUEUE_KEY, 0, job_id)
+                        status = JobStatus.CANCELLED.value
+                    elif status == JobStatus.RUNNING.value:
+                        pipe.hset(key, "cancel_requested", "1")
+                    pipe.execute()
+                    break
+                except redis.WatchError:
+                    continue
+        
+        logger.info(f"🛑 Job {job_id} cancel requested (status: {status})")
+        return status
+    
+    # ========================================================================
+    # Worker 侧
+    # ========================================================================
+    
+    def dequeue(self, timeout: float = 1.0) -> Optional[str]:
+        """
+        阻塞获取下一个任务ID（原子移入处理中列表）
+        
+        Args:
+            timeout: 最长等待时间（秒）
+            
+        Returns:
+            任务ID，超时返回 None
+        """
+        return self.redis_client.blmove(_QUEUE_KEY, _PROCESSING_KEY, timeout, "RIGHT", "LEFT")
+    
+    def claim(self, job_id: str, worker_id: str) -> Optional[Dict[str, Any]]:
+        """
+        开始执行任务（queued → running）
+        
+        Args:
+            job_id: dequeue 取到的任务ID
+            worker_id: worker 标识
+            
+        Returns:
+            aprocess_query 参数；任务已取消或已过期时返回 None（并移出处理中列表）
+        """
+        key = self._job_key(job_id)
+        with self.redis_client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    status, request = pipe.hmget(key, "status", "request")
+                    pipe.multi()
+                    if status != JobStatus.QUEUED.value:
+                        # 只移除本次取出的这一项（同一任务可能因重新入队在列表中出现多次）
+                        pipe.lrem(_PROCESSING_KEY, 1, job_id)
+                        pipe.execute()
+                        logger.info(f"Job {job_id} skipped (status: {status or 'expired'})")
+                        return None
+                    
+                    now = time.time()
+                    pipe.hset(key, mapping={
+                        "status": JobStatus.RUNNING.value,
+                        "worker_id": worker_id,
+                        "started_at": now,
+                        "heartbeat_at": now
+                    })
+                    pipe.execute()
+                    return json.loads(request)
+                except redis.WatchError:
+                    continue
+    
+    def heartbeat(self, job_id: str) -> bool:
+        """
+        刷新执行中任务的心跳
+        
+        Args:
+            job_id: 任务ID
+            
+        Returns:
+            是否已请求取消
+        """
+        key = self._job_key(job_id)
+        pipe = self.redis_client.pipeline()
+        pipe.hset(key, "heartbeat_at", time.time())
+        pipe.hget(key, "cancel_requested")
+        _, cancel_requested = pipe.execute()
+        return cancel_requested == "1"
+    
+    def finish(
+        self,
+        job_id: str,
+        status: JobStatus,
+        result: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None
+    ) -> None:
+        """
+        结束任务：写入结果，设置结果过期时间，移出处理中列表
+        
+        Args:
+            job_id: 任务ID
+            status: 结束状态（succeeded / failed / cancelled）
+            result: aprocess_query 返回结果
+            error: 错误信息
+        """
+        key = self._job_key(job_id)
+        mapping = {"status": status.value, "finished_at": time.time()}
+        if result is not None:
+            mapping["result"] = json.dumps(result, ensure_ascii=False, default=str)
+        if error:
+            mapping["error"] = error
+        
+        pipe = self.redis_client.pipeline()
+        pipe.hset(key, mapping=mapping)
+        pipe.expire(key, self.result_ttl)
+        pipe.lrem(_PROCESSING_KEY, 1, job_id)
+        pipe.execute()
+        
+        logger.info(f"✅ Job {job_id} finished: {status.value}")
+    
+    def requeue_stale(self, stale_after: float) -> List[str]:
+        """
+        重新入队心跳超时的任务（worker 崩溃或被杀），清理已过期的任务ID
+        
+        取出后一直未开始执行（worker 在 dequeue 与 claim 之间崩溃）的任务，
+        连续两次检查都处于该状态时同样重新入队。
+        
+        Args:
+            stale_after: 心跳超时时间（秒）
+            
+        Returns:
+            重新入队的任务ID列表
+        """
+        requeued = []
+        unclaimed = set()
+        deadline = time.time() - stale_after
+        
+        for job_id in self.redis_client.lrange(_PROCESSING_KEY, 0, -1):
+            key = self._job_key(job_id)
+            with self.redis_client.pipeline() as pipe:
+                try:
+                    pipe.watch(key)
+                    status, heartbeat_at = pipe.hmget(key, "status", "heartbeat_at")
+                    if status == JobStatus.RUNNING.value and float(heartbeat_at or 0) >= deadline:
+                        continue
+                    if status == JobStatus.QUEUED.value and job_id not in self._unclaimed:
+                        # 刚被 dequeue、即将 claim 的任务，下次检查时再确认
+                        unclaimed.add(job_id)
+                        continue
+                    
+                    pipe.multi()
+                    pipe.lrem(_PROCESSING_KEY, 1, job_id)
+                    if status == JobStatus.QUEUED.value:
+                        pipe.rpush(_QUEUE_KEY, job_id)
+                        requeued.append(job_id)
+                    elif status == JobStatus.RUNNING.value:
+                        pipe.hset(key, "status", JobStatus.QUEUED.value)
+                        pipe.hdel(key, "worker_id", "started_at", "heartbeat_at")
+                        pipe.rpush(_QUEUE_KEY, job_id)
+                        requeued.append(job_id)
+                    pipe.execute()
+                except redis.WatchError:
+                    continue
+        
+        self._unclaimed = unclaimed
+        if requeued:
+            logger.warning(f"♻️  Requeued {len(requeued)} stale job(s): {requeued}")
+        return requeued
+    
+    def stats(self) -> Dict[str, int]:
+        """队列统计"""
+        return {
+            "queued": self.redis_client.llen(_QUEUE_KEY),
+            "processing": self.redis_client.llen(_PROCESSING_KEY)
+        }
+
+
+def create_job_store() -> JobStore:
+    """
+    根据配置创建任务存储（使用 Redis 配置）
+    
+    Returns:
+        JobStore 实例
+    """
+    settings = get_settings()
+    redis_kwargs = {
+        'host': settings.redis_host,
+        'port': settings.redis_port,
+        'db': settings.redis_db,
+        'socket_timeout': settings.redis_socket_timeout,
+        'socket_connect_timeout': settings.redis_socket_connect_timeout,
+        'decode_responses': True
+    }
+    if settings.redis_password:
+        redis_kwargs['password'] = settings.redis_password
+        if settings.redis_username:
+            redis_kwargs['username'] = settings.redis_username
+    
+    return JobStore(
+        redis.Redis(**redis_kwargs),
+        result_ttl=settings.job_result_ttl,
+        queued_ttl=settings.job_queued_ttl
+    )
@@ -0,0 +1,141 @@
+"""
+异步查询任务 worker 池
+
+在独立进程中运行（``python worker.py``），与 API 进程共享 Redis 任务存储：
+- ``concurrency`` 个协程并发从队列取任务，调用 ``agent.aprocess_query`` 执行
+- 执行期间定期刷新心跳，并检查取消请求（取消时中断正在执行的协程）
+- 维护协程定期将心跳超时的任务（worker 崩溃）重新入队
+"""
+import asyncio
+import os
+import socket
+import uuid
+from typing import Any, Optional
+
+from .job_store import JobStatus, JobStore
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class JobWorker:
+    """任务 worker 池（单进程内多个并发执行协程）"""
+    
+    def __init__(
+        self,
+        agent: Any,
+        store: JobStore,
+        concurrency: int = 4,
+        heartbeat_interval: float = 5.0,
+        stale_timeout: float = 60.0,
+        poll_timeout: float = 1.0
+    ):
+        """
+        初始化 worker 池
+        
+        Args:
+            agent: IntelligentAgent 实例（需提供 aprocess_query）
+            store: 任务存储
+            concurrency: 同时执行的任务数
+            heartbeat_interval: 心跳与取消检查间隔（秒）
+            stale_timeout: 心跳超时后任务重新入队（秒）
+            poll_timeout: 队列阻塞等待时间（秒），决定停止时的响应速度
+        """
+        self.agent = agent
+        self.store = store
+        self.concurrency = max(1, concurrency)
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_timeout = stale_timeout
+        self.poll_timeout = poll_timeout
+        
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stopping = asyncio.Event()
+        self._tasks: list = []
+    
+    async def start(self) -> None:
+        """启动执行协程与维护协程（立即返回）"""
+        self._stopping.clear()
+        self._tasks = [
+            asyncio.create_task(self._consume(i), name=f"job-worker-{i}")
+            for i in range(self.concurrency)
+        ]
+        self._tasks.append(asyncio.create_task(self._maintain(), name="job-worker-maintenance"))
+        logger.info(f"🚀 Job worker {self.worker_id} started (concurrency={self.concurrency})")
+    
+    async def stop(self) -> None:
+        """停止取新任务，并等待正在执行的任务结束"""
+        self._stopping.set()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info(f"Job worker {self.worker_id} stopped")
+    
+    async def run(self) -> None:
+        """启动并一直运行，直到 stop() 被调用"""
+        await self.start()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+    
+    async def _consume(self, index: int) -> None:
+        """执行协程：循环取任务并执行"""
+        while not self._stopping.is_set():
+            try:
+                job_id = await asyncio.to_thread(self.store.dequeue, self.poll_timeout)
+            except Exception as e:
+                logger.error(f"Job worker {index}: failed to dequeue: {e}")
+                await asyncio.sleep(self.poll_timeout)
+                continue
+            
+            if job_id is not None:
+                await self.run_job(job_id)
+    
+    async def _maintain(self) -> None:
+        """维护协程：重新入队心跳超时的任务"""
+        while not self._stopping.is_set():
+            try:
+                await asyncio.to_thread(self.store.requeue_stale, self.stale_timeout)
+            except Exception as e:
+                logger.error(f"Job worker: failed to requeue stale jobs: {e}")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.stale_timeout / 2)
+            except asyncio.TimeoutError:
+                pass
+    
+    async def run_job(self, job_id: str) -> Optional[JobStatus]:
+        """
+        执行单个任务
+        
+        Args:
+            job_id: dequeue 取到的任务ID
+            
+        Returns:
+            任务结束状态，任务已取消或已过期（未执行）时返回 None
+        """
+        request = await asyncio.to_thread(self.store.claim, job_id, self.worker_id)
+        if request is None:
+            return None
+        
+        logger.info(f"▶️  Job {job_id} started on {self.worker_id}")
+        task = asyncio.create_task(self.agent.aprocess_query(**request))
+        
+        try:
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=self.heartbeat_interval)
+                if done:
+                    break
+                if await asyncio.to_thread(self.store.heartbeat, job_id):
+                    task.cancel()
+                    try:
+                        await task
+                    except asyncio.CancelledError:
+                        pass
+                    await asyncio.to_thread(self.store.finish, job_id, JobStatus.CANCELLED)
+                    return JobStatus.CANCELLED
+            
+            result = task.result()
+            status = JobStatus.SUCCEEDED if result.get("success") else JobStatus.FAILED
+            await asyncio.to_thread(self.store.finish, job_id, status, result, result.get("error"))
+            return status
+        
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}", exc_info=True)
+            await asyncio.to_thread(self.store.finish, job_id, JobStatus.FAILED, None, str(e))
+            return JobStatus.FAILED
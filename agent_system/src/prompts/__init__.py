@@ -17,7 +17,7 @@ from .planning import (
     KNOWLEDGE_DEEP_THINKING_PROMPT,
     TEMPLATE_DEEP_THINKING_PROMPT,
 )
-from .execution_prompts import TOOL_EXECUTION_PROMPT
+from .execution_prompts import TOOL_EXECUTION_PROMPT, DIRECT_CONTENT_NOTICE
 from .analysis_prompts import INFORMATION_ANALYSIS_PROMPT
 from .answer_prompts import (
     SIMPLE_INTERACTION_PROMPT,
@@ -26,13 +26,17 @@ from .answer_prompts import (
     COMPLIANCE_ANSWER_PROMPT,
     KNOWLEDGE_ANSWER_PROMPT,
     TEMPLATE_ANSWER_PROMPT,
+    ANSWER_QUERY_WITH_HISTORY,
     get_answer_prompt
 )
 from .deep_thinking_prompts import (
     SUB_QUESTION_ANSWER_PROMPT,
+    SUB_QUESTION_REFINE_PROMPT,
     FAST_MODE_ANSWER_PROMPT,
-    get_sub_question_context
+    get_sub_question_context,
+    get_all_qa_context
 )
+from .budget import PromptBudget, PromptBudgeter, get_prompt_budgeter
 
 __all__ = [
     # Intent recognition
@@ -55,6 +59,7 @@ __all__ = [
     
     # Execution and analysis
     "TOOL_EXECUTION_PROMPT",
+    "DIRECT_CONTENT_NOTICE",
     "INFORMATION_ANALYSIS_PROMPT",
     
     # Simple interaction
@@ -66,11 +71,19 @@ __all__ = [
     "COMPLIANCE_ANSWER_PROMPT",
     "KNOWLEDGE_ANSWER_PROMPT",
     "TEMPLATE_ANSWER_PROMPT",
+    "ANSWER_QUERY_WITH_HISTORY",
     "get_answer_prompt",
     
     # Deep thinking sub-question answering
     "SUB_QUESTION_ANSWER_PROMPT",
+    "SUB_QUESTION_REFINE_PROMPT",
     "FAST_MODE_ANSWER_PROMPT",
-    "get_sub_question_context"
+    "get_sub_question_context",
+    "get_all_qa_context",
+    
+    # Prompt token budgeting
+    "PromptBudget",
+    "PromptBudgeter",
+    "get_prompt_budgeter"
 ]
 
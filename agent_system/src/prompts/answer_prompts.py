@@ -1,5 +1,8 @@
 """Answer generation prompts for different task types."""
 
+# Wraps the user query when conversation history is injected into an answer prompt
+ANSWER_QUERY_WITH_HISTORY = "【对话历史（用于理解上下文和代词）】\n{context}\n\n【当前问题】\n{user_query}"
+
 
 SIMPLE_INTERACTION_PROMPT = """你是一个友好的AI助手。用户向你打招呼或进行简单交流。
 
@@ -0,0 +1,222 @@
+"""
+Prompt token budgeting.
+
+The fixed part of every prompt that carries the collected information or the
+user's document (the template text with its variable fields empty) is measured
+once, when the budgeter is created, and cached per intent and mode. With the
+tokenizer loaded, the budget left for that content at request time is exact:
+
+    context window - reserved answer - query - max over those prompts of
+    (template overhead + injected history, for prompts that inject history)
+
+Per-step fields that only exist after planning (step titles, execution summary,
+previous QA pairs) are not known up front and are not part of the overhead.
+
+Without the tokenizer every count is a character-count estimate; the budgeter
+and its budgets are then marked ``exact=False`` and the measurement is logged
+as estimated.
+"""
+import string
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from config import get_settings
+from context.token_counter import TOKENIZER_FILE, calculate_tokens, tokenizer_available
+
+from .analysis_prompts import INFORMATION_ANALYSIS_PROMPT
+from .answer_prompts import ANSWER_QUERY_WITH_HISTORY, SIMPLE_INTERACTION_PROMPT, get_answer_prompt
+from .deep_thinking_prompts import SUB_QUESTION_ANSWER_PROMPT
+from .execution_prompts import DIRECT_CONTENT_NOTICE, TOOL_EXECUTION_PROMPT
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Prompts that inject conversation history (the others only carry the query)
+HISTORY_STAGES = frozenset({"answer"})
+
+
+def render_empty(template: str, **values: str) -> str:
+    """
+    Render a template with every variable field empty unless given.
+    
+    Args:
+        template: ``str.format`` template
+        **values: Values for selected fields
+        
+    Returns:
+        Rendered prompt
+    """
+    fields = {name for _, name, _, _ in string.Formatter().parse(template) if name}
+    return template.format(**{name: values.get(name, "") for name in fields})
+
+
+@dataclass(frozen=True)
+class PromptBudget:
+    """Token budget of one request, for the prompt that leaves the least room."""
+    
+    max_context_tokens: int
+    reserved_answer_tokens: int
+    query_tokens: int
+    template_tokens: int  # Fixed overhead of the binding prompt
+    history_tokens: int  # Injected history in the binding prompt (0 if it injects none)
+    stage: str  # Binding prompt: execution / sub_question / analysis / answer
+    exact: bool = True  # False when token counts are character-count estimates (no tokenizer)
+    
+    @property
+    def used_tokens(self) -> int:
+        return self.reserved_answer_tokens + self.query_tokens + self.template_tokens + self.history_tokens
+    
+    @property
+    def available_tokens(self) -> int:
+        """Tokens left for collected information / direct document content."""
+        return max(0, self.max_context_tokens - self.used_tokens)
+
+
+class PromptBudgeter:
+    """Measures prompt template overheads once and budgets requests against them."""
+    
+    def __init__(self, model: Optional[str] = None):
+        """
+        Measure all template overheads.
+        
+        Args:
+            model: Model name for token counting (defaults to settings)
+        """
+        self.model = model or get_settings().model_name
+        self.exact = tokenizer_available()
+        self._overheads: Dict[Tuple[str, bool], Dict[str, int]] = {}
+        self._measure()
+    
+    def _count(self, text: str) -> int:
+        return calculate_tokens(text, self.model)
+    
+    def _measure(self) -> None:
+        """Measure the overhead of each content-carrying prompt per intent and mode."""
+        # Import here to avoid circular dependency
+        from ..agent.state import IntentType
+        
+        execution = self._count(render_empty(
+            TOOL_EXECUTION_PROMPT,
+            collected_information=DIRECT_CONTENT_NOTICE,
+            web_search_available="不可用"
+        ))
+        sub_question = self._count(render_empty(SUB_QUESTION_ANSWER_PROMPT))
+        self.history_wrapper_tokens = self._count(render_empty(ANSWER_QUERY_WITH_HISTORY))
+        
+        for intent in IntentType:
+            if intent == IntentType.SIMPLE_INTERACTION:
+                stages = {"answer": self._count(render_empty(SIMPLE_INTERACTION_PROMPT))}
+                self._overheads[(intent.value, False)] = stages
+                self._overheads[(intent.value, True)] = stages
+                continue
+            
+            analysis = self._count(render_empty(INFORMATION_ANALYSIS_PROMPT, task_type=intent.value))
+            answer = self._count(render_empty(get_answer_prompt(intent)))
+            self._overheads[(intent.value, False)] = {
+                "execution": execution,
+                "analysis": analysis,
+                "answer": answer
+            }
+            # 深度思考模式：文档内容进入子问题回答提示词，最终回答只使用QA对
+            self._overheads[(intent.value, True)] = {
+                "execution": execution,
+                "sub_question": sub_question,
+                "analysis": analysis
+            }
+        
+        overheads = ", ".join(
+            f"{intent}{'/deep' if deep else ''}={max(stages.values())}"
+            for (intent, deep), stages in self._overheads.items()
+        )
+        if self.exact:
+            logger.info(f"Prompt template overheads measured: {overheads}")
+        else:
+            logger.warning(
+                f"Prompt template overheads ESTIMATED from character counts, tokenizer unavailable "
+                f"({TOKENIZER_FILE}); context budgets are approximate: {overheads}"
+            )
+    
+    def template_tokens(self, intent: Optional[str] = None, deep_thinking: bool = False) -> Dict[str, int]:
+        """
+        Cached overhead per prompt for an intent and mode.
+        
+        Args:
+            intent: Intent type (IntentType or its value); None means not yet
+                recognised, and the largest overhead of any document intent is used
+            deep_thinking: Deep thinking mode
+            
+        Returns:
+            Overhead tokens by prompt stage
+        """
+        if intent is not None:
+            return dict(self._overheads[(getattr(intent, "value", intent), deep_thinking)])
+        
+        merged: Dict[str, int] = {}
+        for (name, deep), stages in self._overheads.items():
+            if deep != deep_thinking or name == "simple_interaction":
+                continue
+            for stage, tokens in stages.items():
+                merged[stage] = max(merged.get(stage, 0), tokens)
+        return merged
+    
+    def budget(
+        self,
+        query_tokens: int,
+        history_tokens: int = 0,
+        intent: Optional[str] = None,
+        deep_thinking: bool = False
+    ) -> PromptBudget:
+        """
+        Remaining budget for collected information / direct content.
+        
+        Args:
+            query_tokens: Tokens of the user query
+            history_tokens: Tokens of the formatted history injected into answer prompts
+            intent: Intent type, None if not yet recognised
+            deep_thinking: Deep thinking mode
+            
+        Returns:
+            Budget of the prompt that leaves the least room
+        """
+        settings = get_settings()
+        history_cost = history_tokens + self.history_wrapper_tokens if history_tokens else 0
+        
+        stage, template, history = max(
+            (
+                (stage, tokens, history_cost if stage in HISTORY_STAGES else 0)
+                for stage, tokens in self.template_tokens(intent, deep_thinking).items()
+            ),
+            key=lambda item: item[1] + item[2]
+        )
+        return PromptBudget(
+            max_context_tokens=settings.max_context_tokens,
+            reserved_answer_tokens=settings.reserved_answer_tokens,
+            query_tokens=query_tokens,
+            template_tokens=template,
+            history_tokens=history,
+            stage=stage,
+            exact=self.exact
+        )
+
+
+_budgeter: Optional[PromptBudgeter] = None
+_budgeter_lock = threading.Lock()
+
+
+def get_prompt_budgeter() -> PromptBudgeter:
+    """
+    Get the process-wide prompt budgeter (templates are measured on first call).
+    
+    Call it at startup, after the tokenizer is loaded, so requests never pay
+    for the measurement.
+    
+    Returns:
+        PromptBudgeter instance
+    """
+    global _budgeter
+    if _budgeter is None:
+        with _budgeter_lock:
+            if _budgeter is None:
+                _budgeter = PromptBudgeter()
+    return _budgeter
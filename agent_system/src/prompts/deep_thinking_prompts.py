@@ -47,6 +47,36 @@ SUB_QUESTION_ANSWER_PROMPT = """你是一个专业的文档分析助手。当前
 **请开始回答当前子问题**："""
 
 
+SUB_QUESTION_REFINE_PROMPT = """你是一个专业的文档分析助手。当前处于深度思考模式，各子问题的初稿回答是并行独立生成的，彼此之间没有参考。现在需要结合全部子问题的回答，修订其中一个子问题的回答。
+
+**用户原始问题**：
+{user_query}
+
+**当前子问题（Step {step_index}/{total_steps}）**：
+{sub_question}
+
+**当前子问题的初稿回答**：
+{draft_answer}
+
+**全部子问题及其初稿回答**：
+{all_qa_context}
+
+**任务说明**：
+请参考其他子问题的回答，修订当前子问题的初稿回答，使其与整体保持一致。
+
+**修订要求**：
+1. **以初稿为准**：初稿基于召回的文档内容，不要删除其中的关键信息（数字、日期、术语、引用等）
+2. **统一表述**：与其他回答保持术语、称谓和口径一致
+3. **消除矛盾**：如与其他回答存在矛盾，指出并说明各自依据，不要编造结论
+4. **避免重复**：其他子问题已详细说明的内容，可简要提及而不必展开
+5. **不引入新事实**：只能使用初稿和其他回答中已有的信息
+
+**输出格式**：
+直接输出修订后的答案内容，不需要额外的格式标记或说明文字。
+
+**请开始修订**："""
+
+
 FAST_MODE_ANSWER_PROMPT = """你是一个专业的文档分析助手。当前处于快速模式，需要基于一次性召回的文档内容直接回答用户问题。
 
 **用户问题**：
@@ -92,3 +122,21 @@ def get_sub_question_context(qa_pairs: list) -> str:
     
     return "\n".join(context_lines)
 
+
+def get_all_qa_context(qa_pairs: list) -> str:
+    """
+    Format all QA pairs (full answers) as context for the refinement pass.
+    
+    Args:
+        qa_pairs: List of QAPair dictionaries
+        
+    Returns:
+        Formatted context string
+    """
+    context_lines = []
+    for i, qa in enumerate(qa_pairs, 1):
+        context_lines.append(f"Q{i}: {qa['question']}")
+        context_lines.append(f"A{i}: {qa['answer']}")
+        context_lines.append("")
+    
+    return "\n".join(context_lines)
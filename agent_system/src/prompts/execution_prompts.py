@@ -1,5 +1,9 @@
 """Prompts for execution and tool calling."""
 
+# Prefixed to the collected information in direct content mode
+DIRECT_CONTENT_NOTICE = "📄 **已提供完整文档内容**（直接内容模式，无需再次 recall）\n\n"
+
+
 TOOL_EXECUTION_PROMPT = """你是一个工具调用助手。根据当前执行的步骤，决定是否需要调用工具以及如何调用。
 
 **用户原始问题**：
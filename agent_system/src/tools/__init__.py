@@ -1,8 +1,11 @@
 """Tools for the agent system."""
+from .recall_cache import RecallCache, create_recall_cache
 from .recall_tool import RecallTool, create_recall_tool
 from .web_search_tool import WebSearchTool, create_web_search_tool
 
 __all__ = [
+    "RecallCache",
+    "create_recall_cache",
     "RecallTool",
     "create_recall_tool",
     "WebSearchTool",
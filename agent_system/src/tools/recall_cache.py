@@ -0,0 +1,304 @@
+"""
+Recall 结果缓存
+
+两级缓存：进程内 LRU（带 TTL）+ 可选的 Redis 共享层。
+缓存 key 由规范化后的问题、索引集合、排序后的 doc_ids、top_n、阈值和模型名计算得出，
+并包含每个索引的代数（generation）：文档上传/删除后递增对应索引的代数，
+旧条目不再被命中，随 TTL 自然过期，无需扫描删除。
+"""
+import asyncio
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import redis
+
+from config import get_settings
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Redis key 前缀
+_ENTRY_PREFIX = "agent_recall_cache:entry:"
+_GENERATION_PREFIX = "agent_recall_cache:gen:"
+
+# payload 中影响召回结果的字段（api_key 等凭据不参与 key 计算）
+_KEY_FIELDS = (
+    "es_host",
+    "top_n",
+    "similarity_threshold",
+    "vector_similarity_weight",
+    "model_factory",
+    "model_name",
+    "rerank_factory",
+    "rerank_model_name"
+)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """规范化问题文本：去首尾空白、合并连续空白、转小写"""
+    return _WHITESPACE.sub(" ", question.strip()).lower()
+
+
+class RecallCache:
+    """
+    Recall 结果缓存（线程安全）
+    
+    只缓存召回服务返回成功的原始响应，格式化由调用方完成。
+    Redis 不可用时自动退化为仅进程内缓存。
+    """
+    
+    def __init__(
+        self,
+        ttl: int = 600,
+        max_entries: int = 1024,
+        redis_client: Optional[redis.Redis] = None
+    ):
+        """
+        初始化缓存
+        
+        Args:
+            ttl: 条目有效期（秒）
+            max_entries: 进程内 LRU 最大条目数
+            redis_client: 可选的 Redis 客户端（共享层 + 代数计数器）
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.redis_client = redis_client
+        
+        self._entries: OrderedDict = OrderedDict()  # key -> (expires_at, value)
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        
+        self.hits = 0
+        self.misses = 0
+    
+    # ========================================================================
+    # Key 计算
+    # ========================================================================
+    
+    def _get_generations(self, index_names: List[str]) -> List[int]:
+        """获取各索引的当前代数（优先 Redis，保证多进程一致）"""
+        if self.redis_client is not None and index_names:
+            try:
+                values = self.redis_client.mget([f"{_GENERATION_PREFIX}{name}" for name in index_names])
+                return [int(v) if v else 0 for v in values]
+            except redis.RedisError as e:
+                logger.warning(f"Recall cache: failed to read generations from Redis, using local: {e}")
+        
+        with self._lock:
+            return [self._generations.get(name, 0) for name in index_names]
+    
+    def make_key(self, payload: Dict[str, Any]) -> str:
+        """
+        根据召回请求 payload 计算缓存 key
+        
+        Args:
+            payload: 召回 API 请求体
+            
+        Returns:
+            缓存 key（sha256）
+        """
+        index_names = sorted(payload.get("index_names") or [])
+        doc_ids = sorted(payload.get("doc_ids") or [])
+        
+        key_data = {
+            "question": normalize_question(payload.get("question", "")),
+            "index_names": index_names,
+            "generations": self._get_generations(index_names),
+            "doc_ids": doc_ids,
+            **{field: payload.get(field) for field in _KEY_FIELDS}
+        }
+        raw = json.dumps(key_data, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    
+    # ========================================================================
+    # 读写
+    # ========================================================================
+    
+    def _get_local(self, key: str) -> Optional[Dict[str, Any]]:
+        """从进程内 LRU 读取（过期条目直接淘汰）"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+    
+    def _set_local(self, key: str, value: Dict[str, Any]) -> None:
+        """写入进程内 LRU，超过容量时淘汰最久未使用的条目"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def _get_redis(self, key: str) -> Optional[Dict[str, Any]]:
+        """从 Redis 共享层读取"""
+        if self.redis_client is None:
+            return None
+        try:
+            data = self.redis_client.get(f"{_ENTRY_PREFIX}{key}")
+            return json.loads(data) if data else None
+        except redis.RedisError as e:
+            logger.warning(f"Recall cache: Redis read failed: {e}")
+            return None
+    
+    def _set_redis(self, key: str, value: Dict[str, Any]) -> None:
+        """写入 Redis 共享层"""
+        if self.redis_client is None:
+            return
+        try:
+            self.redis_client.setex(f"{_ENTRY_PREFIX}{key}", self.ttl, json.dumps(value, ensure_ascii=False))
+        except redis.RedisError as e:
+            logger.warning(f"Recall cache: Redis write failed: {e}")
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        读取缓存（先进程内，后 Redis；Redis 命中时回填进程内缓存）
+        
+        Args:
+            key: make_key 计算的缓存 key
+            
+        Returns:
+            缓存的召回响应，未命中返回 None
+        """
+        value = self._get_local(key)
+        if value is None:
+            value = self._get_redis(key)
+            if value is not None:
+                self._set_local(key, value)
+        
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            logger.info(f"Recall cache hit ({key[:12]})")
+        return value
+    
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        """
+        写入缓存（两级同时写入）
+        
+        Args:
+            key: make_key 计算的缓存 key
+            value: 召回服务返回的成功响应
+        """
+        self._set_local(key, value)
+        self._set_redis(key, value)
+    
+    async def aget_key(self, payload: Dict[str, Any]) -> str:
+        """make_key 的异步版本（代数读取涉及 Redis，在线程池中执行）"""
+        if self.redis_client is None:
+            return self.make_key(payload)
+        return await asyncio.to_thread(self.make_key, payload)
+    
+    async def aget(self, key: str) -> Optional[Dict[str, Any]]:
+        """get 的异步版本（进程内命中时不切换线程）"""
+        value = self._get_local(key)
+        if value is not None:
+            self.hits += 1
+            logger.info(f"Recall cache hit ({key[:12]})")
+            return value
+        if self.redis_client is None:
+            self.misses += 1
+            return None
+        return await asyncio.to_thread(self.get, key)
+    
+    async def aset(self, key: str, value: Dict[str, Any]) -> None:
+        """set 的异步版本"""
+        self._set_local(key, value)
+        if self.redis_client is not None:
+            await asyncio.to_thread(self._set_redis, key, value)
+    
+    # ========================================================================
+    # 失效
+    # ========================================================================
+    
+    def invalidate_indexes(self, index_names: List[str]) -> None:
+        """
+        使指定索引相关的所有缓存条目失效（递增索引代数）
+        
+        Args:
+            index_names: 发生文档上传/删除的索引
+        """
+        with self._lock:
+            for name in index_names:
+                self._generations[name] = self._generations.get(name, 0) + 1
+        
+        if self.redis_client is not None and index_names:
+            try:
+                pipe = self.redis_client.pipeline()
+                for name in index_names:
+                    pipe.incr(f"{_GENERATION_PREFIX}{name}")
+                pipe.execute()
+            except redis.RedisError as e:
+                logger.warning(f"Recall cache: failed to bump generations in Redis: {e}")
+        
+        logger.info(f"Recall cache invalidated for indexes: {index_names}")
+    
+    def clear(self) -> None:
+        """清空进程内缓存（Redis 条目随 TTL 过期）"""
+        with self._lock:
+            self._entries.clear()
+        logger.info("Recall cache cleared (local tier)")
+    
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "redis_enabled": self.redis_client is not None
+        }
+
+
+def create_recall_cache() -> Optional[RecallCache]:
+    """
+    根据配置创建 Recall 缓存
+    
+    Returns:
+        RecallCache 实例，未启用时返回 None
+    """
+    settings = get_settings()
+    if not settings.recall_cache_enabled:
+        logger.info("Recall cache disabled")
+        return None
+    
+    redis_client = None
+    if settings.recall_cache_redis_enabled:
+        redis_kwargs = {
+            'host': settings.redis_host,
+            'port': settings.redis_port,
+            'db': settings.redis_db,
+            'socket_timeout': settings.redis_socket_timeout,
+            'socket_connect_timeout': settings.redis_socket_connect_timeout,
+            'decode_responses': True
+        }
+        if settings.redis_password:
+            redis_kwargs['password'] = settings.redis_password
+            if settings.redis_username:
+                redis_kwargs['username'] = settings.redis_username
+        redis_client = redis.Redis(**redis_kwargs)
+    
+    logger.info(
+        f"Recall cache enabled (ttl={settings.recall_cache_ttl}s, "
+        f"max_entries={settings.recall_cache_max_entries}, redis={redis_client is not None})"
+    )
+    return RecallCache(
+        ttl=settings.recall_cache_ttl,
+        max_entries=settings.recall_cache_max_entries,
+        redis_client=redis_client
+    )
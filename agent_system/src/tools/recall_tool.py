@@ -1,14 +1,26 @@
 """Document retrieval tool using remote HTTP API."""
+import asyncio
 import json
-import requests
-from typing import Dict, Any, List, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+import httpx
 from langchain.tools import BaseTool
-from langchain_core.callbacks import CallbackManagerForToolRun
+from langchain_core.callbacks import AsyncCallbackManagerForToolRun, CallbackManagerForToolRun
+from pydantic import PrivateAttr
 
+from .recall_cache import RecallCache
 from ..utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Batch endpoint status codes meaning "not available on this service"
+_BATCH_UNSUPPORTED_STATUS = (404, 405, 501)
+
+# Per-query outcome of a batched search: (text, chunk records) or the error
+SearchOutcome = Union[Tuple[str, List[Dict[str, Any]]], Exception]
+
 
 class RecallTool(BaseTool):
     """
@@ -32,6 +44,7 @@ class RecallTool(BaseTool):
     
     # API configuration
     api_url: str
+    batch_api_url: Optional[str] = None  # Multi-question endpoint (one embedding pass + ES msearch)
     index_names: List[str]
     doc_ids: Optional[List[str]] = None
     es_host: str
@@ -52,154 +65,573 @@ class RecallTool(BaseTool):
     rerank_base_url: Optional[str] = None
     rerank_api_key: Optional[str] = None
     
+    # HTTP client configuration (shared keep-alive pool)
+    timeout: float = 60.0
+    connect_timeout: float = 10.0
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    keepalive_expiry: float = 30.0
+    http2: bool = False
+    
+    # Optional recall result cache (LRU + Redis, TTL)
+    cache: Optional[RecallCache] = None
+    
+    # Shared HTTP clients, created lazily
+    _client: Optional[httpx.Client] = PrivateAttr(default=None)
+    _async_client: Optional[httpx.AsyncClient] = PrivateAttr(default=None)
+    _async_client_loop: Optional[asyncio.AbstractEventLoop] = PrivateAttr(default=None)
+    _closing_tasks: set = PrivateAttr(default_factory=set)
+    _client_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _batch_supported: bool = PrivateAttr(default=True)
+    
     class Config:
         arbitrary_types_allowed = True
     
-    def _run(
+    def _client_options(self) -> Dict[str, Any]:
+        """Connection pool, timeout and protocol options shared by both clients."""
+        http2 = self.http2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("RECALL_HTTP2 is enabled but the 'h2' package is not installed, falling back to HTTP/1.1")
+                http2 = False
+        
+        return {
+            "timeout": httpx.Timeout(self.timeout, connect=self.connect_timeout),
+            "limits": httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry
+            ),
+            "http2": http2
+        }
+    
+    def _get_client(self) -> httpx.Client:
+        """Get the shared sync client (thread-safe, created on first use)."""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = httpx.Client(**self._client_options())
+                    logger.info(f"Recall HTTP client created (max_connections={self.max_connections})")
+        return self._client
+    
+    def _get_async_client(self) -> httpx.AsyncClient:
+        """
+        Get the shared async client for the running event loop.
+        
+        Pooled connections belong to the loop that opened them, so a new client
+        is created if the tool is used from a different loop; the previous one
+        is closed first.
+        """
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_client_loop is not loop:
+            if self._async_client is not None:
+                self._discard_async_client(self._async_client, self._async_client_loop)
+            self._async_client = httpx.AsyncClient(**self._client_options())
+            self._async_client_loop = loop
+            logger.info(f"Recall async HTTP client created (max_connections={self.max_connections})")
+        return self._async_client
+    
+    def _discard_async_client(self, client: httpx.AsyncClient, loop: asyncio.AbstractEventLoop) -> None:
+        """
+        Close an async client created on another event loop.
+        
+        If that loop is still running (another thread), the close is scheduled
+        there. Otherwise the loop is gone and the client is closed from the
+        current loop; connections bound to the dead loop cannot be shut down
+        cleanly, so only the pool is released and the error is logged.
+        
+        Args:
+            client: Client being replaced
+            loop: Event loop the client was created on
+        """
+        if loop.is_running() and not loop.is_closed():
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+            return
+        
+        async def close_quietly():
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.debug(f"Previous recall async HTTP client closed with error: {str(e)}")
+        
+        task = asyncio.get_running_loop().create_task(close_quietly())
+        self._closing_tasks.add(task)
+        task.add_done_callback(self._closing_tasks.discard)
+    
+    def _build_payload(
         self,
         query: str,
-        run_manager: Optional[CallbackManagerForToolRun] = None,
         index_names: Optional[List[str]] = None,
         doc_ids: Optional[List[str]] = None
-    ) -> str:
+    ) -> Dict[str, Any]:
         """
-        Execute document retrieval via HTTP API.
+        Build the recall API request payload.
         
         Args:
             query: Search query
-            run_manager: Callback manager for the tool run
             index_names: Optional override for index names
             doc_ids: Optional override for document IDs
             
         Returns:
-            Formatted search results
+            Request payload
         """
-        try:
-            # Use provided parameters or fall back to instance defaults
-            final_index_names = index_names if index_names is not None else self.index_names
-            final_doc_ids = doc_ids if doc_ids is not None else self.doc_ids
-            
-            logger.info(f"Executing recall with query: {query[:100]}...")
-            logger.info(f"Using index_names: {final_index_names}")
-            if final_doc_ids:
-                logger.info(f"Using doc_ids: {final_doc_ids}")
+        # Use provided parameters or fall back to instance defaults
+        final_index_names = index_names if index_names is not None else self.index_names
+        final_doc_ids = doc_ids if doc_ids is not None else self.doc_ids
+        
+        logger.info(f"Executing recall with query: {query[:100]}...")
+        logger.info(f"Using index_names: {final_index_names}")
+        if final_doc_ids:
+            logger.info(f"Using doc_ids: {final_doc_ids}")
+        
+        # Prepare request payload
+        payload = {
+            "question": query,
+            "index_names": final_index_names,
+            "es_host": self.es_host,
+            "top_n": self.top_n,
+            "similarity_threshold": self.similarity_threshold,
+            "vector_similarity_weight": self.vector_similarity_weight,
+            "model_factory": self.model_factory,
+            "model_name": self.model_name,
+            "model_base_url": self.model_base_url,
+            "api_key": self.api_key
+        }
+        
+        # Add optional doc_ids if provided
+        if final_doc_ids:
+            payload["doc_ids"] = final_doc_ids
+        
+        # Add rerank configuration if enabled
+        if self.use_rerank and self.rerank_model_name:
+            payload.update({
+                "rerank_factory": self.rerank_factory,
+                "rerank_model_name": self.rerank_model_name,
+                "rerank_base_url": self.rerank_base_url,
+                "rerank_api_key": self.rerank_api_key
+            })
+        
+        logger.info(f"Calling recall API: {self.api_url}")
+        logger.info(f"Payload: {json.dumps(payload, ensure_ascii=False, indent=2)}")
+        
+        return payload
+    
+    @staticmethod
+    def _to_chunk_record(chunk: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert a raw recall API chunk into a structured chunk record."""
+        page_nums = chunk.get("page_num_int", [])
+        return {
+            "chunk_id": chunk.get("chunk_id", ""),
+            "doc_name": chunk.get("docnm_kwd", "Unknown"),
+            "page_num": page_nums[0] if page_nums else None,
+            "content": chunk.get("content_with_weight", ""),
+            "similarity": chunk.get("similarity", 0) or 0
+        }
+    
+    @staticmethod
+    def format_chunks(chunks: List[Dict[str, Any]]) -> str:
+        """
+        Format chunk records as text for the LLM.
+        
+        Args:
+            chunks: Chunk records (see _to_chunk_record)
             
-            # Prepare request payload
-            payload = {
-                "question": query,
-                "index_names": final_index_names,
-                "es_host": self.es_host,
-                "top_n": self.top_n,
-                "similarity_threshold": self.similarity_threshold,
-                "vector_similarity_weight": self.vector_similarity_weight,
-                "model_factory": self.model_factory,
-                "model_name": self.model_name,
-                "model_base_url": self.model_base_url,
-                "api_key": self.api_key
-            }
+        Returns:
+            Formatted document list
+        """
+        formatted_results = []
+        for i, chunk in enumerate(chunks, 1):
+            result_str = f"【文档 {i}】"
+            result_str += f"\n来源：{chunk['doc_name']}"
+            if chunk.get("page_num") is not None:
+                result_str += f" (第{chunk['page_num']}页)"
+            # 不显示相似度（按用户修改意图）
+            result_str += f"\n内容：{chunk['content']}\n"
+            formatted_results.append(result_str)
+        
+        # 返回格式化的文档列表（不包含额外的装饰字符）
+        return "\n".join(formatted_results)
+    
+    def _parse_response(self, result: Dict[str, Any]) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Parse the recall API response into text for the LLM and chunk records.
+        
+        Args:
+            result: Parsed JSON response of the recall API
             
-            # Add optional doc_ids if provided
-            if final_doc_ids:
-                payload["doc_ids"] = final_doc_ids
+        Returns:
+            Tuple of (formatted search results, chunk records); the records are
+            empty when the request failed or nothing was found
+        """
+        # Log full API response for debugging
+        logger.info(f"Recall API full response: {json.dumps(result, ensure_ascii=False, indent=2)[:1000]}...")
+        
+        # Check if request was successful
+        if not result.get("success"):
+            error_msg = result.get("message", "Unknown error")
+            logger.error(f"Recall API returned error: {error_msg}")
+            logger.error(f"Full response: {result}")
+            return f"检索失败: {error_msg}", []
+        
+        # Extract chunks from response
+        data = result.get("data", {})
+        chunks = data.get("chunks", [])
+        
+        logger.info(f"Recall API response - success: {result.get('success')}, total: {data.get('total')}, chunks: {len(chunks)}")
+        
+        if not chunks:
+            logger.error(f"❌ No chunks returned despite total={data.get('total')}")
+            logger.error(f"Possible cause: All results filtered by similarity_threshold={self.similarity_threshold}")
+            logger.error(f"API message: {result.get('message')}")
             
-            # Add rerank configuration if enabled
-            if self.use_rerank and self.rerank_model_name:
-                payload.update({
-                    "rerank_factory": self.rerank_factory,
-                    "rerank_model_name": self.rerank_model_name,
-                    "rerank_base_url": self.rerank_base_url,
-                    "rerank_api_key": self.rerank_api_key
-                })
+            # Show what was filtered out
+            if data.get('total', 0) > 0:
+                logger.error(f"⚠️  Found {data.get('total')} results but all filtered by threshold")
+                logger.error(f"Consider: 1) Lower similarity_threshold, 2) Use more specific query, 3) Check if rerank is working")
+            return "未找到相关信息。", []
+        
+        total = data.get("total", len(chunks))
+        logger.info(f"Found {len(chunks)} chunks from total {total} results")
+        
+        records = [self._to_chunk_record(chunk) for chunk in chunks]
+        
+        # 记录元数据
+        if data.get("rerank_used"):
+            logger.info(f"使用重排序模型: {data.get('rerank_model')}")
+        
+        logger.info(f"Recall completed successfully. Processing time: {result.get('processing_time', 0):.2f}s")
+        logger.info(f"Returning {len(records)} formatted chunks")
+        
+        return self.format_chunks(records), records
+    
+    def _request_error(self, error: Exception) -> RuntimeError:
+        """Log a failed recall request and wrap it as RuntimeError."""
+        if isinstance(error, httpx.TimeoutException):
+            error_msg = "Recall API request timeout"
+            logger.error(error_msg)
+        elif isinstance(error, httpx.HTTPError):
+            error_msg = f"Recall API request failed: {str(error)}"
+            logger.error(error_msg, exc_info=True)
+        else:
+            error_msg = f"Error during recall: {str(error)}"
+            logger.error(error_msg, exc_info=True)
+        return RuntimeError(error_msg)
+    
+    def _post(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Send one recall request (pooled keep-alive connection)."""
+        response = self._get_client().post(self.api_url, json=payload)
+        response.raise_for_status()
+        return response.json()
+    
+    async def _apost(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Async version of _post."""
+        response = await self._get_async_client().post(self.api_url, json=payload)
+        response.raise_for_status()
+        return response.json()
+    
+    def _fetch(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Call the recall API, serving repeated requests from the cache.
+        
+        Args:
+            payload: Request payload
             
-            logger.info(f"Calling recall API: {self.api_url}")
-            logger.info(f"Payload: {json.dumps(payload, ensure_ascii=False, indent=2)}")
+        Returns:
+            Parsed JSON response (only successful responses are cached)
+        """
+        cache_key = self.cache.make_key(payload) if self.cache else None
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        result = self._post(payload)
+        
+        if cache_key and result.get("success"):
+            self.cache.set(cache_key, result)
+        return result
+    
+    async def _afetch(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Async version of _fetch."""
+        cache_key = await self.cache.aget_key(payload) if self.cache else None
+        if cache_key:
+            cached = await self.cache.aget(cache_key)
+            if cached is not None:
+                return cached
+        
+        result = await self._apost(payload)
+        
+        if cache_key and result.get("success"):
+            await self.cache.aset(cache_key, result)
+        return result
+    
+    # ========================================================================
+    # Batch recall
+    # ========================================================================
+    
+    def _use_batch(self, count: int) -> bool:
+        """Whether to send count questions to the batch endpoint."""
+        return bool(self.batch_api_url) and self._batch_supported and count > 1
+    
+    @staticmethod
+    def _build_batch_payload(payloads: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Build the batch request: the shared recall configuration plus all questions.
+        
+        Args:
+            payloads: Single-question payloads (same indexes, doc_ids and models)
             
-            # Make HTTP request
-            response = requests.post(
-                self.api_url,
-                json=payload,
-                timeout=60
+        Returns:
+            Batch request payload
+        """
+        batch_payload = {k: v for k, v in payloads[0].items() if k != "question"}
+        batch_payload["questions"] = [payload["question"] for payload in payloads]
+        return batch_payload
+    
+    @staticmethod
+    def _parse_batch_response(response: httpx.Response, count: int) -> List[Dict[str, Any]]:
+        """
+        Split a batch response into single-question responses.
+        
+        The batch endpoint answers ``{"success": true, "data": {"results": [...]}}``
+        where each result has the same shape as a single recall response, in
+        question order.
+        
+        Raises:
+            httpx.HTTPStatusError: Non-2xx response
+            RuntimeError: Batch request failed or result count mismatch
+        """
+        response.raise_for_status()
+        result = response.json()
+        if not result.get("success"):
+            raise RuntimeError(f"Batch recall failed: {result.get('message', 'Unknown error')}")
+        
+        results = (result.get("data") or {}).get("results") or []
+        if len(results) != count:
+            raise RuntimeError(f"Batch recall returned {len(results)} results for {count} questions")
+        return results
+    
+    def _batch_failed(self, error: Exception) -> None:
+        """Log a failed batch request; disable batching if the endpoint doesn't exist."""
+        if isinstance(error, httpx.HTTPStatusError) and error.response.status_code in _BATCH_UNSUPPORTED_STATUS:
+            self._batch_supported = False
+            logger.warning(
+                f"Batch recall endpoint not available ({error.response.status_code}), "
+                f"using concurrent single recalls from now on"
             )
-            response.raise_for_status()
-            
-            result = response.json()
-            
-            # Log full API response for debugging
-            logger.info(f"Recall API full response: {json.dumps(result, ensure_ascii=False, indent=2)[:1000]}...")
-            
-            # Check if request was successful
-            if not result.get("success"):
-                error_msg = result.get("message", "Unknown error")
-                logger.error(f"Recall API returned error: {error_msg}")
-                logger.error(f"Full response: {result}")
-                return f"检索失败: {error_msg}"
-            
-            # Extract chunks from response
-            data = result.get("data", {})
-            chunks = data.get("chunks", [])
-            
-            logger.info(f"Recall API response - success: {result.get('success')}, total: {data.get('total')}, chunks: {len(chunks)}")
-            
-            if not chunks:
-                logger.error(f"❌ No chunks returned despite total={data.get('total')}")
-                logger.error(f"Possible cause: All results filtered by similarity_threshold={self.similarity_threshold}")
-                logger.error(f"API message: {result.get('message')}")
-                
-                # Show what was filtered out
-                if data.get('total', 0) > 0:
-                    logger.error(f"⚠️  Found {data.get('total')} results but all filtered by threshold")
-                    logger.error(f"Consider: 1) Lower similarity_threshold, 2) Use more specific query, 3) Check if rerank is working")
-                return "未找到相关信息。"
-            
-            # Format results
-            formatted_results = []
-            total = data.get("total", len(chunks))
+        else:
+            logger.warning(f"Batch recall failed, falling back to concurrent single recalls: {error}")
+    
+    def _post_batch(self, payloads: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+        """Send all questions in one batch request; None if the batch request failed."""
+        logger.info(f"Calling batch recall API with {len(payloads)} questions: {self.batch_api_url}")
+        try:
+            response = self._get_client().post(self.batch_api_url, json=self._build_batch_payload(payloads))
+            return self._parse_batch_response(response, len(payloads))
+        except Exception as e:
+            self._batch_failed(e)
+            return None
+    
+    async def _apost_batch(self, payloads: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+        """Async version of _post_batch."""
+        logger.info(f"Calling batch recall API with {len(payloads)} questions: {self.batch_api_url}")
+        try:
+            response = await self._get_async_client().post(
+                self.batch_api_url, json=self._build_batch_payload(payloads)
+            )
+            return self._parse_batch_response(response, len(payloads))
+        except Exception as e:
+            self._batch_failed(e)
+            return None
+    
+    def _try_post(self, payload: Dict[str, Any]) -> Union[Dict[str, Any], Exception]:
+        """_post that returns the error instead of raising it."""
+        try:
+            return self._post(payload)
+        except Exception as e:
+            return e
+    
+    def _fetch_many(
+        self,
+        payloads: List[Dict[str, Any]],
+        max_concurrency: int
+    ) -> List[Union[Dict[str, Any], Exception]]:
+        """
+        Fetch several questions: cache first, then one batch request for the
+        misses, or concurrent single requests when batching is unavailable.
+        
+        Args:
+            payloads: Single-question payloads
+            max_concurrency: Concurrent single requests in the fallback
             
-            logger.info(f"Found {len(chunks)} chunks from total {total} results")
+        Returns:
+            Parsed JSON response or the request error, per payload
+        """
+        keys = [self.cache.make_key(payload) if self.cache else None for payload in payloads]
+        results: List[Any] = [self.cache.get(key) if key else None for key in keys]
+        misses = [i for i, result in enumerate(results) if result is None]
+        if not misses:
+            return results
+        
+        fetched = self._post_batch([payloads[i] for i in misses]) if self._use_batch(len(misses)) else None
+        if fetched is None:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(misses)))) as pool:
+                fetched = list(pool.map(self._try_post, [payloads[i] for i in misses]))
+        
+        for i, result in zip(misses, fetched):
+            results[i] = result
+            if keys[i] and isinstance(result, dict) and result.get("success"):
+                self.cache.set(keys[i], result)
+        return results
+    
+    async def _afetch_many(
+        self,
+        payloads: List[Dict[str, Any]],
+        max_concurrency: int
+    ) -> List[Union[Dict[str, Any], Exception]]:
+        """Async version of _fetch_many."""
+        keys = [await self.cache.aget_key(payload) if self.cache else None for payload in payloads]
+        results: List[Any] = [await self.cache.aget(key) if key else None for key in keys]
+        misses = [i for i, result in enumerate(results) if result is None]
+        if not misses:
+            return results
+        
+        fetched = await self._apost_batch([payloads[i] for i in misses]) if self._use_batch(len(misses)) else None
+        if fetched is None:
+            semaphore = asyncio.Semaphore(max(1, max_concurrency))
             
-            for i, chunk in enumerate(chunks, 1):
-                doc_name = chunk.get("docnm_kwd", "Unknown")
-                content = chunk.get("content_with_weight", "")
-                similarity = chunk.get("similarity", 0)
-                page_nums = chunk.get("page_num_int", [])
-                chunk_id = chunk.get("chunk_id", "")
-                
-                result_str = f"【文档 {i}】"
-                result_str += f"\n来源：{doc_name}"
-                if page_nums:
-                    result_str += f" (第{page_nums[0]}页)"
-                # 不显示相似度（按用户修改意图）
-                result_str += f"\n内容：{content}\n"
-                
-                formatted_results.append(result_str)
+            async def post(payload: Dict[str, Any]) -> Dict[str, Any]:
+                async with semaphore:
+                    return await self._apost(payload)
             
-            # 记录元数据
-            if data.get("rerank_used"):
-                logger.info(f"使用重排序模型: {data.get('rerank_model')}")
+            fetched = await asyncio.gather(*(post(payloads[i]) for i in misses), return_exceptions=True)
+        
+        for i, result in zip(misses, fetched):
+            results[i] = result
+            if keys[i] and isinstance(result, dict) and result.get("success"):
+                await self.cache.aset(keys[i], result)
+        return results
+    
+    def _parse_outcome(self, result: Union[Dict[str, Any], Exception]) -> SearchOutcome:
+        """Parse one response of a batched search, wrapping errors like search does."""
+        if isinstance(result, Exception):
+            return self._request_error(result)
+        try:
+            return self._parse_response(result)
+        except Exception as e:
+            return self._request_error(e)
+    
+    def search(
+        self,
+        query: str,
+        index_names: Optional[List[str]] = None,
+        doc_ids: Optional[List[str]] = None
+    ) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Execute document retrieval and keep the structured chunk records.
+        
+        Args:
+            query: Search query
+            index_names: Optional override for index names
+            doc_ids: Optional override for document IDs
             
-            logger.info(f"Recall completed successfully. Processing time: {result.get('processing_time', 0):.2f}s")
-            logger.info(f"Returning {len(formatted_results)} formatted chunks")
+        Returns:
+            Tuple of (formatted search results, chunk records with chunk_id,
+            doc_name, page_num, content and similarity)
+        """
+        try:
+            payload = self._build_payload(query, index_names, doc_ids)
+            return self._parse_response(self._fetch(payload))
+        except Exception as e:
+            raise self._request_error(e) from e
+    
+    async def asearch(
+        self,
+        query: str,
+        index_names: Optional[List[str]] = None,
+        doc_ids: Optional[List[str]] = None
+    ) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Async version of search.
+        
+        Uses the shared ``httpx.AsyncClient`` so concurrent recalls of one agent
+        run reuse pooled keep-alive connections to the recall service; repeated
+        requests are served from the cache.
+        """
+        try:
+            payload = self._build_payload(query, index_names, doc_ids)
+            return self._parse_response(await self._afetch(payload))
+        except Exception as e:
+            raise self._request_error(e) from e
+    
+    def search_many(
+        self,
+        queries: List[str],
+        index_names: Optional[List[str]] = None,
+        doc_ids: Optional[List[str]] = None,
+        max_concurrency: int = 4
+    ) -> List[SearchOutcome]:
+        """
+        Execute several retrievals against the same indexes and documents.
+        
+        With ``batch_api_url`` configured, all uncached questions go out in one
+        request so the recall service embeds them in a single forward pass and
+        serves them with one ES msearch. Otherwise (or if the batch request
+        fails) they run as concurrent single requests.
+        
+        Args:
+            queries: Search queries
+            index_names: Optional override for index names
+            doc_ids: Optional override for document IDs
+            max_concurrency: Concurrent single requests in the fallback
             
-            # 返回格式化的文档列表（不包含额外的装饰字符）
-            return "\n".join(formatted_results)
+        Returns:
+            Per query, in order: (formatted search results, chunk records),
+            or the RuntimeError raised for that query
+        """
+        payloads = [self._build_payload(query, index_names, doc_ids) for query in queries]
+        return [self._parse_outcome(result) for result in self._fetch_many(payloads, max_concurrency)]
+    
+    async def asearch_many(
+        self,
+        queries: List[str],
+        index_names: Optional[List[str]] = None,
+        doc_ids: Optional[List[str]] = None,
+        max_concurrency: int = 4
+    ) -> List[SearchOutcome]:
+        """Async version of search_many."""
+        payloads = [self._build_payload(query, index_names, doc_ids) for query in queries]
+        return [self._parse_outcome(result) for result in await self._afetch_many(payloads, max_concurrency)]
+    
+    def _run(
+        self,
+        query: str,
+        run_manager: Optional[CallbackManagerForToolRun] = None,
+        index_names: Optional[List[str]] = None,
+        doc_ids: Optional[List[str]] = None
+    ) -> str:
+        """
+        Execute document retrieval via HTTP API.
+        
+        Args:
+            query: Search query
+            run_manager: Callback manager for the tool run
+            index_names: Optional override for index names
+            doc_ids: Optional override for document IDs
             
-        except requests.exceptions.Timeout:
-            error_msg = "Recall API request timeout"
-            logger.error(error_msg)
-            raise RuntimeError(error_msg)
-        except requests.exceptions.RequestException as e:
-            error_msg = f"Recall API request failed: {str(e)}"
-            logger.error(error_msg, exc_info=True)
-            raise RuntimeError(error_msg)
-        except Exception as e:
-            error_msg = f"Error during recall: {str(e)}"
-            logger.error(error_msg, exc_info=True)
-            raise RuntimeError(error_msg)
+        Returns:
+            Formatted search results
+        """
+        return self.search(query, index_names, doc_ids)[0]
     
     async def _arun(
         self,
         query: str,
-        run_manager: Optional[CallbackManagerForToolRun] = None
+        run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
+        index_names: Optional[List[str]] = None,
+        doc_ids: Optional[List[str]] = None
     ) -> str:
         """
         Async execute document retrieval.
@@ -207,13 +639,32 @@ class RecallTool(BaseTool):
         Args:
             query: Search query
             run_manager: Callback manager for the tool run
+            index_names: Optional override for index names
+            doc_ids: Optional override for document IDs
             
         Returns:
             Formatted search results
         """
-        # For now, use synchronous version
-        # In production, implement async requests with httpx
-        return self._run(query, run_manager)
+        return (await self.asearch(query, index_names, doc_ids))[0]
+    
+    def close(self) -> None:
+        """Close the shared sync HTTP client."""
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+    
+    async def aclose(self) -> None:
+        """Close both shared HTTP clients (call on application shutdown)."""
+        self.close()
+        loop = asyncio.get_running_loop()
+        closing = [task for task in self._closing_tasks if task.get_loop() is loop]
+        if closing:
+            await asyncio.gather(*closing)
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+            self._async_client_loop = None
+            logger.info("Recall HTTP clients closed")
 
 
 def create_recall_tool(
@@ -232,7 +683,15 @@ def create_recall_tool(
     rerank_factory: Optional[str] = None,
     rerank_model_name: Optional[str] = None,
     rerank_base_url: Optional[str] = None,
-    rerank_api_key: Optional[str] = None
+    rerank_api_key: Optional[str] = None,
+    timeout: float = 60.0,
+    connect_timeout: float = 10.0,
+    max_connections: int = 20,
+    max_keepalive_connections: int = 10,
+    keepalive_expiry: float = 30.0,
+    http2: bool = False,
+    cache: Optional[RecallCache] = None,
+    batch_api_url: Optional[str] = None
 ) -> RecallTool:
     """
     Factory function to create a configured RecallTool.
@@ -254,7 +713,16 @@ def create_recall_tool(
         rerank_model_name: Name of the rerank model
         rerank_base_url: Base URL for the rerank model
         rerank_api_key: API key for the rerank model
-        
+        timeout: Request timeout in seconds
+        connect_timeout: Connection timeout in seconds
+        max_connections: Maximum concurrent connections to the recall service
+        max_keepalive_connections: Maximum idle keep-alive connections kept in the pool
+        keepalive_expiry: Seconds an idle keep-alive connection is kept
+        http2: Use HTTP/2 if the 'h2' package is installed
+        cache: Optional recall result cache
+        batch_api_url: Optional multi-question recall endpoint (falls back to
+            concurrent single calls when not set or not available)
+            
     Returns:
         Configured RecallTool instance
     """
@@ -274,5 +742,13 @@ def create_recall_tool(
         rerank_factory=rerank_factory,
         rerank_model_name=rerank_model_name,
         rerank_base_url=rerank_base_url,
-        rerank_api_key=rerank_api_key
+        rerank_api_key=rerank_api_key,
+        timeout=timeout,
+        connect_timeout=connect_timeout,
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=keepalive_expiry,
+        http2=http2,
+        cache=cache,
+        batch_api_url=batch_api_url
     )
@@ -7,6 +7,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
 from .logger import setup_logger, get_logger
 from .json_parser import parse_json_response, safe_json_loads
+from .chunk_context import merge_chunks, assemble_chunk_context
 
 # token_counter 已移动到 context 目录，从那里导入
 from context.token_counter import calculate_tokens, should_use_direct_content
@@ -16,6 +17,8 @@ __all__ = [
     "get_logger", 
     "parse_json_response",
     "safe_json_loads",
+    "merge_chunks",
+    "assemble_chunk_context",
     "calculate_tokens",
     "should_use_direct_content"
 ]
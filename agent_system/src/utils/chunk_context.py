@@ -0,0 +1,130 @@
+"""Chunk deduplication and token-budgeted context assembly for recall results."""
+import hashlib
+from typing import Any, Dict, List
+
+from context.token_counter import count_tokens_batch
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+# Relative score bonus per additional step that retrieved the same chunk
+COVERAGE_BONUS = 0.25
+
+
+def _chunk_key(chunk: Dict[str, Any]) -> str:
+    """Deduplication key: chunk_id, or a content hash when the API returned none."""
+    if chunk.get("chunk_id"):
+        return chunk["chunk_id"]
+    raw = f"{chunk.get('doc_name', '')}\n{chunk.get('content', '')}"
+    return "content:" + hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def merge_chunks(
+    existing: List[Dict[str, Any]],
+    new_chunks: List[Dict[str, Any]],
+    step_index: int
+) -> List[Dict[str, Any]]:
+    """
+    Merge the chunks recalled by a step into the retrieved chunks, deduplicated by chunk_id.
+    
+    A chunk recalled again keeps its highest similarity and records every step
+    that retrieved it. Token counts are computed once, when a chunk is first seen,
+    in one batch for all new chunks of the step.
+    
+    Args:
+        existing: Retrieved chunks accumulated so far
+        new_chunks: Chunk records returned by the recall tool for this step
+        step_index: Index of the step that recalled new_chunks
+        
+    Returns:
+        New list of retrieved chunks (existing records are not mutated)
+    """
+    merged = {_chunk_key(chunk): dict(chunk, step_indices=list(chunk["step_indices"])) for chunk in existing}
+    duplicates = 0
+    added = []
+    
+    for chunk in new_chunks:
+        key = _chunk_key(chunk)
+        record = merged.get(key)
+        if record is None:
+            merged[key] = {
+                **chunk,
+                "chunk_id": key,
+                "step_indices": [step_index]
+            }
+            added.append(merged[key])
+            continue
+        
+        duplicates += 1
+        record["similarity"] = max(record.get("similarity", 0), chunk.get("similarity", 0) or 0)
+        if step_index not in record["step_indices"]:
+            record["step_indices"].append(step_index)
+    
+    for record, token_count in zip(added, count_tokens_batch([record.get("content", "") for record in added])):
+        record["token_count"] = token_count
+    
+    if duplicates:
+        logger.info(f"Step {step_index + 1}: {duplicates} duplicate chunk(s) merged, {len(merged)} unique chunks total")
+    return list(merged.values())
+
+
+def chunk_score(chunk: Dict[str, Any]) -> float:
+    """Rank score: similarity, boosted for chunks retrieved by several steps."""
+    coverage = len(chunk.get("step_indices", [])) or 1
+    return (chunk.get("similarity", 0) or 0) * (1 + COVERAGE_BONUS * (coverage - 1))
+
+
+def format_chunk(number: int, chunk: Dict[str, Any]) -> str:
+    """Prompt text of one chunk: header (number, source, page, steps) and content."""
+    steps = "、".join(str(idx + 1) for idx in sorted(chunk["step_indices"]))
+    part = f"【文档 {number}】"
+    part += f"\n来源：{chunk.get('doc_name', 'Unknown')}"
+    if chunk.get("page_num") is not None:
+        part += f" (第{chunk['page_num']}页)"
+    part += f"\n相关步骤：{steps}"
+    part += f"\n内容：{chunk.get('content', '')}\n"
+    return part
+
+
+def assemble_chunk_context(chunks: List[Dict[str, Any]], token_budget: int) -> str:
+    """
+    Assemble retrieved chunks into prompt text under a token budget.
+    
+    Chunks are taken in descending score order (similarity and step coverage)
+    until the budget is used up; a chunk that doesn't fit is skipped so that
+    smaller lower-ranked chunks can still fill the remaining budget.
+    
+    A chunk costs its content tokens plus its header (document number, source,
+    page, steps and separator). Headers are counted with the chunk's rank as
+    its number, which is never smaller than the number it ends up with.
+    
+    Args:
+        chunks: Retrieved chunks (see merge_chunks)
+        token_budget: Maximum tokens for the assembled chunk context
+        
+    Returns:
+        Formatted chunk context (empty string if no chunk fits)
+    """
+    if not chunks or token_budget <= 0:
+        return ""
+    
+    ranked = sorted(chunks, key=chunk_score, reverse=True)
+    header_tokens = count_tokens_batch([
+        format_chunk(rank, dict(chunk, content="")) + "\n" for rank, chunk in enumerate(ranked, 1)
+    ])
+    
+    selected = []
+    used_tokens = 0
+    for chunk, header in zip(ranked, header_tokens):
+        cost = header + chunk.get("token_count", 0)
+        if used_tokens + cost > token_budget:
+            continue
+        selected.append(chunk)
+        used_tokens += cost
+    
+    logger.info(
+        f"Assembled {len(selected)}/{len(chunks)} chunks into context "
+        f"({used_tokens:,}/{token_budget:,} tokens)"
+    )
+    
+    return "\n".join(format_chunk(i, chunk) for i, chunk in enumerate(selected, 1))
@@ -0,0 +1,10 @@
+"""Shared test setup for the agent system."""
+import os
+import sys
+from pathlib import Path
+
+# Add agent_system root to path (same as api.py)
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# Settings require an OpenAI key; tests never call the LLM
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
@@ -0,0 +1,119 @@
+"""Scripted LLM and recall tool for agent tests (no network access)."""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import Field, PrivateAttr
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Chat model that answers each prompt with ``respond(prompt)``.
+    
+    ``delay(prompt)`` seconds pass before each answer, so concurrent calls
+    (``batch`` / ``abatch``) can be made to complete out of order; prompts are
+    recorded in completion order. Streaming yields the answer in small pieces.
+    """
+    
+    respond: Callable[[str], str]
+    delay: Callable[[str], float] = Field(default=lambda prompt: 0.0)
+    stream_piece_size: int = 4
+    
+    _completed: List[str] = PrivateAttr(default_factory=list)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+    
+    @property
+    def completed(self) -> List[str]:
+        """Prompts in the order their answers completed."""
+        return list(self._completed)
+    
+    def _answer(self, messages: List[BaseMessage]) -> str:
+        prompt = messages[-1].content
+        answer = self.respond(prompt)
+        with self._lock:
+            self._completed.append(prompt)
+        return answer
+    
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs):
+        time.sleep(self.delay(messages[-1].content))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._answer(messages)))])
+    
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.delay(messages[-1].content))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._answer(messages)))])
+    
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs
+    ) -> Iterator[ChatGenerationChunk]:
+        answer = self._answer(messages)
+        for i in range(0, len(answer), self.stream_piece_size):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=answer[i:i + self.stream_piece_size]))
+
+
+class StubRecallTool:
+    """
+    Recall tool stand-in with the interface AgentNodes uses.
+    
+    Each query returns one chunk whose content and chunk_id derive from the
+    query; ``delay(query)`` lets concurrent recalls complete out of order.
+    """
+    
+    def __init__(self, delay: Callable[[str], float] = lambda query: 0.0, fail: Tuple[str, ...] = ()):
+        self.delay = delay
+        self.fail = fail
+        self.completed: List[str] = []
+        self._lock = threading.Lock()
+    
+    def _result(self, query: str) -> Tuple[str, List[Dict[str, Any]]]:
+        with self._lock:
+            self.completed.append(query)
+        if query in self.fail:
+            raise RuntimeError(f"Recall API request failed: {query}")
+        chunk = {
+            "chunk_id": f"chunk-{query}",
+            "doc_name": "员工手册.pdf",
+            "page_num": 1,
+            "content": f"关于{query}的内容",
+            "similarity": 0.8
+        }
+        return f"【文档 1】\n内容：{chunk['content']}", [chunk]
+    
+    def search(self, query: str, index_names=None, doc_ids=None) -> Tuple[str, List[Dict[str, Any]]]:
+        time.sleep(self.delay(query))
+        return self._result(query)
+    
+    async def asearch(self, query: str, index_names=None, doc_ids=None) -> Tuple[str, List[Dict[str, Any]]]:
+        await asyncio.sleep(self.delay(query))
+        return self._result(query)
+    
+    def _try(self, query: str):
+        try:
+            return self.search(query)
+        except Exception as e:
+            return e
+    
+    async def _atry(self, query: str):
+        try:
+            return await self.asearch(query)
+        except Exception as e:
+            return e
+    
+    def search_many(self, queries: List[str], index_names=None, doc_ids=None, max_concurrency: int = 4) -> List[Any]:
+        with ThreadPoolExecutor(max_workers=max(1, len(queries))) as pool:
+            return list(pool.map(self._try, queries))
+    
+    async def asearch_many(self, queries: List[str], index_names=None, doc_ids=None, max_concurrency: int = 4) -> List[Any]:
+        return list(await asyncio.gather(*(self._atry(query) for query in queries)))
@@ -0,0 +1,253 @@
+"""
+End-to-end tests of IntelligentAgent's async entry points with a scripted LLM.
+
+The graph, session management and prompt building run for real; the LLM and
+the recall service are replaced. Needs the agent schema in the configured
+PostgreSQL (POSTGRES_* settings); skipped otherwise.
+"""
+import asyncio
+import json
+import re
+
+import httpx
+import psycopg2
+import pytest
+
+import api
+from config import get_settings
+from src.agent.agent import IntelligentAgent
+from tests.fakes import ScriptedChatModel, StubRecallTool
+
+QUERY = "公司年假有多少天？"
+ANSWER = "根据员工手册，工作满1年不满10年的员工年假为5天。"
+PLAN = {
+    "locale": "zh-CN",
+    "thought": "先检索年假规定，再整理答案",
+    "title": "年假天数",
+    "steps": [
+        {"title": "年假天数规定", "step_type": "recall"},
+        {"title": "整理年假规定", "step_type": "synthesis"}
+    ]
+}
+
+
+def respond(prompt):
+    """Answer each kind of agent prompt with a fixed, valid response."""
+    if "工具调用助手" in prompt:
+        title = re.search(r"步骤标题：(.+)", prompt).group(1).strip()
+        if title == "年假天数规定":
+            return json.dumps({"need_tool": True, "tool_name": "recall", "query": title, "reasoning": "检索"})
+        return json.dumps({"need_tool": False, "tool_name": None, "query": None, "reasoning": "整理已有信息"})
+    if "任务分类助手" in prompt:
+        return json.dumps({"intent": "knowledge_reasoning", "confidence": "high", "reasoning": "知识问答"})
+    if "信息充分性分析专家" in prompt:
+        return json.dumps({"is_sufficient": True, "analysis": "信息充分", "missing_aspects": []})
+    if "规划助手" in prompt:
+        return json.dumps(PLAN, ensure_ascii=False)
+    return ANSWER
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    settings = get_settings()
+    try:
+        conn = psycopg2.connect(
+            host=settings.postgres_host,
+            port=settings.postgres_port,
+            database=settings.postgres_db,
+            user=settings.postgres_user,
+            password=settings.postgres_password,
+            connect_timeout=3
+        )
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"PostgreSQL not available: {e}")
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT to_regclass('agent_sessions') IS NOT NULL")
+            if not cursor.fetchone()[0]:
+                pytest.skip("agent schema is not installed")
+    finally:
+        conn.close()
+    
+    # 不依赖 Redis
+    monkeypatch.setattr(settings, "enable_cache", False)
+    monkeypatch.setattr(settings, "recall_cache_enabled", False)
+    
+    agent = IntelligentAgent()
+    agent.llm = agent.agent_nodes.llm = ScriptedChatModel(respond=respond)
+    agent.recall_tool = agent.agent_nodes.recall_tool = StubRecallTool()
+    return agent
+
+
+def _comparable(result):
+    """Response fields that must not depend on the sync/async path."""
+    return {key: value for key, value in result.items() if key not in ("session_id", "execution_time")}
+
+
+@pytest.mark.parametrize("parallel_execution", [False, True])
+def test_async_query_matches_sync(agent, parallel_execution):
+    sync_result = agent.process_query(QUERY, parallel_execution=parallel_execution)
+    async_result = asyncio.run(agent.aprocess_query(QUERY, parallel_execution=parallel_execution))
+    
+    assert async_result["success"] is True, async_result.get("error")
+    assert async_result["final_answer"] == ANSWER
+    assert async_result["detected_intent"] == "knowledge_reasoning"
+    assert [r["step_index"] for r in async_result["execution_results"]] == [0, 1]
+    assert async_result["execution_results"][0]["query"] == "年假天数规定"
+    assert _comparable(async_result) == _comparable(sync_result)
+    
+    history = agent.get_conversation_history(async_result["session_id"])
+    assert [(m["role"], m["content"]) for m in history] == [("user", QUERY), ("assistant", ANSWER)]
+
+
+def test_async_query_continues_session(agent):
+    first = asyncio.run(agent.aprocess_query(QUERY))
+    second = asyncio.run(agent.aprocess_query("那病假呢？", session_id=first["session_id"]))
+    
+    assert second["session_id"] == first["session_id"]
+    assert second["session_message_count"] == 4
+    assert "公司年假有多少天" in next(
+        prompt for prompt in agent.llm.completed if "那病假呢" in prompt and ANSWER in prompt
+    )
+
+
+# ============================================================================
+# Streaming
+# ============================================================================
+
+def _failing_answer(prompt):
+    answer = respond(prompt)
+    if answer == ANSWER:
+        raise RuntimeError("answer model unavailable")
+    return answer
+
+
+async def _collect(agent, **kwargs):
+    return [event async for event in agent.astream_query(QUERY, **kwargs)]
+
+
+@pytest.mark.parametrize("parallel_execution", [False, True])
+def test_stream_events_in_workflow_order(agent, parallel_execution):
+    events = asyncio.run(_collect(agent, parallel_execution=parallel_execution))
+    types = [event["type"] for event in events]
+    
+    assert types[:6] == ["session", "intent", "plan", "step", "step", "analysis"]
+    assert set(types[6:-1]) == {"token"} and len(types[6:-1]) > 1
+    assert types[-1] == "done"
+    
+    session_id = events[0]["session_id"]
+    assert events[1]["content"] == "knowledge_reasoning"
+    assert [step["title"] for step in events[2]["data"]["steps"]] == ["年假天数规定", "整理年假规定"]
+    assert [event["data"]["step_index"] for event in events[3:5]] == [0, 1]
+    assert events[5]["data"]["is_sufficient"] is True
+    assert "".join(event["content"] for event in events[6:-1]) == ANSWER
+    
+    response = events[-1]["data"]
+    assert response["success"] is True and response["session_id"] == session_id
+    assert response["final_answer"] == ANSWER
+    assert _comparable(response) == _comparable(agent.process_query(QUERY, parallel_execution=parallel_execution))
+
+
+def test_stream_ends_with_error_event(agent):
+    agent.llm = agent.agent_nodes.llm = ScriptedChatModel(respond=_failing_answer)
+    
+    events = asyncio.run(_collect(agent))
+    
+    assert [event["type"] for event in events] == ["session", "intent", "plan", "step", "step", "analysis", "error"]
+    error = events[-1]
+    assert "answer model unavailable" in error["content"]
+    assert error["data"]["success"] is False and error["data"]["session_id"] == events[0]["session_id"]
+
+
+async def _post_stream(agent, monkeypatch):
+    # ASGITransport 不触发 startup 事件，直接注入测试用 agent
+    monkeypatch.setattr(api, "agent", agent)
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://agent") as client:
+        response = await client.post("/query/stream", json={"user_query": QUERY})
+    return response
+
+
+def _sse_payloads(response):
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    frames = response.text.split("\n\n")
+    assert frames[-1] == ""
+    assert all(frame.startswith("data: ") and "\n" not in frame for frame in frames[:-1])
+    return [frame[len("data: "):] for frame in frames[:-1]]
+
+
+def test_sse_stream_framing(agent, monkeypatch):
+    payloads = _sse_payloads(asyncio.run(_post_stream(agent, monkeypatch)))
+    
+    assert payloads[-1] == "[DONE]"
+    events = [json.loads(payload) for payload in payloads[:-1]]
+    assert [event["type"] for event in events][:3] == ["session", "intent", "plan"]
+    assert events[0] == {"type": "session", "session_id": events[0]["session_id"]}
+    assert "".join(event["content"] for event in events if event["type"] == "token") == ANSWER
+    assert events[-1]["type"] == "done" and events[-1]["data"]["final_answer"] == ANSWER
+
+
+def test_sse_stream_error_then_done_marker(agent, monkeypatch):
+    agent.llm = agent.agent_nodes.llm = ScriptedChatModel(respond=_failing_answer)
+    
+    payloads = _sse_payloads(asyncio.run(_post_stream(agent, monkeypatch)))
+    
+    assert payloads[-1] == "[DONE]"
+    error = json.loads(payloads[-2])
+    assert error["type"] == "error" and "answer model unavailable" in error["content"]
+    assert all(json.loads(payload)["type"] != "token" for payload in payloads[:-1])
+
+
+# ============================================================================
+# Checkpoints
+# ============================================================================
+
+def _record_deleted_threads(agent, monkeypatch):
+    deleted = []
+    delete_thread = agent.checkpointer.delete_thread
+    
+    def spy(thread_id):
+        deleted.append(thread_id)
+        delete_thread(thread_id)
+    
+    monkeypatch.setattr(agent.checkpointer, "delete_thread", spy)
+    return deleted
+
+
+def test_checkpoints_are_dropped_when_each_run_ends(agent, monkeypatch):
+    deleted = _record_deleted_threads(agent, monkeypatch)
+    
+    first = agent.process_query(QUERY)
+    session_id = first["session_id"]
+    asyncio.run(agent.aprocess_query("那病假呢？", session_id=session_id))
+    asyncio.run(_collect(agent, session_id=session_id))
+    
+    # 每次运行使用独立的检查点线程，结束即删除
+    assert len(deleted) == len(set(deleted)) == 3
+    assert all(thread_id.startswith(f"{session_id}:") for thread_id in deleted)
+    assert agent.checkpointer.stats()["threads"] == 0
+
+
+def test_failed_run_checkpoints_are_dropped(agent, monkeypatch):
+    deleted = _record_deleted_threads(agent, monkeypatch)
+    agent.llm = agent.agent_nodes.llm = ScriptedChatModel(respond=_failing_answer)
+    
+    assert asyncio.run(agent.aprocess_query(QUERY))["success"] is False
+    assert len(deleted) == 1 and agent.checkpointer.stats()["threads"] == 0
+
+
+def test_concurrent_runs_of_a_session_do_not_share_checkpoints(agent):
+    session_id = agent.process_query(QUERY)["session_id"]
+    
+    async def run_both():
+        return await asyncio.gather(
+            agent.aprocess_query("那病假呢？", session_id=session_id),
+            agent.aprocess_query("那婚假呢？", session_id=session_id)
+        )
+    
+    results = asyncio.run(run_both())
+    
+    assert [result["final_answer"] for result in results] == [ANSWER, ANSWER]
+    assert all(result["success"] for result in results)
+    assert agent.checkpointer.stats()["threads"] == 0
@@ -0,0 +1,168 @@
+"""Tests for the bounded in-memory checkpointer and checkpointer backend selection."""
+import sys
+from typing import TypedDict
+
+import pytest
+from langgraph.checkpoint.base import create_checkpoint, empty_checkpoint
+from langgraph.graph import END, START, StateGraph
+
+from config import get_settings
+from src.agent import checkpointer as checkpointer_module
+from src.agent.checkpointer import BoundedMemorySaver, create_checkpointer
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(checkpointer_module.time, "monotonic", clock)
+    return clock
+
+
+def _config(thread_id):
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+
+
+def _put(saver, thread_id, step=0):
+    checkpoint = create_checkpoint(empty_checkpoint(), None, step)
+    checkpoint["channel_values"] = {"answer": f"{thread_id}-{step}"}
+    return saver.put(_config(thread_id), checkpoint, {"step": step}, {"answer": step + 1})
+
+
+def test_lru_eviction_beyond_max_threads(clock):
+    saver = BoundedMemorySaver(max_threads=3, ttl=3600)
+    for i in range(3):
+        _put(saver, f"s{i}")
+        clock.now += 1
+    
+    # 读取 s0 使其成为最近使用，再写入两个新会话
+    assert saver.get_tuple(_config("s0")) is not None
+    _put(saver, "s3")
+    _put(saver, "s4")
+    
+    assert list(saver._threads) == ["s0", "s3", "s4"]
+    assert saver.get_tuple(_config("s1")) is None
+    assert saver.get_tuple(_config("s2")) is None
+    assert saver.stats() == {"threads": 3, "checkpoints": 3, "blobs": 3, "evictions": 2}
+
+
+def test_ttl_expiry(clock):
+    saver = BoundedMemorySaver(max_threads=10, ttl=60)
+    _put(saver, "old")
+    clock.now += 30
+    _put(saver, "recent")
+    clock.now += 31
+    
+    _put(saver, "new")
+    
+    assert list(saver._threads) == ["recent", "new"]
+    assert saver.get_tuple(_config("old")) is None
+    assert saver.evictions == 1
+
+
+def test_unknown_thread_is_not_created_by_reads(clock):
+    saver = BoundedMemorySaver(max_threads=2, ttl=60)
+    
+    assert saver.get_tuple(_config("missing")) is None
+    assert list(saver.list(_config("missing"))) == []
+    assert saver.stats()["threads"] == 0 and "missing" not in saver.storage
+
+
+def test_eviction_drops_tracked_writes_and_blobs(clock):
+    saver = BoundedMemorySaver(max_threads=1, ttl=3600)
+    config = _put(saver, "s0")
+    _put(saver, "s0", step=1)
+    saver.put_writes(config, [("answer", "pending")], task_id="task-1")
+    
+    assert len(saver._blob_keys["s0"]) == 2
+    assert len(saver._write_keys["s0"]) == 1
+    assert len(saver.writes) == 1
+    
+    _put(saver, "s1")
+    
+    assert set(saver._blob_keys) == {"s1"} and saver._write_keys == {}
+    assert len(saver.writes) == 0
+    assert {key[0] for key in saver.blobs} == {"s1"}
+    
+    saver.delete_thread("s1")
+    assert saver.stats() == {"threads": 0, "checkpoints": 0, "blobs": 0, "evictions": 1}
+
+
+class CounterState(TypedDict):
+    count: int
+
+
+def test_graph_runs_across_more_sessions_than_max_threads():
+    saver = BoundedMemorySaver(max_threads=2, ttl=3600)
+    builder = StateGraph(CounterState)
+    builder.add_node("increment", lambda state: {"count": state["count"] + 1})
+    builder.add_edge(START, "increment")
+    builder.add_edge("increment", END)
+    graph = builder.compile(checkpointer=saver)
+    
+    for i in range(5):
+        config = {"configurable": {"thread_id": f"session-{i}"}}
+        assert graph.invoke({"count": i}, config) == {"count": i + 1}
+        assert graph.get_state(config).values == {"count": i + 1}
+    
+    assert list(saver._threads) == ["session-3", "session-4"]
+    assert set(saver._blob_keys) <= {"session-3", "session-4"}
+    assert {key[0] for key in saver.writes} <= {"session-3", "session-4"}
+    assert saver.evictions == 3
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    settings = get_settings()
+    
+    def set_backend(name):
+        monkeypatch.setattr(settings, "checkpointer_backend", name)
+    return set_backend
+
+
+def test_create_memory_and_none_backends(backend):
+    backend("memory")
+    saver = create_checkpointer()
+    assert isinstance(saver, BoundedMemorySaver)
+    assert saver.max_threads == get_settings().checkpointer_max_threads
+    
+    backend("None")
+    assert create_checkpointer() is None
+
+
+@pytest.mark.parametrize("name, factory", [
+    ("postgres", "_create_postgres_checkpointer"),
+    ("redis", "_create_redis_checkpointer")
+])
+def test_create_optional_backends(backend, monkeypatch, name, factory):
+    sentinel = object()
+    monkeypatch.setattr(checkpointer_module, factory, lambda settings: sentinel)
+    backend(name)
+    
+    assert create_checkpointer() is sentinel
+
+
+@pytest.mark.parametrize("name, module", [
+    ("postgres", "langgraph.checkpoint.postgres"),
+    ("redis", "langgraph.checkpoint.redis")
+])
+def test_optional_backend_without_package(backend, monkeypatch, name, module):
+    monkeypatch.setitem(sys.modules, module, None)
+    backend(name)
+    
+    with pytest.raises(RuntimeError, match=f"CHECKPOINTER_BACKEND={name}"):
+        create_checkpointer()
+
+
+def test_unknown_backend(backend):
+    backend("sqlite")
+    
+    with pytest.raises(ValueError, match="Unknown CHECKPOINTER_BACKEND: sqlite"):
+        create_checkpointer()
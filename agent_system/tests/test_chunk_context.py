@@ -0,0 +1,65 @@
+"""Tests for recalled chunk deduplication and budgeted context assembly."""
+from context.token_counter import calculate_tokens
+from src.utils.chunk_context import assemble_chunk_context, chunk_score, format_chunk, merge_chunks
+
+
+def _chunk(chunk_id, similarity, content="年假按工龄计算。", doc_name="员工手册.pdf"):
+    return {"chunk_id": chunk_id, "doc_name": doc_name, "page_num": 3, "content": content, "similarity": similarity}
+
+
+def test_merge_dedups_by_chunk_id():
+    first = merge_chunks([], [_chunk("c1", 0.6), _chunk("c2", 0.5)], step_index=0)
+    merged = merge_chunks(first, [_chunk("c1", 0.8), _chunk("c3", 0.4)], step_index=2)
+    
+    by_id = {chunk["chunk_id"]: chunk for chunk in merged}
+    assert list(by_id) == ["c1", "c2", "c3"]
+    assert by_id["c1"]["similarity"] == 0.8
+    assert by_id["c1"]["step_indices"] == [0, 2]
+    assert by_id["c3"]["step_indices"] == [2]
+    assert by_id["c3"]["token_count"] == calculate_tokens(by_id["c3"]["content"])
+    # 原记录不被修改
+    assert first[0]["step_indices"] == [0] and first[0]["similarity"] == 0.6
+    
+    lower = merge_chunks(merged, [_chunk("c1", 0.1)], step_index=2)
+    assert lower[0]["similarity"] == 0.8 and lower[0]["step_indices"] == [0, 2]
+
+
+def test_merge_falls_back_to_content_hash():
+    chunks = [_chunk(None, 0.5), _chunk("", 0.7), _chunk(None, 0.5, doc_name="其他.pdf")]
+    
+    merged = merge_chunks([], chunks, step_index=1)
+    
+    assert len(merged) == 2
+    assert all(chunk["chunk_id"].startswith("content:") for chunk in merged)
+    assert merged[0]["similarity"] == 0.7
+    assert merge_chunks(merged, [_chunk(None, 0.9)], step_index=3)[0]["step_indices"] == [1, 3]
+
+
+def test_coverage_bonus_ranks_chunks_found_by_several_steps_first():
+    merged = merge_chunks([], [_chunk("broad", 0.6, "A"), _chunk("top", 0.8, "B")], step_index=0)
+    merged = merge_chunks(merged, [_chunk("broad", 0.5, "A")], step_index=1)
+    merged = merge_chunks(merged, [_chunk("broad", 0.5, "A")], step_index=2)
+    
+    broad, top = merged
+    assert chunk_score(broad) > chunk_score(top)
+    context = assemble_chunk_context(merged, 10_000)
+    assert context.index("内容：A") < context.index("内容：B")
+
+
+def test_assembly_counts_headers_and_fills_with_smaller_chunks():
+    large = _chunk("large", 0.9, "条款" * 300)
+    small = _chunk("small", 0.5, "年假五天。")
+    chunks = merge_chunks([], [large, small], step_index=0)
+    small_alone = calculate_tokens(format_chunk(1, chunks[1]))
+    
+    # 大片段放不下时跳过，用排名更低的小片段填充
+    context = assemble_chunk_context(chunks, small_alone + 5)
+    assert "年假五天" in context and "条款" not in context
+    assert context.startswith("【文档 1】")
+    
+    # 预算只够正文、不够标题时不选入
+    assert assemble_chunk_context(chunks, chunks[1]["token_count"] + 1) == ""
+    
+    for budget in (50, 200, 700):
+        context = assemble_chunk_context(chunks, budget)
+        assert calculate_tokens(context) <= budget
@@ -0,0 +1,97 @@
+"""Tests for CompressionManager's incremental (rolling summary) mode, with a stub LLM."""
+from types import SimpleNamespace
+
+import pytest
+
+from context.compression_manager import CompressionManager
+from context.models import Message, MessageType
+
+SUMMARY = (
+    "<conversation_summary><topic>{topic}</topic><key_points><point>p</point></key_points>"
+    "<decisions>无</decisions><context>无</context></conversation_summary>"
+)
+
+
+class RecordingLLM:
+    def __init__(self):
+        self.prompts = []
+    
+    def invoke(self, messages):
+        self.prompts.append(messages[0].content)
+        return SimpleNamespace(content=SUMMARY.format(topic=f"round {len(self.prompts)}"))
+
+
+class NoStorage:
+    """compress_history must not read storage; rounds are assigned when the result is saved."""
+
+
+@pytest.fixture
+def manager():
+    return CompressionManager(llm=RecordingLLM(), storage=NoStorage())
+
+
+def _history(manager, with_summary: bool):
+    tokens = manager.compression_threshold // 4
+    messages = []
+    if with_summary:
+        summary = Message.create_compression_message("s1", SUMMARY.format(topic="earlier"), tokens, "c0", 0)
+        messages.append(summary)
+    for seq in range(1, 7):
+        factory = Message.create_user_message if seq % 2 else Message.create_assistant_message
+        messages.append(factory("s1", f"turn content {seq}", tokens, sequence_number=seq))
+    return messages
+
+
+def test_incremental_merges_only_the_new_span(manager):
+    messages = _history(manager, with_summary=True)
+    
+    compressed, summary, record = manager.compress_history(messages)
+    
+    prompt = manager.llm.prompts[0]
+    assert len(manager.llm.prompts) == 1
+    assert "topic>earlier<" in prompt and "已有摘要" in prompt
+    new_span = [m for m in compressed if m.message_type != MessageType.COMPRESSION]
+    assert all(m.content in prompt for m in new_span)
+    assert messages[-1].content not in prompt  # 保留区间不进入摘要
+    assert compressed[0] is messages[0]  # 上一轮摘要被新摘要取代
+    assert record.parent_compression_id == "c0"
+    assert record.metadata["mode"] == "incremental"
+    assert record.metadata["new_message_count"] == len(new_span)
+    assert summary.compression_id == record.compression_id
+
+
+def test_already_merged_summary_is_not_compressed_again(manager):
+    messages = _history(manager, with_summary=True)
+    merged = Message.create_compression_message("s1", "older", 50, "c-old", 0)
+    merged.is_compressed = True
+    messages.insert(0, merged)
+    
+    compressed, _, record = manager.compress_history(messages)
+    
+    assert merged not in compressed
+    assert record.parent_compression_id == "c0"
+
+
+def test_first_round_uses_full_summary(manager):
+    _, _, record = manager.compress_history(_history(manager, with_summary=False))
+    
+    assert "已有摘要" not in manager.llm.prompts[0]
+    assert record.parent_compression_id is None
+    assert record.metadata["mode"] == "full"
+
+
+def test_full_mode_resummarises_prior_summary(manager):
+    manager.compression_mode = "full"
+    
+    _, _, record = manager.compress_history(_history(manager, with_summary=True))
+    
+    assert "已有摘要" not in manager.llm.prompts[0]
+    assert "topic>earlier<" in manager.llm.prompts[0]
+    assert record.parent_compression_id is None
+
+
+def test_unknown_mode_is_rejected(monkeypatch):
+    from config import get_settings
+    monkeypatch.setattr(get_settings(), "compression_mode", "bogus")
+    with pytest.raises(ValueError):
+        CompressionManager(llm=RecordingLLM(), storage=NoStorage())
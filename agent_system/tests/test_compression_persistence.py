@@ -0,0 +1,130 @@
+"""
+Crash-consistency tests for SessionStorage.save_compression_result.
+
+Needs the agent schema in the configured PostgreSQL (POSTGRES_* settings,
+including docker/init-db/05-agent-compression-lineage.sql); skipped otherwise.
+"""
+import psycopg2
+import pytest
+
+from config import get_settings
+from context.models import CompressionRecord, Message, MessageType, Session
+from context.session_storage import SessionStorage
+
+
+@pytest.fixture
+def storage():
+    settings = get_settings()
+    try:
+        conn = psycopg2.connect(
+            host=settings.postgres_host,
+            port=settings.postgres_port,
+            database=settings.postgres_db,
+            user=settings.postgres_user,
+            password=settings.postgres_password,
+            connect_timeout=3
+        )
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"PostgreSQL not available: {e}")
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM information_schema.columns "
+                "WHERE table_name = 'agent_compression_history' AND column_name = 'parent_compression_id'"
+            )
+            if cursor.fetchone() is None:
+                pytest.skip("agent schema with parent_compression_id is not installed")
+    finally:
+        conn.close()
+    
+    storage = SessionStorage()
+    storage.settings = settings.model_copy(update={"enable_cache": False})
+    return storage
+
+
+@pytest.fixture
+def session(storage):
+    session = Session.create_new(user_id="compression-test")
+    storage.create_session(session)
+    for turn in range(3):
+        storage.add_turn_messages(session.session_id, [
+            Message.create_user_message(session.session_id, f"question {turn}", token_count=10),
+            Message.create_assistant_message(session.session_id, f"answer {turn}", token_count=30)
+        ])
+    return storage.get_session(session.session_id)
+
+
+def _compression(storage, session_id, count=4):
+    messages = storage.get_messages(session_id)[:count]
+    record = CompressionRecord.create_new(
+        session_id=session_id,
+        round=0,
+        original_message_count=len(messages),
+        compressed_token_count=sum(m.token_count for m in messages),
+        summary_token_count=5,
+        summary_content="summary",
+        compressed_message_ids=[m.message_id for m in messages]
+    )
+    summary = Message.create_compression_message(
+        session_id, "summary", 5, record.compression_id, sequence_number=messages[0].sequence_number
+    )
+    return record, summary
+
+
+def _state(storage, session_id):
+    session = storage.get_session(session_id)
+    messages = storage.get_messages(session_id, include_compressed=True)
+    return (
+        session.total_token_count,
+        session.compression_count,
+        sorted((m.message_id, m.is_compressed) for m in messages),
+        len(storage.get_compression_history(session_id))
+    )
+
+
+def test_failure_on_last_step_rolls_back_everything(storage, session):
+    before = _state(storage, session.session_id)
+    record, summary = _compression(storage, session.session_id)
+    # 最后一步（写入压缩记录）违反外键约束
+    record.parent_compression_id = "comp_missing"
+    
+    with pytest.raises(psycopg2.Error):
+        storage.save_compression_result(record, summary)
+    assert _state(storage, session.session_id) == before
+    
+    # 重试成功，统计只计一次
+    record.parent_compression_id = None
+    assert storage.save_compression_result(record, summary) == 1
+    after = storage.get_session(session.session_id)
+    assert after.total_token_count == session.total_token_count - 80 + 5
+    assert after.compression_count == 1
+    active = storage.get_messages(session.session_id)
+    assert [m.message_type for m in active].count(MessageType.COMPRESSION) == 1
+    assert len(active) == 3
+
+
+def test_stale_compression_is_rejected_without_double_counting(storage, session):
+    first, first_summary = _compression(storage, session.session_id)
+    stale, stale_summary = _compression(storage, session.session_id)
+    
+    assert storage.save_compression_result(first, first_summary) == 1
+    after_first = _state(storage, session.session_id)
+    
+    # 基于压缩前历史生成的第二个结果不能再次扣减 token 或写入摘要
+    with pytest.raises(ValueError):
+        storage.save_compression_result(stale, stale_summary)
+    assert _state(storage, session.session_id) == after_first
+
+
+def test_recalculated_stats_match_maintained_counters(storage, session):
+    record, summary = _compression(storage, session.session_id)
+    storage.save_compression_result(record, summary)
+    maintained = storage.get_session(session.session_id)
+    
+    # 人为破坏计数器，再由已保存的每条消息 token_count 重新汇总
+    storage.update_session_stats(session.session_id, total_tokens=1, message_count=1)
+    recalculated = storage.recalculate_session_stats(session.session_id)
+    
+    assert recalculated.total_token_count == maintained.total_token_count == 3 * 40 - 80 + 5
+    assert recalculated.message_count == maintained.message_count == 6
+    assert recalculated.compression_count == 1
@@ -0,0 +1,103 @@
+"""Tests for the background compression worker (fakeredis, no PostgreSQL or LLM access)."""
+import threading
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+
+from context.compression_worker import CompressionWorker
+
+
+class FakeStorage:
+    def __init__(self, total_tokens: int):
+        self.redis_client = fakeredis.FakeRedis(decode_responses=True)
+        self.total_tokens = total_tokens
+    
+    def get_session(self, session_id):
+        return SimpleNamespace(session_id=session_id, total_token_count=self.total_tokens)
+
+
+class BlockingCompressor:
+    """Stand-in for CompressionManager whose summarisation waits for release()."""
+    
+    def __init__(self, storage: FakeStorage):
+        self.storage = storage
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calls = []
+    
+    def compress_session(self, session_id):
+        self.calls.append(session_id)
+        self.started.set()
+        assert self.release.wait(5)
+        self.storage.total_tokens = 0
+        return SimpleNamespace(saved_tokens=100, round=1)
+
+
+@pytest.fixture
+def storage():
+    return FakeStorage(total_tokens=10 ** 9)
+
+
+@pytest.fixture
+def compressor(storage):
+    return BlockingCompressor(storage)
+
+
+@pytest.fixture
+def worker(storage, compressor):
+    worker = CompressionWorker(storage=storage, compression_manager=compressor)
+    yield worker
+    compressor.release.set()
+    worker.shutdown()
+
+
+def test_submit_does_not_wait_for_summarisation(worker, compressor):
+    assert worker.submit("s1")
+    assert compressor.started.wait(5)
+    # 摘要仍在执行，请求路径已经返回
+    assert worker.stats()["pending"] == 1
+    
+    compressor.release.set()
+    assert worker.join(5)
+    assert compressor.calls == ["s1"]
+    assert worker.stats()["completed"] == 1
+
+
+def test_one_compression_per_session(worker, compressor, storage):
+    assert worker.submit("s1")
+    assert compressor.started.wait(5)
+    assert not worker.submit("s1")
+    
+    compressor.release.set()
+    assert worker.join(5)
+    # 锁已释放，会话已低于阈值：再次提交不会重复压缩
+    assert storage.redis_client.get(worker._lock_key("s1")) is None
+    assert worker.submit("s1")
+    assert worker.join(5)
+    assert compressor.calls == ["s1"]
+
+
+def test_session_locked_by_another_process_is_skipped(worker, compressor, storage):
+    storage.redis_client.set(worker._lock_key("s1"), "other-process")
+    
+    assert worker.submit("s1")
+    assert worker.join(5)
+    assert compressor.calls == []
+    assert storage.redis_client.get(worker._lock_key("s1")) == "other-process"
+    assert worker.stats()["skipped"] == 1
+
+
+def test_failure_releases_lock(storage):
+    class FailingCompressor:
+        def compress_session(self, session_id):
+            raise RuntimeError("llm unavailable")
+    
+    worker = CompressionWorker(storage=storage, compression_manager=FailingCompressor())
+    try:
+        assert worker.submit("s1")
+        assert worker.join(5)
+        assert worker.stats()["failed"] == 1
+        assert storage.redis_client.get(worker._lock_key("s1")) is None
+    finally:
+        worker.shutdown()
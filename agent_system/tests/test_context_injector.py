@@ -0,0 +1,85 @@
+"""Tests for slicing a per-request session snapshot in ContextInjector."""
+from datetime import datetime
+
+import pytest
+
+from context.context_injector import ContextInjector
+from context.models import Message, MessageType
+
+
+class NoStorage:
+    """Fails if the injector reads storage while a snapshot is available."""
+    
+    def get_messages(self, *args, **kwargs):
+        pytest.fail("storage must not be read when a snapshot is given")
+    
+    def get_recent_context(self, *args, **kwargs):
+        pytest.fail("storage must not be read when a snapshot is given")
+
+
+class RecentOnlyStorage:
+    """Serves the tail query only; loading the full history fails."""
+    
+    def __init__(self, messages):
+        self.messages = messages
+        self.calls = []
+    
+    def get_recent_context(self, session_id, message_count):
+        self.calls.append(message_count)
+        return self.messages[:1] + self.messages[1:][-message_count:]
+    
+    def get_messages(self, *args, **kwargs):
+        pytest.fail("recent-turn injection must not load the full history")
+
+
+def _message(seq: int, message_type: MessageType) -> Message:
+    return Message(
+        message_id=f"m{seq}",
+        session_id="s1",
+        role=message_type.value,
+        content=f"content {seq}",
+        token_count=5,
+        created_at=datetime.now(),
+        message_type=message_type,
+        sequence_number=seq
+    )
+
+
+@pytest.fixture
+def snapshot():
+    messages = [_message(0, MessageType.COMPRESSION)]
+    for seq in range(1, 11):
+        messages.append(_message(seq, MessageType.USER if seq % 2 else MessageType.ASSISTANT))
+    return messages
+
+
+def test_stages_slice_the_snapshot(snapshot):
+    injector = ContextInjector(storage=NoStorage())
+    strategy = injector.injection_strategy
+    
+    for stage, inject in (
+        ("intent_recognition", injector.inject_for_intent_recognition),
+        ("planning", injector.inject_for_planning),
+        ("answer_generation", injector.inject_for_answer_generation)
+    ):
+        messages = inject("s1", snapshot)
+        regular = [m for m in messages if m.message_type != MessageType.COMPRESSION]
+        assert regular == snapshot[-strategy[stage]["turn_count"] * 2:]
+        assert (messages[0] is snapshot[0]) == strategy[stage]["include_compression"]
+
+
+def test_empty_snapshot_does_not_fall_back_to_storage():
+    injector = ContextInjector(storage=NoStorage())
+    assert injector.inject_for_planning("s1", []) == []
+
+
+def test_recent_turns_use_tail_query(snapshot):
+    storage = RecentOnlyStorage(snapshot)
+    injector = ContextInjector(storage=storage)
+    turn_count = injector.injection_strategy["answer_generation"]["turn_count"]
+    
+    messages = injector.inject_for_answer_generation("s1")
+    assert storage.calls == [turn_count * 2]
+    assert [m for m in messages if m.message_type != MessageType.COMPRESSION] == snapshot[-turn_count * 2:]
+    
+    assert injector.load_snapshot("s1") == storage.get_recent_context("s1", injector.snapshot_message_count)
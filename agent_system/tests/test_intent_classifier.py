@@ -0,0 +1,72 @@
+"""Tests for the local intent recognition fast path (no LLM access)."""
+import pytest
+
+from src.agent.intent_classifier import IntentClassifier, load_examples
+from src.agent.nodes import AgentNodes
+from src.agent.state import IntentType
+
+
+@pytest.fixture(scope="module")
+def classifier():
+    return IntentClassifier(threshold=0.9)
+
+
+@pytest.mark.parametrize("query", ["你好", "谢谢！", "好的，明白了", "Hello", "拜拜", "我之前问了什么？"])
+def test_small_talk_is_decided_by_rules(classifier, query):
+    prediction = classifier.classify(query)
+    
+    assert prediction.intent == IntentType.SIMPLE_INTERACTION
+    assert prediction.tier == "rule"
+
+
+def test_query_matching_several_task_rules_is_not_decided_by_rules():
+    # 既是对比又是合规判断：规则层不下结论
+    assert IntentClassifier.match_rules("对比两份合同是否符合公司规范") is None
+    assert IntentClassifier.match_rules("对比A、B两份投标书") == IntentType.COMPARISON_EVALUATION
+
+
+def test_follow_up_referring_to_history_goes_to_llm(classifier):
+    query = "这两份合同哪个更好"
+    
+    assert classifier.classify(query).intent == IntentType.COMPARISON_EVALUATION
+    prediction = classifier.classify(query, has_history=True)
+    assert prediction.intent is None and prediction.tier == "llm"
+    # 寒暄不受历史影响
+    assert classifier.classify("谢谢", has_history=True).intent == IntentType.SIMPLE_INTERACTION
+
+
+def test_model_tier_decides_only_above_threshold():
+    examples = load_examples()
+    assert {intent for _, intent in examples} == set(IntentType)
+    
+    confident = IntentClassifier(examples=examples, threshold=0.0).classify("年假怎么计算")
+    assert confident.tier == "model"
+    strict = IntentClassifier(examples=examples, threshold=1.01).classify("年假怎么计算")
+    assert strict.intent is None and strict.tier == "llm"
+    assert strict.confidence == confident.confidence
+
+
+class FailingLLM:
+    def invoke(self, messages):
+        raise AssertionError("intent should be decided locally")
+
+
+def _nodes(classifier):
+    nodes = AgentNodes.__new__(AgentNodes)
+    nodes.llm = FailingLLM()
+    nodes.intent_classifier = classifier
+    return nodes
+
+
+def test_intent_node_skips_llm_when_confident(classifier):
+    state = {"user_query": "你好", "mode_type": None, "messages": [], "session_history": []}
+    
+    update = _nodes(classifier).intent_recognition_node(state)
+    
+    assert update["detected_intent"] == IntentType.SIMPLE_INTERACTION
+
+
+def test_fast_path_can_be_disabled():
+    state = {"user_query": "你好", "mode_type": None, "messages": []}
+    
+    assert _nodes(None)._intent_from_classifier(state) is None
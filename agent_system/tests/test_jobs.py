@@ -0,0 +1,167 @@
+"""Tests for the async query job store and worker pool (fakeredis)."""
+import asyncio
+import time
+
+import fakeredis
+import pytest
+
+from src.jobs import JobStatus, JobStore, JobWorker
+
+
+class FakeAgent:
+    """Stand-in for IntelligentAgent.aprocess_query."""
+    
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = []
+    
+    async def aprocess_query(self, **kwargs):
+        self.calls.append(kwargs)
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("agent crashed")
+        return {
+            "success": True,
+            "session_id": kwargs["session_id"],
+            "final_answer": f"answer: {kwargs['user_query']}",
+            "execution_time": self.delay
+        }
+
+
+@pytest.fixture
+def store():
+    return JobStore(fakeredis.FakeRedis(decode_responses=True), result_ttl=60, queued_ttl=600)
+
+
+def _request(query: str = "hello", session_id: str = "s1"):
+    return {"user_query": query, "session_id": session_id}
+
+
+def test_enqueue_and_get(store):
+    first = store.enqueue(_request("a"), "s1")
+    second = store.enqueue(_request("b"), "s2")
+    
+    job = store.get(first)
+    assert job["status"] == JobStatus.QUEUED.value
+    assert job["session_id"] == "s1"
+    assert job["queue_position"] == 0
+    assert store.get(second)["queue_position"] == 1
+    assert store.get("missing") is None
+
+
+def test_queue_position_follows_worker_order(store):
+    jobs = [store.enqueue(_request(str(i)), f"s{i}") for i in range(4)]
+    
+    assert [store.get(job_id)["queue_position"] for job_id in jobs] == [0, 1, 2, 3]
+    
+    # 取出最早的任务后其余任务前移
+    assert store.dequeue(timeout=1) == jobs[0]
+    assert [store.get(job_id)["queue_position"] for job_id in jobs[1:]] == [0, 1, 2]
+    assert store._queue_position(jobs[0]) is None
+
+
+def test_dequeue_claim_finish_sets_result_ttl(store):
+    job_id = store.enqueue(_request(), "s1")
+    
+    assert store.dequeue(timeout=0.1) == job_id
+    assert store.claim(job_id, "w1") == _request()
+    assert store.get(job_id)["status"] == JobStatus.RUNNING.value
+    assert store.stats() == {"queued": 0, "processing": 1}
+    
+    store.finish(job_id, JobStatus.SUCCEEDED, {"success": True, "final_answer": "ok"})
+    
+    job = store.get(job_id)
+    assert job["status"] == JobStatus.SUCCEEDED.value
+    assert job["result"]["final_answer"] == "ok"
+    assert 0 < store.redis_client.ttl(f"agent_job:{job_id}") <= 60
+    assert store.stats() == {"queued": 0, "processing": 0}
+
+
+def test_cancel_queued_job(store):
+    job_id = store.enqueue(_request(), "s1")
+    
+    assert store.cancel(job_id) == JobStatus.CANCELLED.value
+    assert store.get(job_id)["status"] == JobStatus.CANCELLED.value
+    assert store.dequeue(timeout=0.1) is None
+    assert store.cancel("missing") is None
+
+
+def test_claim_skips_job_cancelled_after_dequeue(store):
+    job_id = store.enqueue(_request(), "s1")
+    assert store.dequeue(timeout=0.1) == job_id
+    store.redis_client.hset(f"agent_job:{job_id}", "status", JobStatus.CANCELLED.value)
+    
+    assert store.claim(job_id, "w1") is None
+    assert store.stats()["processing"] == 0
+
+
+def test_requeue_stale_running_job(store):
+    job_id = store.enqueue(_request(), "s1")
+    store.dequeue(timeout=0.1)
+    store.claim(job_id, "w1")
+    store.redis_client.hset(f"agent_job:{job_id}", "heartbeat_at", time.time() - 120)
+    
+    assert store.requeue_stale(stale_after=60) == [job_id]
+    assert store.get(job_id)["status"] == JobStatus.QUEUED.value
+    assert store.dequeue(timeout=0.1) == job_id
+
+
+def test_requeue_unclaimed_job_on_second_check(store):
+    job_id = store.enqueue(_request(), "s1")
+    store.dequeue(timeout=0.1)
+    
+    # First check may race with a worker about to claim the job
+    assert store.requeue_stale(stale_after=60) == []
+    assert store.requeue_stale(stale_after=60) == [job_id]
+    assert store.stats() == {"queued": 1, "processing": 0}
+
+
+def test_worker_runs_jobs(store):
+    agent = FakeAgent()
+    worker = JobWorker(agent, store, concurrency=2, poll_timeout=0.05)
+    job_ids = [store.enqueue(_request(f"q{i}", f"s{i}"), f"s{i}") for i in range(3)]
+    
+    async def run():
+        await worker.start()
+        for _ in range(100):
+            if all(store.get(j)["status"] == JobStatus.SUCCEEDED.value for j in job_ids):
+                break
+            await asyncio.sleep(0.02)
+        await worker.stop()
+    
+    asyncio.run(run())
+    
+    for i, job_id in enumerate(job_ids):
+        job = store.get(job_id)
+        assert job["status"] == JobStatus.SUCCEEDED.value
+        assert job["result"]["final_answer"] == f"answer: q{i}"
+    assert len(agent.calls) == 3
+
+
+def test_worker_records_failure(store):
+    worker = JobWorker(FakeAgent(fail=True), store)
+    job_id = store.enqueue(_request(), "s1")
+    store.dequeue(timeout=0.1)
+    
+    assert asyncio.run(worker.run_job(job_id)) == JobStatus.FAILED
+    job = store.get(job_id)
+    assert job["status"] == JobStatus.FAILED.value
+    assert "agent crashed" in job["error"]
+
+
+def test_worker_cancels_running_job(store):
+    worker = JobWorker(FakeAgent(delay=5), store, heartbeat_interval=0.05)
+    job_id = store.enqueue(_request(), "s1")
+    store.dequeue(timeout=0.1)
+    
+    async def run():
+        task = asyncio.create_task(worker.run_job(job_id))
+        while store.get(job_id)["status"] != JobStatus.RUNNING.value:
+            await asyncio.sleep(0.01)
+        assert store.cancel(job_id) == JobStatus.RUNNING.value
+        return await asyncio.wait_for(task, timeout=2)
+    
+    assert asyncio.run(run()) == JobStatus.CANCELLED
+    assert store.get(job_id)["status"] == JobStatus.CANCELLED.value
+    assert store.stats()["processing"] == 0
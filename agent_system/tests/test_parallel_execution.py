@@ -0,0 +1,222 @@
+"""Tests for parallel plan execution with a scripted LLM and recall tool."""
+import asyncio
+import json
+import re
+
+import pytest
+
+from src.agent.nodes import AgentNodes
+from tests.fakes import ScriptedChatModel, StubRecallTool
+
+STEPS = [
+    ("年假天数", "recall"),
+    ("汇总年假规定", "analysis"),
+    ("病假规定", "recall"),
+    ("婚假规定", "recall"),
+    ("对比三类假期", "synthesis"),
+]
+RECALL_TITLES = [title for title, step_type in STEPS if step_type == "recall"]
+
+
+def _step_title(prompt):
+    match = re.search(r"步骤标题：(.+)", prompt)
+    return match.group(1).strip() if match else None
+
+
+def _respond(prompt):
+    title = _step_title(prompt)
+    if dict(STEPS).get(title) == "recall":
+        return json.dumps({"need_tool": True, "tool_name": "recall", "query": title, "reasoning": "检索"})
+    return json.dumps({"need_tool": False, "tool_name": None, "query": None, "reasoning": f"{title}：整理已有信息"})
+
+
+def _reverse_delay(titles, unit=0.05):
+    """Later items finish first."""
+    return lambda text: unit * (len(titles) - titles.index(text)) if text in titles else 0.0
+
+
+def _state(**overrides):
+    state = {
+        "user_query": "公司的年假、病假和婚假怎么规定？",
+        "plan": {
+            "locale": "zh-CN",
+            "thought": "",
+            "title": "假期规定",
+            "steps": [{"title": title, "step_type": step_type} for title, step_type in STEPS]
+        },
+        "current_step_index": 0,
+        "execution_results": [],
+        "collected_information": "",
+        "retrieved_chunks": [],
+        "qa_pairs": [],
+        "deep_thinking": False,
+        "use_direct_content": False,
+        "enable_web_search": False,
+    }
+    state.update(overrides)
+    return state
+
+
+@pytest.fixture
+def nodes():
+    nodes = AgentNodes.__new__(AgentNodes)
+    nodes.llm = ScriptedChatModel(
+        respond=_respond,
+        delay=lambda prompt: _reverse_delay(RECALL_TITLES)(_step_title(prompt))
+    )
+    nodes.recall_tool = StubRecallTool(delay=_reverse_delay(RECALL_TITLES))
+    nodes.web_search_tool = None
+    
+    # 记录走顺序执行路径的步骤
+    nodes.sequential_steps = []
+    execution_node, aexecution_node = nodes.execution_node, nodes.aexecution_node
+    
+    def spy(state):
+        nodes.sequential_steps.append(state["current_step_index"])
+        return execution_node(state)
+    
+    async def aspy(state):
+        nodes.sequential_steps.append(state["current_step_index"])
+        return await aexecution_node(state)
+    
+    nodes.execution_node, nodes.aexecution_node = spy, aspy
+    return nodes
+
+
+def _assert_plan_order(nodes, update):
+    # 并发的工具决策和召回都是倒序完成的
+    assert [_step_title(prompt) for prompt in nodes.llm.completed[:3]] == RECALL_TITLES[::-1]
+    assert nodes.recall_tool.completed == RECALL_TITLES[::-1]
+    
+    assert nodes.sequential_steps == [1, 4]
+    assert update["current_step_index"] == len(STEPS)
+    assert [result["step_index"] for result in update["execution_results"]] == list(range(len(STEPS)))
+    assert [result["query"] for result in update["execution_results"] if result["tool_used"] == "recall"] == RECALL_TITLES
+    assert [chunk["chunk_id"] for chunk in update["retrieved_chunks"]] == [f"chunk-{title}" for title in RECALL_TITLES]
+    assert [chunk["step_indices"] for chunk in update["retrieved_chunks"]] == [[0], [2], [3]]
+    
+    info = update["collected_information"]
+    assert info.index("【步骤 2: 汇总年假规定】") < info.index("【步骤 5: 对比三类假期】")
+    assert "关于年假天数的内容" not in info  # 召回片段在提示词组装时按预算加入
+    
+    # 顺序步骤在计划顺序中看到之前全部召回步骤的结果
+    last_prompt = next(prompt for prompt in nodes.llm.completed if _step_title(prompt) == "对比三类假期")
+    assert all(f"关于{title}的内容" in last_prompt for title in RECALL_TITLES)
+    middle_prompt = next(prompt for prompt in nodes.llm.completed if _step_title(prompt) == "汇总年假规定")
+    assert "关于年假天数的内容" in middle_prompt and "关于婚假规定的内容" not in middle_prompt
+
+
+def test_parallel_execution_merges_in_plan_order(nodes):
+    _assert_plan_order(nodes, nodes.parallel_execution_node(_state()))
+
+
+def test_async_parallel_execution_merges_in_plan_order(nodes):
+    _assert_plan_order(nodes, asyncio.run(nodes.aparallel_execution_node(_state())))
+
+
+def test_failed_recall_is_recorded_on_its_step(nodes):
+    nodes.recall_tool.fail = ("病假规定",)
+    
+    update = nodes.parallel_execution_node(_state())
+    
+    results = update["execution_results"]
+    assert [result["step_index"] for result in results] == list(range(len(STEPS)))
+    assert "病假规定" in results[2]["error"] and results[0]["error"] is None
+    assert [chunk["chunk_id"] for chunk in update["retrieved_chunks"]] == ["chunk-年假天数", "chunk-婚假规定"]
+
+
+# ============================================================================
+# Deep thinking sub-questions
+# ============================================================================
+
+_SUB_QUESTION = re.compile(r"\*\*当前子问题（Step \d+/\d+）\*\*：\n(.+)")
+
+
+def _sub_question(prompt):
+    return _SUB_QUESTION.search(prompt).group(1).strip()
+
+
+def _prefetched(state):
+    prefetched = {}
+    for i, (title, step_type) in enumerate(STEPS):
+        if step_type == "recall":
+            decision = {"need_tool": True, "tool_name": "recall", "query": title}
+            execution_result = {"step_index": i, "step_title": title, "result": f"关于{title}的内容", "error": None}
+            prefetched[i] = (decision, execution_result, [])
+    return prefetched
+
+
+@pytest.fixture
+def sub_question_nodes():
+    """Nodes whose LLM drafts "初稿：<question>" and refines to "修订：<question>"."""
+    failing = set()
+    
+    def respond(prompt):
+        question = _sub_question(prompt)
+        if "当前子问题的初稿回答" in prompt:
+            return f"修订：{question}"
+        if question in failing:
+            raise RuntimeError(f"draft failed: {question}")
+        return f"初稿：{question}"
+    
+    nodes = AgentNodes.__new__(AgentNodes)
+    nodes.llm = ScriptedChatModel(respond=respond)
+    nodes.failing = failing
+    return nodes
+
+
+def _refine_prompts(nodes):
+    return [prompt for prompt in nodes.llm.completed if "当前子问题的初稿回答" in prompt]
+
+
+def test_sub_questions_draft_only(sub_question_nodes, monkeypatch):
+    monkeypatch.setattr("src.agent.nodes.settings.parallel_deep_thinking_refine", False)
+    state = _state(deep_thinking=True)
+    prefetched = _prefetched(state)
+    prefetched[1] = RuntimeError("decision failed")  # 工具决策失败的步骤不生成回答
+    
+    answers = sub_question_nodes._answer_sub_questions(state, prefetched)
+    
+    assert answers == {0: "初稿：年假天数", 2: "初稿：病假规定", 3: "初稿：婚假规定"}
+    assert _refine_prompts(sub_question_nodes) == []
+    draft = next(p for p in sub_question_nodes.llm.completed if _sub_question(p) == "婚假规定")
+    assert "关于婚假规定的内容" in draft
+
+
+def test_sub_questions_refined_with_all_drafts(sub_question_nodes, monkeypatch):
+    monkeypatch.setattr("src.agent.nodes.settings.parallel_deep_thinking_refine", True)
+    state = _state(deep_thinking=True, qa_pairs=[{"question": "上一轮问题", "answer": "上一轮回答"}])
+    
+    answers = sub_question_nodes._answer_sub_questions(state, _prefetched(state))
+    
+    assert answers == {0: "修订：年假天数", 2: "修订：病假规定", 3: "修订：婚假规定"}
+    refine_prompts = _refine_prompts(sub_question_nodes)
+    assert sorted(_sub_question(p) for p in refine_prompts) == sorted(RECALL_TITLES)
+    for prompt in refine_prompts:
+        assert "Q1: 上一轮问题" in prompt
+        assert all(f"初稿：{title}" in prompt for title in RECALL_TITLES)
+
+
+def test_failed_draft_is_dropped_and_others_refined(sub_question_nodes, monkeypatch):
+    monkeypatch.setattr("src.agent.nodes.settings.parallel_deep_thinking_refine", True)
+    sub_question_nodes.failing.add("病假规定")
+    state = _state(deep_thinking=True)
+    
+    answers = sub_question_nodes._answer_sub_questions(state, _prefetched(state))
+    
+    assert answers == {0: "修订：年假天数", 3: "修订：婚假规定"}
+    assert all("初稿：病假规定" not in prompt for prompt in _refine_prompts(sub_question_nodes))
+    
+    # 只剩一个初稿时不再修订
+    sub_question_nodes.failing.update({"年假天数"})
+    assert sub_question_nodes._answer_sub_questions(state, _prefetched(state)) == {3: "初稿：婚假规定"}
+
+
+def test_async_sub_questions_match_sync(sub_question_nodes, monkeypatch):
+    monkeypatch.setattr("src.agent.nodes.settings.parallel_deep_thinking_refine", True)
+    sub_question_nodes.failing.add("年假天数")
+    state = _state(deep_thinking=True)
+    
+    expected = sub_question_nodes._answer_sub_questions(state, _prefetched(state))
+    
+    assert asyncio.run(sub_question_nodes._aanswer_sub_questions(state, _prefetched(state))) == expected
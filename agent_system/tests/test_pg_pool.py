@@ -0,0 +1,107 @@
+"""Tests for the thread-safe PostgreSQL connection pool (connections are stubbed)."""
+import threading
+import time
+
+import psycopg2
+import pytest
+from psycopg2 import extensions
+
+from context.pg_pool import PoolTimeoutError, PostgresConnectionPool
+
+
+class FakeInfo:
+    def __init__(self):
+        self.transaction_status = extensions.TRANSACTION_STATUS_IDLE
+
+
+class FakeConnection:
+    """Minimal psycopg2 connection stand-in tracking commits/rollbacks."""
+    
+    def __init__(self):
+        self.closed = 0
+        self.info = FakeInfo()
+        self.commits = 0
+        self.rollbacks = 0
+    
+    def commit(self):
+        self.commits += 1
+        self.info.transaction_status = extensions.TRANSACTION_STATUS_IDLE
+    
+    def rollback(self):
+        self.rollbacks += 1
+        self.info.transaction_status = extensions.TRANSACTION_STATUS_IDLE
+    
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(psycopg2, "connect", lambda **kwargs: FakeConnection())
+    return PostgresConnectionPool(pool_size=2, max_overflow=1, timeout=0.2)
+
+
+def test_overflow_connections_are_closed_on_return(pool):
+    conns = [pool.getconn() for _ in range(3)]
+    assert pool.stats()["overflow"] == 1
+    
+    for conn in conns:
+        pool.putconn(conn)
+    
+    stats = pool.stats()
+    assert stats["connections"] == 2
+    assert stats["checked_out"] == 0
+    assert sum(conn.closed for conn in conns) == 1
+
+
+def test_getconn_times_out_when_exhausted(pool):
+    conns = [pool.getconn() for _ in range(3)]
+    with pytest.raises(PoolTimeoutError):
+        pool.getconn()
+    assert pool.stats()["timeouts"] == 1
+    for conn in conns:
+        pool.putconn(conn)
+
+
+def test_waiter_gets_returned_connection(pool):
+    conns = [pool.getconn() for _ in range(3)]
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.getconn(timeout=2)))
+    waiter.start()
+    time.sleep(0.05)
+    pool.putconn(conns[0])
+    waiter.join()
+    
+    assert got == [conns[0]]
+    stats = pool.stats()
+    assert stats["wait_count"] == 1
+    assert stats["max_wait_time"] > 0
+
+
+def test_connection_commits_or_rolls_back(pool):
+    with pool.connection() as conn:
+        pass
+    assert conn.commits == 1
+    
+    with pytest.raises(ValueError):
+        with pool.connection() as conn:
+            raise ValueError("boom")
+    assert conn.rollbacks == 1
+    assert pool.stats()["checked_out"] == 0
+
+
+def test_putconn_rolls_back_open_transaction(pool):
+    conn = pool.getconn()
+    conn.info.transaction_status = extensions.TRANSACTION_STATUS_INTRANS
+    pool.putconn(conn)
+    assert conn.rollbacks == 1
+    assert pool.getconn() is conn
+
+
+def test_closeall_rejects_new_checkouts(pool):
+    conn = pool.getconn()
+    pool.putconn(conn)
+    pool.closeall()
+    assert conn.closed
+    with pytest.raises(psycopg2.pool.PoolError):
+        pool.getconn()
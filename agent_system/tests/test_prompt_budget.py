@@ -0,0 +1,89 @@
+"""Tests for PromptBudgeter: measured template overheads instead of a fixed estimate."""
+from types import SimpleNamespace
+
+import pytest
+
+from config import get_settings
+from context import token_counter
+from context.token_counter import calculate_tokens
+from src.agent.state import IntentType
+from src.prompts import ANSWER_QUERY_WITH_HISTORY, PromptBudgeter, get_answer_prompt
+from src.prompts.budget import render_empty
+
+
+@pytest.fixture(scope="module")
+def budgeter():
+    return PromptBudgeter()
+
+
+def test_render_empty_keeps_literal_braces():
+    assert render_empty("{a}-{{json}}-{b}", b="x") == "-{json}-x"
+
+
+def test_overhead_is_the_measured_template(budgeter):
+    overheads = budgeter.template_tokens(IntentType.SUMMARY_EXTRACTION)
+    
+    assert overheads["answer"] == calculate_tokens(render_empty(get_answer_prompt(IntentType.SUMMARY_EXTRACTION)))
+    assert budgeter.template_tokens("summary_extraction") == overheads
+
+
+def test_budget_is_exact(budgeter):
+    settings = get_settings()
+    answer = budgeter.template_tokens(IntentType.SUMMARY_EXTRACTION)["answer"]
+    
+    budget = budgeter.budget(query_tokens=30, history_tokens=500, intent=IntentType.SUMMARY_EXTRACTION)
+    
+    assert budget.stage == "answer"
+    assert budget.history_tokens == 500 + calculate_tokens(render_empty(ANSWER_QUERY_WITH_HISTORY))
+    assert budget.available_tokens == (
+        settings.max_context_tokens - settings.reserved_answer_tokens - 30 - answer - budget.history_tokens
+    )
+
+
+def test_unknown_intent_uses_largest_overhead(budgeter):
+    unknown = budgeter.budget(query_tokens=10, history_tokens=200)
+    
+    for intent in IntentType:
+        if intent != IntentType.SIMPLE_INTERACTION:
+            assert unknown.available_tokens <= budgeter.budget(10, 200, intent=intent).available_tokens
+
+
+def test_history_only_counts_for_prompts_that_inject_it(budgeter):
+    # 深度思考模式下文档内容不进入最终回答提示词，历史不占用内容预算
+    with_history = budgeter.budget(query_tokens=10, history_tokens=5000, deep_thinking=True)
+    without = budgeter.budget(query_tokens=10, deep_thinking=True)
+    
+    assert with_history.history_tokens == 0
+    assert with_history.available_tokens == without.available_tokens
+
+
+class WordTokenizer:
+    def encode_batch(self, texts):
+        return [SimpleNamespace(ids=text.split()) for text in texts]
+
+
+def test_budget_is_exact_with_tokenizer(monkeypatch, caplog):
+    monkeypatch.setattr(token_counter, "_get_qwen_tokenizer", WordTokenizer)
+    token_counter.clear_token_cache()
+    
+    with caplog.at_level("INFO", logger="src.prompts.budget"):
+        budgeter = PromptBudgeter()
+    token_counter.clear_token_cache()
+    
+    assert budgeter.exact and budgeter.budget(query_tokens=10).exact
+    assert any(record.getMessage().startswith("Prompt template overheads measured") for record in caplog.records)
+
+
+def test_budget_without_tokenizer_is_marked_estimated(monkeypatch, caplog):
+    def missing():
+        raise FileNotFoundError("no tokenizer")
+    monkeypatch.setattr(token_counter, "_get_qwen_tokenizer", missing)
+    token_counter.clear_token_cache()
+    
+    with caplog.at_level("INFO", logger="src.prompts.budget"):
+        budgeter = PromptBudgeter()
+    
+    assert not budgeter.exact and not budgeter.budget(query_tokens=10).exact
+    warnings = [record.getMessage() for record in caplog.records if record.levelname == "WARNING"]
+    assert any("ESTIMATED" in message and str(token_counter.TOKENIZER_FILE) in message for message in warnings)
+    assert not any("overheads measured" in record.getMessage() for record in caplog.records)
@@ -0,0 +1,150 @@
+"""Tests for the agent-side recall cache."""
+import os
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+import fakeredis
+import httpx
+import pytest
+import redis
+
+from src.tools.recall_cache import RecallCache
+from src.tools.recall_tool import create_recall_tool
+
+READER_SRC = Path(__file__).parent.parent.parent / "src"
+
+PAYLOAD = {"question": "年假怎么计算", "index_names": ["user_1"], "top_n": 5}
+RESPONSE = {"success": True, "data": {"chunks": [{"chunk_id": "c1"}]}}
+
+
+@pytest.fixture
+def redis_server():
+    """Real TCP endpoint shared with the reader service (which uses redis.asyncio)."""
+    server = fakeredis.TcpFakeServer(("127.0.0.1", 0), server_type="redis")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def _reader_invalidate(port: int, index_name: str) -> None:
+    """Run the reader's invalidate_index (as upload/delete do) in its own process."""
+    env = {
+        **os.environ,
+        "REDIS_URL": f"redis://127.0.0.1:{port}/0",
+        "AGENT_RECALL_CACHE_REDIS_URL": f"redis://127.0.0.1:{port}/1",
+    }
+    script = (
+        "import asyncio\n"
+        "from config.redis import close_redis\n"
+        "from utils.recall_cache import recall_cache\n"
+        "async def main():\n"
+        f"    await recall_cache.invalidate_index({index_name!r})\n"
+        "    await close_redis()\n"
+        "asyncio.run(main())\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script], cwd=READER_SRC, env=env, capture_output=True, text=True, timeout=60
+    )
+    if result.returncode != 0 and "ModuleNotFoundError" in result.stderr:
+        pytest.skip(f"reader service dependencies unavailable: {result.stderr.strip().splitlines()[-1]}")
+    assert result.returncode == 0, result.stderr
+
+
+@pytest.mark.skipif(not READER_SRC.is_dir(), reason="reader service source not available")
+def test_reader_document_change_invalidates_agent_cache(redis_server):
+    cache = RecallCache(ttl=60, max_entries=10, redis_client=redis.Redis(port=redis_server, db=1, decode_responses=True))
+    cache.set(cache.make_key(PAYLOAD), RESPONSE)
+    assert cache.get(cache.make_key(PAYLOAD)) == RESPONSE
+    
+    _reader_invalidate(redis_server, "user_1")
+    
+    # 同一进程内的本地层也不再命中
+    assert cache.get(cache.make_key(PAYLOAD)) is None
+    # 其他索引不受影响
+    other = {**PAYLOAD, "index_names": ["user_2"]}
+    cache.set(cache.make_key(other), RESPONSE)
+    _reader_invalidate(redis_server, "user_1")
+    assert cache.get(cache.make_key(other)) == RESPONSE
+
+
+@pytest.fixture
+def cache():
+    return RecallCache(ttl=60, max_entries=10, redis_client=fakeredis.FakeRedis(decode_responses=True))
+
+
+def test_key_ignores_question_formatting_and_list_order(cache):
+    payload = {**PAYLOAD, "index_names": ["user_1", "user_2"], "doc_ids": ["d1", "d2"]}
+    same = {**payload, "question": "  年假怎么计算\n", "index_names": ["user_2", "user_1"], "doc_ids": ["d2", "d1"]}
+    
+    assert cache.make_key(same) == cache.make_key(payload)
+    assert cache.make_key({**PAYLOAD, "question": "Annual   Leave"}) == cache.make_key(
+        {**PAYLOAD, "question": "annual leave"}
+    )
+
+
+@pytest.mark.parametrize("field, value", [
+    ("top_n", 10),
+    ("similarity_threshold", 0.5),
+    ("doc_ids", ["d1"]),
+    ("rerank_model_name", "bge-reranker-v2-m3")
+])
+def test_key_changes_with_recall_parameters(cache, field, value):
+    assert cache.make_key({**PAYLOAD, field: value}) != cache.make_key(PAYLOAD)
+
+
+def test_credentials_do_not_change_key(cache):
+    assert cache.make_key({**PAYLOAD, "api_key": "other"}) == cache.make_key(PAYLOAD)
+
+
+def test_invalidation_bumps_generation(cache):
+    key = cache.make_key(PAYLOAD)
+    cache.set(key, RESPONSE)
+    
+    cache.invalidate_indexes(["user_1"])
+    
+    assert cache.redis_client.get("agent_recall_cache:gen:user_1") == "1"
+    assert cache.make_key(PAYLOAD) != key
+    assert cache.get(cache.make_key(PAYLOAD)) is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_local_generation_used_without_redis():
+    cache = RecallCache(ttl=60, max_entries=10)
+    key = cache.make_key(PAYLOAD)
+    
+    cache.invalidate_indexes(["user_2"])
+    assert cache.make_key(PAYLOAD) == key
+    cache.invalidate_indexes(["user_1"])
+    assert cache.make_key(PAYLOAD) != key
+
+
+def test_failed_responses_are_not_cached(cache):
+    responses = [{"success": False, "message": "ES unavailable"}, RESPONSE]
+    requests = []
+    
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json=responses[min(len(requests), len(responses)) - 1])
+    
+    tool = create_recall_tool(
+        api_url="http://recall/api/recall",
+        index_names=["user_1"],
+        es_host="http://es:9200",
+        model_base_url="http://embedding/v1",
+        api_key="test",
+        cache=cache
+    )
+    tool._client = httpx.Client(transport=httpx.MockTransport(handler))
+    
+    assert tool.search("年假怎么计算")[0].startswith("检索失败")
+    assert cache.stats()["entries"] == 0
+    first = tool.search("年假怎么计算")
+    second = tool.search("年假怎么计算")
+    
+    assert first == second
+    assert len(requests) == 2
+    tool.close()
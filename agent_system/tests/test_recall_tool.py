@@ -0,0 +1,273 @@
+"""Tests for RecallTool batch recall and its HTTP clients (httpx.MockTransport, no network)."""
+import asyncio
+import json
+import threading
+import time
+
+import httpx
+import pytest
+
+from src.tools.recall_cache import RecallCache
+from src.tools.recall_tool import RecallTool, create_recall_tool
+
+API_URL = "http://recall/api/recall"
+BATCH_URL = "http://recall/api/recall/batch"
+QUERIES = ["年假天数", "病假规定", "婚假规定"]
+
+
+def _reverse_delay(question):
+    """Earlier queries finish last (batch requests are not delayed)."""
+    return 0.05 * (len(QUERIES) - QUERIES.index(question)) if question in QUERIES else 0.0
+
+
+def _recall_result(question):
+    return {
+        "success": True,
+        "data": {
+            "total": 1,
+            "chunks": [{
+                "chunk_id": f"chunk-{question}",
+                "docnm_kwd": "员工手册.pdf",
+                "page_num_int": [1],
+                "content_with_weight": f"关于{question}的内容",
+                "similarity": 0.8
+            }]
+        }
+    }
+
+
+class RecallService:
+    """Mock recall service: single and batch endpoints, with optional per-question delays."""
+    
+    def __init__(self, batch_status=200, delay=lambda question: 0.0):
+        self.batch_status = batch_status
+        self.delay = delay
+        self.requests = []
+    
+    def _respond(self, request):
+        body = json.loads(request.content)
+        self.requests.append((request.url.path, body.get("questions") or body["question"]))
+        if request.url == BATCH_URL:
+            if self.batch_status != 200:
+                return httpx.Response(self.batch_status, json={"detail": "Not Found"})
+            return httpx.Response(200, json={
+                "success": True,
+                "data": {"results": [_recall_result(question) for question in body["questions"]]}
+            })
+        return httpx.Response(200, json=_recall_result(body["question"]))
+    
+    def handler(self, request):
+        body = json.loads(request.content)
+        time.sleep(self.delay(body.get("question")))
+        return self._respond(request)
+    
+    async def ahandler(self, request):
+        body = json.loads(request.content)
+        await asyncio.sleep(self.delay(body.get("question")))
+        return self._respond(request)
+    
+    def paths(self):
+        return [path for path, _ in self.requests]
+
+
+def _new_tool(batch=True, cache=None):
+    return create_recall_tool(
+        api_url=API_URL,
+        batch_api_url=BATCH_URL if batch else None,
+        index_names=["user_1"],
+        es_host="http://es:9200",
+        model_base_url="http://embedding/v1",
+        api_key="test",
+        cache=cache
+    )
+
+
+def _tool(service, batch=True, cache=None):
+    tool = _new_tool(batch, cache)
+    tool._client = httpx.Client(transport=httpx.MockTransport(service.handler))
+    return tool
+
+
+def _use_async_transport(tool, service):
+    tool._async_client = httpx.AsyncClient(transport=httpx.MockTransport(service.ahandler))
+    tool._async_client_loop = asyncio.get_running_loop()
+
+
+def _chunk_ids(outcomes):
+    return [records[0]["chunk_id"] for _, records in outcomes]
+
+
+def test_batch_request_serves_all_queries():
+    service = RecallService()
+    tool = _tool(service)
+    
+    outcomes = tool.search_many(QUERIES)
+    
+    assert service.requests == [("/api/recall/batch", QUERIES)]
+    assert _chunk_ids(outcomes) == [f"chunk-{query}" for query in QUERIES]
+    assert "关于病假规定的内容" in outcomes[1][0]
+
+
+def test_batch_only_sends_cache_misses():
+    service = RecallService()
+    tool = _tool(service, cache=RecallCache(ttl=60, max_entries=10))
+    tool.search(QUERIES[1])
+    
+    outcomes = tool.search_many(QUERIES)
+    
+    assert service.requests[1:] == [("/api/recall/batch", [QUERIES[0], QUERIES[2]])]
+    assert _chunk_ids(outcomes) == [f"chunk-{query}" for query in QUERIES]
+
+
+@pytest.mark.parametrize("status", [404, 405, 501])
+def test_missing_batch_endpoint_falls_back_and_sticks(status):
+    service = RecallService(batch_status=status)
+    tool = _tool(service)
+    
+    outcomes = tool.search_many(QUERIES)
+    
+    assert tool._batch_supported is False
+    assert service.paths()[0] == "/api/recall/batch"
+    assert sorted(question for _, question in service.requests[1:]) == sorted(QUERIES)
+    assert _chunk_ids(outcomes) == [f"chunk-{query}" for query in QUERIES]
+    
+    # 之后不再尝试批量接口
+    tool.search_many(QUERIES[:2])
+    assert service.paths().count("/api/recall/batch") == 1
+
+
+def test_other_batch_errors_fall_back_without_disabling_batch():
+    service = RecallService(batch_status=500)
+    tool = _tool(service)
+    
+    assert _chunk_ids(tool.search_many(QUERIES)) == [f"chunk-{query}" for query in QUERIES]
+    assert tool._batch_supported is True
+
+
+def test_single_request_fallback_keeps_query_order():
+    service = RecallService(delay=_reverse_delay)
+    tool = _tool(service, batch=False)
+    
+    outcomes = tool.search_many(QUERIES)
+    
+    assert [question for _, question in service.requests] == QUERIES[::-1]
+    assert _chunk_ids(outcomes) == [f"chunk-{query}" for query in QUERIES]
+
+
+def test_failed_single_request_is_returned_in_place():
+    service = RecallService()
+    tool = _tool(service, batch=False)
+    
+    def handler(request):
+        if json.loads(request.content)["question"] == QUERIES[1]:
+            return httpx.Response(503)
+        return service.handler(request)
+    
+    tool._client = httpx.Client(transport=httpx.MockTransport(handler))
+    
+    outcomes = tool.search_many(QUERIES)
+    
+    assert isinstance(outcomes[1], RuntimeError) and "503" in str(outcomes[1])
+    assert outcomes[0][1][0]["chunk_id"] == "chunk-年假天数"
+    assert outcomes[2][1][0]["chunk_id"] == "chunk-婚假规定"
+
+
+def test_async_batch_and_fallback():
+    async def run():
+        service = RecallService()
+        tool = _tool(service)
+        _use_async_transport(tool, service)
+        batched = await tool.asearch_many(QUERIES)
+        
+        missing = RecallService(batch_status=404, delay=_reverse_delay)
+        fallback_tool = _tool(missing)
+        _use_async_transport(fallback_tool, missing)
+        first = await fallback_tool.asearch_many(QUERIES)
+        second = await fallback_tool.asearch_many(QUERIES[:2])
+        return service, batched, missing, fallback_tool, first, second
+    
+    service, batched, missing, fallback_tool, first, second = asyncio.run(run())
+    
+    assert service.requests == [("/api/recall/batch", QUERIES)]
+    assert _chunk_ids(batched) == [f"chunk-{query}" for query in QUERIES]
+    
+    assert fallback_tool._batch_supported is False
+    assert missing.paths().count("/api/recall/batch") == 1
+    assert [question for _, question in missing.requests[1:4]] == QUERIES[::-1]
+    assert _chunk_ids(first) == [f"chunk-{query}" for query in QUERIES]
+    assert _chunk_ids(second) == [f"chunk-{query}" for query in QUERIES[:2]]
+
+
+# ============================================================================
+# Pooled client lifecycle
+# ============================================================================
+
+@pytest.fixture
+def pooled_tool(monkeypatch):
+    """Tool whose lazily created clients (sync and async) use a mock transport."""
+    service = RecallService()
+    monkeypatch.setattr(RecallTool, "_client_options", lambda self: {"transport": httpx.MockTransport(service.handler)})
+    return _new_tool(batch=False)
+
+
+def test_clients_are_created_lazily(pooled_tool):
+    assert pooled_tool._client is None and pooled_tool._async_client is None
+    
+    pooled_tool.search(QUERIES[0])
+    assert pooled_tool._client is not None and pooled_tool._async_client is None
+    
+    asyncio.run(pooled_tool.asearch(QUERIES[0]))
+    assert pooled_tool._async_client is not None
+
+
+def test_async_client_from_finished_loop_is_closed_on_replacement(pooled_tool):
+    asyncio.run(pooled_tool.asearch(QUERIES[0]))
+    first = pooled_tool._async_client
+    
+    asyncio.run(pooled_tool.asearch(QUERIES[1]))
+    
+    assert pooled_tool._async_client is not first
+    assert first.is_closed and not pooled_tool._async_client.is_closed
+    assert not pooled_tool._closing_tasks
+
+
+def test_async_client_on_running_loop_is_closed_on_that_loop(pooled_tool):
+    other_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=other_loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        asyncio.run_coroutine_threadsafe(pooled_tool.asearch(QUERIES[0]), other_loop).result(timeout=5)
+        first = pooled_tool._async_client
+        
+        asyncio.run(pooled_tool.asearch(QUERIES[1]))
+        # 关闭被调度到原事件循环上执行
+        asyncio.run_coroutine_threadsafe(asyncio.sleep(0), other_loop).result(timeout=5)
+        
+        assert first.is_closed and pooled_tool._async_client is not first
+    finally:
+        other_loop.call_soon_threadsafe(other_loop.stop)
+        thread.join(timeout=5)
+        other_loop.close()
+
+
+def test_aclose_resets_both_clients(pooled_tool):
+    asyncio.run(pooled_tool.asearch(QUERIES[0]))
+    stale = pooled_tool._async_client
+    
+    async def use_and_close():
+        await pooled_tool.asearch(QUERIES[1])
+        pooled_tool.search(QUERIES[2])
+        clients = pooled_tool._client, pooled_tool._async_client
+        await pooled_tool.aclose()
+        return clients
+    
+    sync_client, async_client = asyncio.run(use_and_close())
+    
+    assert sync_client.is_closed and async_client.is_closed and stale.is_closed
+    assert pooled_tool._client is None
+    assert pooled_tool._async_client is None and pooled_tool._async_client_loop is None
+    assert not pooled_tool._closing_tasks
+    
+    # 关闭后仍可再次使用（重新创建客户端）
+    asyncio.run(pooled_tool.asearch(QUERIES[0]))
+    assert pooled_tool._async_client is not None and not pooled_tool._async_client.is_closed
@@ -0,0 +1,118 @@
+"""
+Concurrency test for per-session sequence allocation.
+
+Needs the agent schema in the configured PostgreSQL (POSTGRES_* settings,
+including docker/init-db/03-agent-sequence-counter.sql); skipped otherwise.
+"""
+import threading
+import uuid
+
+import psycopg2
+import pytest
+
+from config import get_settings
+from context.models import Message, Session
+from context.session_storage import SessionStorage
+
+THREADS = 16
+MESSAGES_PER_THREAD = 10
+
+
+@pytest.fixture
+def storage():
+    settings = get_settings()
+    try:
+        conn = psycopg2.connect(
+            host=settings.postgres_host,
+            port=settings.postgres_port,
+            database=settings.postgres_db,
+            user=settings.postgres_user,
+            password=settings.postgres_password,
+            connect_timeout=3
+        )
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"PostgreSQL not available: {e}")
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM information_schema.columns "
+                "WHERE table_name = 'agent_sessions' AND column_name = 'next_sequence_number'"
+            )
+            if cursor.fetchone() is None:
+                pytest.skip("agent schema with next_sequence_number is not installed")
+    finally:
+        conn.close()
+    
+    storage = SessionStorage()
+    storage.settings = settings.model_copy(update={"enable_cache": False})
+    return storage
+
+
+def test_concurrent_writers_get_unique_contiguous_sequence_numbers(storage):
+    session = Session.create_new(user_id="sequence-test")
+    storage.create_session(session)
+    errors = []
+    
+    def writer():
+        try:
+            for _ in range(MESSAGES_PER_THREAD):
+                storage.add_message(Message.create_user_message(session.session_id, "hi", token_count=1))
+        except Exception as e:
+            errors.append(e)
+    
+    threads = [threading.Thread(target=writer) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert not errors
+    sequence_numbers = [m.sequence_number for m in storage.get_messages(session.session_id)]
+    total = THREADS * MESSAGES_PER_THREAD
+    assert sorted(sequence_numbers) == list(range(total))
+    assert storage.get_next_sequence_number(session.session_id) == total
+
+
+def test_explicit_sequence_number_advances_counter(storage):
+    session = Session.create_new(user_id="sequence-test")
+    storage.create_session(session)
+    
+    storage.add_message(Message.create_user_message(session.session_id, "a", token_count=1, sequence_number=5))
+    message = Message.create_user_message(session.session_id, "b", token_count=1)
+    storage.add_message(message)
+    
+    assert message.sequence_number == 6
+
+
+def test_unknown_session_is_rejected(storage):
+    with pytest.raises(ValueError):
+        storage.add_message(Message.create_user_message(f"missing-{uuid.uuid4()}", "a", token_count=1))
+
+
+def test_concurrent_turns_keep_exact_session_stats(storage):
+    from context.session_manager import SessionManager
+    
+    manager = SessionManager(storage)
+    session = manager.create_session(user_id="sequence-test")
+    sessions = []
+    
+    def writer():
+        for _ in range(MESSAGES_PER_THREAD // 2):
+            sessions.append(manager.commit_turn(session.session_id, "question", "answer"))
+    
+    threads = [threading.Thread(target=writer) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    turns = THREADS * (MESSAGES_PER_THREAD // 2)
+    messages = storage.get_messages(session.session_id)
+    stored = storage.get_session(session.session_id)
+    assert len(messages) == 2 * turns
+    assert stored.message_count == 2 * turns
+    assert stored.total_token_count == sum(m.token_count for m in messages)
+    assert max(s.message_count for s in sessions) == 2 * turns
+    # 每轮的用户消息与助手回复序号相邻
+    roles = {m.sequence_number: m.role for m in messages}
+    assert all(roles[seq] == "user" and roles[seq + 1] == "assistant" for seq in range(0, 2 * turns, 2))
@@ -0,0 +1,150 @@
+"""Tests for SessionStorage's Redis message cache (fakeredis, no PostgreSQL access)."""
+from datetime import datetime
+
+import fakeredis
+import pytest
+
+from context.models import Message, MessageType
+from context.session_storage import SessionStorage
+
+
+@pytest.fixture
+def storage():
+    storage = SessionStorage()
+    storage.redis_client = fakeredis.FakeRedis(decode_responses=True)
+    return storage
+
+
+def _message(seq: int, content: str = None, session_id: str = "s1") -> Message:
+    return Message(
+        message_id=f"m{seq}",
+        session_id=session_id,
+        role="user",
+        content=content or f"message {seq}",
+        token_count=3,
+        created_at=datetime.now(),
+        message_type=MessageType.USER,
+        sequence_number=seq
+    )
+
+
+def _load(storage, messages, scope="active", session_id="s1"):
+    cached, version = storage._get_cached_messages(session_id, scope)
+    assert cached is None
+    storage._cache_messages(session_id, scope, messages, version)
+
+
+def test_unloaded_cache_is_a_miss(storage):
+    # 追加写入先于加载时，集合不完整，不能当作完整历史
+    storage._append_cached_message(_message(5))
+    assert storage._get_cached_messages("s1", "active")[0] is None
+
+
+def test_append_after_load_is_visible(storage):
+    _load(storage, [_message(0), _message(1)])
+    storage._append_cached_message(_message(2))
+    
+    cached, _ = storage._get_cached_messages("s1", "active")
+    assert [m.sequence_number for m in cached] == [0, 1, 2]
+    assert [m.sequence_number for m in storage._get_cached_messages("s1", "active", limit=2)[0]] == [0, 1]
+
+
+def test_empty_history_is_a_hit(storage):
+    _load(storage, [])
+    assert storage._get_cached_messages("s1", "active")[0] == []
+
+
+def test_load_merges_concurrent_append(storage):
+    _, version = storage._get_cached_messages("s1", "active")
+    # 加载期间有新消息写入
+    storage._append_cached_message(_message(2))
+    storage._cache_messages("s1", "active", [_message(0), _message(1)], version)
+    
+    cached, _ = storage._get_cached_messages("s1", "active")
+    assert [m.sequence_number for m in cached] == [0, 1, 2]
+
+
+def test_compression_updates_cache_in_place(storage):
+    _load(storage, [_message(0), _message(1), _message(2)], scope="active")
+    _load(storage, [_message(0), _message(1), _message(2)], scope="all")
+    
+    storage._mark_cached_messages_compressed("s1", ["m0", "m1"], "c1")
+    # 摘要沿用被压缩区间第一条消息的序号
+    summary = Message.create_compression_message("s1", "summary", 2, "c1", sequence_number=0)
+    storage._append_cached_message(summary)
+    
+    active, _ = storage._get_cached_messages("s1", "active")
+    assert [m.message_id for m in active] == [summary.message_id, "m2"]
+    everything, _ = storage._get_cached_messages("s1", "all")
+    assert sorted((m.sequence_number, m.content, m.is_compressed) for m in everything) == [
+        (0, "message 0", True), (0, "summary", False), (1, "message 1", True), (2, "message 2", False)
+    ]
+
+
+def test_compressed_summary_stays_active(storage):
+    summary = Message.create_compression_message("s1", "summary", 2, "c1", sequence_number=0)
+    _load(storage, [summary, _message(1)])
+    
+    storage._mark_cached_messages_compressed("s1", [summary.message_id, "m1"], "c2")
+    
+    active, _ = storage._get_cached_messages("s1", "active")
+    assert [(m.message_id, m.is_compressed) for m in active] == [(summary.message_id, True)]
+
+
+def test_stale_load_is_discarded_after_compression(storage):
+    _, version = storage._get_cached_messages("s1", "active")
+    storage._mark_cached_messages_compressed("s1", ["m0"], "c1")
+    # 压缩前读取的历史不能写入缓存
+    storage._cache_messages("s1", "active", [_message(0)], version)
+    assert storage._get_cached_messages("s1", "active")[0] is None
+
+
+def test_invalidation_does_not_scan_keyspace(storage, monkeypatch):
+    _load(storage, [_message(0)])
+    monkeypatch.setattr(storage.redis_client, "keys", lambda *args: pytest.fail("KEYS must not be used"))
+    storage._invalidate_message_cache("s1")
+    assert storage._get_cached_messages("s1", "active")[0] is None
+
+
+def _load_tail(storage, summary, recent, session_id="s1"):
+    cached, version = storage._get_cached_tail(session_id, 2)
+    assert cached is None
+    storage._cache_tail(session_id, summary, recent, version)
+
+
+def test_tail_append_after_load(storage):
+    summary = Message.create_compression_message("s1", "summary", 2, "c1", sequence_number=0)
+    _load_tail(storage, summary, [_message(1), _message(2)])
+    storage._append_cached_message(_message(3))
+    
+    cached, _ = storage._get_cached_tail("s1", 2)
+    assert [m.message_id for m in cached] == [summary.message_id, "m2", "m3"]
+
+
+def test_tail_is_trimmed_to_window(storage, monkeypatch):
+    monkeypatch.setattr("context.session_storage._TAIL_WINDOW", 3)
+    _load_tail(storage, None, [_message(0)])
+    for seq in range(1, 6):
+        storage._append_cached_message(_message(seq))
+    
+    assert storage.redis_client.zcard(storage._message_cache_key("s1", "tail")) == 3 + 1  # 含加载标记
+    assert [m.sequence_number for m in storage._get_cached_tail("s1", 10)[0]] == [3, 4, 5]
+
+
+def test_tail_follows_compression(storage):
+    _load_tail(storage, None, [_message(0), _message(1), _message(2)])
+    
+    storage._mark_cached_messages_compressed("s1", ["m0", "m1"], "c1")
+    summary = Message.create_compression_message("s1", "summary", 2, "c1", sequence_number=0)
+    storage._append_cached_message(summary)
+    
+    cached, _ = storage._get_cached_tail("s1", 5)
+    assert [m.message_id for m in cached] == [summary.message_id, "m2"]
+
+
+def test_stale_tail_load_is_discarded(storage):
+    _, version = storage._get_cached_tail("s1", 2)
+    storage._append_cached_message(Message.create_compression_message("s1", "summary", 2, "c1", sequence_number=0))
+    # 摘要更新前读取的尾部窗口不能写入缓存
+    storage._cache_tail("s1", None, [_message(1)], version)
+    assert storage._get_cached_tail("s1", 2)[0] is None
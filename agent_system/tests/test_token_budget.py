@@ -0,0 +1,62 @@
+"""Tests for TokenBudget: answers come from the session counters, never from message rows."""
+from types import SimpleNamespace
+
+import pytest
+
+from context.compression_manager import CompressionManager
+from context.session_manager import SessionManager
+from context.token_budget import TokenBudget
+
+
+class CounterOnlyStorage:
+    def __init__(self, total_tokens):
+        self.total_tokens = total_tokens
+        self.session_reads = 0
+    
+    def get_session(self, session_id):
+        self.session_reads += 1
+        if self.total_tokens is None:
+            return None
+        return SimpleNamespace(session_id=session_id, total_token_count=self.total_tokens)
+    
+    def get_messages(self, *args, **kwargs):
+        raise AssertionError("budgeting must not load messages")
+
+
+def test_available_tokens_uses_session_counter():
+    storage = CounterOnlyStorage(total_tokens=300)
+    budget = TokenBudget(storage=storage, max_context_tokens=1000, compression_threshold=500)
+    
+    assert budget.used_tokens("s1") == 300
+    assert budget.available_tokens("s1") == 700
+    assert not budget.needs_compression("s1")
+    
+    storage.total_tokens = 501
+    assert budget.needs_compression("s1")
+
+
+def test_supplied_session_skips_storage_read():
+    storage = CounterOnlyStorage(total_tokens=0)
+    budget = TokenBudget(storage=storage, max_context_tokens=1000, compression_threshold=500)
+    
+    assert budget.needs_compression("s1", SimpleNamespace(total_token_count=900))
+    assert storage.session_reads == 0
+
+
+def test_missing_session():
+    budget = TokenBudget(storage=CounterOnlyStorage(total_tokens=None), max_context_tokens=1000)
+    
+    assert budget.used_tokens("s1") == 0
+    assert budget.available_tokens("s1") == 1000
+    assert not budget.needs_compression("s1")
+
+
+@pytest.mark.parametrize("tokens, expected", [(10, False), (10 ** 9, True)])
+def test_managers_share_the_counter_path(tokens, expected):
+    storage = CounterOnlyStorage(total_tokens=tokens)
+    
+    assert SessionManager(storage=storage).check_compression_needed("s1") is expected
+    assert CompressionManager(llm=object(), storage=storage).should_compress("s1") is expected
+    assert SessionManager(storage=storage).get_available_tokens("s1") == (
+        SessionManager(storage=storage).max_context_tokens - tokens
+    )
@@ -0,0 +1,116 @@
+"""Tests for batched, cached and early-exit token counting (stub tokenizer)."""
+from types import SimpleNamespace
+
+import pytest
+
+from context import token_counter
+from context.token_counter import calculate_tokens, count_tokens_batch, is_within_token_limit
+
+
+class WordTokenizer:
+    """One token per whitespace-separated word; records every encode_batch call."""
+    
+    def __init__(self):
+        self.batches = []
+    
+    def encode_batch(self, texts):
+        self.batches.append(list(texts))
+        return [SimpleNamespace(ids=text.split()) for text in texts]
+
+
+@pytest.fixture
+def tokenizer(monkeypatch):
+    tokenizer = WordTokenizer()
+    monkeypatch.setattr(token_counter, "_get_qwen_tokenizer", lambda: tokenizer)
+    token_counter.clear_token_cache()
+    yield tokenizer
+    token_counter.clear_token_cache()
+
+
+def test_batch_encodes_unique_misses_once(tokenizer):
+    assert count_tokens_batch(["a b", "", "c d e", "a b"]) == [2, 0, 3, 2]
+    assert tokenizer.batches == [["a b", "c d e"]]
+    
+    # 已缓存的文本不再编码
+    assert count_tokens_batch(["c d e", "f"]) == [3, 1]
+    assert calculate_tokens("a b") == 2
+    assert tokenizer.batches[1:] == [["f"]]
+
+
+def test_cache_is_bounded(tokenizer, monkeypatch):
+    from config import get_settings
+    monkeypatch.setattr(get_settings(), "token_count_cache_size", 2)
+    
+    count_tokens_batch(["one", "two", "three"])
+    assert len(token_counter._TOKEN_CACHE) == 2
+    calculate_tokens("one")
+    assert tokenizer.batches[-1] == ["one"]
+
+
+def test_limit_check_stops_encoding_early(tokenizer, monkeypatch):
+    monkeypatch.setattr(token_counter, "_EARLY_EXIT_CHUNK_CHARS", 20)
+    text = "word " * 100
+    
+    within, counted = is_within_token_limit(text, 10)
+    assert not within and 10 < counted < 100
+    assert sum(len(batch[0]) for batch in tokenizer.batches) < len(text)
+    
+    assert is_within_token_limit(text, 100) == (True, 100)
+    # 完整计数后写入缓存
+    assert is_within_token_limit(text, 10) == (False, 100)
+
+
+def test_estimates_are_not_cached(monkeypatch):
+    def missing():
+        raise FileNotFoundError("no tokenizer")
+    monkeypatch.setattr(token_counter, "_get_qwen_tokenizer", missing)
+    token_counter.clear_token_cache()
+    
+    assert calculate_tokens("abcd") == 4
+    assert not token_counter._TOKEN_CACHE
+
+
+def test_loads_tokenizer_json_without_transformers(tmp_path):
+    from tokenizers import Tokenizer
+    from tokenizers.models import WordLevel
+    from tokenizers.pre_tokenizers import Whitespace
+    
+    tokenizer = Tokenizer(WordLevel({"hello": 0, "world": 1, "[UNK]": 2}, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = Whitespace()
+    tokenizer.save(str(tmp_path / "tokenizer.json"))
+    
+    loaded = token_counter._load_tokenizer(tmp_path)
+    assert [len(e.ids) for e in loaded.encode_batch(["hello world", "hello"])] == [2, 1]
+
+
+def test_failed_load_is_not_retried(monkeypatch, tmp_path):
+    attempts = []
+    
+    def load(tokenizer_dir):
+        attempts.append(tokenizer_dir)
+        raise FileNotFoundError("missing")
+    monkeypatch.setattr(token_counter, "_load_tokenizer", load)
+    monkeypatch.setattr(token_counter, "_QWEN_TOKENIZER", None)
+    monkeypatch.setattr(token_counter, "_TOKENIZER_ERROR", None)
+    token_counter.clear_token_cache()
+    
+    assert not token_counter.warmup_tokenizer()
+    assert calculate_tokens("abc") == 3
+    assert len(attempts) == 1
+
+
+def test_failed_warmup_logs_expected_path(monkeypatch, tmp_path, caplog):
+    monkeypatch.setattr(token_counter, "TOKENIZER_DIR", tmp_path)
+    monkeypatch.setattr(token_counter, "_QWEN_TOKENIZER", None)
+    monkeypatch.setattr(token_counter, "_TOKENIZER_ERROR", None)
+    token_counter.clear_token_cache()
+    
+    with caplog.at_level("DEBUG", logger=token_counter.logger.name):
+        assert not token_counter.warmup_tokenizer()
+        calculate_tokens("abc")
+        calculate_tokens("abcd")
+    
+    errors = [record for record in caplog.records if record.levelname == "ERROR"]
+    assert any(str(token_counter.TOKENIZER_FILE) in record.getMessage() for record in errors)
+    # 之后的计数不再重复输出 warning
+    assert not [record for record in caplog.records if record.levelname == "WARNING"]
@@ -0,0 +1,69 @@
+"""Worker process for async query jobs (``POST /query/async``)."""
+import argparse
+import asyncio
+import logging
+import signal
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.agent.agent import create_agent
+from src.jobs import JobWorker, create_job_store
+from src.prompts import get_prompt_budgeter
+from context.compression_worker import shutdown_compression_worker
+from context.token_counter import TOKENIZER_FILE, warmup_tokenizer
+from src.utils.logger import setup_logger
+from config import get_settings
+
+settings = get_settings()
+
+# Setup root logger so all modules can output logs
+root_logger = setup_logger(
+    "",
+    log_level=settings.log_level,
+    log_file=settings.log_file
+)
+logger = logging.getLogger("agent_worker")
+
+
+async def main(concurrency: int) -> None:
+    """Run the worker pool until SIGINT / SIGTERM."""
+    if not warmup_tokenizer() and settings.tokenizer_required:
+        raise RuntimeError(f"TOKENIZER_REQUIRED is set but the tokenizer could not be loaded from {TOKENIZER_FILE}")
+    get_prompt_budgeter()
+    agent = create_agent()
+    worker = JobWorker(
+        agent,
+        create_job_store(),
+        concurrency=concurrency,
+        heartbeat_interval=settings.job_heartbeat_interval,
+        stale_timeout=settings.job_stale_timeout
+    )
+    
+    loop = asyncio.get_running_loop()
+    stop_requested = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_requested.set)
+    
+    await worker.start()
+    await stop_requested.wait()
+    
+    logger.info("Stopping worker, waiting for running jobs to finish...")
+    await worker.stop()
+    await agent.aclose()
+    shutdown_compression_worker()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Async query job worker")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=settings.job_worker_concurrency,
+        help="Number of jobs executed concurrently by this process"
+    )
+    args = parser.parse_args()
+    
+    asyncio.run(main(args.concurrency))
@@ -12,6 +12,7 @@ CREATE TABLE IF NOT EXISTS agent_sessions (
     total_token_count INTEGER NOT NULL DEFAULT 0,
     message_count INTEGER NOT NULL DEFAULT 0,
     compression_count INTEGER NOT NULL DEFAULT 0,
+    next_sequence_number INTEGER NOT NULL DEFAULT 0,
     status VARCHAR(50) NOT NULL DEFAULT 'active',
     metadata JSONB DEFAULT '{}'::jsonb
 );
@@ -27,6 +28,7 @@ COMMENT ON COLUMN agent_sessions.session_id IS '会话唯一标识';
 COMMENT ON COLUMN agent_sessions.user_id IS '用户标识';
 COMMENT ON COLUMN agent_sessions.total_token_count IS '会话累积token总数';
 COMMENT ON COLUMN agent_sessions.compression_count IS '压缩执行次数';
+COMMENT ON COLUMN agent_sessions.next_sequence_number IS '下一个消息序号（UPDATE ... RETURNING 原子分配）';
 
 
 -- 2. 消息表（Deep Doc Agent）
@@ -49,6 +51,11 @@ CREATE INDEX IF NOT EXISTS idx_agent_messages_session ON agent_messages(session_
 CREATE INDEX IF NOT EXISTS idx_agent_messages_session_created ON agent_messages(session_id, created_at DESC);
 CREATE INDEX IF NOT EXISTS idx_agent_messages_compressed ON agent_messages(is_compressed) WHERE is_compressed = TRUE;
 CREATE INDEX IF NOT EXISTS idx_agent_messages_type ON agent_messages(message_type);
+-- 最近上下文查询（最新压缩摘要 + 最近N条未压缩普通消息，ORDER BY sequence_number DESC LIMIT）
+CREATE INDEX IF NOT EXISTS idx_agent_messages_active_tail ON agent_messages(session_id, sequence_number DESC)
+    WHERE is_compressed = FALSE AND message_type <> 'compression';
+CREATE INDEX IF NOT EXISTS idx_agent_messages_summary ON agent_messages(session_id, sequence_number DESC, created_at DESC)
+    WHERE message_type = 'compression';
 
 -- 消息表注释
 COMMENT ON TABLE agent_messages IS 'Deep Doc Agent 对话消息表';
@@ -71,6 +78,7 @@ CREATE TABLE IF NOT EXISTS agent_compression_history (
     summary_content TEXT NOT NULL,
     compressed_message_ids TEXT[] NOT NULL,
     created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    parent_compression_id VARCHAR(255) REFERENCES agent_compression_history(compression_id) ON DELETE SET NULL,
     metadata JSONB DEFAULT '{}'::jsonb
 );
 
@@ -85,6 +93,7 @@ COMMENT ON COLUMN agent_compression_history.original_message_count IS '原始消
 COMMENT ON COLUMN agent_compression_history.compressed_token_count IS '压缩前的token数';
 COMMENT ON COLUMN agent_compression_history.summary_token_count IS '摘要的token数';
 COMMENT ON COLUMN agent_compression_history.compressed_message_ids IS '被压缩的消息ID列表';
+COMMENT ON COLUMN agent_compression_history.parent_compression_id IS '增量压缩时合并的上一轮压缩（摘要谱系）';
 
 
 -- 4. 创建更新时间触发器函数（Deep Doc Agent）
@@ -0,0 +1,26 @@
+-- ============================================================================
+-- Deep Doc Agent 消息序号计数器（迁移）
+-- 消息序号由 agent_sessions.next_sequence_number 原子分配，不再扫描 MAX(sequence_number)
+-- 新建数据库时 02 已包含该列，本脚本为空操作；已有数据库可手动执行（可重复执行）：
+--   psql -h <host> -p <port> -U <user> -d <db> -f 03-agent-sequence-counter.sql
+-- ============================================================================
+
+ALTER TABLE agent_sessions
+    ADD COLUMN IF NOT EXISTS next_sequence_number INTEGER NOT NULL DEFAULT 0;
+
+COMMENT ON COLUMN agent_sessions.next_sequence_number IS '下一个消息序号（UPDATE ... RETURNING 原子分配）';
+
+-- 用已有消息初始化计数器（只向前推进，不触发 updated_at 更新）
+ALTER TABLE agent_sessions DISABLE TRIGGER update_agent_sessions_updated_at;
+
+UPDATE agent_sessions s
+SET next_sequence_number = m.max_sequence_number + 1
+FROM (
+    SELECT session_id, MAX(sequence_number) AS max_sequence_number
+    FROM agent_messages
+    GROUP BY session_id
+) m
+WHERE s.session_id = m.session_id
+  AND s.next_sequence_number <= m.max_sequence_number;
+
+ALTER TABLE agent_sessions ENABLE TRIGGER update_agent_sessions_updated_at;
@@ -0,0 +1,13 @@
+-- ============================================================================
+-- Deep Doc Agent 最近上下文查询索引（迁移）
+-- SessionStorage.get_recent_context 按 sequence_number DESC LIMIT 读取最新压缩摘要
+-- 与最近N条未压缩普通消息，部分索引只包含这两类消息
+-- 新建数据库时 02 已包含这些索引，本脚本为空操作；已有数据库可手动执行（可重复执行）：
+--   psql -h <host> -p <port> -U <user> -d <db> -f 04-agent-recent-context-index.sql
+-- ============================================================================
+
+CREATE INDEX IF NOT EXISTS idx_agent_messages_active_tail ON agent_messages(session_id, sequence_number DESC)
+    WHERE is_compressed = FALSE AND message_type <> 'compression';
+
+CREATE INDEX IF NOT EXISTS idx_agent_messages_summary ON agent_messages(session_id, sequence_number DESC, created_at DESC)
+    WHERE message_type = 'compression';
@@ -0,0 +1,12 @@
+-- ============================================================================
+-- Deep Doc Agent 压缩谱系（迁移）
+-- 增量压缩将新区间合并进上一轮摘要，parent_compression_id 记录被合并的上一轮压缩
+-- 新建数据库时 02 已包含该列，本脚本为空操作；已有数据库可手动执行（可重复执行）：
+--   psql -h <host> -p <port> -U <user> -d <db> -f 05-agent-compression-lineage.sql
+-- ============================================================================
+
+ALTER TABLE agent_compression_history
+    ADD COLUMN IF NOT EXISTS parent_compression_id VARCHAR(255)
+    REFERENCES agent_compression_history(compression_id) ON DELETE SET NULL;
+
+COMMENT ON COLUMN agent_compression_history.parent_compression_id IS '增量压缩时合并的上一轮压缩（摘要谱系）';
@@ -2,8 +2,9 @@
 import redis.asyncio as redis
 from .settings import settings
 
-# Redis client instance
+# Redis client instances
 redis_client: redis.Redis | None = None
+agent_redis_client: redis.Redis | None = None
 
 
 async def get_redis_client() -> redis.Redis:
@@ -18,11 +19,26 @@ async def get_redis_client() -> redis.Redis:
     return redis_client
 
 
+async def get_agent_redis_client() -> redis.Redis | None:
+    """Get or create the client for the agent's Redis db (None if not configured)."""
+    global agent_redis_client
+    if agent_redis_client is None and settings.AGENT_RECALL_CACHE_REDIS_URL:
+        agent_redis_client = await redis.from_url(
+            settings.AGENT_RECALL_CACHE_REDIS_URL,
+            encoding="utf-8",
+            decode_responses=True
+        )
+    return agent_redis_client
+
+
 async def close_redis():
-    """Close Redis connection."""
-    global redis_client
+    """Close Redis connections."""
+    global redis_client, agent_redis_client
     if redis_client:
         await redis_client.close()
         redis_client = None
+    if agent_redis_client:
+        await agent_redis_client.close()
+        agent_redis_client = None
 
 
@@ -75,6 +75,17 @@ class Settings(BaseSettings):
     SIMILARITY_THRESHOLD: float = 0.2
     VECTOR_SIMILARITY_WEIGHT: float = 0.3
     
+    # Recall Cache (in-process LRU + optional Redis tier)
+    RECALL_CACHE_ENABLED: bool = True
+    RECALL_CACHE_TTL: int = 600  # seconds
+    RECALL_CACHE_MAX_ENTRIES: int = 1024
+    RECALL_CACHE_USE_REDIS: bool = True
+    # Agent recall cache: its per-index generations are bumped together with ours
+    # so agent-side cached recalls are invalidated on document changes too
+    # (must point at the agent's Redis db, set per deployment; empty disables)
+    AGENT_RECALL_CACHE_REDIS_URL: str = ""
+    AGENT_RECALL_CACHE_GENERATION_PREFIX: str = "agent_recall_cache:gen:"
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
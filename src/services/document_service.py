@@ -7,6 +7,7 @@ from repositories.document_repository import DocumentRepository
 from utils.minio_client import upload_file, delete_file
 from utils.external_services import MineruService, DocumentProcessService
 from utils.es_utils import get_user_es_index
+from utils.recall_cache import recall_cache
 from models.document import Document
 from config.settings import settings
 from typing import List, Tuple, Optional
@@ -216,6 +217,9 @@ class DocumentService:
                     await self._poll_parse_task(doc, task_id, doc_repo)
                     logger.info(f"[Doc {doc_id}] Document processing completed successfully!")
                     
+                    # New chunks are searchable: drop cached recall results of this index
+                    await recall_cache.invalidate_index(es_index_name)
+                    
                 finally:
                     # Clean up temp file
                     if os.path.exists(temp_file_path):
@@ -396,6 +400,7 @@ class DocumentService:
                 await DocumentProcessService.delete_document_from_es(str(doc.id), user_es_index)
             except Exception as e:
                 logger.warning(f"Failed to delete from ES: {e}")
+            await recall_cache.invalidate_index(user_es_index)
         
         # Delete from MinIO
         if doc.file_path:
@@ -7,6 +7,7 @@ from repositories.document_repository import DocumentRepository
 from repositories.kb_subscription_repository import KBSubscriptionRepository
 from utils.external_services import DocumentProcessService
 from utils.es_utils import get_user_es_index
+from utils.recall_cache import recall_cache
 from typing import List, Tuple, Optional
 import logging
 import uuid
@@ -130,6 +131,8 @@ class KnowledgeBaseService:
                 )
             except Exception as e:
                 logger.warning(f"Failed to delete doc {doc.id} from ES: {e}")
+        if documents:
+            await recall_cache.invalidate_index(user_index)
         
         # Delete KB (will cascade delete documents in DB)
         await self.kb_repo.delete(kb)
@@ -0,0 +1,6 @@
+"""Shared test setup for the reader service."""
+import sys
+from pathlib import Path
+
+# Modules are imported relative to src (main.py runs from there)
+sys.path.insert(0, str(Path(__file__).parent.parent))
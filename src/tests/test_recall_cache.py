@@ -0,0 +1,110 @@
+"""Tests for the recall result cache and its use in search_chunks."""
+import fakeredis.aioredis
+import httpx
+import pytest
+
+from utils import external_services, recall_cache as recall_cache_module
+from utils.external_services import DocumentProcessService
+from utils.recall_cache import RecallCache
+
+PAYLOAD = {
+    "question": "年假怎么计算",
+    "index_names": ["user_1", "user_2"],
+    "doc_ids": ["d1", "d2"],
+    "top_n": 5,
+    "similarity_threshold": 0.2,
+}
+
+
+@pytest.fixture
+def redis_clients(monkeypatch):
+    """Fake Redis for the reader's own db and the agent's db."""
+    server = fakeredis.FakeServer()
+    reader = fakeredis.aioredis.FakeRedis(server=server, db=0, decode_responses=True)
+    agent = fakeredis.aioredis.FakeRedis(server=server, db=1, decode_responses=True)
+
+    async def get_reader():
+        return reader
+
+    async def get_agent():
+        return agent
+
+    monkeypatch.setattr(recall_cache_module, "get_redis_client", get_reader)
+    monkeypatch.setattr(recall_cache_module, "get_agent_redis_client", get_agent)
+    return reader, agent
+
+
+@pytest.fixture
+def cache(redis_clients):
+    return RecallCache(ttl=60, max_entries=10)
+
+
+@pytest.mark.asyncio
+async def test_key_ignores_question_formatting_and_list_order(cache):
+    key = await cache.make_key(PAYLOAD)
+
+    same = {
+        **PAYLOAD,
+        "question": "  年假怎么计算 ",
+        "index_names": ["user_2", "user_1"],
+        "doc_ids": ["d2", "d1"],
+    }
+    assert await cache.make_key(same) == key
+    assert await cache.make_key({**PAYLOAD, "question": "Annual   Leave"}) == await cache.make_key(
+        {**PAYLOAD, "question": "annual leave"}
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("field, value", [("top_n", 10), ("similarity_threshold", 0.5), ("doc_ids", ["d1"])])
+async def test_key_changes_with_recall_parameters(cache, field, value):
+    assert await cache.make_key({**PAYLOAD, field: value}) != await cache.make_key(PAYLOAD)
+
+
+@pytest.mark.asyncio
+async def test_invalidate_bumps_own_and_agent_generations(cache, redis_clients):
+    reader, agent = redis_clients
+    key = await cache.make_key(PAYLOAD)
+    await cache.set(key, {"chunks": []})
+    assert await cache.get(key) == {"chunks": []}
+
+    await cache.invalidate_index("user_1")
+
+    assert await reader.get("recall_cache:gen:user_1") == "1"
+    assert await agent.get("agent_recall_cache:gen:user_1") == "1"
+    new_key = await cache.make_key(PAYLOAD)
+    assert new_key != key
+    assert await cache.get(new_key) is None
+
+
+@pytest.mark.asyncio
+async def test_entries_are_shared_through_redis(cache):
+    key = await cache.make_key(PAYLOAD)
+    await cache.set(key, {"chunks": [{"chunk_id": "c1"}]})
+
+    other_worker = RecallCache(ttl=60, max_entries=10)
+    assert await other_worker.get(key) == {"chunks": [{"chunk_id": "c1"}]}
+
+
+@pytest.mark.asyncio
+async def test_failed_search_is_not_cached(redis_clients, monkeypatch):
+    responses = [
+        {"success": False, "message": "ES unavailable"},
+        {"success": True, "data": {"chunks": [{"chunk_id": "c1"}]}},
+    ]
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json=responses[min(len(requests), len(responses)) - 1])
+
+    monkeypatch.setattr(external_services, "recall_cache", RecallCache(ttl=60, max_entries=10))
+    monkeypatch.setattr(external_services, "http_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+    with pytest.raises(Exception, match="ES unavailable"):
+        await DocumentProcessService.search_chunks("年假怎么计算", ["user_1"], ["d1"])
+    first = await DocumentProcessService.search_chunks("年假怎么计算", ["user_1"], ["d1"])
+    second = await DocumentProcessService.search_chunks("年假怎么计算", ["user_1"], ["d1"])
+
+    assert first == second == {"chunks": [{"chunk_id": "c1"}]}
+    assert len(requests) == 2
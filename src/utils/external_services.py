@@ -2,6 +2,7 @@
 import httpx
 from typing import Dict, List, Optional, Any
 from config.settings import settings
+from utils.recall_cache import recall_cache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -171,6 +172,9 @@ class DocumentProcessService:
         """
         Search chunks using vector similarity.
         
+        Successful results are cached (see utils.recall_cache); uploading or
+        deleting a document invalidates the cached results of its index.
+        
         Args:
             question: User question
             index_names: List of ES index names
@@ -209,6 +213,14 @@ class DocumentProcessService:
                 if settings.RERANK_API_KEY:
                     payload["rerank_api_key"] = settings.RERANK_API_KEY
             
+            cache_key = None
+            if settings.RECALL_CACHE_ENABLED:
+                cache_key = await recall_cache.make_key(payload)
+                cached = await recall_cache.get(cache_key)
+                if cached is not None:
+                    logger.info(f"Search chunks cache hit ({cache_key[:12]})")
+                    return cached
+            
             response = await http_client.post(
                 f"{settings.DOC_PROCESS_BASE_URL}/api/recall",
                 json=payload
@@ -219,6 +231,9 @@ class DocumentProcessService:
             if not result.get("success"):
                 raise Exception(f"Search failed: {result.get('message')}")
             
+            if cache_key:
+                await recall_cache.set(cache_key, result["data"])
+            
             return result["data"]
         
         except Exception as e:
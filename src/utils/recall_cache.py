@@ -0,0 +1,160 @@
+"""Recall (search_chunks) result cache.
+
+Two tiers: an in-process LRU with TTL, plus an optional Redis tier shared by
+all workers. Cache keys cover the normalized question, index set, sorted
+doc_ids, top_n, thresholds and model names, plus a per-index generation
+counter. Uploading or deleting a document bumps the generation of its index,
+so stale entries are never hit again and simply expire with their TTL.
+
+The agent service keeps its own recall cache with generations in its Redis db
+(AGENT_RECALL_CACHE_REDIS_URL); invalidation bumps those too.
+"""
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from config.redis import get_agent_redis_client, get_redis_client
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+ENTRY_PREFIX = "recall_cache:entry:"
+GENERATION_PREFIX = "recall_cache:gen:"
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """Normalize question text: trim, collapse whitespace, lowercase."""
+    return _WHITESPACE.sub(" ", question.strip()).lower()
+
+
+class RecallCache:
+    """Two-tier cache for successful recall results."""
+
+    def __init__(self, ttl: int, max_entries: int, use_redis: bool = True):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.use_redis = use_redis
+        self._entries: OrderedDict = OrderedDict()  # key -> (expires_at, value)
+        self._generations: Dict[str, int] = {}
+
+    async def _get_generations(self, index_names: List[str]) -> List[int]:
+        """Get current generation of each index (Redis first, local fallback)."""
+        if self.use_redis and index_names:
+            try:
+                redis = await get_redis_client()
+                values = await redis.mget([f"{GENERATION_PREFIX}{name}" for name in index_names])
+                return [int(v) if v else 0 for v in values]
+            except Exception as e:
+                logger.warning(f"Recall cache: failed to read generations from Redis: {e}")
+
+        return [self._generations.get(name, 0) for name in index_names]
+
+    async def make_key(self, payload: Dict[str, Any]) -> str:
+        """
+        Build the cache key for a recall request payload.
+
+        Args:
+            payload: Recall API request payload
+
+        Returns:
+            Cache key (sha256 hex digest)
+        """
+        index_names = sorted(payload.get("index_names") or [])
+        key_data = {
+            "question": normalize_question(payload.get("question", "")),
+            "index_names": index_names,
+            "generations": await self._get_generations(index_names),
+            "doc_ids": sorted(payload.get("doc_ids") or []),
+            "top_n": payload.get("top_n"),
+            "similarity_threshold": payload.get("similarity_threshold"),
+            "vector_similarity_weight": payload.get("vector_similarity_weight"),
+            "model_name": payload.get("model_name"),
+            "rerank_model_name": payload.get("rerank_model_name"),
+        }
+        raw = json.dumps(key_data, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _get_local(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _set_local(self, key: str, value: Dict[str, Any]) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get a cached result (local tier first, then Redis)."""
+        value = self._get_local(key)
+        if value is not None:
+            return value
+
+        if self.use_redis:
+            try:
+                redis = await get_redis_client()
+                data = await redis.get(f"{ENTRY_PREFIX}{key}")
+                if data:
+                    value = json.loads(data)
+                    self._set_local(key, value)
+                    return value
+            except Exception as e:
+                logger.warning(f"Recall cache: Redis read failed: {e}")
+
+        return None
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        """Store a result in both tiers."""
+        self._set_local(key, value)
+
+        if self.use_redis:
+            try:
+                redis = await get_redis_client()
+                await redis.setex(f"{ENTRY_PREFIX}{key}", self.ttl, json.dumps(value, ensure_ascii=False))
+            except Exception as e:
+                logger.warning(f"Recall cache: Redis write failed: {e}")
+
+    async def invalidate_index(self, index_name: str) -> None:
+        """
+        Invalidate all cached results of an index (bump its generation).
+
+        Args:
+            index_name: ES index whose documents changed
+        """
+        self._generations[index_name] = self._generations.get(index_name, 0) + 1
+
+        if self.use_redis:
+            try:
+                redis = await get_redis_client()
+                await redis.incr(f"{GENERATION_PREFIX}{index_name}")
+            except Exception as e:
+                logger.warning(f"Recall cache: failed to bump generation in Redis: {e}")
+
+        try:
+            agent_redis = await get_agent_redis_client()
+            if agent_redis is not None:
+                await agent_redis.incr(f"{settings.AGENT_RECALL_CACHE_GENERATION_PREFIX}{index_name}")
+        except Exception as e:
+            logger.warning(f"Recall cache: failed to bump agent recall cache generation: {e}")
+
+        logger.info(f"Recall cache invalidated for index: {index_name}")
+
+
+recall_cache = RecallCache(
+    ttl=settings.RECALL_CACHE_TTL,
+    max_entries=settings.RECALL_CACHE_MAX_ENTRIES,
+    use_redis=settings.RECALL_CACHE_USE_REDIS
+)